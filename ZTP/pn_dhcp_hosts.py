@@ -0,0 +1,476 @@
+#!/usr/bin/python
+
+"""
+Generator of the DHCP host blocks and of the Ansible hosts file of the
+switches listed in a ZTP csv file.
+
+The existing dhcpd.conf and hosts file are parsed once, the host blocks
+indexed by mac, ip and hostname and the inventory by group and host name.
+The whole csv file is validated in one pass before anything is changed:
+field count, mac and ip format, and macs, ips and hostnames given twice.
+Every row is then checked against the indexes, which are kept up to date as
+hosts are added or removed, so a run costs one read and at most one write
+of each file whatever the number of switches.
+
+add:    adds a host block for every row whose mac, ip and hostname are all
+        unused. A row matching an existing block exactly is left unchanged, a
+        row with only some of them in use is skipped. Rows tagged spine are
+        added to the [spine] group of the inventory, other tagged rows to
+        [leaf], untagged rows are left out of it.
+remove: removes the host blocks with the mac of a row, and their hosts from
+        the inventory.
+
+Host blocks not created by the generator are kept as they are, as is the
+rest of both files. Each file is written to a temporary file next to it and
+renamed over it, only when its contents changed.
+
+Example Usage:
+python pn_dhcp_hosts.py add switches.csv
+python pn_dhcp_hosts.py add switches.csv --fields 6
+    --default-url http://10.9.9.2/images/onie-installer
+python pn_dhcp_hosts.py add switches.csv --new-inventory
+python pn_dhcp_hosts.py remove retired.csv --inventory /etc/ansible/hosts
+
+Csv rows are mac,ip,hostname,tag[,device-id,device-type], see ztp.sh -h.
+Exits with status 1 when the csv file is invalid, without writing anything.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+from collections import OrderedDict
+
+DEFAULT_CONF = '/etc/dhcp/dhcpd.conf'
+DEFAULT_INVENTORY = '/etc/ansible/hosts'
+DEFAULT_FIELDS = 4
+GROUPS = ('spine', 'leaf')
+
+MAC_PATTERN = re.compile(r'^([a-fA-F0-9]{2}:){5}[a-fA-F0-9]{2}$')
+IP_PATTERN = re.compile(r'^[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+$')
+HOST_BLOCK = re.compile(r'^[ \t]*host[ \t]+([^\s{]+)\s*\{[^}]*\}[ \t]*\n?',
+                        re.M)
+HOST_OPTIONS = {
+    'mac': re.compile(r'hardware\s+ethernet\s+([0-9a-fA-F:]+)\s*;'),
+    'ip': re.compile(r'fixed-address\s+([^\s;]+)\s*;'),
+    'hostname': re.compile(r'option\s+host-name\s+"([^"]*)"\s*;'),
+}
+SECTION = re.compile(r'^\s*\[([^\]]+)\]\s*$')
+
+
+class Host(object):
+    """
+    DHCP host block of a switch.
+    """
+
+    def __init__(self, mac, ip, hostname=None, tag=None, url=None,
+                 text=None, line=None):
+        """
+        :param mac: Mac address of the switch.
+        :param ip: Fixed address leased to the switch.
+        :param hostname: Hostname of the switch, or None.
+        :param tag: spine or leaf for the inventory, or None.
+        :param url: ONIE installer url, or None.
+        :param text: Block as parsed from dhcpd.conf, kept as it is.
+        :param line: Line number in the csv file.
+        """
+        self.mac = mac.lower() if mac else mac
+        self.ip = ip
+        self.hostname = hostname or None
+        self.tag = tag or None
+        self.url = url
+        self.text = text
+        self.line = line
+        # Name of the host declaration and whether the block was removed,
+        # set by DhcpConf.
+        self.declared = None
+        self.removed = False
+
+    @property
+    def name(self):
+        """ Name of the host block and of the inventory host. """
+        return self.hostname or self.ip
+
+    def same(self, other):
+        """ Whether both hosts lease the same ip to the same switch. """
+        return (self.mac, self.ip, self.hostname) == \
+            (other.mac, other.ip, other.hostname)
+
+    def render(self):
+        """ Host block in dhcpd.conf syntax. """
+        if self.text is not None:
+            return self.text
+        lines = ['host %s {' % self.name,
+                 '  hardware ethernet %s;' % self.mac,
+                 '  fixed-address %s;' % self.ip]
+        if self.hostname:
+            lines.append('  option host-name "%s";' % self.hostname)
+        if self.url:
+            lines.append('  option default-url="%s";' % self.url)
+        return '\n'.join(lines + ['}']) + '\n'
+
+
+class DhcpConf(object):
+    """
+    Contents of dhcpd.conf: the host blocks indexed by mac, ip and hostname,
+    and the text around them.
+    """
+
+    def __init__(self, text=''):
+        """
+        :param text: Contents of dhcpd.conf.
+        """
+        # Text between the host blocks and the Host objects, in file order.
+        self.segments = []
+        self.macs = {}
+        self.ips = {}
+        self.names = {}
+        position = 0
+        for match in HOST_BLOCK.finditer(text):
+            self.segments.append(text[position:match.start()])
+            block = match.group(0)
+            values = dict((key, pattern.search(block))
+                          for key, pattern in HOST_OPTIONS.items())
+            values = dict((key, value.group(1) if value else None)
+                          for key, value in values.items())
+            host = Host(values['mac'], values['ip'], values['hostname'],
+                        text=block)
+            host.declared = match.group(1)
+            self.segments.append(host)
+            self._index(host)
+            position = match.end()
+        self.segments.append(text[position:])
+
+    @staticmethod
+    def _keys(host):
+        """
+        Method to list the index entries of a host.
+        :param host: The Host.
+        :return: List of tuples of the index name and key.
+        """
+        keys = [('macs', host.mac), ('ips', host.ip),
+                ('names', host.declared), ('names', host.hostname)]
+        return [(index, key) for index, key in keys if key]
+
+    def _index(self, host):
+        """
+        Method to add a host to the indexes.
+        :param host: The Host.
+        """
+        for index, key in self._keys(host):
+            getattr(self, index)[key] = host
+
+    def conflicts(self, host):
+        """
+        Method to find the host blocks using the mac, ip or hostname of a
+        host.
+        :param host: The Host.
+        :return: List of the Host blocks in use, without duplicates.
+        """
+        found = []
+        for index, key in ((self.macs, host.mac), (self.ips, host.ip),
+                           (self.names, host.name)):
+            existing = index.get(key) if key else None
+            if existing is not None and existing not in found:
+                found.append(existing)
+        return found
+
+    def add(self, host):
+        """
+        Method to append a host block.
+        :param host: The Host.
+        """
+        last = self.segments[-1] if self.segments else ''
+        if not isinstance(last, Host) and last and not last.endswith('\n'):
+            self.segments[-1] += '\n'
+        host.declared = host.name
+        self.segments.append(host)
+        self._index(host)
+
+    def remove(self, host):
+        """
+        Method to remove a host block and its index entries.
+        :param host: The Host, as found in the indexes.
+        """
+        for index, key in self._keys(host):
+            if getattr(self, index).get(key) is host:
+                del getattr(self, index)[key]
+        host.removed = True
+
+    def render(self):
+        """ Contents of dhcpd.conf. """
+        return ''.join(segment.render() if isinstance(segment, Host)
+                       else segment for segment in self.segments
+                       if not getattr(segment, 'removed', False))
+
+
+class Inventory(object):
+    """
+    Ansible hosts file: the hosts of the spine and leaf groups, and the
+    other groups kept as they are.
+    """
+
+    def __init__(self, text=''):
+        """
+        :param text: Contents of the hosts file.
+        """
+        self.groups = OrderedDict((group, OrderedDict()) for group in GROUPS)
+        self.other = []
+        section = None
+        for line in text.splitlines():
+            match = SECTION.match(line)
+            if match:
+                section = match.group(1).strip()
+            if section in self.groups:
+                fields = line.split()
+                if not match and fields and not fields[0].startswith(
+                        ('#', ';')):
+                    self.groups[section][fields[0]] = line.strip()
+            elif section is not None or line.strip():
+                self.other.append(line)
+
+    def add(self, host):
+        """
+        Method to add a host to the group of its tag, moving it from the
+        other group.
+        :param host: The Host, with a tag.
+        """
+        group = 'spine' if host.tag == 'spine' else 'leaf'
+        self.remove(host.name)
+        self.groups[group][host.name] = '%s ansible_host=%s' % (host.name,
+                                                                host.ip)
+
+    def remove(self, name):
+        """
+        Method to remove a host from the spine and leaf groups.
+        :param name: Name of the host.
+        """
+        for hosts in self.groups.values():
+            hosts.pop(name, None)
+
+    def render(self):
+        """ Contents of the hosts file. """
+        sections = ['\n'.join(['[%s]' % group] + list(hosts.values()))
+                    for group, hosts in self.groups.items()]
+        other = '\n'.join(self.other).strip('\n')
+        return '\n\n'.join(sections + ([other] if other else [])) + '\n'
+
+
+def read_csv(lines, fields=DEFAULT_FIELDS, url=None, require_ip=True):
+    """
+    Method to parse and validate the rows of a csv file in one pass.
+    :param lines: Lines of the csv file.
+    :param fields: Minimum number of fields of a row.
+    :param url: ONIE installer url of the host blocks, or None.
+    :param require_ip: Whether a row must have an ip, removal only needs the
+    mac.
+    :return: Tuple of the list of Host and the list of error messages.
+    """
+    hosts = []
+    errors = []
+    seen = {'mac': {}, 'ip': {}, 'hostname': {}}
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        row = [value.strip() for value in line.split(',')]
+        if len(row) < fields:
+            errors.append('line %d: %d fields, expected at least %d, use ,, '
+                          'in place of an optional value' %
+                          (number, len(row), fields))
+            continue
+        if not MAC_PATTERN.match(row[0]):
+            errors.append('line %d: invalid mac address %s' % (number,
+                                                                row[0]))
+            continue
+        ip = row[1] if len(row) > 1 else ''
+        if (ip or require_ip) and not IP_PATTERN.match(ip):
+            errors.append('line %d: invalid ip address %s' % (number, ip))
+            continue
+
+        host = Host(row[0], ip or None, row[2] if len(row) > 2 else None,
+                    row[3] if len(row) > 3 else None, url, line=number)
+        for key in ('mac', 'ip', 'hostname'):
+            value = getattr(host, key)
+            if value and value in seen[key]:
+                errors.append('line %d: %s %s already on line %d' % (
+                    number, key, value, seen[key][value]))
+            elif value:
+                seen[key][value] = number
+        hosts.append(host)
+    return hosts, errors
+
+
+def add_hosts(conf, inventory, hosts):
+    """
+    Method to add the host blocks and inventory hosts of the csv rows.
+    :param conf: The DhcpConf.
+    :param inventory: The Inventory, or None.
+    :param hosts: List of Host read from the csv file.
+    :return: Dictionary of the list of Host added, unchanged and skipped,
+    and the list of messages.
+    """
+    report = {'added': [], 'unchanged': [], 'skipped': [], 'messages': []}
+    for host in hosts:
+        conflicts = conf.conflicts(host)
+        if not conflicts:
+            conf.add(host)
+            report['added'].append(host)
+        elif len(conflicts) == 1 and conflicts[0].same(host):
+            report['unchanged'].append(host)
+        else:
+            report['skipped'].append(host)
+            report['messages'].append(
+                'line %d: skipped, %s in use by host %s' % (
+                    host.line, ', '.join(
+                        key for key in ('mac', 'ip', 'hostname')
+                        if getattr(host, key) and any(
+                            getattr(other, key) == getattr(host, key)
+                            for other in conflicts)) or 'name',
+                    ', '.join(other.name or '?' for other in conflicts)))
+            continue
+
+        if inventory is None:
+            continue
+        if host.tag:
+            inventory.add(host)
+        else:
+            report['messages'].append(
+                'line %d: no spine/leaf tag, host %s is not added to the '
+                'inventory' % (host.line, host.name))
+    return report
+
+
+def remove_hosts(conf, inventory, hosts):
+    """
+    Method to remove the host blocks and inventory hosts of the macs of the
+    csv rows.
+    :param conf: The DhcpConf.
+    :param inventory: The Inventory, or None.
+    :param hosts: List of Host read from the csv file.
+    :return: Dictionary of the list of Host removed and missing, and the
+    list of messages.
+    """
+    report = {'removed': [], 'missing': [], 'messages': []}
+    for host in hosts:
+        existing = conf.macs.get(host.mac)
+        if existing is None:
+            report['missing'].append(host)
+            report['messages'].append('line %d: no host block for mac %s' %
+                                      (host.line, host.mac))
+            continue
+        conf.remove(existing)
+        report['removed'].append(existing)
+        if inventory is not None:
+            inventory.remove(existing.name)
+    return report
+
+
+def read_file(path):
+    """
+    Method to read a file which may not exist yet.
+    :param path: Path of the file.
+    :return: Contents of the file, empty if it does not exist.
+    """
+    if not os.path.exists(path):
+        return ''
+    with open(path) as text_file:
+        return text_file.read()
+
+
+def write_atomic(path, text):
+    """
+    Method to replace a file with a single rename of a temporary file
+    written next to it, keeping its mode.
+    :param path: Path of the file.
+    :param text: New contents.
+    :return: True if the file changed.
+    """
+    if os.path.exists(path) and read_file(path) == text:
+        return False
+    directory = os.path.dirname(os.path.abspath(path))
+    mode = os.stat(path).st_mode & 0o7777 if os.path.exists(path) else 0o644
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.pn_dhcp')
+    try:
+        with os.fdopen(handle, 'w') as temp_file:
+            temp_file.write(text)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.chmod(temp_path, mode)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return True
+
+
+def main(argv=None):
+    """ This section is for arguments parsing """
+    parser = argparse.ArgumentParser(
+        description='DHCP host blocks and Ansible hosts file of the switches '
+                    'of a csv file.')
+    parser.add_argument('action', choices=['add', 'remove'])
+    parser.add_argument('csv', help='Csv file of the switches.')
+    parser.add_argument('--conf', default=DEFAULT_CONF,
+                        help='Path of dhcpd.conf (default: %(default)s).')
+    parser.add_argument('--inventory', default=DEFAULT_INVENTORY,
+                        help='Path of the Ansible hosts file '
+                             '(default: %(default)s).')
+    parser.add_argument('--no-inventory', action='store_true',
+                        help='Leave the Ansible hosts file alone.')
+    parser.add_argument('--new-inventory', action='store_true',
+                        help='Replace the Ansible hosts file instead of '
+                             'updating it.')
+    parser.add_argument('--fields', type=int, default=DEFAULT_FIELDS,
+                        help='Minimum number of fields of a row '
+                             '(default: %(default)s).')
+    parser.add_argument('--default-url',
+                        help='ONIE installer url of the added host blocks.')
+    args = parser.parse_args(argv)
+
+    with open(args.csv) as csv_file:
+        hosts, errors = read_csv(
+            csv_file, args.fields if args.action == 'add' else 1,
+            args.default_url, args.action == 'add')
+    if errors:
+        print('Invalid csv file %s, nothing written:' % args.csv)
+        print('\n'.join('  -' + error for error in errors))
+        return 1
+
+    conf = DhcpConf(read_file(args.conf))
+    inventory = None
+    if not args.no_inventory:
+        inventory = Inventory('' if args.new_inventory else
+                              read_file(args.inventory))
+
+    if args.action == 'add':
+        report = add_hosts(conf, inventory, hosts)
+        summary = '%d added, %d unchanged, %d skipped' % (
+            len(report['added']), len(report['unchanged']),
+            len(report['skipped']))
+    else:
+        report = remove_hosts(conf, inventory, hosts)
+        summary = '%d removed, %d not found' % (len(report['removed']),
+                                                len(report['missing']))
+    for message in report['messages']:
+        print('  -' + message)
+
+    changed = write_atomic(args.conf, conf.render())
+    print('  -%s: %s%s' % (args.conf, summary, '' if changed else
+                           ', not modified'))
+    if inventory is not None:
+        changed = write_atomic(args.inventory, inventory.render())
+        print('  -%s: %s' % (args.inventory, '%d spine, %d leaf hosts' % (
+            len(inventory.groups['spine']), len(inventory.groups['leaf'])) +
+            ('' if changed else ', not modified')))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -137,6 +137,7 @@ device_id=()
 device_type=()
 ip_arr=()
 script_dir=`pwd`
+ztp_dir="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
 
 ##
 # This function validates ipaddress and mac address field from CSV file.
@@ -343,86 +344,40 @@ subnet $subnet netmask $subnet_mask {  #network
   #Following will parse csv file and wil create host blocks in dhcpd.conf file
   if [ $processCsv == 1 ]; then
 
-    #Appending dhcpd.conf file with mac-ipaddress entries
-    spinehostnames=()
-    leafhostnames=() 
-    spineips=()
-    leafips=()
-  
+    cd $script_dir
 
+    #Keeping ip, device id and device type of every switch for the ONIE license functions
     for line in `cat $csv_file` ;
     do
       arr=()
       IFS=',' read -a arr <<< "$line"
-      mac=${arr[0]}
-      ip=${arr[1]}
       ip_arr+=(${arr[1]})
-      hostname=${arr[2]}
-      tag=${arr[3]}
       device_id+=(${arr[4]})
       device_type+=(${arr[5]})
-  
-      check_mac_entry_exists=`cat /etc/dhcp/dhcpd.conf | grep "$mac" | wc -l`
-      check_ip_entry_exists=`cat /etc/dhcp/dhcpd.conf | grep "$ip" | wc -l`
-      if [ -z "$hostname" ]; then
-        check_hostname_entry_exists=0
-      else
-        check_hostname_entry_exists=`cat /etc/dhcp/dhcpd.conf | grep "$hostname" | wc -l`
-      fi
-
-      if [ -z $hostname ]; then
-      host_block="host $ip {
-  hardware ethernet $mac;
-  fixed-address $ip;
-"
-      else
-      host_block="host $hostname {
-  hardware ethernet $mac;
-  fixed-address $ip;
-  option host-name \"$hostname\";
-"
-     fi
-
-      if [[ "$params" == *"-onie"* ]]; then
-        url=`cat $conf_file | grep 'default-url=' | cut -d = -f2`
-        host_block="$host_block  option default-url=\"$url\";"
-      fi
-  host_block="$host_block
-}"
-
-      if [ $check_mac_entry_exists == 0 ] && [ $check_ip_entry_exists == 0 ] && [ $check_hostname_entry_exists == 0 ]; then
-        sudo sh -c "echo '$host_block' >> /etc/dhcp/dhcpd.conf"
-      fi
-
-      if ! [ -z "$tag" ]; then
-        if [ "$tag" == "spine"  ]; then
-          spinehostnames+=($hostname)
-          spineips+=($ip)
-        else
-          leafhostnames+=($hostname)
-          leafips+=($ip)
-        fi
-      else
-        printf "\n  -Tag(spine/leaf) is not provided for host:$hostname. This host is not added in /etc/ansible/hosts file"
-      fi
     done
-    
-    #if user has not provided -skip_ansible flag, then only following code will get executed.
-    #this code creates host file for ansbile from csv file
-    if ! [[ "$params" == *"-skip_ansible"* ]]; then
-      echo "[spine]" > /etc/ansible/hosts
-      for ((j=1; j<=${#spineips[@]}; j++)); do
-        echo "${spinehostnames[j-1]} ansible_host=${spineips[j-1]}" >> /etc/ansible/hosts
-      done
 
-      echo -e "\n" >> /etc/ansible/hosts
+    #pn_dhcp_hosts.py parses dhcpd.conf and /etc/ansible/hosts once, adds the host blocks of the new switches
+    #and the spine/leaf groups, and replaces each file with a single rename.
+    generator_args="add $csv_file --conf /etc/dhcp/dhcpd.conf --inventory /etc/ansible/hosts"
+    if [[ "$params" == *"-onie"* ]]; then
+      url=`cat $conf_file | grep 'default-url=' | cut -d = -f2`
+      generator_args="$generator_args --fields 6 --default-url $url"
+    fi
 
-      echo "[leaf]" >> /etc/ansible/hosts
-      for ((j=1; j<=${#leafips[@]}; j++)); do
-        echo "${leafhostnames[j-1]} ansible_host=${leafips[j-1]}" >> /etc/ansible/hosts
-      done
+    #if user has provided -skip_ansible flag, ansible hosts file is left alone.
+    #if user has provided -reconfigure_dhcp flag, ansible hosts file is recreated from csv file.
+    if [[ "$params" == *"-skip_ansible"* ]]; then
+      generator_args="$generator_args --no-inventory"
+    elif [[ "$params" == *"-reconfigure_dhcp"* ]]; then
+      generator_args="$generator_args --new-inventory"
     fi
 
+    python_command=`command -v python3 || command -v python`
+    #The ERR trap is not inherited by this function, so stop here if the files could not be generated.
+    if ! sudo $python_command $ztp_dir/pn_dhcp_hosts.py $generator_args; then
+      printf "${RED}Failed to update /etc/dhcp/dhcpd.conf and /etc/ansible/hosts from $csv_file${NC}\n"
+      exit 1
+    fi
   fi #end of processCsv
 
   #Restart dhcp server
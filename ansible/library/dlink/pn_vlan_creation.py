@@ -21,6 +21,8 @@
 import shlex
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_csv import parse_vlan
+from ansible.module_utils.pn_vlan_set import VlanSet, coalesce_vlan_creates
 
 DOCUMENTATION = """
 ---
@@ -144,37 +146,36 @@ def run_cli(module, cli):
         return None
 
 
-def create_vlan(module, vlan_id, untagged_ports):
+def create_vlans(module, requests):
     """
-    Method to create a vlan.
+    Method to create vlans. Vlans sharing the same untagged ports are created
+    with one vlan-create per contiguous range.
     :param module: The Ansible module to fetch input parameters.
-    :param vlan_id: vlan id to be created.
-    :param untagged_ports: List of untagged ports.
-    :return: String describing if vlan got created or not.
+    :param requests: List of (vlan id, untagged ports or None) tuples.
+    :return: String describing which vlans got created.
     """
     global CHANGED_FLAG
     output = ''
-    new_vlan = False
 
     cli = pn_cli(module)
     cli += ' vlan-show format id no-show-headers '
     existing_vlans = run_cli(module, cli)
+    existing_vlans = VlanSet.parse(existing_vlans.split()
+                                   if existing_vlans is not None else [])
 
-    if existing_vlans is not None:
-        existing_vlans = existing_vlans.split()
-        if vlan_id not in existing_vlans:
-            new_vlan = True
-
-    if new_vlan or existing_vlans is None:
-        cli = pn_cli(module)
-        cli += ' vlan-create id %s scope fabric ' % vlan_id
-
+    attributes = []
+    for vlan_id, untagged_ports in requests:
+        scope = 'scope fabric'
         if untagged_ports is not None:
-            cli += ' untagged-ports %s ' % untagged_ports
+            scope += ' untagged-ports %s' % untagged_ports
+        attributes.append((vlan_id, scope))
 
+    for command in coalesce_vlan_creates(attributes, existing_vlans):
+        cli = pn_cli(module)
+        cli += ' %s ' % command
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-        output += 'Created vlan with id %s\n' % vlan_id
+        output += 'Created vlan with %s\n' % ' '.join(command.split()[1:3])
 
     return output
 
@@ -199,19 +200,41 @@ def main():
     if vlan_data:
         vlan_data = vlan_data.replace(' ', '')
         vlan_data_list = vlan_data.split('\n')
-        for row in vlan_data_list:
+        requests = []
+        errors = []
+        for line_number, row in enumerate(vlan_data_list, 1):
             if row.startswith('#'):
                 continue
             else:
-                elements = row.split(',')
-                elements = filter(None, elements)
-                vlan_id = elements.pop(0).strip()
+                elements = [element for element in row.split(',') if element]
+                if not elements:
+                    continue
+                try:
+                    vlan_id = parse_vlan(elements.pop(0).strip())
+                except ValueError as error:
+                    errors.append('line %d: vlan_id: %s' % (line_number,
+                                                            error))
+                    continue
                 if len(elements) > 0:
                     untagged_ports = ','.join(elements)
                 else:
                     untagged_ports = None
 
-                message += create_vlan(module, vlan_id, untagged_ports)
+                requests.append((vlan_id, untagged_ports))
+
+        if errors:
+            module.exit_json(
+                unreachable=False,
+                failed=True,
+                exception='\n'.join(errors),
+                summary=[{'switch': module.params['pn_switch'],
+                          'output': error} for error in errors],
+                msg='Invalid vlan csv data',
+                task='Create vlans',
+                changed=False
+            )
+
+        message += create_vlans(module, requests)
 
     for line in message.splitlines():
         if line:
@@ -17,6 +17,9 @@
 
 import shlex
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import CliExecutor, DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_vlan_set import (VlanSet, vlan_create_commands,
+                                              vlan_delete_commands)
 
 
 DOCUMENTATION = """
@@ -30,6 +33,7 @@ description:
   - VLANs are used to isolate network traffic at Layer 2.The VLAN identifiers
     0 and 4095 are reserved and cannot be used per the IEEE 802.1Q standard.
     The range of configurable VLAN identifiers is 2 through 4092.
+  - Contiguous VLANs are created or deleted with one range command.
 options:
   pn_cliusername:
     description:
@@ -103,6 +107,19 @@ options:
         VLAN. Untagged packets are packets that do not contain IEEE 802.1Q VLAN
         tags.
     type: str
+  pn_switch_list:
+    description:
+      - List of switches to configure. Overrides pn_cliswitch.
+    type: list
+  pn_all_switches:
+    description:
+      - Configure every switch of the fabric. Overrides pn_switch_list.
+    default: False
+    type: bool
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time.
+    type: int
 """
 
 EXAMPLES = """
@@ -116,6 +133,13 @@ EXAMPLES = """
   pn_vlan:
     pn_action: 'delete'
     pn_vlanid: 1854
+
+- name: create local VLANs on every switch of the fabric
+  pn_vlan:
+    pn_action: 'create'
+    pn_vlanid: '100-3999'
+    pn_scope: local
+    pn_all_switches: True
 """
 
 RETURN = """
@@ -136,7 +160,8 @@ exception:
   returned: always
   type: str
 summary:
-  description: A set of responses in JSON object format.
+  description: A set of responses in JSON object format, one per switch
+    with the VLAN ranges changed, skipped and failed on it.
   returned:always
   type: str
 task:
@@ -155,7 +180,6 @@ changed:
 
 MAX_VLAN_ID = 4092
 MIN_VLAN_ID = 2
-CHANGED_FLAG = []
 
 
 def pn_cli(module):
@@ -224,47 +248,61 @@ def get_switch_name(module):
     return run_cli(module, cli).split()[1]
 
 
-def get_existing_vlans(module):
+def get_target_switches(module, executor):
     """
-    Method to obtain existing vlans.
+    Method to find the switches to configure.
     :param module: The Ansible module to fetch input parameters.
-    :return: list of existing vlans.
+    :param executor: CliExecutor used to run the commands.
+    :return: List of switch names.
     """
-    cli = pn_cli(module)
-    cli += 'vlan-show format id, no-show-headers'
-    existing_vlans = run_cli(module, cli).splitlines()
-    vlan_list = []
-    for vlan in existing_vlans:
-        vlan = vlan.strip()
-        vlan_list.append(vlan)
-    return vlan_list
+    if module.params['pn_all_switches']:
+        result = executor.run('fabric-node-show format name no-show-headers')
+        if result.failed:
+            exit_failed(module, result)
+        return sorted(set(result.out.split()))
 
+    if module.params['pn_switch_list']:
+        return list(module.params['pn_switch_list'])
 
-def expand_range(range_str):
-    """
-    Method to expand a given string into range.
-    :param range_str: A combination of comma separated list and range
-    :return: list of values
-    """
-    range_to_list = []
-    for value in range_str.split(','):
-        if '-' not in value:
-            range_to_list.append(int(value))
-        else:
-            l, h = map(int, value.split('-'))
-            range_to_list += range(l, h+1)
-    return range_to_list
+    cliswitch = module.params['pn_cliswitch']
+    return [get_switch_name(module) if cliswitch == 'local' else cliswitch]
 
 
-def create_vlan(module, switch, vlanid):
+def get_existing_vlans(module, executor, switches):
     """
-    Method to create VLAN.
+    Method to obtain existing vlans of all switches with one parsable
+    vlan-show across the fabric.
     :param module: The Ansible module to fetch input parameters.
-    :param switch: Name of the target switch
-    :param vlanid: VLAN ID
-    :return: message string
+    :param executor: CliExecutor used to run the commands.
+    :param switches: List of switch names.
+    :return: Tuple of dictionary of switch: VlanSet of its vlans and VlanSet
+    of the fabric scope vlans.
+    """
+    existing = dict((switch, VlanSet()) for switch in switches)
+    fabric_vlans = VlanSet()
+    result = executor.run('vlan-show format switch,id,scope no-show-headers '
+                          'parsable-delim ,', '*')
+    if result.failed:
+        exit_failed(module, result)
+
+    for line in result.out.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) < 3 or not fields[1].isdigit():
+            continue
+        if fields[0] in existing:
+            existing[fields[0]].add(fields[1])
+        if fields[2] == 'fabric':
+            fabric_vlans.add(fields[1])
+
+    return existing, fabric_vlans
+
+
+def vlan_attributes(module):
+    """
+    Method to build the attributes of the vlan-create command.
+    :param module: The Ansible module to fetch input parameters.
+    :return: Attributes string.
     """
-    scope = module.params['pn_scope']
     vnet = module.params['pn_vnet']
     vxlan = module.params["pn_vxlan"]
     vxlan_mode = module.params["pn_vxlan_mode"]
@@ -273,73 +311,108 @@ def create_vlan(module, switch, vlanid):
     stats = module.params['pn_stats']
     ports = module.params['pn_ports']
     untagged_ports = module.params['pn_untagged_ports']
-    cli = pn_cli(module)
-    cli += 'vlan-create id %s scope %s' % (vlanid, scope)
+    attributes = 'scope %s' % module.params['pn_scope']
 
     if vnet:
-        cli += ' vnet ' + vnet
+        attributes += ' vnet ' + vnet
     if vxlan:
-        cli += ' vxlan ' + vxlan
+        attributes += ' vxlan ' + vxlan
     if vxlan_mode:
-        cli += 'vxlan-mode ' + vxlan_mode
+        attributes += ' vxlan-mode ' + vxlan_mode
     if public_vlan:
-        cli += ' public-vlan ' + public_vlan
+        attributes += ' public-vlan ' + public_vlan
     if description:
-        cli += ' description ' + description
-    if stats:
-        cli += ' stats ' if stats is True else ' no-stats '
+        attributes += ' description ' + description
+    if stats is not None:
+        attributes += ' stats' if stats is True else ' no-stats'
     if ports:
-        cli += ' ports ' + ports
+        attributes += ' ports ' + ports
     if untagged_ports:
-        cli += ' untagged-ports ' + untagged_ports
+        attributes += ' untagged-ports ' + untagged_ports
 
-    output = run_cli(module, cli)
+    return attributes
 
-    if 'created' in output:
-        return ' %s: VLAN %s created \n' % (switch, vlanid)
 
-
-def delete_vlan(module, switch, vlanid):
-    """
-    Method to delete VLANS.
-    :param module: The Ansible module to fetch input parameters.
-    :param switch: Name of the target switch
-    :param vlanid: VLAN ID
-    :return: message string
-    """
-    cli = pn_cli(module)
-    cli += 'vlan-delete id %s' % (vlanid,)
-    output = run_cli(module, cli)
-    if 'Success' in output:
-        return ' %s: VLAN %s deleted \n' % (switch, vlanid)
-
-
-def modify_vlan(module, switch, vlanid):
+def modify_commands(module, vlans):
     """
-    Method to modify existing vlans.
+    Method to build the vlan-modify commands of a set of vlans.
     :param module: The Ansible module to fetch input parameters.
-    :param switch: Name of the target switch
-    :param vlanid: VLAN ID
-    :return: message string
+    :param vlans: VlanSet of the vlans to modify.
+    :return: List of vlan-modify commands.
     """
-    cli = pn_cli(module)
-    cli += 'vlan-modify id %s ' % (vlanid,)
+    attributes = ''
     vnet = module.params['pn_vnet']
     vxlan = module.params["pn_vxlan"]
     public_vlan = module.params["pn_public_vlan"]
     description = module.params['pn_description']
 
     if vnet:
-        cli += ' vnet ' + vnet
+        attributes += ' vnet ' + vnet
     if vxlan:
-        cli += ' vxlan ' + vxlan
+        attributes += ' vxlan ' + vxlan
     if public_vlan:
-        cli += ' public-vlan ' + public_vlan
+        attributes += ' public-vlan ' + public_vlan
     if description:
-        cli += ' description ' + description
+        attributes += ' description ' + description
 
-    output = run_cli(module, cli)
-    return ' %s: %s \n' % (switch, output,)
+    return ['vlan-modify id %d%s' % (vlan, attributes) for vlan in vlans]
+
+
+def plan_changes(module, requested, switches, existing, fabric_vlans):
+    """
+    Method to compute the vlans to change on every switch. Fabric scope
+    vlans are created, deleted or modified once, from the first switch.
+    :param module: The Ansible module to fetch input parameters.
+    :param requested: VlanSet of the requested vlans.
+    :param switches: List of switch names.
+    :param existing: Dictionary of switch: VlanSet of its vlans.
+    :param fabric_vlans: VlanSet of the fabric scope vlans.
+    :return: List of (switch, VlanSet of vlans to change, VlanSet of vlans
+    skipped) tuples. Fabric scope vlans changed from an earlier switch are
+    in neither set.
+    """
+    action = module.params['pn_action']
+    plan = []
+    handled = VlanSet()
+    for switch in switches:
+        if action == 'create':
+            # Fabric scope vlans exist on every switch of the fabric.
+            changes = requested - existing[switch] - fabric_vlans
+            elsewhere = VlanSet()
+            if module.params['pn_scope'] == 'fabric':
+                elsewhere = changes & handled
+                handled = handled | changes
+        else:
+            changes = requested & existing[switch]
+            elsewhere = changes & fabric_vlans & handled
+            handled = handled | (changes & fabric_vlans)
+
+        changes = changes - elsewhere
+        plan.append((switch, changes, requested - changes - elsewhere))
+
+    return plan
+
+
+def exit_failed(module, result):
+    """
+    Method to exit the module when a show command failed.
+    :param module: The Ansible module to fetch input parameters.
+    :param result: The failed CommandResult.
+    """
+    module.exit_json(
+        final_stats='Failed!',
+        unreachable=False,
+        failed=True,
+        exception='',
+        summary=[{
+            'switch': result.switch or module.params['pn_cliswitch'],
+            'output': u'Operation Failed: ' + result.command
+        }],
+        task='VLAN Configuration',
+        stderr=result.err.strip(),
+        msg='VLAN configuration failed',
+        changed=False
+    )
 
 
 def main():
@@ -349,6 +422,10 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
             pn_cliswitch=dict(required=False, type='str', default='local'),
+            pn_switch_list=dict(required=False, type='list'),
+            pn_all_switches=dict(required=False, type='bool', default=False),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS),
             pn_action=dict(required=True, type='str',
                            choices=['create', 'delete', 'modify']),
             pn_vlanid=dict(required=True, type='str'),
@@ -372,119 +449,88 @@ def main():
 
     # Accessing the arguments
     action = module.params['pn_action']
-    vlanid = module.params['pn_vlanid']
-    existing_vlans = get_existing_vlans(module)
-    vlan_list = expand_range(vlanid)
-    vlan_list = list(set(vlan_list))
-    cliswitch = module.params['pn_cliswitch']
-    results = []
-    message = ''
-    fail_count = 0
-    pass_count = 0
-    final_stats = ''
-    global CHANGED_FLAG
-
-    if cliswitch == 'local':
-        cliswitch = get_switch_name(module)
-
-    for vlan in vlan_list:
-        if vlan not in range(MIN_VLAN_ID, MAX_VLAN_ID+1):
-            json_msg = {
-                'switch': cliswitch,
-                'output': u'Invalid VLAN ID {}. VLAN ID must be between 2 and 4092'.format(vlan)
-            }
-            results.append(json_msg)
-            message += 'Invalid VLAN ID {}. VLAN ID must be between 2 and 4092\n'.format(vlan)
-            module.exit_json(
-                final_stats='Failed!',
-                unreachable=False,
-                failed=True,
-                exception='',
-                summary=results,
-                task='VLAN Configuration',
-                msg=message,
-                changed=False
-            )
+    executor = CliExecutor(module, module.params['pn_max_workers'])
+
+    try:
+        requested = VlanSet.parse(module.params['pn_vlanid'])
+        invalid = requested.invalid()
+    except ValueError as error:
+        invalid = str(error)
+
+    if invalid:
+        message = u'Invalid VLAN ID {}. VLAN ID must be between {} and ' \
+                  u'{}'.format(invalid, MIN_VLAN_ID, MAX_VLAN_ID)
+        module.exit_json(
+            final_stats='Failed!',
+            unreachable=False,
+            failed=True,
+            exception='',
+            summary=[{'switch': module.params['pn_cliswitch'],
+                      'output': message}],
+            task='VLAN Configuration',
+            msg=message,
+            changed=False
+        )
+
+    switches = get_target_switches(module, executor)
+    existing, fabric_vlans = get_existing_vlans(module, executor, switches)
+    plan = plan_changes(module, requested, switches, existing, fabric_vlans)
 
     if action == 'create':
-        for vlan_id in vlan_list:
-            if str(vlan_id) not in existing_vlans:
-                message += create_vlan(module, cliswitch, str(vlan_id))
-                json_msg = {
-                    'switch': cliswitch,
-                    'output': u'VLAN {} created'.format(vlan_id)
-                }
-                pass_count += 1
-                results.append(json_msg)
-                CHANGED_FLAG.append(True)
-                existing_vlans.append(str(vlan_id))
-            else:
-                message += 'VLAN {} already exists \n'.format(vlan_id)
-                json_msg = {
-                    'switch': cliswitch,
-                    'output': u'VLAN {} already exists'.format(vlan_id)
-                }
-                fail_count += 1
-                results.append(json_msg)
-                CHANGED_FLAG.append(False)
-
-    if action == 'delete':
-        for vlan_id in vlan_list:
-            if str(vlan_id) in existing_vlans:
-                message += delete_vlan(module, cliswitch, str(vlan_id))
-                json_msg = {
-                    'switch': cliswitch,
-                    'output': u'VLAN {} deleted'.format(vlan_id)
-                }
-                pass_count += 1
-                results.append(json_msg)
-                CHANGED_FLAG.append(True)
-                existing_vlans.remove(str(vlan_id))
-            else:
-                message += 'VLAN {} does not exist \n'.format(vlan_id)
-                json_msg = {
-                    'switch': cliswitch,
-                    'output': u'VLAN {} does not exist'.format(vlan_id)
-                }
-                fail_count += 1
-                results.append(json_msg)
-                CHANGED_FLAG.append(False)
-
-    if action == 'modify':
-        for vlan_id in vlan_list:
-            if str(vlan_id) in existing_vlans:
-                message += modify_vlan(module, cliswitch, str(vlan_id))
-                json_msg = {
-                    'switch': cliswitch,
-                    'output': message
-                }
-                results.append(json_msg)
-                pass_count += 1
-                CHANGED_FLAG.append(True)
-            else:
-                message += 'VLAN {} does not exist \n'.format(vlan_id)
-                json_msg = {
-                    'switch': cliswitch,
-                    'output': u'VLAN {} does not exist'.format(vlan_id)
-                }
-                fail_count += 1
-                results.append(json_msg)
-                CHANGED_FLAG.append(False)
-
-    final_stats += 'Failed!   ' if fail_count else 'Pass!  '
+        attributes = vlan_attributes(module)
+        batches = [(switch, vlan_create_commands(changes, attributes))
+                   for switch, changes, skipped in plan]
+        done, skipped_text = 'created', 'already exist'
+    elif action == 'delete':
+        batches = [(switch, vlan_delete_commands(changes))
+                   for switch, changes, skipped in plan]
+        done, skipped_text = 'deleted', 'do not exist'
+    else:
+        batches = [(switch, modify_commands(module, changes))
+                   for switch, changes, skipped in plan]
+        done, skipped_text = 'modified', 'do not exist'
+
+    # Vlans of every switch are configured in order, switches concurrently.
+    batch_results = executor.run_batches(batches)
+
+    results = []
+    lines = []
+    pass_count = fail_count = 0
+    for (switch, changes, skipped), batch in zip(plan, batch_results):
+        # A switch stops at its first failed command, so the vlans of that
+        # command and of the commands after it are not configured.
+        changed = VlanSet.parse([result.command.split()[2] for result in batch
+                                 if not result.failed])
+        failed = changes - changed
+        pass_count += len(changed)
+        fail_count += len(skipped) + len(failed)
+        parts = []
+        if changed:
+            parts.append('VLANs %s %s' % (changed, done))
+        if skipped:
+            parts.append('VLANs %s %s' % (skipped, skipped_text))
+        if failed:
+            parts.append('VLANs %s failed: %s' % (
+                failed, [r for r in batch if r.failed][0].output))
+
+        output = '; '.join(parts)
+        results.append({'switch': switch, 'output': output})
+        lines.append(' %s: %s ' % (switch, output))
+
+    final_stats = 'Failed!   ' if fail_count else 'Pass!  '
     final_stats += 'Failed: %d  PASS: %d' % (fail_count, pass_count)
 
     module.exit_json(
         final_stats=final_stats,
         unreachable=False,
-        msg=message,
+        msg='\n'.join(lines),
         summary=results,
         exception='',
         task='VLAN Configuration',
         failed=True if fail_count else False,
-        changed=True if True in CHANGED_FLAG else False
+        changed=True if pass_count else False,
+        cli_metrics=executor.metrics
     )
 
 if __name__ == '__main__':
     main()
-
@@ -19,6 +19,7 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_csv import HOSTS_SCHEMA, load_csv
 import os
 import paramiko
 import shlex
@@ -137,18 +138,16 @@ def main():
     filepath = module.params['pn_filepath']
     overwrite = module.params['pn_overwrite']
 
+    table = load_csv(module, csv_data, HOSTS_SCHEMA)
+
     if not os.path.exists(filepath):
         message += generate_key(filepath, module)
     
     filepath_pub = str(filepath) + '.pub'
     key = open(filepath_pub).read()
 
-    csv_data = csv_data.replace(" ", "")
-    csv_data_list = csv_data.splitlines()
-
-    for item in csv_data_list:
-        host = item.split(',')[1]
-        message += deploy_key(key, host, user, ssh_password, overwrite)
+    for row in table.rows:
+        message += deploy_key(key, row.ip, user, ssh_password, overwrite)
 
     module.exit_json(
         stdout=message,
@@ -52,13 +52,15 @@ options:
     description:
       - The C(pn_command) takes the cluster-create/cluster-delete command
         as value.
-    required: true
+      - Required unless given in every item of pn_items.
+    required: False
     choices: ['cluster-create', 'cluster-delete']
     type: str
   pn_name:
     description:
       - Specify the name of the cluster.
-    required: true
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
   pn_cluster_node1:
     description:
@@ -75,6 +77,20 @@ options:
       - Validate the inter-switch links and state of switches in the cluster.
     choices: ['validate', 'no-validate']
     type: str
+  pn_items:
+    description:
+      - List of clusters to configure in one task. Every item is a dictionary
+        of the parameters above, with or without the pn_ prefix, overriding the
+        top level ones. The existing clusters are read once and every item is
+        reported in results.
+    required: False
+    type: list
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time with
+        pn_items.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -109,11 +125,17 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+results:
+  description: One result per item of pn_items with its msg, changed,
+    skipped and failed flags, command and stdout/stderr.
+  returned: with pn_items
+  type: list
 """
 
-NAME_EXISTS = None
-NODE1_EXISTS = None
-NODE2_EXISTS = None
+REQUIRED = ['pn_command', 'pn_name']
+REQUIRED_IF = [
+    ('pn_command', 'cluster-create', ['pn_cluster_node1', 'pn_cluster_node2'])
+]
 
 def pn_cli(module):
     """
@@ -135,33 +157,62 @@ def pn_cli(module):
     return cli
 
 
-def check_cli(module, cli):
+def get_index(run):
     """
-    This method checks for idempotency using the cluster-show command.
-    If a cluster with given name exists, return NAME_EXISTS as True else False.
-    If the given cluster-node-1 is already a part of another cluster, return
-    NODE1_EXISTS as True else False.
-    If the given cluster-node-2 is already a part of another cluster, return
-    NODE2_EXISTS as True else False.
-    :param module: The Ansible module to fetch input parameters
-    :param cli: The CLI string
-    :return Global Booleans: NAME_EXISTS, NODE1_EXISTS, NODE2_EXISTS
+    Method to read the existing clusters with one cluster-show.
+    :param run: Function running a show command and returning its output.
+    :return: Dictionary of cluster name: (cluster-node-1, cluster-node-2).
     """
-    name = module.params['pn_name']
-    node1 = module.params['pn_cluster_node1']
-    node2 = module.params['pn_cluster_node2']
+    clusters = {}
+    out = run('cluster-show format name,cluster-node-1,cluster-node-2 '
+              'no-show-headers')
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) == 3:
+            clusters[fields[0]] = (fields[1], fields[2])
+
+    return clusters
 
-    show = cli + ' cluster-show  format name,cluster-node-1,cluster-node-2 '
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
 
-    out = out.split()
-    # Global flags
-    global NAME_EXISTS, NODE1_EXISTS, NODE2_EXISTS
+def plan_item(params, clusters):
+    """
+    Method to check a cluster against the existing ones and build its
+    command. A cluster can be created only if none of its nodes is part of
+    another cluster.
+    :param params: Module parameters of the cluster.
+    :param clusters: Index returned by get_index(), updated with the change.
+    :return: Tuple of the cli command, or None if the cluster is skipped, and
+    the message.
+    """
+    command = params['pn_command']
+    name = params['pn_name']
+    cluster_node1 = params['pn_cluster_node1']
+    cluster_node2 = params['pn_cluster_node2']
+    validate = params['pn_validate']
 
-    NAME_EXISTS = True if name in out else False
-    NODE1_EXISTS = True if node1 in out else False
-    NODE2_EXISTS = True if node2 in out else False
+    if command == 'cluster-delete':
+        if name not in clusters:
+            return None, 'Cluster with name %s does not exist' % name
+        del clusters[name]
+        return ' %s name %s ' % (command, name), 'Cluster %s deleted' % name
+
+    if name in clusters:
+        return None, 'Cluster with name %s already exists' % name
+    nodes = set(node for pair in clusters.values() for node in pair)
+    for node in (cluster_node1, cluster_node2):
+        if node in nodes:
+            return None, 'Node %s already part of a cluster' % node
+    clusters[name] = (cluster_node1, cluster_node2)
+
+    cli = ' %s name %s ' % (command, name)
+    cli += 'cluster-node-1 %s cluster-node-2 %s ' % (cluster_node1,
+                                                     cluster_node2)
+    if validate is True:
+        cli += ' validate '
+    if validate is False:
+        cli += ' no-validate '
+
+    return cli, 'Cluster %s created' % name
 
 
 def run_cli(module, cli):
@@ -214,73 +265,40 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str'),
             pn_cliswitch=dict(required=False, type='str', default='local'),
-            pn_command=dict(required=True, type='str',
+            pn_command=dict(required=False, type='str',
                             choices=['cluster-create', 'cluster-delete']),
-            pn_name=dict(required=True, type='str'),
+            pn_name=dict(required=False, type='str'),
             pn_cluster_node1=dict(type='str'),
             pn_cluster_node2=dict(type='str'),
-            pn_validate=dict(type='bool')
-        ),
-        required_if=(
-            ["pn_command", "cluster-create",
-             ["pn_name", "pn_cluster_node1", "pn_cluster_node2"]],
-            ["pn_command", "cluster-delete", ["pn_name"]]
+            pn_validate=dict(type='bool'),
+            pn_items=dict(required=False, type='list'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS)
         )
     )
 
-    # Accessing the parameters
-    command = module.params['pn_command']
-    name = module.params['pn_name']
-    cluster_node1 = module.params['pn_cluster_node1']
-    cluster_node2 = module.params['pn_cluster_node2']
-    validate = module.params['pn_validate']
+    if module.params['pn_items']:
+        apply_items(module, get_index, plan_item, REQUIRED, REQUIRED_IF)
+
+    check_required(module, REQUIRED, REQUIRED_IF)
 
     # Building the CLI command string
     cli = pn_cli(module)
+    command, message = plan_item(module.params,
+                                 get_index(show_runner(module, cli)))
+    if command is None:
+        module.exit_json(
+            skipped=True,
+            msg=message
+        )
 
-    if command == 'cluster-create':
-
-        check_cli(module, cli)
-
-        if NAME_EXISTS is True:
-            module.exit_json(
-                skipped=True,
-                msg='Cluster with name %s already exists' % name
-            )
-        if NODE1_EXISTS is True:
-            module.exit_json(
-                skipped=True,
-                msg='Node %s already part of a cluster' % cluster_node1
-            )
-        if NODE2_EXISTS is True:
-            module.exit_json(
-                skipped=True,
-                msg='Node %s already part of a cluster' % cluster_node2
-            )
-
-        cli += ' %s name %s ' % (command, name)
-        cli += 'cluster-node-1 %s cluster-node-2 %s ' % (cluster_node1,
-                                                         cluster_node2)
-        if validate is True:
-            cli += ' validate '
-        if validate is False:
-            cli += ' no-validate '
-
-    if command == 'cluster-delete':
-
-        check_cli(module, cli)
-
-        if NAME_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='Cluster with name %s does not exist' % name
-            )
-        cli += ' %s name %s ' % (command, name)
-
-    run_cli(module, cli)
+    run_cli(module, cli + ' ' + command)
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_items import (apply_items, check_required,
+                                          show_runner)
 
 if __name__ == '__main__':
     main()
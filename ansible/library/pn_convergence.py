@@ -0,0 +1,216 @@
+#!/usr/bin/python
+""" PN Routing Convergence """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_convergence import (PROTOCOLS, format_report,
+                                                 read_plan,
+                                                 wait_for_convergence)
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_rest import (BACKENDS, DEFAULT_REST_URL,
+                                          make_executor)
+
+DOCUMENTATION = """
+---
+module: pn_convergence
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Module to wait for the BGP/OSPF adjacencies of the fabric.
+description:
+    Reads the BGP neighbors and OSPF networks configured on the vrouters of
+    the fabric, then polls the BGP and OSPF neighbor state of the whole
+    fabric, with an interval growing between polls, until every expected
+    adjacency is Established/Full or pn_timeout passes. Reports the time to
+    converge of every switch and of the fabric. Meant to follow pn_ebgp_ospf
+    and pn_dci instead of a fixed pause.
+options:
+    pn_cliusername:
+      description:
+        - Provide login username if user is not root.
+      required: False
+      type: str
+    pn_clipassword:
+      description:
+        - Provide login password if user is not root.
+      required: False
+      type: str
+    pn_protocols:
+      description:
+        - Routing protocols to wait for.
+      required: False
+      type: list
+      choices: ['bgp', 'ospf']
+      default: ['bgp', 'ospf']
+    pn_timeout:
+      description:
+        - Seconds to wait for the adjacencies to come up.
+      required: False
+      type: int
+      default: 120
+    pn_poll_interval:
+      description:
+        - Seconds between the first polls of the neighbor state.
+      required: False
+      type: float
+      default: 1
+    pn_max_poll_interval:
+      description:
+        - Maximum seconds between polls, the interval growing by half at
+          every poll.
+      required: False
+      type: float
+      default: 10
+    pn_fail_on_timeout:
+      description:
+        - Flag to fail the task when the fabric did not converge in time.
+      required: False
+      type: bool
+      default: True
+    pn_max_workers:
+      description:
+        - Maximum number of show commands run at the same time.
+      required: False
+      type: int
+      default: 10
+    pn_backend:
+      description:
+        - How the shows are run. cli forks the cli for every show, rest sends
+          them to the web API of the switch over keep-alive connections.
+      required: False
+      type: str
+      choices: ['cli', 'rest']
+      default: 'cli'
+    pn_rest_url:
+      description:
+        - Base url of the web API of the switch, used by the rest backend.
+      required: False
+      type: str
+      default: 'https://127.0.0.1'
+"""
+
+EXAMPLES = """
+- name: Wait for eBGP to converge
+  pn_convergence:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_protocols: ['bgp']
+    pn_timeout: 180
+"""
+
+RETURN = """
+stdout:
+  description: One line per switch with its adjacencies and time to
+    converge, and the adjacencies still down.
+  returned: always
+  type: str
+converged:
+  description: Indicates whether every expected adjacency came up.
+  returned: on success
+  type: bool
+time_to_converge:
+  description: Seconds until the last switch converged, null if the fabric
+    did not converge.
+  returned: on success
+  type: float
+switches:
+  description: Number of adjacencies, adjacencies up and time to converge
+    of every switch.
+  returned: on success
+  type: dict
+pending:
+  description: Adjacencies which did not come up.
+  returned: on success
+  type: list
+polls:
+  description: Number of polls of the neighbor state.
+  returned: on success
+  type: int
+changed:
+  description: Indicates whether the module caused changes on the target.
+  returned: always(False)
+  type: bool
+cli_metrics:
+  description: Number of cli calls made and time spent in them.
+  returned: always
+  type: dict
+"""
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_cliusername=dict(required=False, type='str'),
+            pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_protocols=dict(required=False, type='list',
+                              choices=list(PROTOCOLS),
+                              default=list(PROTOCOLS)),
+            pn_timeout=dict(required=False, type='int', default=120),
+            pn_poll_interval=dict(required=False, type='float', default=1),
+            pn_max_poll_interval=dict(required=False, type='float',
+                                      default=10),
+            pn_fail_on_timeout=dict(required=False, type='bool',
+                                    default=True),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS),
+            pn_backend=dict(required=False, type='str',
+                            choices=list(BACKENDS), default='cli'),
+            pn_rest_url=dict(required=False, type='str',
+                             default=DEFAULT_REST_URL),
+        )
+    )
+
+    protocols = module.params['pn_protocols']
+    executor = make_executor(module, module.params['pn_max_workers'])
+    adjacencies, locations, failed = read_plan(executor, protocols)
+    if failed is not None:
+        module.fail_json(
+            msg='Could not read the routing configuration: %s failed' %
+                failed.command,
+            stderr=failed.err.strip(),
+            changed=False,
+            cli_metrics=executor.metrics
+        )
+
+    report, failed = wait_for_convergence(
+        executor, adjacencies, locations, protocols,
+        module.params['pn_timeout'], module.params['pn_poll_interval'],
+        module.params['pn_max_poll_interval'])
+    if report['converged']:
+        msg = 'Fabric converged in %.2fs: %d adjacencies' % (
+            report['time_to_converge'], report['adjacencies'])
+    else:
+        msg = 'Fabric not converged after %ds: %d of %d adjacencies down' % (
+            module.params['pn_timeout'], len(report['pending']),
+            report['adjacencies'])
+        if failed is not None:
+            msg += ', %s failed: %s' % (failed.command.split()[0],
+                                        failed.err.strip())
+
+    module.exit_json(
+        msg=msg,
+        stdout=format_report(report),
+        changed=False,
+        failed=not report['converged'] and
+        module.params['pn_fail_on_timeout'],
+        cli_metrics=executor.metrics,
+        **report
+    )
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,11 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_csv import (
+    DCI_SCHEMA, THIRD_PARTY_BGP_SCHEMA, load_csv
+)
+from ansible.module_utils.pn_numbering import get_numbering_plan
+from ansible.module_utils.pn_progress import Progress
 import shlex
 import time
 
@@ -115,6 +120,27 @@ options:
         - Specify third party bgp config data in the form of csv.
       required: False
       type: str
+    pn_numbering_plan:
+      description:
+        - Specify path of the numbering plan file. Router-ids and in-band
+          networks are numbered from it and new switches are added to it,
+          so numbering stays stable when switches are added.
+      required: False
+      type: str
+    pn_status_file:
+      description:
+        - Path of a file the module writes its progress to (phase, switches
+          done, cli calls, elapsed time) while it runs, for playbooks
+          running it with async and poll 0. pn_progress reads the file.
+      required: False
+      type: str
+    pn_run_id:
+      description:
+        - Identifier of the run, written to the status file. Give the same
+          pn_run_id to pn_progress so that it ignores a status file left by
+          a previous run.
+      required: False
+      type: str
 """
 
 EXAMPLES = """
@@ -165,6 +191,10 @@ failed:
 """
 
 CHANGED_FLAG = []
+# Parsed csv data, keyed by module parameter name.
+CSV_TABLES = {}
+NUMBERING = {}
+PROGRESS = Progress()
 
 
 def pn_cli(module):
@@ -194,6 +224,7 @@ def run_cli(module, cli):
     """
     cli = shlex.split(cli)
     rc, out, err = module.run_command(cli)
+    PROGRESS.command(cli)
     if out:
         return out
 
@@ -256,9 +287,8 @@ def assign_inband_ip(module):
     """
     global CHANGED_FLAG
     inband_ip = module.params['pn_inband_ip']
-    leaf_list = module.params['pn_leaf_list']
     current_switch = module.params['pn_current_switch']
-    switch_position = leaf_list.index(current_switch) + 1
+    switch_position = get_numbering(module).position(current_switch)
 
     address = inband_ip.split('.')
     static_part = str(address[0]) + '.' + str(address[1]) + '.'
@@ -290,16 +320,15 @@ def create_switch_routes(module, inband_ip):
     last_octet = str(inband_address[3]).split('/')
     subnet = last_octet[1]
     gateway_ip = gateway_static_part + str(int(last_octet[0]) + 1)
-    switch_count = 1
+    plan = get_numbering(module)
 
-    while switch_count <= len(module.params['pn_leaf_list']):
-        network_ip = static_part + str(switch_count) + '.' + str(0)
+    for leaf in module.params['pn_leaf_list']:
+        network_ip = static_part + str(plan.position(leaf)) + '.' + str(0)
         network_ip += '/' + subnet
         cli = pn_cli(module)
         cli += ' switch-route-create network %s gateway-ip %s ' % (
             network_ip, gateway_ip
         )
-        switch_count += 1
         cli = shlex.split(cli)
         module.run_command(cli)
 
@@ -314,7 +343,7 @@ def configure_fabric(module, switch):
     global CHANGED_FLAG
     output = ''
     fabric_name = module.params['pn_fabric_name']
-    switch_index = module.params['pn_leaf_list'].index(switch)
+    switch_index = get_numbering(module).index(switch)
 
     address = module.params['pn_inband_ip'].split('.')
     inband_static_part = str(address[0]) + '.' + str(address[1]) + '.'
@@ -355,6 +384,39 @@ def configure_fabric(module, switch):
     return output
 
 
+def get_csv_table(module, param, schema):
+    """
+    Method to parse and validate csv data of a module parameter. The data is
+    parsed only once, later calls return the same table.
+    :param module: The Ansible module to fetch input parameters.
+    :param param: Name of the module parameter holding the csv data.
+    :param schema: Schema to validate the csv data against.
+    :return: Table of typed rows indexed by switch, vlan and cluster.
+    """
+    if param not in CSV_TABLES:
+        CSV_TABLES[param] = load_csv(
+            module, module.params[param], schema,
+            switches=module.params['pn_spine_list'] + module.params[
+                'pn_leaf_list']
+        )
+    return CSV_TABLES[param]
+
+
+def get_numbering(module):
+    """
+    Method to get the numbering plan of the DC switches. It is built only
+    once, later calls return the same plan.
+    :param module: The Ansible module to fetch input parameters.
+    :return: NumberingPlan of the leaf switches.
+    """
+    if 'plan' not in NUMBERING:
+        NUMBERING['plan'] = get_numbering_plan(
+            module, [], module.params['pn_leaf_list'],
+            loopback_ip=module.params['pn_loopback_ip']
+        )
+    return NUMBERING['plan']
+
+
 def find_clustered_switches(module):
     """
     Method to find clustered switches from the input csv file.
@@ -362,25 +424,11 @@ def find_clustered_switches(module):
     :return: It returns a dict whose first value is list of pairs of cluster
     and second is list of switches in cluster.
     """
-    csv_data = module.params['pn_csv_data']
-    csv_data = csv_data.replace(' ', '')
-    csv_data = csv_data.split('\n')
+    table = get_csv_table(module, 'pn_csv_data', DCI_SCHEMA)
     cluster_dict_info = {}
-    cluster_list = []
-    cluster_switches = []
-
-    for line in csv_data:
-        if line != '':
-            line = line.split(',')
-            cluster_node_1 = line[2]
-            cluster_node_2 = line[3]
-
-            if not cluster_node_2.isdigit():
-                temp_list = [cluster_node_1, cluster_node_2]
-                if temp_list not in cluster_list:
-                    cluster_switches.append(cluster_node_1)
-                    cluster_switches.append(cluster_node_2)
-                    cluster_list.append(temp_list)
+    cluster_list = [list(cluster) for cluster in table.clusters()]
+    cluster_switches = [switch for cluster in cluster_list
+                        for switch in cluster]
 
     cluster_dict_info[0] = cluster_list
     cluster_dict_info[1] = cluster_switches
@@ -399,19 +447,17 @@ def fabric_inband_net_create(module, inband_static_part, subnet, switch):
     """
     global CHANGED_FLAG
     output = ''
-    leaf_list = module.params['pn_leaf_list']
+    plan = get_numbering(module)
     cli = pn_cli(module)
     clicopy = cli
+    cli += 'fabric-in-band-network-show format network no-show-headers'
+    existing_networks = set(run_cli(module, cli).split())
 
-    for leaf in leaf_list:
-        switch_position = leaf_list.index(leaf) + 1
+    for leaf in module.params['pn_leaf_list']:
+        switch_position = plan.position(leaf)
         inband_network_ip = inband_static_part + str(switch_position) + '.'
         inband_network_ip += str(switch_position)
 
-        cli = clicopy
-        cli += 'fabric-in-band-network-show format network no-show-headers'
-        existing_networks = run_cli(module, cli).split()
-
         if inband_network_ip not in existing_networks:
             cli = clicopy
             cli += 'fabric-in-band-network-create network ' + inband_network_ip
@@ -556,85 +602,79 @@ def configure_loopback_interface(module, switch, router_id):
         )
 
 
-def configure_ebgp_connections(module, switch, third_party_data, bgp_nic_ip):
+def configure_ebgp_connections(module, switch, third_party_rows, bgp_nic_ip):
     """
     Method to configure eBGP connection to remaining third party neighbors.
     :param module: The Ansible module to fetch input parameters.
     :param switch: Name of the switch.
-    :param third_party_data: Third party BGP data in csv format.
+    :param third_party_rows: Third party BGP rows of this switch.
     :param bgp_nic_ip: Ip of first bgp neighbor added.
     :return: String describing eBGP configuration.
     """
     global CHANGED_FLAG
     output = ''
     vrouter_name = switch + '-vrouter'
-    skip_flag = False
     address = bgp_nic_ip.split('.')
     bgp_static_part = str(address[0]) + '.' + str(address[1]) + '.'
     bgp_static_part += str(address[2]) + '.'
     bgp_last_octet = str(address[3]).split('/')
     bgp_subnet = bgp_last_octet[1]
 
-    for row in third_party_data:
-        row = row.split(',')
-        if not skip_flag and row[4] == switch:
-            skip_flag = True
-            continue
+    # First neighbor has already been added along with the vrouter.
+    for row in third_party_rows[1:]:
+        neighbor_name = row.neighbor_name
+        neighbor_ip = row.neighbor_ip
+        remote_as = str(row.remote_as)
 
-        if skip_flag and row[4] == switch:
-            neighbor_name = row[0]
-            neighbor_ip = row[1]
-            remote_as = row[2]
+        address = neighbor_ip.split('.')
+        static_part = str(address[0]) + '.' + str(address[1]) + '.'
+        static_part += str(address[2]) + '.'
+        last_octet = str(int(address[3]) - 1)
+        ip = static_part + last_octet + '/' + bgp_subnet
 
-            address = neighbor_ip.split('.')
-            static_part = str(address[0]) + '.' + str(address[1]) + '.'
-            static_part += str(address[2]) + '.'
-            last_octet = str(int(address[3]) - 1)
-            ip = static_part + last_octet + '/' + bgp_subnet
+        l3_port = get_l3_port(module, neighbor_name)
 
-            l3_port = get_l3_port(module, neighbor_name)
+        cli = pn_cli(module)
+        clicopy = cli
+        cli += ' vrouter-interface-show vrouter-name %s ' % vrouter_name
+        cli += ' format ip no-show-headers '
+        exisiting_ip = run_cli(module, cli).split()
 
-            cli = pn_cli(module)
-            clicopy = cli
-            cli += ' vrouter-interface-show vrouter-name %s ' % vrouter_name
-            cli += ' format ip no-show-headers '
-            exisiting_ip = run_cli(module, cli).split()
+        if ip not in exisiting_ip:
+            cli = clicopy
+            cli += ' vrouter-interface-add vrouter-name %s ' % vrouter_name
+            cli += ' l3-port %s ip %s ' % (l3_port, ip)
+            run_cli(module, cli)
+            output += ' %s: Added vrouter interface %s \n' % (switch, ip)
+        else:
+            output += ' %s: Vrouter interface %s already added \n' % (
+                switch, ip
+            )
 
-            if ip not in exisiting_ip:
-                cli = clicopy
-                cli += ' vrouter-interface-add vrouter-name %s ' % vrouter_name
-                cli += ' l3-port %s ip %s ' % (l3_port, ip)
-                run_cli(module, cli)
-                output += ' %s: Added vrouter interface %s \n' % (switch, ip)
-            else:
-                output += ' %s: Vrouter interface %s already added \n' % (
-                    switch, ip
-                )
+        cli = clicopy
+        cli += ' vrouter-bgp-show vrouter-name %s ' % vrouter_name
+        cli += ' format neighbor no-show-headers '
+        exisiting_neighbor = run_cli(module, cli).split()
 
+        if neighbor_ip not in exisiting_neighbor:
             cli = clicopy
-            cli += ' vrouter-bgp-show vrouter-name %s ' % vrouter_name
-            cli += ' format neighbor no-show-headers '
-            exisiting_neighbor = run_cli(module, cli).split()
-
-            if neighbor_ip not in exisiting_neighbor:
-                cli = clicopy
-                cli += ' vrouter-bgp-add vrouter-name %s ' % vrouter_name
-                cli += ' neighbor %s remote-as %s bfd ' % (neighbor_ip,
-                                                           remote_as)
-                cli += ' allowas-in '
-                run_cli(module, cli)
-                output += ' %s: Added eBGP neighbor %s \n' % (switch,
-                                                              neighbor_ip)
+            cli += ' vrouter-bgp-add vrouter-name %s ' % vrouter_name
+            cli += ' neighbor %s remote-as %s bfd ' % (neighbor_ip,
+                                                       remote_as)
+            cli += ' allowas-in '
+            run_cli(module, cli)
+            output += ' %s: Added eBGP neighbor %s \n' % (switch,
+                                                          neighbor_ip)
 
-                cli = clicopy
-                cli += ' vrouter-modify name %s ' % vrouter_name
-                cli += ' bgp-max-paths %s ' % module.params['pn_bgp_max_path']
-                cli += ' bgp-bestpath-as-path multipath-relax '
-                run_cli(module, cli)
-            else:
-                output += ' %s: eBGP neighbor %s already added \n' % (
-                    switch, neighbor_ip
-                )
+            cli = clicopy
+            cli += ' vrouter-modify name %s ' % vrouter_name
+            cli += ' bgp-max-paths %s ' % module.params['pn_bgp_max_path']
+            cli += ' bgp-bestpath-as-path multipath-relax '
+            run_cli(module, cli)
+        else:
+            output += ' %s: eBGP neighbor %s already added \n' % (
+                switch, neighbor_ip
+            )
 
     return output
 
@@ -928,22 +968,19 @@ def configure_vrrp(module):
     :return: Output string of configuration.
     """
     output = ''
-    csv_data = module.params['pn_csv_data']
-    csv_data = csv_data.replace(" ", "")
-    csv_data_list = csv_data.split('\n')
+    table = get_csv_table(module, 'pn_csv_data', DCI_SCHEMA)
 
-    # Parse csv file data and configure VRRP.
-    for row in csv_data_list:
-        elements = row.split(',')
+    # Configure VRRP from csv file data.
+    for row in table.rows:
         cluster_list = []
-        vlan_id = elements[0]
-        vrrp_ip = elements[1]
-        cluster_node1 = str(elements[2])
-        if len(elements) > 5:
+        vlan_id = str(row.vlan_id)
+        vrrp_ip = row.vrrp_ip
+        cluster_node1 = row.switch_1
+        if row.switch_2 is not None:
             # Configure VRRP for clustered switches
-            cluster_node2 = str(elements[3])
-            vrrp_id = elements[4]
-            active_switch = str(elements[5])
+            cluster_node2 = row.switch_2
+            vrrp_id = str(row.vrrp_id)
+            active_switch = row.active_switch
             cluster_list.append(cluster_node1)
             cluster_list.append(cluster_node2)
             cluster_name = cluster_node1 + '-to-' + cluster_node2 + '-cluster'
@@ -1096,67 +1133,38 @@ def configure_vxlan(module):
     :return: Output string of configuration.
     """
     output = ''
-    vxlan_switches_list = []
-    csv_data = module.params['pn_csv_data']
-    csv_data = csv_data.replace(" ", "")
-    csv_data_list = csv_data.split('\n')
-
-    for row in csv_data_list:
-        elements = row.split(',')
-        vlan_id = elements[0]
-        leaf_switch_1 = elements[2]
-        if len(elements) == 7:
-            leaf_switch_2 = elements[3]
-            vxlan_id = elements[6]
-            vxlan_switches_list.append([leaf_switch_1, leaf_switch_2, vlan_id])
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id,
-                                        leaf_switch_1)
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id,
-                                        leaf_switch_2)
-        elif len(elements) == 4:
-            vxlan_id = elements[3]
-            vxlan_switches_list.append([leaf_switch_1, vlan_id])
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id,
-                                        leaf_switch_1)
-
-    for row in csv_data_list:
-        elements = row.split(',')
-        vlan_id = elements[0]
-        leaf_switch_1 = elements[2]
-
-        if len(elements) == 7 or len(elements) == 4:
-            if len(elements) == 7:
-                leaf_switch_2 = elements[3]
-                vxlan_id = elements[6]
-                cluster = [leaf_switch_1, leaf_switch_2, vlan_id]
-                scope = 'cluster'
-            else:
-                leaf_switch_2 = None
-                vxlan_id = elements[3]
-                cluster = [leaf_switch_1, vlan_id]
-                scope = 'local'
-
-            for switches in vxlan_switches_list:
-                if switches == cluster:
-                    continue
-                else:
-                    tunnel_name = leaf_switch_1 + '-' + switches[0] + '-tunnel'
-                    local_ip = get_vrouter_interface_ip(module, leaf_switch_1,
-                                                        vlan_id)
-                    if len(switches) == 3:
-                        remote_vlan = switches[2]
-                    else:
-                        remote_vlan = switches[1]
-
-                    remote_ip = get_vrouter_interface_ip(module, switches[0],
-                                                         remote_vlan)
-
-                    output += create_tunnel(module, leaf_switch_1, tunnel_name,
-                                            scope, local_ip, remote_ip,
-                                            leaf_switch_2)
-
-                    output += add_vxlan_to_tunnel(module, vxlan_id, tunnel_name,
-                                                  leaf_switch_1)
+    table = get_csv_table(module, 'pn_csv_data', DCI_SCHEMA)
+    vxlan_rows = [row for row in table.rows if row.vxlan_id is not None]
+
+    for row in vxlan_rows:
+        for switch in (row.switch_1, row.switch_2):
+            if switch is not None:
+                output += add_vxlan_to_vlan(module, str(row.vlan_id),
+                                            str(row.vxlan_id), switch)
+
+    for row in vxlan_rows:
+        leaf_switch_1 = row.switch_1
+        leaf_switch_2 = row.switch_2
+        vlan_id = str(row.vlan_id)
+        vxlan_id = str(row.vxlan_id)
+        cluster = (leaf_switch_1, leaf_switch_2, row.vlan_id)
+        scope = 'cluster' if leaf_switch_2 is not None else 'local'
+
+        for remote in vxlan_rows:
+            if (remote.switch_1, remote.switch_2, remote.vlan_id) == cluster:
+                continue
+
+            tunnel_name = leaf_switch_1 + '-' + remote.switch_1 + '-tunnel'
+            local_ip = get_vrouter_interface_ip(module, leaf_switch_1, vlan_id)
+            remote_ip = get_vrouter_interface_ip(module, remote.switch_1,
+                                                 str(remote.vlan_id))
+
+            output += create_tunnel(module, leaf_switch_1, tunnel_name,
+                                    scope, local_ip, remote_ip,
+                                    leaf_switch_2)
+
+            output += add_vxlan_to_tunnel(module, vxlan_id, tunnel_name,
+                                          leaf_switch_1)
 
     return output
 
@@ -1173,6 +1181,7 @@ def configure_ibgp_vrrp_vxlan(module):
     cluster_list = cluster_dict_info[0]
 
     # Configure iBGP connection between clusters
+    PROGRESS.phase('Configure iBGP')
     for cluster in cluster_list:
         cluster_node1 = cluster[0]
         cluster_node2 = cluster[1]
@@ -1197,14 +1206,12 @@ def configure_ibgp_vrrp_vxlan(module):
         subnet_count += 1
 
         # Get the bgp-as values of cluster nodes.
-        third_party_data = module.params['pn_third_party_bgp_data'].replace(' ',
-                                                                            '')
-        third_party_data = third_party_data.split('\n')
-        for row in third_party_data:
-            row = row.split(',')
-            if row[4] == cluster_node1 or row[4] == cluster_node2:
-                bgp_as = row[3]
-                break
+        third_party = get_csv_table(module, 'pn_third_party_bgp_data',
+                                    THIRD_PARTY_BGP_SCHEMA)
+        rows = (third_party.by_switch.get(cluster_node1, []) +
+                third_party.by_switch.get(cluster_node2, []))
+        if rows:
+            bgp_as = str(min(rows, key=lambda row: row.line).bgp_as)
 
         # Configure iBGP connection.
         output += configure_ibgp_connection(module, cluster_node1, node1_ip,
@@ -1214,9 +1221,11 @@ def configure_ibgp_vrrp_vxlan(module):
                                             node1_ip, bgp_as)
 
     # Configure VRRP to be used for VTEP HA
+    PROGRESS.phase('Configure VRRP')
     output += configure_vrrp(module)
 
     # Configure vxlan tunnels
+    PROGRESS.phase('Configure vxlan')
     output += configure_vxlan(module)
 
     return output
@@ -1232,10 +1241,9 @@ def implement_dci(module):
     output = ''
     current_switch = module.params['pn_current_switch']
     bgp_ip = module.params['pn_bgp_ip']
-    leaf_list = module.params['pn_leaf_list']
-    loopback_ip = module.params['pn_loopback_ip']
-    third_party_data = module.params['pn_third_party_bgp_data'].replace(' ', '')
-    third_party_data = third_party_data.split('\n')
+    plan = get_numbering(module)
+    third_party = get_csv_table(module, 'pn_third_party_bgp_data',
+                                THIRD_PARTY_BGP_SCHEMA)
 
     address = bgp_ip.split('.')
     bgp_static_part = str(address[0]) + '.' + str(address[1]) + '.'
@@ -1243,14 +1251,10 @@ def implement_dci(module):
     bgp_last_octet = str(address[3]).split('/')
     bgp_subnet = bgp_last_octet[1]
 
-    address = loopback_ip.split('.')
-    loopback_static_part = str(address[0]) + '.' + str(address[1]) + '.'
-
-    # Calculate router-id to be assigned to vrouter.
-    switch_index = leaf_list.index(current_switch)
-    router_count = switch_index + 1
-    router_id = loopback_static_part + str(router_count) + '.'
-    router_id += str(router_count)
+    # Router-id to be assigned to vrouter, numbered like the loopbacks of
+    # deployed DCI fabrics.
+    switch_index = plan.index(current_switch)
+    router_id = plan.dci_router_id(current_switch)
 
     # Calculate in-band-nic-ip and in-band-nic-netmask for vrouter creation.
     cli = pn_cli(module)
@@ -1268,19 +1272,15 @@ def implement_dci(module):
     # Get the neighbor ip and remote-as value of the first neighbor
     # Third party csv format: (third party switch name, neighbor-ip,
     # bgp-as of third party switch, remote-as, neighbor switch name)
-    neighbor_name, neighbor_ip, remote_as, bgp_as = None, None, None, None
-    for row in third_party_data:
-        row = row.split(',')
-        if row[4] == current_switch:
-            neighbor_name = row[0]
-            neighbor_ip = row[1]
-            remote_as = row[2]
-            bgp_as = row[3]
-            break
-
-    if neighbor_name is None or neighbor_ip is None or remote_as is None:
+    third_party_rows = third_party.by_switch.get(current_switch)
+    if not third_party_rows:
         return ' %s: Could not find remote bgp data \n' % current_switch
 
+    neighbor_name = third_party_rows[0].neighbor_name
+    neighbor_ip = third_party_rows[0].neighbor_ip
+    remote_as = str(third_party_rows[0].remote_as)
+    bgp_as = str(third_party_rows[0].bgp_as)
+
     # Calculate bgp-nic-l3-port number connected to first neighbor
     bgp_nic_l3_port = get_l3_port(module, neighbor_name)
 
@@ -1303,7 +1303,7 @@ def implement_dci(module):
 
     # Configure other eBGP connection to third party switches
     output += configure_ebgp_connections(module, current_switch,
-                                         third_party_data, bgp_nic_ip)
+                                         third_party_rows, bgp_nic_ip)
 
     # Configure loopback interface for debugging purpose.
     output += configure_loopback_interface(module, current_switch, router_id)
@@ -1397,15 +1397,24 @@ def main():
                                   default='75.75.75.0/30'),
             pn_csv_data=dict(required=False, type='str'),
             pn_third_party_bgp_data=dict(required=False, type='str'),
+            pn_numbering_plan=dict(required=False, type='str'),
+            pn_status_file=dict(required=False, type='str'),
+            pn_run_id=dict(required=False, type='str'),
         )
     )
 
     current_switch = module.params['pn_current_switch']
     message = ''
-    global CHANGED_FLAG
+    global CHANGED_FLAG, PROGRESS
+    PROGRESS = Progress(module.params['pn_status_file'], 'Configure DCI',
+                        len(module.params['pn_spine_list'] +
+                            module.params['pn_leaf_list']),
+                        5 if module.params['pn_run_initial_setup'] else 3,
+                        module.params['pn_run_id']).attach(module)
 
     if module.params['pn_run_initial_setup']:
         # Auto accept EULA
+        PROGRESS.phase('Accept EULA')
         if 'Setup completed successfully' in auto_accept_eula(module):
             message += ' %s: EULA accepted \n' % current_switch
             CHANGED_FLAG.append(True)
@@ -1413,18 +1422,22 @@ def main():
             message += ' %s: EULA has already been accepted \n' % current_switch
 
         # Update switch names to match host names from hosts file
+        PROGRESS.phase('Update switch name')
         if 'Updated' in update_switch_names(module, current_switch):
             CHANGED_FLAG.append(True)
 
         # Toggle 40g ports to 10g
+        PROGRESS.phase('Toggle 40g ports')
         if toggle_40g_local(module):
             message += ' %s: Toggled 40G ports to 10G \n' % current_switch
             CHANGED_FLAG.append(True)
 
         # Assign in-band ip
+        PROGRESS.phase('Assign in-band ip')
         message += assign_inband_ip(module)
 
         # Implement Data Center Interconnect
+        PROGRESS.phase('Implement DCI')
         message += implement_dci(module)
     else:
         # Configure iBGP, VRRP and vxlan
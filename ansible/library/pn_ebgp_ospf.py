@@ -21,6 +21,10 @@
 import shlex
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import (DEADLINE_EXCEEDED,
+                                              new_metrics, run_command)
+from ansible.module_utils.pn_numbering import get_numbering_plan
+from ansible.module_utils.pn_progress import Progress
 
 DOCUMENTATION = """
 ---
@@ -111,6 +115,42 @@ options:
       required: False
       type: str
       default: '0'
+    pn_numbering_plan:
+      description:
+        - Specify path of the numbering plan file. bgp-as and area ids are
+          loaded from it and new switches are added to it,
+          so numbering stays stable when switches are added.
+      required: False
+      type: str
+    pn_command_timeout:
+      description:
+        - Number of seconds a cli command may run before it is killed. Show
+          commands are retried, a killed write is not since it may have been
+          applied.
+      required: False
+      type: int
+      default: 120
+    pn_deadline:
+      description:
+        - Number of seconds the module may run cli commands for. Commands
+          are not run past the deadline and the module reports the commands
+          run so far.
+      required: False
+      type: int
+    pn_status_file:
+      description:
+        - Path of a file the module writes its progress to (phase, switches
+          done, cli calls, elapsed time) while it runs, for playbooks
+          running it with async and poll 0. pn_progress reads the file.
+      required: False
+      type: str
+    pn_run_id:
+      description:
+        - Identifier of the run, written to the status file. Give the same
+          pn_run_id to pn_progress so that it ignores a status file left by
+          a previous run.
+      required: False
+      type: str
 """
 
 EXAMPLES = """
@@ -120,6 +160,17 @@ EXAMPLES = """
     pn_clipassword: "{{ PASSWORD }}"
     pn_spine_list: "{{ groups['spine'] }}"
     pn_leaf_list: "{{ groups['leaf'] }}"
+
+- name: Configure eBGP/OSPF in the background
+  pn_ebgp_ospf:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_status_file: /tmp/pn_ebgp_ospf.status
+    pn_run_id: "{{ ebgp_run_id }}"
+  async: 3600
+  poll: 0
 """
 
 RETURN = """
@@ -151,9 +202,16 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+cli_metrics:
+  description: Number of cli commands executed and total time spent in them,
+    with the number of retries of transient errors and time waited for them.
+  returned: always
+  type: dict
 """
 
 CHANGED_FLAG = []
+CLI_METRICS = new_metrics()
+PROGRESS = Progress()
 
 
 def pn_cli(module):
@@ -182,11 +240,29 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli, CLI_METRICS)
+    PROGRESS.command(cli)
     results = []
     if out:
         return out
 
+    if err == DEADLINE_EXCEEDED:
+        # Report what was configured before the deadline.
+        module.exit_json(
+            cli_metrics=CLI_METRICS,
+            unreachable=False,
+            failed=True,
+            exception=err,
+            summary=[{
+                'switch': '',
+                'output': 'Deadline exceeded after %d cli commands' %
+                          CLI_METRICS['calls']
+            }],
+            task='Configure eBGP/OSPF',
+            msg='eBGP/OSPF configuration stopped at the deadline',
+            changed=True if True in CHANGED_FLAG else False
+        )
+
     if err:
         json_msg = {
             'switch': '',
@@ -194,6 +270,7 @@ def run_cli(module, cli):
         }
         results.append(json_msg)
         module.exit_json(
+            cli_metrics=CLI_METRICS,
             unreachable=False,
             failed=True,
             exception='',
@@ -207,45 +284,47 @@ def run_cli(module, cli):
         return 'Success'
 
 
-def find_bgp_as_dict(module):
+def find_leaf_clusters(module):
     """
-    Method to find bgp-as for all switches and store it in a dictionary.
+    Method to find the clusters of the fabric with one cluster-show.
     :param module: The Ansible module to fetch input parameters.
-    :return: Dictionary containing switch: bgp_as key value pairs.
+    :return: List of (cluster-node-1, cluster-node-2) tuples.
     """
-    leaf_list = module.params['pn_leaf_list']
-    bgp_as = int(module.params['pn_bgp_as_range'])
-    cluster_leaf_list = []
     cli = pn_cli(module)
-    clicopy = cli
-    dict_bgp_as = {}
-
-    for spine in module.params['pn_spine_list']:
-        dict_bgp_as[spine] = str(bgp_as)
+    cli += ' cluster-show format cluster-node-1,cluster-node-2 '
+    cli += ' no-show-headers '
+    clusters = []
+    for line in run_cli(module, cli).splitlines():
+        nodes = line.split()
+        if len(nodes) == 2:
+            clusters.append((nodes[0], nodes[1]))
 
-    cli += ' cluster-show format name no-show-headers'
-    cluster_list = run_cli(module, cli).split()
+    return clusters
 
-    if 'Success' not in cluster_list:
-        for cluster in cluster_list:
-            cli = clicopy
-            cli += ' cluster-show name %s' % cluster
-            cli += ' format cluster-node-1,cluster-node-2 no-show-headers'
-            cluster_nodes = run_cli(module, cli).split()
 
-            if cluster_nodes[0] in leaf_list and cluster_nodes[1] in leaf_list:
-                bgp_as += 1
-                dict_bgp_as[cluster_nodes[0]] = str(bgp_as)
-                dict_bgp_as[cluster_nodes[1]] = str(bgp_as)
-                cluster_leaf_list.append(cluster_nodes[0])
-                cluster_leaf_list.append(cluster_nodes[1])
+def get_fabric_numbering(module):
+    """
+    Method to get the numbering plan (bgp-as, area id) of the
+    fabric, built from the switch lists and the leaf clusters.
+    :param module: The Ansible module to fetch input parameters.
+    :return: NumberingPlan of the fabric.
+    """
+    return get_numbering_plan(module, module.params['pn_spine_list'],
+                              module.params['pn_leaf_list'],
+                              find_leaf_clusters(module),
+                              bgp_as=module.params['pn_bgp_as_range'],
+                              area_id=module.params['pn_ospf_area_id'])
 
-    non_clustered_leaf_list = list(set(leaf_list) - set(cluster_leaf_list))
-    for leaf in non_clustered_leaf_list:
-        bgp_as += 1
-        dict_bgp_as[leaf] = str(bgp_as)
 
-    return dict_bgp_as
+def find_bgp_as_dict(module, plan):
+    """
+    Method to find bgp-as for all switches and store it in a dictionary.
+    :param module: The Ansible module to fetch input parameters.
+    :param plan: NumberingPlan of the fabric.
+    :return: Dictionary containing switch: bgp_as key value pairs.
+    """
+    return plan.bgp_as_dict(module.params['pn_spine_list'] +
+                            module.params['pn_leaf_list'])
 
 
 def vrouter_interface_ibgp_add(module, switch_name, interface_ip, neighbor_ip,
@@ -489,6 +568,7 @@ def add_bgp_neighbor(module, dict_bgp_as):
 def assign_router_id(module, vrouter_names):
     """
     Method to assign router-id to vrouters which is same as loopback ip.
+    Vrouters without a loopback interface are left alone.
     :param module: The Ansible module to fetch input parameters.
     :param vrouter_names: List of vrouter names.
     :return: String describing if router id got assigned or not.
@@ -498,29 +578,29 @@ def assign_router_id(module, vrouter_names):
     cli = pn_cli(module)
     clicopy = cli
 
-    if len(vrouter_names) > 0:
-        for vrouter in vrouter_names:
-            cli = clicopy
-            cli += ' vrouter-loopback-interface-show vrouter-name ' + vrouter
-            cli += ' format ip no-show-headers '
-            loopback_ip = run_cli(module, cli).split()
-
-            if 'Success' not in loopback_ip and len(loopback_ip) > 0:
-                loopback_ip.remove(vrouter)
-                cli = clicopy
-                cli += ' vrouter-modify name %s router-id %s ' % (
-                    vrouter, loopback_ip[0])
+    # One show for the whole fabric, the cli prefixes every row with the
+    # vrouter name.
+    cli += ' vrouter-loopback-interface-show format ip no-show-headers '
+    loopbacks = {}
+    for line in run_cli(module, cli).splitlines():
+        fields = line.split()
+        if len(fields) >= 2:
+            loopbacks.setdefault(fields[0], fields[-1].split('/')[0])
+
+    for switch in module.params['pn_spine_list'] + module.params['pn_leaf_list']:
+        vrouter = switch + '-vrouter'
+        router_id = loopbacks.get(vrouter)
+        if vrouter not in vrouter_names or router_id is None:
+            continue
 
-                if 'Success' in run_cli(module, cli):
-                    cli = clicopy
-                    cli += ' vrouter-show name ' + vrouter
-                    cli += ' format location no-show-headers '
-                    switch = run_cli(module, cli).split()[0]
+        cli = clicopy
+        cli += ' vrouter-modify name %s router-id %s ' % (vrouter, router_id)
 
-                    output += ' %s: Added router id %s to %s \n' % (
-                        switch, loopback_ip[0], vrouter)
+        if 'Success' in run_cli(module, cli):
+            output += ' %s: Added router id %s to %s \n' % (
+                switch, router_id, vrouter)
 
-                    CHANGED_FLAG.append(True)
+            CHANGED_FLAG.append(True)
 
     return output
 
@@ -740,42 +820,14 @@ def add_ospf_loopback_spine(module, switch, vrouter, ospf_network,
     return output
 
 
-def find_area_id_leaf_switches(module):
+def find_area_id_leaf_switches(module, plan):
     """
     Method to find area_id for all leaf switches and store it in a dictionary.
     :param module: The Ansible module to fetch input parameters.
+    :param plan: NumberingPlan of the fabric.
     :return: Dictionary containing area_id of all leaf switches.
     """
-    leaf_list = module.params['pn_leaf_list']
-    ospf_area_id = int(module.params['pn_ospf_area_id'])
-    cluster_leaf_list = []
-    cli = pn_cli(module)
-    clicopy = cli
-    dict_area_id = {}
-
-    cli += ' cluster-show format name no-show-headers'
-    cluster_list = run_cli(module, cli).split()
-
-    if 'Success' not in cluster_list:
-        for cluster in cluster_list:
-            cli = clicopy
-            cli += ' cluster-show name %s' % cluster
-            cli += ' format cluster-node-1,cluster-node-2 no-show-headers'
-            cluster_nodes = run_cli(module, cli).split()
-
-            if cluster_nodes[0] in leaf_list and cluster_nodes[1] in leaf_list:
-                ospf_area_id += 1
-                dict_area_id[cluster_nodes[0]] = str(ospf_area_id)
-                dict_area_id[cluster_nodes[1]] = str(ospf_area_id)
-                cluster_leaf_list.append(cluster_nodes[0])
-                cluster_leaf_list.append(cluster_nodes[1])
-
-    non_clustered_leaf_list = list(set(leaf_list) - set(cluster_leaf_list))
-    for leaf in non_clustered_leaf_list:
-        ospf_area_id += 1
-        dict_area_id[leaf] = str(ospf_area_id)
-
-    return dict_area_id
+    return plan.area_id_dict(module.params['pn_leaf_list'])
 
 
 def add_ospf_neighbor(module, dict_area_id):
@@ -1084,31 +1136,50 @@ def main():
             pn_ospf_area_id=dict(required=False, type='str', default='0'),
             pn_routing_protocol=dict(required=False, type='str',
                                      choices=['ebgp', 'ospf'], default='ebgp'),
+            pn_numbering_plan=dict(required=False, type='str'),
+            pn_command_timeout=dict(required=False, type='int', default=120),
+            pn_deadline=dict(required=False, type='int'),
+            pn_status_file=dict(required=False, type='str'),
+            pn_run_id=dict(required=False, type='str'),
         )
     )
 
-    global CHANGED_FLAG
+    global CHANGED_FLAG, PROGRESS
     routing_protocol = module.params['pn_routing_protocol']
+    PROGRESS = Progress(module.params['pn_status_file'],
+                        'Configure eBGP/OSPF',
+                        len(module.params['pn_spine_list'] +
+                            module.params['pn_leaf_list']), 5,
+                        module.params['pn_run_id']).attach(module)
 
     # Get the list of vrouter names.
     cli = pn_cli(module)
     cli += ' vrouter-show format name no-show-headers '
     vrouter_names = run_cli(module, cli).split()
 
-    message = assign_router_id(module, vrouter_names)
-    message += create_leaf_clusters(module)
+    PROGRESS.phase('Create leaf clusters')
+    message = create_leaf_clusters(module)
+    plan = get_fabric_numbering(module)
+    PROGRESS.phase('Assign router ids')
+    message += assign_router_id(module, vrouter_names)
 
     if routing_protocol == 'ebgp':
-        dict_bgp_as = find_bgp_as_dict(module)
+        dict_bgp_as = find_bgp_as_dict(module, plan)
+        PROGRESS.phase('Configure BGP')
         message += configure_bgp(module, vrouter_names, dict_bgp_as,
                                  module.params['pn_bgp_maxpath'],
                                  module.params['pn_bgp_redistribute'])
+        PROGRESS.phase('Add BGP neighbors')
         message += add_bgp_neighbor(module, dict_bgp_as)
+        PROGRESS.phase('Assign iBGP interfaces')
         message += assign_ibgp_interface(module, dict_bgp_as)
     elif routing_protocol == 'ospf':
-        dict_area_id = find_area_id_leaf_switches(module)
+        dict_area_id = find_area_id_leaf_switches(module, plan)
+        PROGRESS.phase('Add OSPF neighbors')
         message += add_ospf_neighbor(module, dict_area_id)
+        PROGRESS.phase('Add OSPF redistribute')
         message += add_ospf_redistribute(module, vrouter_names)
+        PROGRESS.phase('Assign leaf cluster OSPF interfaces')
         message += assign_leafcluster_ospf_interface(module, dict_area_id)
 
     message_string = message
@@ -1127,6 +1198,7 @@ def main():
 
     # Exit the module and return the required JSON.
     module.exit_json(
+        cli_metrics=CLI_METRICS,
         unreachable=False,
         msg='eBGP/OSPF configuration succeeded',
         summary=results,
@@ -140,6 +140,9 @@ failed:
 """
 
 CHANGED_FLAG = []
+# Caches of the vrouter interfaces and bgp/ospf configuration looked up.
+INTERFACE_IPS = {}
+VROUTER_CONFIG = {}
 
 
 def pn_cli(module):
@@ -190,44 +193,158 @@ def run_cli(module, cli):
         return 'Success'
 
 
-def find_dict_bgp_as(module):
+def find_clusters(module):
     """
-    Method to find bgp-as for all switches and store in dictionary.
+    Method to find the clusters of the fabric with one cluster-show.
     :param module: The Ansible module to fetch input parameters.
-    :return: Dictionary containing area_id of all leaf.
+    :return: List of (cluster-node-1, cluster-node-2) tuples.
+    """
+    cli = pn_cli(module)
+    cli += ' cluster-show format cluster-node-1,cluster-node-2 '
+    cli += ' no-show-headers '
+    clusters = []
+    for line in run_cli(module, cli).splitlines():
+        nodes = line.split()
+        if len(nodes) == 2:
+            clusters.append((nodes[0], nodes[1]))
+
+    return clusters
+
+
+def find_vrouters(module):
+    """
+    Method to find name and bgp-as of the vrouter of every switch with one
+    vrouter-show.
+    :param module: The Ansible module to fetch input parameters.
+    :return: Dictionary of switch: (vrouter name, bgp-as).
+    """
+    cli = pn_cli(module)
+    cli += ' vrouter-show format name,location,bgp-as no-show-headers '
+    vrouters = {}
+    for line in run_cli(module, cli).splitlines():
+        fields = line.split()
+        if len(fields) >= 2:
+            bgp_as = fields[2] if len(fields) > 2 else ''
+            vrouters[fields[1]] = (fields[0], bgp_as)
+
+    return vrouters
+
+
+def find_new_links(module):
+    """
+    Method to find the spine-leaf links which have at least one new switch
+    at either end. Only the ports of the new switches are looked up, with one
+    port-show per new switch.
+    :param module: The Ansible module to fetch input parameters.
+    :return: List of (spine, spine port, leaf) tuples.
+    """
+    spines = set(module.params['pn_spine_list'] +
+                 module.params['pn_new_spine_list'])
+    leafs = set(module.params['pn_leaf_list'] +
+                module.params['pn_new_leaf_list'])
+    links = []
+    seen = set()
+
+    for switch in (module.params['pn_new_leaf_list'] +
+                   module.params['pn_new_spine_list']):
+        cli = pn_cli(module)
+        cli += ' switch %s port-show format port,hostname,rport ' % switch
+        cli += ' no-show-headers '
+        for line in run_cli(module, cli).splitlines():
+            fields = line.split()
+            if len(fields) != 3:
+                continue
+
+            port, hostname, rport = fields
+            if switch in leafs and hostname in spines:
+                link = (hostname, rport, switch)
+            elif switch in spines and hostname in leafs:
+                link = (switch, port, hostname)
+            else:
+                continue
+
+            if link not in seen:
+                seen.add(link)
+                links.append(link)
+
+    return links
+
+
+def get_interface_ips(module, vrouter):
+    """
+    Method to find the ips of the l3-port interfaces of a vrouter. The
+    interfaces of a vrouter are looked up only once.
+    :param module: The Ansible module to fetch input parameters.
+    :param vrouter: Name of the vrouter.
+    :return: Dictionary of l3-port: ip.
+    """
+    if vrouter not in INTERFACE_IPS:
+        cli = pn_cli(module)
+        cli += ' vrouter-interface-show vrouter-name %s ' % vrouter
+        cli += ' format l3-port,ip no-show-headers '
+        ips = {}
+        for line in run_cli(module, cli).splitlines():
+            fields = line.split()
+            if len(fields) == 3:
+                ips[fields[1]] = fields[2]
+        INTERFACE_IPS[vrouter] = ips
+
+    return INTERFACE_IPS[vrouter]
+
+
+def get_vrouter_config(module, vrouter, show, fields):
+    """
+    Method to find existing bgp neighbors or ospf networks of a vrouter. The
+    configuration of a vrouter is looked up only once.
+    :param module: The Ansible module to fetch input parameters.
+    :param vrouter: Name of the vrouter.
+    :param show: The show command, vrouter-bgp-show or vrouter-ospf-show.
+    :param fields: Fields to show.
+    :return: Set of tuples of the field values.
+    """
+    key = (vrouter, show)
+    if key not in VROUTER_CONFIG:
+        cli = pn_cli(module)
+        cli += ' %s vrouter-name %s ' % (show, vrouter)
+        cli += ' format %s no-show-headers ' % fields
+        count = len(fields.split(','))
+        config = set()
+        for line in run_cli(module, cli).splitlines():
+            values = line.split()
+            if len(values) == count + 1:
+                config.add(tuple(values[1:]))
+        VROUTER_CONFIG[key] = config
+
+    return VROUTER_CONFIG[key]
+
+
+def find_dict_bgp_as(module, clusters):
+    """
+    Method to find bgp-as for all new switches and store in dictionary.
+    :param module: The Ansible module to fetch input parameters.
+    :param clusters: List of (cluster-node-1, cluster-node-2) tuples.
+    :return: Dictionary containing bgp-as of all new switches.
     """
     leaf_list = module.params['pn_new_leaf_list']
     bgp_as = int(module.params['pn_bgp_as_range'])
     cluster_leaf_list = []
-    cli = pn_cli(module)
-    clicopy = cli
     dict_bgp_as = {}
 
     for spine in module.params['pn_new_spine_list']:
         dict_bgp_as[spine] = str(bgp_as)
 
-    cli += ' cluster-show format name no-show-headers'
-    cluster_list = run_cli(module, cli).split()
-
-    if 'Success' not in cluster_list:
-        for cluster in cluster_list:
+    for node1, node2 in clusters:
+        if node1 in leaf_list and node2 in leaf_list:
+            bgp_as += 1
+            dict_bgp_as[node1] = str(bgp_as)
+            dict_bgp_as[node2] = str(bgp_as)
+            cluster_leaf_list.append(node1)
+            cluster_leaf_list.append(node2)
 
-            cli = clicopy
-            cli += ' cluster-show name %s' % cluster
-            cli += ' format cluster-node-1,cluster-node-2 no-show-headers'
-            cluster_nodes = run_cli(module, cli).split()
-
-            if cluster_nodes[0] in leaf_list and cluster_nodes[1] in leaf_list:
-                bgp_as += 1
-                dict_bgp_as[cluster_nodes[0]] = str(bgp_as)
-                dict_bgp_as[cluster_nodes[1]] = str(bgp_as)
-                cluster_leaf_list.append(cluster_nodes[0])
-                cluster_leaf_list.append(cluster_nodes[1])
-
-    noncluster_leaf_list = list(set(leaf_list) - set(cluster_leaf_list))
-    for leaf in noncluster_leaf_list:
-        bgp_as += 1
-        dict_bgp_as[leaf] = str(bgp_as)
+    for leaf in leaf_list:
+        if leaf not in cluster_leaf_list:
+            bgp_as += 1
+            dict_bgp_as[leaf] = str(bgp_as)
 
     return dict_bgp_as
 
@@ -313,11 +430,12 @@ def vrouter_interface_ibgp_add(module, switch_name, interface_ip, neighbor_ip, r
     return output
 
 
-def assign_ibgp_interface(module, dict_bgp_as):
+def assign_ibgp_interface(module, dict_bgp_as, clusters):
     """
     Method to create interfaces and add ibgp neighbors.
     :param module: The Ansible module to fetch input parameters.
     :param dict_bgp_as: The dictionary containing bgp-as of all switches.
+    :param clusters: List of (cluster-node-1, cluster-node-2) tuples.
     :return: The output of vrouter_interface_ibgp_add() method.
     """
     output = ''
@@ -327,33 +445,17 @@ def assign_ibgp_interface(module, dict_bgp_as):
     subnet_count = 0
     supernet = 30
 
-    cli = pn_cli(module)
-    clicopy = cli
-
     address = ibgp_ip_range.split('.')
     static_part = str(address[0]) + '.' + str(address[1]) + '.'
     static_part += str(address[2]) + '.'
 
-    cli += ' cluster-show format name no-show-headers '
-    cluster_list = run_cli(module, cli).split()
-
-    if len(cluster_list) > 0 and cluster_list[0] != 'Success':
-        for cluster in cluster_list:
-            cli = clicopy
-            cli += ' cluster-show name %s format cluster-node-1' % cluster
-            cli += ' no-show-headers'
-            cluster_node_1 = run_cli(module, cli).split()[0]
-
+    if clusters:
+        for cluster_node_1, cluster_node_2 in clusters:
             if cluster_node_1 not in spine_list and cluster_node_1 in leaf_list:
                 ip_count = subnet_count * 4
                 ip1 = static_part + str(ip_count + 1) + '/' + str(supernet)
                 ip2 = static_part + str(ip_count + 2) + '/' + str(supernet)
 
-                cli = clicopy
-                cli += ' cluster-show name %s format cluster-node-2' % cluster
-                cli += ' no-show-headers'
-                cluster_node_2 = run_cli(module, cli).split()[0]
-
                 remote_as = dict_bgp_as[cluster_node_1]
                 output += vrouter_interface_ibgp_add(module, cluster_node_1,
                                                      ip1, ip2, remote_as)
@@ -367,258 +469,79 @@ def assign_ibgp_interface(module, dict_bgp_as):
     return output
 
 
-def add_bgp_neighbor(module, dict_bgp_as):
-    """
-    Method to add bgp_neighbor to the vrouters.
-    :param module: The Ansible module to fetch input parameters.
-    :param dict_bgp_as: Dictionary containing bgp-as of all switches.
-    :return: String describing if bgp neighbors got added or not.
-    """
-    output = '' 
-    output += add_neighbor_old_spines(module, dict_bgp_as)
-    output += add_neighbor_new_spines(module, dict_bgp_as)
-    return output
-
-
-def add_neighbor_new_spines(module, dict_bgp_as):
+def add_bgp_neighbor(module, clusters):
     """
-    Method to add bgp_neighbor to the vrouters.
+    Method to add bgp neighbors on both ends of every link of the new
+    switches. Links between old switches are not looked at.
     :param module: The Ansible module to fetch input parameters.
-    :param vrouter_names: List of vrouter names.
-    :param dict_bgp_as: Dictionary containing bgp-as of all switches.
+    :param clusters: List of (cluster-node-1, cluster-node-2) tuples.
     :return: String describing if bgp neighbors got added or not.
     """
-    global CHANGED_FLAG
     output = ''
-    cli = pn_cli(module)
-    clicopy = cli
-
-    for spine in module.params['pn_new_spine_list']:
-        cli = clicopy
-        cli += ' vrouter-show location %s' % spine
-        cli += ' format name no-show-headers'
-        vrouter_spine = run_cli(module, cli).split()[0]
-
-        cli = clicopy
-        cli += ' vrouter-interface-show vrouter-name %s ' % vrouter_spine
-        cli += ' format l3-port no-show-headers '
-        port_list = run_cli(module, cli).split()
-        port_list = list(set(port_list))
-        port_list.remove(vrouter_spine)
-
-        for port in port_list:
-            cli = clicopy
-            cli += ' switch %s port-show port %s ' % (spine, port)
-            cli += ' format hostname no-show-headers '
-            leaf = run_cli(module, cli).split()[0]
-
-            cli = clicopy
-            cli += ' vrouter-show location %s' % leaf
-            cli += ' format name no-show-headers'
-            vrouter_leaf = run_cli(module, cli).split()[0]
-
-            cli = clicopy
-            cli += ' vrouter-show name %s' % vrouter_leaf
-            cli += ' format bgp-as no-show-headers'
-            bgp_leaf = run_cli(module, cli).split()[0]
-
-            bgp_spine = dict_bgp_as[spine]
-
-            cli = clicopy
-            cli += ' vrouter-interface-show vrouter-name %s ' % (
-                vrouter_spine)
-            cli += ' l3-port %s format ip no-show-headers ' % port
-            ip = run_cli(module, cli).split()
-            ip = list(set(ip))
-            ip.remove(vrouter_spine)
-            ip = ip[0]
-
-            ip = ip.split('/')[0]
-            ip_spine = ip
-
-            ip = ip.split('.')
-            static_part = str(ip[0]) + '.' + str(ip[1]) + '.'
-            static_part += str(ip[2]) + '.'
-            leaf_last_octet = int(ip[3]) - 1
-            ip_leaf = static_part + str(leaf_last_octet)
-
-            cli = clicopy
-            cli += ' vrouter-bgp-show remote-as ' + bgp_leaf
-            cli += ' neighbor %s format switch no-show-headers ' % (
-                ip_leaf)
-            already_added = run_cli(module, cli).split()
-
-            if vrouter_spine in already_added:
-                output += ' %s: ' % spine
-                output += 'BGP Neighbor %s already exists for %s \n' % (
-                    ip_leaf, vrouter_spine
-                )
-            else:
-                cli = clicopy
-                cli += ' vrouter-bgp-add vrouter-name ' + vrouter_spine
-                cli += ' neighbor %s remote-as %s ' % (ip_leaf,
-                                                       bgp_leaf)
-                if module.params['pn_bfd']:
-                    cli += ' bfd '
-
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                        spine, ip_leaf, vrouter_spine
-                    )
-                    CHANGED_FLAG.append(True)
-
-            cli = clicopy
-            cli += ' vrouter-bgp-show remote-as ' + bgp_spine
-            cli += ' neighbor %s format switch no-show-headers ' % (
-                ip_spine)
-            already_added = run_cli(module, cli).split()
-
-            if vrouter_leaf in already_added:
-                output += ' %s: ' % leaf
-                output += 'BGP Neighbor %s already exists for %s \n' % (
-                    ip_spine, vrouter_leaf
-                )
-            else:
-                cli = clicopy
-                cli += ' vrouter-bgp-add vrouter-name ' + vrouter_leaf
-                cli += ' neighbor %s remote-as %s ' % (ip_spine,
-                                                       bgp_spine)
-                if module.params['pn_bfd']:
-                    cli += ' bfd '
-
-                temp_cli = clicopy
-                temp_cli += ' cluster-show format name no-show-headers'
-                cluster_list = run_cli(module, temp_cli).split()
-                for cluster in cluster_list:
-                    if leaf in cluster:
-                        cli += ' weight 100 allowas-in '
-                        break
-
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                        leaf, ip_spine, vrouter_leaf
-                    )
-                    CHANGED_FLAG.append(True)
+    vrouters = find_vrouters(module)
+    clustered = set(node for cluster in clusters for node in cluster)
+
+    for spine, port, leaf in find_new_links(module):
+        if spine not in vrouters or leaf not in vrouters:
+            continue
+
+        vrouter_spine, bgp_spine = vrouters[spine]
+        vrouter_leaf, bgp_leaf = vrouters[leaf]
+        ip = get_interface_ips(module, vrouter_spine).get(port)
+        if ip is None:
+            continue
+
+        ip_spine = ip.split('/')[0]
+        ip = ip_spine.split('.')
+        static_part = str(ip[0]) + '.' + str(ip[1]) + '.'
+        static_part += str(ip[2]) + '.'
+        ip_leaf = static_part + str(int(ip[3]) - 1)
+
+        output += add_vrouter_bgp_neighbor(module, spine, vrouter_spine,
+                                           ip_leaf, bgp_leaf)
+        output += add_vrouter_bgp_neighbor(module, leaf, vrouter_leaf,
+                                           ip_spine, bgp_spine,
+                                           leaf in clustered)
 
     return output
 
 
-def add_neighbor_old_spines(module, dict_bgp_as):
+def add_vrouter_bgp_neighbor(module, switch, vrouter, neighbor_ip, remote_as,
+                             clustered=False):
     """
-    Method to add bgp_neighbor to the vrouters.
+    Method to add a bgp neighbor to a vrouter if it does not exist yet.
     :param module: The Ansible module to fetch input parameters.
-    :param dict_bgp_as: Dictionary containing bgp-as of all switches.
-    :return: String describing if bgp neighbors got added or not.
+    :param switch: Name of the switch of the vrouter.
+    :param vrouter: Name of the vrouter.
+    :param neighbor_ip: Ip of the neighbor.
+    :param remote_as: bgp-as of the neighbor.
+    :param clustered: Flag to indicate if the switch is part of a cluster.
+    :return: String describing if bgp neighbor got added or not.
     """
     global CHANGED_FLAG
-    output = ''
-    cli = pn_cli(module)
-    clicopy = cli
-
-    for spine in module.params['pn_spine_list']:
-        cli = clicopy
-        cli += ' vrouter-show location %s' % spine
-        cli += ' format name no-show-headers'
-        vrouter_spine = run_cli(module, cli).split()[0]
-
-        for leaf in module.params['pn_new_leaf_list']:
-            cli = clicopy
-            cli += ' switch %s port-show hostname %s ' % (spine, leaf)
-            cli += ' format port no-show-headers '
-            port_list = run_cli(module, cli).split()
-
-            cli = clicopy
-            cli += ' vrouter-show location %s' % leaf
-            cli += ' format name no-show-headers'
-            vrouter_leaf = run_cli(module, cli).split()[0]
-
-            bgp_leaf = dict_bgp_as[leaf]
+    neighbors = get_vrouter_config(module, vrouter, 'vrouter-bgp-show',
+                                   'neighbor,remote-as')
+    if (neighbor_ip, remote_as) in neighbors:
+        return ' %s: BGP Neighbor %s already exists for %s \n' % (
+            switch, neighbor_ip, vrouter
+        )
 
-            cli = clicopy
-            cli += ' vrouter-show name %s' % vrouter_spine
-            cli += ' format bgp-as no-show-headers'
-            bgp_spine = run_cli(module, cli).split()[0]
-
-            if 'Success' not in port_list and len(port_list) > 0:
-                for port in port_list:
-
-                    cli = clicopy
-                    cli += ' vrouter-interface-show vrouter-name %s ' % (
-                        vrouter_spine)
-                    cli += ' l3-port %s format ip no-show-headers ' % port
-                    ip = run_cli(module, cli).split()
-                    ip = list(set(ip))
-                    ip.remove(vrouter_spine)
-                    ip = ip[0]
-        
-                    ip = ip.split('/')[0]
-                    ip_spine = ip
-        
-                    ip = ip.split('.')
-                    static_part = str(ip[0]) + '.' + str(ip[1]) + '.'
-                    static_part += str(ip[2]) + '.'
-                    leaf_last_octet = int(ip[3]) - 1
-                    ip_leaf = static_part + str(leaf_last_octet)
-        
-                    cli = clicopy
-                    cli += ' vrouter-bgp-show remote-as ' + bgp_leaf
-                    cli += ' neighbor %s format switch no-show-headers ' % (
-                        ip_leaf)
-                    already_added = run_cli(module, cli).split()
-        
-                    if vrouter_spine in already_added:
-                        output += ' %s: ' % spine
-                        output += 'BGP Neighbor %s already exists for %s \n' % (
-                            ip_leaf, vrouter_spine
-                        )
-                    else:
-                        cli = clicopy
-                        cli += ' vrouter-bgp-add vrouter-name ' + vrouter_spine
-                        cli += ' neighbor %s remote-as %s ' % (ip_leaf,
-                                                               bgp_leaf)
-                        if module.params['pn_bfd']:
-                            cli += ' bfd '
-        
-                        if 'Success' in run_cli(module, cli):
-                            output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                                spine, ip_leaf, vrouter_spine
-                            )
-                            CHANGED_FLAG.append(True)
-        
-                    cli = clicopy
-                    cli += ' vrouter-bgp-show remote-as ' + bgp_spine
-                    cli += ' neighbor %s format switch no-show-headers ' % (
-                        ip_spine)
-                    already_added = run_cli(module, cli).split()
-        
-                    if vrouter_leaf in already_added:
-                        output += ' %s: ' % leaf
-                        output += 'BGP Neighbor %s already exists for %s \n' % (
-                            ip_spine, vrouter_leaf
-                        )
-                    else:
-                        cli = clicopy
-                        cli += ' vrouter-bgp-add vrouter-name ' + vrouter_leaf
-                        cli += ' neighbor %s remote-as %s ' % (ip_spine,
-                                                               bgp_spine)
-                        if module.params['pn_bfd']:
-                            cli += ' bfd '
-        
-                        temp_cli = clicopy
-                        temp_cli += ' cluster-show format name no-show-headers'
-                        cluster_list = run_cli(module, temp_cli).split()
-                        for cluster in cluster_list:
-                            if leaf in cluster:
-                                cli += ' weight 100 allowas-in '
-                                break
-        
-                        if 'Success' in run_cli(module, cli):
-                            output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                                leaf, ip_spine, vrouter_leaf
-                            )
-                            CHANGED_FLAG.append(True)
+    cli = pn_cli(module)
+    cli += ' vrouter-bgp-add vrouter-name ' + vrouter
+    cli += ' neighbor %s remote-as %s ' % (neighbor_ip, remote_as)
+    if module.params['pn_bfd']:
+        cli += ' bfd '
+    if clustered:
+        cli += ' weight 100 allowas-in '
+
+    if 'Success' in run_cli(module, cli):
+        neighbors.add((neighbor_ip, remote_as))
+        CHANGED_FLAG.append(True)
+        return ' %s: Added BGP Neighbor %s for %s \n' % (
+            switch, neighbor_ip, vrouter
+        )
 
-    return output
+    return ''
 
 
 def assign_router_id(module, vrouter_names):
@@ -875,306 +798,149 @@ def add_ospf_loopback_spine(module, switch, vrouter, ospf_network, ospf_area_id)
     return output
 
 
-def dict_area_id_leaf(module):
+def dict_area_id_leaf(module, clusters):
     """
-    Method to find area_id for all leaf and store in dictionary.
+    Method to find area_id for all leaf and store in dictionary. Area ids of
+    the old leafs are read with one vrouter-ospf-show, new leafs are given
+    the next area ids.
     :param module: The Ansible module to fetch input parameters.
+    :param clusters: List of (cluster-node-1, cluster-node-2) tuples.
     :return: Dictionary containing area_id of all leaf.
     """
-    leaf_list = module.params['pn_leaf_list']
     new_leaf_list = module.params['pn_new_leaf_list']
-    # ospf_area_id = int(module.params['pn_ospf_area_id'])
+    old_leafs = dict((leaf + '-vrouter', leaf)
+                     for leaf in module.params['pn_leaf_list'])
     cluster_leaf_list = []
-    cli = pn_cli(module)
-    clicopy = cli
     dict_area_id = {}
 
+    cli = pn_cli(module)
+    cli += ' vrouter-ospf-show format ospf-area no-show-headers '
     max = 0
-    for leaf in leaf_list:
-        vrouter = leaf + '-vrouter'
-        cli = clicopy
-        cli += ' vrouter-ospf-show vrouter-name %s format ospf-area no-show-headers ' % vrouter
-        ospf_list = run_cli(module, cli).split()
-
-        if 'Success' not in ospf_list:
-            ospf_list = list(set(ospf_list))
-            ospf_list.remove(vrouter)
-            dict_area_id[leaf] = ospf_list[0]
-            if int(ospf_list[0]) > max:
-                max = int(ospf_list[0])
+    for line in run_cli(module, cli).splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[0] in old_leafs:
+            dict_area_id.setdefault(old_leafs[fields[0]], fields[1])
+            if int(fields[1]) > max:
+                max = int(fields[1])
 
     ospf_area_id = max
 
-    cli = clicopy
-    cli += ' cluster-show format name no-show-headers'
-    cluster_list = run_cli(module, cli).split()
-
-    if 'Success' not in cluster_list:
-        for cluster in cluster_list:
+    for node1, node2 in clusters:
+        if node1 in new_leaf_list and node2 in new_leaf_list:
+            ospf_area_id += 1
+            dict_area_id[node1] = str(ospf_area_id)
+            dict_area_id[node2] = str(ospf_area_id)
+            cluster_leaf_list.append(node1)
+            cluster_leaf_list.append(node2)
 
-            cli = clicopy
-            cli += ' cluster-show name %s' % cluster
-            cli += ' format cluster-node-1,cluster-node-2 no-show-headers'
-            cluster_nodes = run_cli(module, cli).split()
-
-            if cluster_nodes[0] in new_leaf_list and cluster_nodes[1] in new_leaf_list:
-                ospf_area_id += 1
-                dict_area_id[cluster_nodes[0]] = str(ospf_area_id)
-                dict_area_id[cluster_nodes[1]] = str(ospf_area_id)
-                cluster_leaf_list.append(cluster_nodes[0])
-                cluster_leaf_list.append(cluster_nodes[1])
-
-    noncluster_leaf_list = list(set(new_leaf_list) - set(cluster_leaf_list))
-    for leaf in noncluster_leaf_list:
-        ospf_area_id += 1
-        dict_area_id[leaf] = str(ospf_area_id)
+    for leaf in new_leaf_list:
+        if leaf not in cluster_leaf_list:
+            ospf_area_id += 1
+            dict_area_id[leaf] = str(ospf_area_id)
 
     return dict_area_id
 
 
 def add_ospf_neighbor(module, dict_area_id):
     """
-    Method to add ospf_neighbor to the vrouters.
-    :param module: The Ansible module to fetch input parameters.
-    :param dict_area_id: Dictionary containing area_id of leafs.
-    :return: String describing if ospf neighbors got added or not.
-    """
-    output = ''
-    output += add_ospf_neighbor_new_spines(module, dict_area_id)
-    output += add_ospf_neighbor_old_spines(module, dict_area_id)
-
-    return output
-
-
-def add_ospf_neighbor_old_spines(module, dict_area_id):
-    """
-    Method to add bgp_neighbor to the vrouters.
-    :param module: The Ansible module to fetch input parameters.
-    :param dict_bgp_as: Dictionary containing bgp-as of all switches.
-    :return: String describing if bgp neighbors got added or not.
-    """
-    global CHANGED_FLAG
-    output = ''
-    cli = pn_cli(module)
-    clicopy = cli
-
-    for spine in module.params['pn_spine_list']:
-        cli = clicopy
-        cli += ' vrouter-show location %s' % spine
-        cli += ' format name no-show-headers'
-        vrouter_spine = run_cli(module, cli).split()[0]
-
-        for leaf in module.params['pn_new_leaf_list']:
-            cli = clicopy
-            cli += ' switch %s port-show hostname %s ' % (spine, leaf)
-            cli += ' format port no-show-headers '
-            port_list = run_cli(module, cli).split()
-
-            cli = clicopy
-            cli += ' vrouter-show location %s' % leaf
-            cli += ' format name no-show-headers'
-            vrouter_leaf = run_cli(module, cli).split()[0]
-
-            ospf_area_id = dict_area_id[leaf]
-
-            if 'Success' not in port_list and len(port_list) > 0:
-                for port in port_list:
-
-                    cli = clicopy
-                    cli += ' vrouter-interface-show vrouter-name %s ' % (
-                        vrouter_spine)
-                    cli += ' l3-port %s format ip no-show-headers ' % port
-                    ip = run_cli(module, cli).split()
-                    ip = list(set(ip))
-                    ip.remove(vrouter_spine)
-                    ip = ip[0]
-
-                    ip = ip.split('.')
-                    static_part = str(ip[0]) + '.' + str(ip[1]) + '.'
-                    static_part += str(ip[2]) + '.'
-                    last_octet = str(ip[3]).split('/')
-                    netmask = last_octet[1]
-
-                    last_octet_ip_mod = int(last_octet[0]) % 4
-                    ospf_last_octet = int(last_octet[0]) - last_octet_ip_mod
-                    ospf_network = static_part + str(ospf_last_octet) + '/' + netmask
-
-                    leaf_last_octet = int(last_octet[0]) - 1
-                    ip_leaf = static_part + str(leaf_last_octet)
-                    ip_spine = static_part + last_octet[0]
-
-                    cli = clicopy
-                    cli += ' vrouter-ospf-show'
-                    cli += ' network %s format switch no-show-headers ' % ospf_network
-                    already_added = run_cli(module, cli).split()
-        
-                    if vrouter_spine in already_added:
-                        output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                            spine, ospf_network, vrouter_spine
-                        )
-                    else:
-                        if module.params['pn_bfd']:
-                            output += configure_ospf_bfd(module, vrouter_spine,
-                                                         ip_spine)
-        
-                        cli = clicopy
-                        cli += ' vrouter-ospf-add vrouter-name ' + vrouter_spine
-                        cli += ' network %s ospf-area %s' % (ospf_network,
-                                                             ospf_area_id)
-        
-                        if 'Success' in run_cli(module, cli):
-                            output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                                spine, ospf_network, vrouter_spine
-                            )
-                            CHANGED_FLAG.append(True)
-        
-                    if vrouter_leaf in already_added:
-                        output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                            leaf, ospf_network, vrouter_leaf
-                        )
-                    else:
-                        if module.params['pn_bfd']:
-                            output += configure_ospf_bfd(module, vrouter_leaf,
-                                                         ip_leaf)
-        
-                        cli = clicopy
-                        cli += ' vrouter-ospf-add vrouter-name ' + vrouter_leaf
-                        cli += ' network %s ospf-area %s' % (ospf_network,
-                                                             ospf_area_id)
-        
-                        if 'Success' in run_cli(module, cli):
-                            output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                                leaf, ospf_network, vrouter_leaf
-                            )
-                            CHANGED_FLAG.append(True)
-
-    return output
-
-
-def add_ospf_neighbor_new_spines(module, dict_area_id):
-    """
-    Method to add ospf_neighbor to the vrouters.
+    Method to add ospf neighbors on both ends of every link of the new
+    switches. Links between old switches are not looked at.
     :param module: The Ansible module to fetch input parameters.
     :param dict_area_id: Dictionary containing area_id of leafs.
     :return: String describing if ospf neighbors got added or not.
     """
-    global CHANGED_FLAG
     output = ''
     cli = pn_cli(module)
     clicopy = cli
-    leaf_list = module.params['pn_leaf_list']
-    spine_list = module.params['pn_spine_list']
-    new_leaf_list = module.params['pn_new_leaf_list']
+    vrouters = find_vrouters(module)
     new_spine_list = module.params['pn_new_spine_list']
 
+    # Loopback network of the spines, from the loopback of first new spine.
     for spine in new_spine_list:
-        cli = clicopy
-        cli += ' vrouter-show location %s' % spine
-        cli += ' format name no-show-headers'
-        vrouter_spine = run_cli(module, cli).split()[0]
-
+        vrouter_spine = vrouters[spine][0]
         if new_spine_list.index(spine) == 0:
             cli = clicopy
             cli += ' vrouter-loopback-interface-show vrouter-name ' + vrouter_spine
             cli += ' format ip no-show-headers '
             loopback_ip = run_cli(module, cli).split()
             loopback_ip.remove(vrouter_spine)
-            vrouter_loopback_ip = loopback_ip[0]
 
             loopback_ip = loopback_ip[0].split('.')
             loopback_network = loopback_ip[0] + '.' + loopback_ip[1] + '.'
             loopback_network += loopback_ip[2] + '.' + '0/24'
 
-        output += add_ospf_loopback_spine(module, spine, vrouter_spine, loopback_network, '0')
-
-        cli = clicopy
-        cli += ' vrouter-interface-show vrouter-name %s ' % vrouter_spine
-        cli += ' format l3-port no-show-headers '
-        port_list = run_cli(module, cli).split()
-        port_list = list(set(port_list))
-        port_list.remove(vrouter_spine)
-
-        for port in port_list:
-            cli = clicopy
-            cli += ' switch %s port-show port %s' % (spine, port)
-            cli += ' format hostname no-show-headers'
-            hostname = run_cli(module, cli).split()[0]
-
-            ospf_area_id = dict_area_id[hostname]
+        output += add_ospf_loopback_spine(module, spine, vrouter_spine,
+                                          loopback_network, '0')
+
+    for spine, port, leaf in find_new_links(module):
+        if spine not in vrouters or leaf not in vrouters:
+            continue
+
+        vrouter_spine = vrouters[spine][0]
+        vrouter_leaf = vrouters[leaf][0]
+        ip = get_interface_ips(module, vrouter_spine).get(port)
+        if ip is None:
+            continue
+
+        ip = ip.split('.')
+        static_part = str(ip[0]) + '.' + str(ip[1]) + '.'
+        static_part += str(ip[2]) + '.'
+        last_octet = str(ip[3]).split('/')
+        netmask = last_octet[1]
+
+        last_octet_ip_mod = int(last_octet[0]) % 4
+        ospf_last_octet = int(last_octet[0]) - last_octet_ip_mod
+        ospf_network = static_part + str(ospf_last_octet) + '/' + netmask
+
+        leaf_last_octet = int(last_octet[0]) - 1
+        ip_leaf = static_part + str(leaf_last_octet)
+        ip_spine = static_part + last_octet[0]
+        ospf_area_id = dict_area_id[leaf]
+
+        output += add_vrouter_ospf_network(module, spine, vrouter_spine,
+                                           ip_spine, ospf_network,
+                                           ospf_area_id)
+        output += add_vrouter_ospf_network(module, leaf, vrouter_leaf,
+                                           ip_leaf, ospf_network,
+                                           ospf_area_id)
 
-            cli = clicopy
-            cli += ' vrouter-show location %s' % hostname
-            cli += ' format name no-show-headers'
-            vrouter_hostname = run_cli(module, cli).split()[0]
+    return output
 
-            cli = clicopy
-            cli += ' vrouter-interface-show vrouter-name %s l3-port %s' % (
-                vrouter_spine, port
-            )
-            cli += ' format ip no-show-headers'
-            ip = run_cli(module, cli).split()
-            ip = list(set(ip))
-            ip.remove(vrouter_spine)
-            ip = ip[0]
-
-            ip = ip.split('.')
-            static_part = str(ip[0]) + '.' + str(ip[1]) + '.'
-            static_part += str(ip[2]) + '.'
-            last_octet = str(ip[3]).split('/')
-            netmask = last_octet[1]
-
-            last_octet_ip_mod = int(last_octet[0]) % 4
-            ospf_last_octet = int(last_octet[0]) - last_octet_ip_mod
-            ospf_network = static_part + str(ospf_last_octet) + '/' + netmask
-
-            leaf_last_octet = int(last_octet[0]) - 1
-            ip_leaf = static_part + str(leaf_last_octet)
-            ip_spine = static_part + last_octet[0]
 
-            cli = clicopy
-            cli += ' vrouter-ospf-show'
-            cli += ' network %s format switch no-show-headers ' % ospf_network
-            already_added = run_cli(module, cli).split()
-
-            if vrouter_spine in already_added:
-                output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                    spine, ospf_network, vrouter_spine
-                )
-            else:
-                if module.params['pn_bfd']:
-                    output += configure_ospf_bfd(module, vrouter_spine,
-                                                 ip_spine)
+def add_vrouter_ospf_network(module, switch, vrouter, ip, ospf_network,
+                             ospf_area_id):
+    """
+    Method to add an ospf network to a vrouter if it does not exist yet.
+    :param module: The Ansible module to fetch input parameters.
+    :param switch: Name of the switch of the vrouter.
+    :param vrouter: Name of the vrouter.
+    :param ip: Ip of the vrouter interface in the network, for ospf bfd.
+    :param ospf_network: The network for adding the ospf neighbor.
+    :param ospf_area_id: The area id of the network.
+    :return: String describing if ospf neighbor got added or not.
+    """
+    global CHANGED_FLAG
+    output = ''
+    networks = get_vrouter_config(module, vrouter, 'vrouter-ospf-show',
+                                  'network')
+    if (ospf_network,) in networks:
+        return ' %s: OSPF Neighbor %s already exists for %s \n' % (
+            switch, ospf_network, vrouter
+        )
 
-                cli = clicopy
-                cli += ' vrouter-ospf-add vrouter-name ' + vrouter_spine
-                cli += ' network %s ospf-area %s' % (ospf_network,
-                                                     ospf_area_id)
-
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                        spine, ospf_network, vrouter_spine
-                    )
-                    CHANGED_FLAG.append(True)
-
-            if vrouter_hostname in already_added:
-                output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                    hostname, ospf_network, vrouter_hostname
-                )
-            else:
-                if module.params['pn_bfd']:
-                    output += configure_ospf_bfd(module, vrouter_hostname,
-                                                 ip_leaf)
+    if module.params['pn_bfd']:
+        output += configure_ospf_bfd(module, vrouter, ip)
 
-                cli = clicopy
-                cli += ' vrouter-ospf-add vrouter-name ' + vrouter_hostname
-                cli += ' network %s ospf-area %s' % (ospf_network,
-                                                     ospf_area_id)
+    cli = pn_cli(module)
+    cli += ' vrouter-ospf-add vrouter-name ' + vrouter
+    cli += ' network %s ospf-area %s' % (ospf_network, ospf_area_id)
 
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                        hostname, ospf_network, vrouter_hostname
-                    )
-                    CHANGED_FLAG.append(True)
+    if 'Success' in run_cli(module, cli):
+        networks.add((ospf_network,))
+        output += ' %s: Added OSPF neighbor %s to %s \n' % (
+            switch, ospf_network, vrouter
+        )
+        CHANGED_FLAG.append(True)
 
     return output
 
@@ -1287,49 +1053,34 @@ def vrouter_leafcluster_ospf_add(module, switch_name, interface_ip,
     return output
 
 
-def assign_leafcluster_ospf_interface(module, dict_area_id):
+def assign_leafcluster_ospf_interface(module, dict_area_id, clusters):
     """
     Method to create interfaces and add ospf neighbor for leaf cluster.
     :param module: The Ansible module to fetch input parameters.
     :param dict_area_id: Dictionary containing area_id of leafs.
+    :param clusters: List of (cluster-node-1, cluster-node-2) tuples.
     :return: The output of vrouter_interface_ibgp_add() method.
     """
     output = ''
     iospf_ip_range = module.params['pn_iospf_ip_range']
     spine_list = module.params['pn_spine_list'] + module.params['pn_new_spine_list']
     leaf_list = module.params['pn_new_leaf_list']
-    
+
     subnet_count = 0
     supernet = 30
 
-    cli = pn_cli(module)
-    clicopy = cli
-
     address = iospf_ip_range.split('.')
     static_part = str(address[0]) + '.' + str(address[1]) + '.'
     static_part += str(address[2]) + '.'
 
-    cli += ' cluster-show format name no-show-headers '
-    cluster_list = run_cli(module, cli).split()
-
-    if len(cluster_list) > 0 and cluster_list[0] != 'Success':
-        for cluster in cluster_list:
-            cli = clicopy
-            cli += ' cluster-show name %s format cluster-node-1' % cluster
-            cli += ' no-show-headers'
-            cluster_node_1 = run_cli(module, cli).split()[0]
-
+    if clusters:
+        for cluster_node_1, cluster_node_2 in clusters:
             if cluster_node_1 not in spine_list and cluster_node_1 in leaf_list:
                 ip_count = subnet_count * 4
                 ip1 = static_part + str(ip_count + 1) + '/' + str(supernet)
                 ip2 = static_part + str(ip_count + 2) + '/' + str(supernet)
                 ospf_network = static_part + str(ip_count) + '/' + str(supernet)
 
-                cli = clicopy
-                cli += ' cluster-show name %s format cluster-node-2' % cluster
-                cli += ' no-show-headers'
-                cluster_node_2 = run_cli(module, cli).split()[0]
-
                 ospf_area_id = dict_area_id[cluster_node_1]
                 output += vrouter_leafcluster_ospf_add(module, cluster_node_1,
                                                        ip1, ospf_network, ospf_area_id)
@@ -1385,19 +1136,21 @@ def main():
 
     message = assign_router_id(module, vrouter_names)
     message += create_leaf_clusters(module)
+    clusters = find_clusters(module)
 
     if routing_protocol == 'ebgp':
-        dict_bgp_as = find_dict_bgp_as(module)
+        dict_bgp_as = find_dict_bgp_as(module, clusters)
         message += configure_bgp(module,
                                  vrouter_names, dict_bgp_as,
            module.params['pn_bgp_maxpath'], module.params['pn_bgp_redistribute'])
-        message += add_bgp_neighbor(module, dict_bgp_as)
-        message += assign_ibgp_interface(module, dict_bgp_as)
+        message += add_bgp_neighbor(module, clusters)
+        message += assign_ibgp_interface(module, dict_bgp_as, clusters)
     elif routing_protocol == 'ospf':
-        dict_area_id = dict_area_id_leaf(module)
+        dict_area_id = dict_area_id_leaf(module, clusters)
         message += add_ospf_neighbor(module, dict_area_id)
         message += add_ospf_redistribute(module, vrouter_names)
-        message += assign_leafcluster_ospf_interface(module, dict_area_id)
+        message += assign_leafcluster_ospf_interface(module, dict_area_id,
+                                                     clusters)
 
     message_string = message
     results = []
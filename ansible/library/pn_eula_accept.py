@@ -21,6 +21,7 @@
 import shlex
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEADLINE_EXCEEDED, run_bounded
 
 DOCUMENTATION = """
 ---
@@ -48,6 +49,19 @@ options:
         - Specify ips of all hosts/switches separated by comma.
       required: True
       type: str
+    pn_command_timeout:
+      description:
+        - Number of seconds an ssh command may run before it is killed. A
+          switch whose command times out is reported unreachable.
+      required: False
+      type: int
+      default: 60
+    pn_deadline:
+      description:
+        - Number of seconds the module may run for. Switches not handled by
+          then are reported as skipped.
+      required: False
+      type: int
 """
 
 EXAMPLES = """
@@ -106,6 +120,8 @@ def main():
         pn_leaf_ips=dict(required=False, type='str', default=''),
         pn_dlink_switch_list=dict(required=False, type='list', default=[]),
         pn_dlink_switch_ips=dict(required=False, type='str', default=''),
+        pn_command_timeout=dict(required=False, type='int', default=60),
+        pn_deadline=dict(required=False, type='int'),
     ))
 
     username = module.params['pn_cliusername']
@@ -135,6 +151,9 @@ def main():
 
     result = []
     count = 0
+    expired = False
+    unreachable = []
+    failed = []
 
     for ip in switch_ips:
         cli = 'sshpass -p %s ' % password
@@ -142,22 +161,50 @@ def main():
         cli += 'eula-show'
 
         cli = shlex.split(cli)
-        rc, out, err = module.run_command(cli)
-
-        if not out:
+        rc, out, err = run_bounded(module, cli)
+
+        if err == DEADLINE_EXCEEDED:
+            expired = True
+            result += [{'switch': switch, 'output': 'Skipped, ' + err}
+                       for switch in switch_list[count:len(switch_ips)]]
+            break
+        elif rc == -1:
+            unreachable.append(switch_list[count])
+            result.append({
+                'switch': switch_list[count],
+                'output': 'Switch is unreachable: ' + err
+            })
+        elif not out:
             cli = 'sshpass -p admin ssh -o StrictHostKeyChecking=no '
             cli += '%s@%s -- --quiet --script-password ' % (username, ip)
             cli += 'switch-setup-modify password %s ' % password
             cli += 'switch-name %s eula-accepted true' % switch_list[count]
 
             cli = shlex.split(cli)
-            module.run_command(cli)
-            CHANGED_FLAG.append(True)
-
-            result.append({
-                'switch': switch_list[count],
-                'output': 'Eula accepted'
-            })
+            rc, out, err = run_bounded(module, cli)
+            if err == DEADLINE_EXCEEDED:
+                expired = True
+                result += [{'switch': switch, 'output': 'Skipped, ' + err}
+                           for switch in switch_list[count:len(switch_ips)]]
+                break
+            elif rc == -1:
+                unreachable.append(switch_list[count])
+                result.append({
+                    'switch': switch_list[count],
+                    'output': 'Switch is unreachable: ' + err
+                })
+            elif rc != 0:
+                failed.append(switch_list[count])
+                result.append({
+                    'switch': switch_list[count],
+                    'output': 'Eula accept failed: ' + (err or out).strip()
+                })
+            else:
+                CHANGED_FLAG.append(True)
+                result.append({
+                    'switch': switch_list[count],
+                    'output': 'Eula accepted'
+                })
         else:
             result.append({
                 'switch': switch_list[count],
@@ -166,14 +213,21 @@ def main():
 
         count += 1
 
+    if expired:
+        msg = 'Eula accept stopped at the deadline'
+    elif unreachable or failed:
+        msg = 'Eula not accepted on %s' % ', '.join(unreachable + failed)
+    else:
+        msg = 'Eula accepted successfully'
+
     # Exit the module and return the required JSON
     module.exit_json(
-        unreachable=False,
-        msg='Eula accepted successfully',
+        unreachable=bool(unreachable),
+        msg=msg,
         summary=result,
         exception='',
         task='Accept eula',
-        failed=False,
+        failed=expired or bool(unreachable or failed),
         changed=True if True in CHANGED_FLAG else False
     )
 
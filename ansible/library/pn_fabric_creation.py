@@ -22,6 +22,8 @@ import shlex
 import time
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import CliExecutor, DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_ztp import setup_fabric
 
 DOCUMENTATION = """
 ---
@@ -36,6 +38,11 @@ description:
         - Enable all ports
         - Create/Join fabric
         - Enable STP
+    With pn_ztp_mode join, the module only renames the switch, assigns its
+    static setup and creates/joins the fabric. With pn_ztp_mode fabric, one
+    invocation on a seed switch then sets up every fabric node of
+    pn_spine_list and pn_leaf_list through the fabric (control network, web
+    api, STP, ports, 40g ports and in-band ip), the switches concurrently.
 options:
     pn_cliusername:
       description:
@@ -147,17 +154,50 @@ options:
       required: False
       default: True
       type: bool
+    pn_ztp_mode:
+      description:
+        - local runs the whole setup on the local switch. join only runs the
+          bootstrap needing the switch itself (switch name, static setup,
+          fabric create/join). fabric runs the rest of the setup of every
+          switch from the seed switch the module runs on.
+      required: False
+      type: str
+      choices: ['local', 'join', 'fabric']
+      default: 'local'
+    pn_max_workers:
+      description:
+        - Maximum number of switches set up at the same time in fabric mode.
+      required: False
+      type: int
+      default: 10
 """
 
 EXAMPLES = """
 - name: Fabric creation/join
-    pn_fabric_creation:
-      pn_cliusername: "{{ USERNAME }}"
-      pn_clipassword: "{{ PASSWORD }}"
-      pn_fabric_name: 'ztp-fabric'
-      pn_current_switch: "{{ inventory_hostname }}"
-      pn_spine_list: "{{ groups['spine'] }}"
-      pn_leaf_list: "{{ groups['leaf'] }}"
+  pn_fabric_creation:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_fabric_name: 'ztp-fabric'
+    pn_current_switch: "{{ inventory_hostname }}"
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+
+- name: Fabric join, one switch at a time
+  pn_fabric_creation:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_fabric_name: 'ztp-fabric'
+    pn_current_switch: "{{ inventory_hostname }}"
+    pn_ztp_mode: 'join'
+
+- name: Setup of all the fabric nodes from the first spine
+  pn_fabric_creation:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_fabric_name: 'ztp-fabric'
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_ztp_mode: 'fabric'
 """
 
 RETURN = """
@@ -189,6 +229,10 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+cli_metrics:
+  description: Number of cli calls made and time spent in them.
+  returned: in fabric mode
+  type: dict
 """
 
 CHANGED_FLAG = []
@@ -532,6 +576,54 @@ def assign_inband_ip(module):
     return 'Could not assign in-band ip'
 
 
+def configure_fabric(module):
+    """
+    Method to set up every fabric node from the seed switch and exit the
+    module.
+    :param module: The Ansible module to fetch input parameters.
+    """
+    switches = module.params['pn_spine_list'] + module.params['pn_leaf_list']
+    executor = CliExecutor(module, module.params['pn_max_workers'])
+    setups, missing, failed = setup_fabric(executor, switches, module.params)
+    if failed is not None:
+        module.exit_json(
+            unreachable=False,
+            failed=True,
+            exception=failed.err.strip(),
+            summary=[],
+            task='Fabric creation',
+            msg='Could not list the fabric nodes',
+            cli_metrics=executor.metrics,
+            changed=False
+        )
+
+    results = []
+    errors = []
+    for setup in setups:
+        results += setup.summary
+        if setup.failed is not None:
+            results.append({
+                'switch': setup.switch,
+                'output': u'Operation Failed: {}'.format(setup.failed.command)
+            })
+            errors.append('%s: %s' % (setup.switch,
+                                      setup.failed.err.strip()))
+    for switch in missing:
+        results.append({'switch': switch, 'output': 'Not in the fabric'})
+
+    failed = bool(errors or missing)
+    module.exit_json(
+        unreachable=False,
+        msg='Fabric setup failed' if failed else 'Fabric setup succeeded',
+        summary=results,
+        exception='; '.join(errors),
+        task='Fabric creation',
+        failed=failed,
+        cli_metrics=executor.metrics,
+        changed=any(setup.changed for setup in setups)
+    )
+
+
 def main():
     """ This section is for arguments parsing """
     module = AnsibleModule(argument_spec=dict(
@@ -557,9 +649,17 @@ def main():
         pn_domain_name=dict(required=False, type='str'),
         pn_ntp_server=dict(required=False, type='str'),
         pn_web_api=dict(type='bool', default=True),
-        pn_stp=dict(required=False, type='bool', default=True), )
+        pn_stp=dict(required=False, type='bool', default=True),
+        pn_ztp_mode=dict(required=False, type='str',
+                         choices=['local', 'join', 'fabric'],
+                         default='local'),
+        pn_max_workers=dict(required=False, type='int',
+                            default=DEFAULT_MAX_WORKERS), )
     )
 
+    if module.params['pn_ztp_mode'] == 'fabric':
+        configure_fabric(module)
+
     fabric_name = module.params['pn_fabric_name']
     fabric_network = module.params['pn_fabric_network']
     control_network = module.params['pn_fabric_control_network']
@@ -586,6 +686,17 @@ def main():
         'output': u"Joined fabric '{}'".format(fabric_name)
     })
 
+    if module.params['pn_ztp_mode'] == 'join':
+        module.exit_json(
+            unreachable=False,
+            msg='Fabric join succeeded',
+            summary=results,
+            exception='',
+            task='Fabric creation',
+            failed=False,
+            changed=True if True in CHANGED_FLAG else False
+        )
+
     # Configure fabric control network to either mgmt or in-band
     if 'Success' in configure_control_network(module, control_network):
         CHANGED_FLAG.append(True)
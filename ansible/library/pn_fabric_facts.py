@@ -0,0 +1,191 @@
+#!/usr/bin/python
+""" PN Fabric Facts """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_fabric_facts import (GENERATION_MODES,
+                                                  collect_facts, fresh_facts)
+from ansible.module_utils.pn_rest import (BACKENDS, DEFAULT_REST_URL,
+                                          make_executor)
+
+DOCUMENTATION = """
+---
+module: pn_fabric_facts
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Module to collect the fabric inventory as facts.
+description:
+    Reads the fabric nodes, clusters, vrouters, vrouter interfaces, lldp
+    links and vlans in one pass, one show per kind of object, and publishes
+    them as the pn_fabric fact. With fact caching enabled in ansible.cfg
+    (fact_caching = jsonfile), the fact is kept by the controller across
+    plays and runs. Passing it back in pn_cached_facts skips the inventory
+    while the cached facts are younger than pn_ttl and the fabric generation
+    is unchanged, which costs a single fabric-node-show.
+options:
+    pn_cliusername:
+      description:
+        - Provide login username if user is not root.
+      required: False
+      type: str
+    pn_clipassword:
+      description:
+        - Provide login password if user is not root.
+      required: False
+      type: str
+    pn_cached_facts:
+      description:
+        - pn_fabric fact of a previous run, usually "{{ pn_fabric }}".
+      required: False
+      type: dict
+    pn_ttl:
+      description:
+        - Number of seconds the collected facts may be reused for.
+      required: False
+      type: int
+      default: 3600
+    pn_generation:
+      description:
+        - What invalidates cached facts besides their ttl. membership
+          invalidates them when nodes join or leave the fabric, transaction
+          after every fabric transaction.
+      required: False
+      type: str
+      choices: ['membership', 'transaction']
+      default: 'membership'
+    pn_refresh:
+      description:
+        - Flag to ignore pn_cached_facts and read the inventory again.
+      required: False
+      type: bool
+      default: False
+    pn_max_workers:
+      description:
+        - Maximum number of show commands run at the same time.
+      required: False
+      type: int
+      default: 10
+    pn_backend:
+      description:
+        - How the shows are run. cli forks the cli for every show, rest sends
+          them to the web API of the switch over keep-alive connections and
+          reads the rows from the JSON responses. The web API is enabled by
+          pn_fabric_creation (pn_web_api).
+      required: False
+      type: str
+      choices: ['cli', 'rest']
+      default: 'cli'
+    pn_rest_url:
+      description:
+        - Base url of the web API of the switch, used by the rest backend.
+      required: False
+      type: str
+      default: 'https://127.0.0.1'
+"""
+
+EXAMPLES = """
+- name: Collect the fabric inventory once per run
+  pn_fabric_facts:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_cached_facts: "{{ pn_fabric | default(omit) }}"
+    pn_backend: 'rest'
+
+- debug:
+    var: hostvars[groups['spine'][0]]['pn_fabric']['clusters']
+"""
+
+RETURN = """
+ansible_facts:
+  description: pn_fabric, the inventory of the fabric with its generation
+    key, collection time and ttl.
+  returned: on success
+  type: dict
+cache_hit:
+  description: Indicates whether the cached facts were reused.
+  returned: always
+  type: bool
+changed:
+  description: Indicates whether the module caused changes on the target.
+  returned: always(False)
+  type: bool
+cli_metrics:
+  description: Number of cli calls made and time spent in them.
+  returned: always
+  type: dict
+"""
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_cliusername=dict(required=False, type='str'),
+            pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_cached_facts=dict(required=False, type='dict'),
+            pn_ttl=dict(required=False, type='int', default=3600),
+            pn_generation=dict(required=False, type='str',
+                               choices=list(GENERATION_MODES),
+                               default='membership'),
+            pn_refresh=dict(required=False, type='bool', default=False),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS),
+            pn_backend=dict(required=False, type='str',
+                            choices=list(BACKENDS), default='cli'),
+            pn_rest_url=dict(required=False, type='str',
+                             default=DEFAULT_REST_URL),
+        )
+    )
+
+    executor = make_executor(module, module.params['pn_max_workers'])
+    cached = module.params['pn_cached_facts']
+    mode = module.params['pn_generation']
+
+    if not module.params['pn_refresh'] and \
+            fresh_facts(executor, cached, mode):
+        module.exit_json(
+            msg='Fabric facts reused from cache',
+            ansible_facts={'pn_fabric': cached},
+            cache_hit=True,
+            changed=False,
+            cli_metrics=executor.metrics
+        )
+
+    facts, failed = collect_facts(executor, mode, module.params['pn_ttl'])
+    if failed is not None:
+        module.fail_json(
+            msg='Could not collect fabric facts: %s failed' % failed.command,
+            stderr=failed.err.strip(),
+            cache_hit=False,
+            changed=False,
+            cli_metrics=executor.metrics
+        )
+
+    module.exit_json(
+        msg='Fabric facts collected: %d nodes, %d clusters, %d vrouters' % (
+            len(facts['nodes']), len(facts['clusters']),
+            len(facts['vrouters'])),
+        ansible_facts={'pn_fabric': facts},
+        cache_hit=False,
+        changed=False,
+        cli_metrics=executor.metrics
+    )
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,8 @@
 import shlex
 import time
 
+from ansible.module_utils.pn_numbering import get_numbering_plan
+
 DOCUMENTATION = """
 ---
 module: pn_fabric_over_l3
@@ -104,6 +106,13 @@ options:
         - Flag to accept eula
         required: True
         type: bool
+    pn_numbering_plan:
+      description:
+        - Specify path of the numbering plan file. bgp-as and in-band ips
+          are loaded from it and new switches are added to it, so numbering
+          stays stable when switches are added.
+        required: False
+        type: str
 """
 
 EXAMPLES = """
@@ -215,39 +224,18 @@ def update_switch_names(module, switch_name):
         return ' Updated switch name to match hostname! '
 
 
-def assign_inband_ip(module, inband_ip):
+def assign_inband_ip(module, plan):
     """
     Method to assign in-band ips to switches.
     :param module: The Ansible module to fetch input parameters.
-    :param inband_ip: The network ip for the in-band ips.
+    :param plan: NumberingPlan of the fabric.
     :return: The output messages for assignment.
     """
     cli = pn_cli(module)
-    clicopy = cli
-
-    supernet = 4
-    spine_list = module.params['pn_spine_list']
-    leaf_list = module.params['pn_leaf_list']
     current_switch = module.params['pn_current_switch']
     output = ''
-    ip_count = 0
 
-    if current_switch in spine_list:
-        spine_pos = int(spine_list.index(current_switch))
-        ip_count = (supernet * spine_pos) + 1
-    elif current_switch in leaf_list:
-        spine_count = len(spine_list)
-        leaf_pos = int(leaf_list.index(current_switch))
-        ip_count = (supernet * leaf_pos) + 1
-        ip_count += (int(spine_count) * supernet)
-
-    address = inband_ip.split('.')
-    static_part = str(address[0]) + '.' + str(address[1]) + '.'
-    static_part += str(address[2]) + '.'
-
-    ip = static_part + str(ip_count) + '/' + str(30)
-
-    cli = clicopy
+    ip = plan.inband_ip(current_switch)
     cli += 'switch-setup-modify in-band-ip %s ' % ip
 
     if 'Setup completed successfully' in run_cli(module, cli):
@@ -255,6 +243,20 @@ def assign_inband_ip(module, inband_ip):
     return output
 
 
+def get_fabric_numbering(module):
+    """
+    Method to get the numbering plan (bgp-as and in-band ips) of the fabric,
+    built from the switch lists and the leaf clusters of the csv file.
+    :param module: The Ansible module to fetch input parameters.
+    :return: NumberingPlan of the fabric.
+    """
+    return get_numbering_plan(module, module.params['pn_spine_list'],
+                              module.params['pn_leaf_list'],
+                              find_leaf_cluster(module)[0],
+                              bgp_as=module.params['pn_bgp_as_range'],
+                              inband_ip=module.params['pn_inband_ip'])
+
+
 def find_leaf_cluster(module):
     """
     Method to find leaf_cluster from the input csv file.
@@ -358,28 +360,26 @@ def join_fabric(module, switch_ip):
     return run_cli(module, cli)
 
 
-def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, cluster_list,
-                non_cluster_leaf):
+def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, plan):
     """
     Method to run fabric-comm command.
     :param module: The Ansible module to fetch input parameters.
     :param bgp_nic_ip: Bgp_nic_ip for the fabric-comm.
     :param neighbor_ip: Neighbor_ip for the fabric-comm.
     :param remote_switch: Remote switch for the fabric-comm.
-    :param cluster_list: Pair of leaf clusters.
-    :param non_cluster_leaf: List of non_cluster leaf.
+    :param plan: NumberingPlan of the fabric.
     :return: The output of all cli commands.
     """
     output = ''
     global CHANGED_FLAG
     vrouter_name = module.params['pn_current_switch'] + '-vrouter'    
-    bgp_spine = module.params['pn_bgp_as_range']
     spine_list = module.params['pn_spine_list']
     leaf_list = module.params['pn_leaf_list']
     current_switch = module.params['pn_current_switch']
     bgp_redistribute = module.params['pn_bgp_redistribute']
     bgp_max_path = module.params['pn_bgp_max_path']
-    length_non_cluster_leaf = len(non_cluster_leaf)
+    bgp_as = plan.bgp_as(current_switch)
+    remote_as = plan.bgp_as(remote_switch)
 
     cli = pn_cli(module)
     clicopy = cli
@@ -405,22 +405,6 @@ def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, cluster_list,
 
         # remote-as for leaf is always spine1 and for spine is always leaf1
         if current_switch in spine_list:
-            bgp_as = bgp_spine
-            if remote_switch in non_cluster_leaf:
-                remote_as = int(bgp_spine) + 1 + non_cluster_leaf.index(
-                    remote_switch)
-            else:
-                cluster_count = 0
-                stop_flag = 0
-                while cluster_count < len(cluster_list) and stop_flag == 0:
-                    if remote_switch in cluster_list[cluster_count]:
-                        remote_as = int(
-                            length_non_cluster_leaf) + 1 + cluster_count + int(
-                            bgp_spine)
-                        stop_flag += 1
-                    cluster_count += 1
-            remote_as = str(remote_as)
-
             cli = clicopy
             cli += 'port-show hostname %s format port, no-show-headers' % (
                                                                       leaf_list[0])
@@ -439,23 +423,6 @@ def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, cluster_list,
             fabric_network_addr = static_part + str(0) + '/' + netmask
 
         else:
-
-            if current_switch in non_cluster_leaf:
-                bgp_as = int(bgp_spine) + 1 + non_cluster_leaf.index(
-                    current_switch)
-            else:
-                cluster_count = 0
-                stop_flag = 0
-                while cluster_count < len(cluster_list) and stop_flag == 0:
-                    if current_switch in cluster_list[cluster_count]:
-                        bgp_as = int(
-                            length_non_cluster_leaf) + 1 + cluster_count + int(
-                            bgp_spine)
-                        stop_flag += 1
-                    cluster_count += 1
-            remote_as = bgp_spine
-            bgp_as = str(bgp_as)
-
             cli = clicopy
             cli += 'port-show hostname %s format port, no-show-headers' % spine_list[0]
             ports = run_cli(module, cli).split()
@@ -493,26 +460,23 @@ def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, cluster_list,
     return output
 
 
-def add_interface_neighbor(module, interface_ip, neighbor_ip, remote_switch, cluster_list, non_cluster_leaf):
+def add_interface_neighbor(module, interface_ip, neighbor_ip, remote_switch,
+                           plan):
     """
     Method to create interfaces and add ebgp neighbors.
     :param module: The Ansible module to fetch input parameters.
     :param interface_ip: Interface ip to create a vrouter interface.
     :param neighbor_ip: Neighbor_ip for the bgp neighbor.
     :param remote_switch: Remote switch.
-    :param cluster_list: Pair of leaf clusters.
-    :param non_cluster_leaf: List of non_cluster leaf.
+    :param plan: NumberingPlan of the fabric.
     :return: The output of all cli commands.
     """
     output = ''
-    length_non_cluster_leaf = len(non_cluster_leaf)
     global CHANGED_FLAG
     cli = pn_cli(module)
     clicopy = cli
 
-    leaf_list = module.params['pn_leaf_list']
     current_switch = module.params['pn_current_switch']
-    bgp_spine = module.params['pn_bgp_as_range']
 
     cli = clicopy
     cli += 'vrouter-show location %s format name no-show-headers' % current_switch
@@ -553,24 +517,8 @@ def add_interface_neighbor(module, interface_ip, neighbor_ip, remote_switch, clu
                 current_switch, interface_ip, vrouter_name[0]
             )
     
-        if current_switch in leaf_list:
-            remote_as = bgp_spine
-        else:
-            if remote_switch in non_cluster_leaf:
-                remote_as = int(bgp_spine) + 1 + non_cluster_leaf.index(remote_switch)
-            else:
-                cluster_count = 0
-                stop_flag = 0
-                while cluster_count < len(cluster_list) and stop_flag == 0:
-                    if remote_switch in cluster_list[cluster_count]:
-                        remote_as = int(length_non_cluster_leaf) + 1 + cluster_count + int(bgp_spine)
-                        stop_flag += 1
-                    cluster_count += 1
-            remote_as = str(remote_as)
-            f = open('output.txt', 'a')
-            f.write('%s %s \n' % (remote_switch, remote_as))
-            f.close()
-    
+        remote_as = plan.bgp_as(remote_switch)
+
         cli = clicopy
         cli += ' vrouter-bgp-show remote-as ' + remote_as
         cli += ' neighbor %s format switch no-show-headers ' % neighbor_ip
@@ -612,7 +560,8 @@ def configure_fabric_over_l3(module):
     current_switch = module.params['pn_current_switch']
     fabric_name = module.params['pn_fabric_name']
 
-    output += assign_inband_ip(module, inband_ip)
+    plan = get_fabric_numbering(module)
+    output += assign_inband_ip(module, plan)
 
     address = bgp_ip.split('.')
     static_part = str(address[0]) + '.' + str(address[1]) + '.'
@@ -624,22 +573,8 @@ def configure_fabric_over_l3(module):
     inband_static_part += str(address[2]) + '.'
     switch_ip = inband_static_part + str(1)
 
-    dict_leaf_info = find_leaf_cluster(module)
-    cluster_leaf = dict_leaf_info[1]
-    cluster_list = dict_leaf_info[0]
-    cluster_list = sorted(cluster_list)
-    non_cluster_leaf = list(sorted(set(leaf_list) - set(cluster_leaf)))
-
-    f = open('output.txt', 'a')
-    f.write('%s\n ' % cluster_list)
-    f.write('%s\n' % non_cluster_leaf)
-    f.close()
-
     if current_switch in spine_list:
         for leaf in leaf_list:
-            f = open('output.txt', 'a')
-            f.write('%s \n' % (leaf))
-            f.close()
             spine_pos = spine_list.index(current_switch)
             if leaf_list.index(leaf) == 0:
 
@@ -660,7 +595,7 @@ def configure_fabric_over_l3(module):
                 neighbor_ip_count = bgp_nic_ip_count + 1
                 bgp_nic_ip = static_part + str(bgp_nic_ip_count) + '/' + str(30)
                 neighbor_ip = static_part + str(neighbor_ip_count)
-                output += fabric_comm(module, bgp_nic_ip, neighbor_ip, leaf, cluster_list, non_cluster_leaf)
+                output += fabric_comm(module, bgp_nic_ip, neighbor_ip, leaf, plan)
 
                 if spine_pos == 0:
                     output += fabric_inband_net_create(module, inband_static_part)
@@ -679,8 +614,7 @@ def configure_fabric_over_l3(module):
                 interface_ip = static_part + str(interface_ip_count) + '/' + str(30)
                 neighbor_ip = static_part + str(neighbor_ip_count)
                 output += add_interface_neighbor(module, interface_ip, neighbor_ip,
-                                                 leaf, cluster_list,
-                                                 non_cluster_leaf)
+                                                 leaf, plan)
 
     elif current_switch in leaf_list:
         for spine in spine_list:
@@ -692,7 +626,7 @@ def configure_fabric_over_l3(module):
                 bgp_nic_ip = static_part + str(bgp_nic_ip_count) + '/' + str(30)
                 neighbor_ip = static_part + str(neighbor_ip_count)
                 output += fabric_comm(module, bgp_nic_ip, neighbor_ip, spine,
-                                      cluster_list, non_cluster_leaf)
+                                      plan)
 
                 if 'already in a fabric' in join_fabric(module, switch_ip):
                     output += '%s: Already a part of fabric \n' % (current_switch)
@@ -708,7 +642,7 @@ def configure_fabric_over_l3(module):
                 interface_ip = static_part + str(interface_ip_count) + '/' + str(30)
                 neighbor_ip = static_part + str(neighbor_ip_count)
                 output += add_interface_neighbor(module, interface_ip, neighbor_ip,
-                                                 spine, cluster_list, non_cluster_leaf)
+                                                 spine, plan)
 
     return output
 
@@ -785,6 +719,7 @@ def main():
             pn_bgp_max_path=dict(required=False, type='str', default='16'),
             pn_csv_data=dict(required=True, type='str'),
             pn_toggle_40g=dict(required=False, type='bool', default=True),
+            pn_numbering_plan=dict(required=False, type='str'),
         )
     )
 
@@ -0,0 +1,228 @@
+#!/usr/bin/python
+""" PN Fabric Verify """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_rest import (BACKENDS, DEFAULT_REST_URL,
+                                          make_executor)
+from ansible.module_utils.pn_verify import (CHECK_NAMES, Expectation,
+                                            format_results, run_checks,
+                                            take_snapshot)
+from ansible.module_utils.pn_vlan_set import VlanSet
+
+DOCUMENTATION = """
+---
+module: pn_fabric_verify
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Module to verify the configuration of the whole fabric.
+description:
+    Reads a snapshot of the fabric, one show per kind of fabric-wide object
+    and the lldp links and vlans of every node read concurrently, and checks
+    invariants of the configuration on it in memory. Every failed check
+    lists exactly what is wrong, like the spine-leaf links without a vrouter
+    interface at one end or the BGP neighbors without a neighbor back.
+    Replaces the count checks of the pn_test_* modules.
+options:
+    pn_cliusername:
+      description:
+        - Provide login username if user is not root.
+      required: False
+      type: str
+    pn_clipassword:
+      description:
+        - Provide login password if user is not root.
+      required: False
+      type: str
+    pn_spine_list:
+      description:
+        - Specify list of Spine hosts.
+      required: False
+      type: list
+    pn_leaf_list:
+      description:
+        - Specify list of leaf hosts.
+      required: False
+      type: list
+    pn_vrouter_switches:
+      description:
+        - List of switches expected to have a vrouter. Default is the spines
+          and leaves, give only the spines for layer 2 designs.
+      required: False
+      type: list
+    pn_vlans:
+      description:
+        - Vlans expected on every spine and leaf, like '100-110,200'.
+      required: False
+      type: str
+    pn_checks:
+      description:
+        - Names of the checks to run. Default is all of them.
+      required: False
+      type: list
+      choices: ['nodes', 'clusters', 'vrouters', 'link_interfaces',
+                'interface_ips', 'loopbacks', 'bgp_neighbors', 'vrrp',
+                'vlans']
+    pn_fail_on_violation:
+      description:
+        - Flag to fail the task when a check fails.
+      required: False
+      type: bool
+      default: True
+    pn_max_workers:
+      description:
+        - Maximum number of show commands run at the same time.
+      required: False
+      type: int
+      default: 10
+    pn_backend:
+      description:
+        - How the shows are run. cli forks the cli for every show, rest sends
+          them to the web API of the switch over keep-alive connections.
+      required: False
+      type: str
+      choices: ['cli', 'rest']
+      default: 'cli'
+    pn_rest_url:
+      description:
+        - Base url of the web API of the switch, used by the rest backend.
+      required: False
+      type: str
+      default: 'https://127.0.0.1'
+"""
+
+EXAMPLES = """
+- name: Verify the layer 3 fabric
+  pn_fabric_verify:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_checks: ['nodes', 'vrouters', 'link_interfaces', 'interface_ips',
+                'loopbacks', 'bgp_neighbors', 'vrrp']
+
+- name: Verify the layer 2 fabric
+  pn_fabric_verify:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_vrouter_switches: "{{ groups['spine'] }}"
+    pn_vlans: '101-110'
+    pn_checks: ['nodes', 'clusters', 'vrouters', 'interface_ips', 'vrrp',
+                'vlans']
+"""
+
+RETURN = """
+stdout:
+  description: One line per check, followed by its violations.
+  returned: always
+  type: str
+checks:
+  description: List of check, description, passed and violations of every
+    check run.
+  returned: on success
+  type: list
+snapshot_time:
+  description: Seconds spent reading the snapshot of the fabric.
+  returned: on success
+  type: float
+changed:
+  description: Indicates whether the module caused changes on the target.
+  returned: always(False)
+  type: bool
+failed:
+  description: Indicates whether a check failed, with pn_fail_on_violation.
+  returned: always
+  type: bool
+cli_metrics:
+  description: Number of cli calls made and time spent in them.
+  returned: always
+  type: dict
+"""
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_cliusername=dict(required=False, type='str'),
+            pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_spine_list=dict(required=False, type='list', default=[]),
+            pn_leaf_list=dict(required=False, type='list', default=[]),
+            pn_vrouter_switches=dict(required=False, type='list'),
+            pn_vlans=dict(required=False, type='str'),
+            pn_checks=dict(required=False, type='list',
+                           choices=CHECK_NAMES),
+            pn_fail_on_violation=dict(required=False, type='bool',
+                                      default=True),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS),
+            pn_backend=dict(required=False, type='str',
+                            choices=list(BACKENDS), default='cli'),
+            pn_rest_url=dict(required=False, type='str',
+                             default=DEFAULT_REST_URL),
+        )
+    )
+
+    try:
+        vlans = VlanSet.parse(module.params['pn_vlans']) \
+            if module.params['pn_vlans'] else None
+    except ValueError as error:
+        module.fail_json(msg='Invalid pn_vlans: %s' % error, changed=False)
+
+    expected = Expectation(module.params['pn_spine_list'],
+                           module.params['pn_leaf_list'],
+                           module.params['pn_vrouter_switches'], vlans)
+    executor = make_executor(module, module.params['pn_max_workers'])
+
+    start = time.time()
+    snapshot, failed = take_snapshot(executor)
+    if failed is not None:
+        module.fail_json(
+            msg='Could not read the fabric snapshot: %s failed' %
+                failed.command,
+            stderr=failed.err.strip(),
+            changed=False,
+            cli_metrics=executor.metrics
+        )
+    snapshot_time = round(time.time() - start, 2)
+
+    checks = run_checks(snapshot, expected, module.params['pn_checks'])
+    failed_checks = [check['check'] for check in checks
+                     if not check['passed']]
+    if failed_checks:
+        msg = 'Fabric verification failed: %s' % ', '.join(failed_checks)
+    else:
+        msg = 'Fabric verification passed: %d checks' % len(checks)
+
+    module.exit_json(
+        msg=msg,
+        stdout=format_results(checks),
+        checks=checks,
+        snapshot_time=snapshot_time,
+        changed=False,
+        failed=bool(failed_checks) and module.params['pn_fail_on_violation'],
+        cli_metrics=executor.metrics
+    )
+
+if __name__ == '__main__':
+    main()
@@ -18,10 +18,8 @@
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import re
-import socket
-
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_preflight import parse_hosts_file
 
 DOCUMENTATION = """
 ---
@@ -85,105 +83,8 @@ def main():
         )
     )
 
-    output = ''
-    line_count = 0
-    switch_names = []
-    host_ips = []
-    connection_str = "ansible_user=\"{{ SSH_USER }}\" "
-    connection_str += "ansible_ssh_pass=\"{{ SSH_PASS }}\""
-    hosts_file_data = module.params['pn_hosts_file_data']
-
-    if hosts_file_data:
-        hosts_file_data_temp = hosts_file_data.split('\n')
-        hosts_file_data = []
-        # To remove whitespace characters at the start and end of line
-        for row in hosts_file_data_temp:
-            hosts_file_data.append(row.strip())
-
-        # [spine] and [leaf] group validation
-        if '[spine]' not in hosts_file_data and '[third_party_spine]' not in hosts_file_data:
-            output += '[spine]/[third_party_spine] section is missing from the hosts file\n'
-
-        if '[leaf]' not in hosts_file_data:
-            output += '[leaf] section is missing from the hosts file\n'
-
-        if not output:
-            for row in hosts_file_data:
-                line_count += 1
-                row_copy = row
-                if not row_copy.strip() or row.startswith('#'):
-                    # Skip blank lines and comments which starts with '#'
-                    continue
-                else:
-                    try:
-                        elements = row.split(" ", 2)
-                        if len(elements) == 1:
-                            if '[spine]' in elements:
-                                pass
-                            elif '[leaf]' in elements:
-                                pass
-                            elif '[third_party_spine]' in elements:
-                                pass
-                            else:
-                                raise IndexError
-
-                        elif len(elements) == 3:
-                            switch = elements[0]
-                            ip = elements[1]
-
-                            # Switch name validation
-                            if switch not in switch_names:
-                                switch_names.append(switch)
-                                if (re.match("^[a-zA-Z0-9_.:-]+$", switch) is
-                                        None):
-                                    output += 'Invalid switch name {} '.format(
-                                        switch)
-                                    output += 'at line number {}\n'.format(
-                                        line_count)
-                            else:
-                                output += 'Duplicate switch name {} '.format(
-                                    switch)
-                                output += 'at line number {}\n'.format(
-                                    line_count)
-
-                            # Host ip validation
-                            ip_host = ip.split('=')
-                            host = ip_host[0]
-                            ip = ip_host[1]
-
-                            if host != 'ansible_host':
-                                raise IndexError
-
-                            if ip not in host_ips:
-                                host_ips.append(ip)
-                                try:
-                                    dot_count = ip.count('.')
-                                    if dot_count != 3:
-                                        raise socket.error
-
-                                    socket.inet_aton(ip)
-                                except socket.error:
-                                    output += 'Invalid host ip {} '.format(ip)
-                                    output += 'at line number {}\n'.format(
-                                        line_count
-                                    )
-                            else:
-                                output += 'Duplicate host ip {} '.format(ip)
-                                output += 'at line number {}\n'.format(
-                                    line_count)
-
-                            # Ansible connection variable validation
-                            if elements[2] != connection_str:
-                                raise IndexError
-                        else:
-                            raise IndexError
-
-                    except IndexError:
-                        output += 'Invalid entry at line number {}\n'.format(
-                            line_count
-                        )
-    else:
-        output += 'Hosts file should not be empty\n'
+    inventory = parse_hosts_file(module.params['pn_hosts_file_data'])
+    output = ''.join(error + '\n' for error in inventory.errors)
 
     if not output:
         msg = 'Valid hosts file'
@@ -204,4 +105,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
@@ -106,6 +106,8 @@ msg:
 """
 
 CHANGED_FLAG = []
+# Switch: dictionary of peer hostname: list of connected ports.
+PORT_HOSTNAMES = {}
 
 
 def pn_cli(module):
@@ -185,16 +187,25 @@ def create_cluster(module, name, node1, node2):
 
 def get_ports(module, switch, peer_switch):
     """
-    Method to figure out connected ports between two switches.
+    Method to figure out connected ports between two switches. The ports of
+    a switch are looked up once, with a single port-show.
     :param module: The Ansible module to fetch input parameters.
     :param switch: Name of the local switch.
     :param peer_switch: Name of the connected peer switch.
     :return: List of connected ports.
     """
-    cli = pn_cli(module)
-    cli += ' switch %s port-show hostname %s' % (switch, peer_switch)
-    cli += ' format port no-show-headers '
-    return run_cli(module, cli).split()
+    if switch not in PORT_HOSTNAMES:
+        cli = pn_cli(module)
+        cli += ' switch %s port-show format port,hostname' % switch
+        cli += ' no-show-headers '
+        peers = {}
+        for line in run_cli(module, cli).splitlines():
+            fields = line.split()
+            if len(fields) == 2:
+                peers.setdefault(fields[1], []).append(fields[0])
+        PORT_HOSTNAMES[switch] = peers
+
+    return list(PORT_HOSTNAMES[switch].get(peer_switch, []))
 
 
 def create_trunk(module, switch, name, ports):
@@ -21,6 +21,10 @@
 import shlex
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import (DEADLINE_EXCEEDED,
+                                              new_metrics, run_command)
+from ansible.module_utils.pn_numbering import get_numbering_plan
+from ansible.module_utils.pn_progress import Progress
 
 DOCUMENTATION = """
 ---
@@ -104,6 +108,42 @@ options:
       required: False
       default: False
       type: bool
+    pn_numbering_plan:
+      description:
+        - Specify path of the numbering plan file. Loopback ips are loaded
+          from it and new switches are added to it, so numbering stays
+          stable when switches are added.
+      required: False
+      type: str
+    pn_command_timeout:
+      description:
+        - Number of seconds a cli command may run before it is killed. Show
+          commands are retried, a killed write is not since it may have been
+          applied.
+      required: False
+      type: int
+      default: 120
+    pn_deadline:
+      description:
+        - Number of seconds the module may run cli commands for. Commands
+          are not run past the deadline and the module reports the commands
+          run so far.
+      required: False
+      type: int
+    pn_status_file:
+      description:
+        - Path of a file the module writes its progress to (phase, switches
+          done, cli calls, elapsed time) while it runs, for playbooks
+          running it with async and poll 0. pn_progress reads the file.
+      required: False
+      type: str
+    pn_run_id:
+      description:
+        - Identifier of the run, written to the status file. Give the same
+          pn_run_id to pn_progress so that it ignores a status file left by
+          a previous run.
+      required: False
+      type: str
 """
 
 EXAMPLES = """
@@ -114,6 +154,10 @@ EXAMPLES = """
     pn_net_address: '192.168.0.1'
     pn_cidr: '24'
     pn_supernet: '30'
+    pn_status_file: /tmp/pn_l3_ztp.status
+    pn_run_id: "{{ l3_ztp_run_id }}"
+  async: 3600
+  poll: 0
 """
 
 RETURN = """
@@ -145,9 +189,16 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+cli_metrics:
+  description: Number of cli commands executed and total time spent in them,
+    with the number of retries of transient errors and time waited for them.
+  returned: always
+  type: dict
 """
 
 CHANGED_FLAG = []
+CLI_METRICS = new_metrics()
+PROGRESS = Progress()
 
 
 def pn_cli(module):
@@ -176,11 +227,29 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli, CLI_METRICS)
+    PROGRESS.command(cli)
     results = []
     if out:
         return out
 
+    if err == DEADLINE_EXCEEDED:
+        # Report what was configured before the deadline.
+        module.exit_json(
+            cli_metrics=CLI_METRICS,
+            unreachable=False,
+            failed=True,
+            exception=err,
+            summary=[{
+                'switch': '',
+                'output': 'Deadline exceeded after %d cli commands' %
+                          CLI_METRICS['calls']
+            }],
+            task='Configure L3 ZTP',
+            msg='L3 ZTP configuration stopped at the deadline',
+            changed=True if True in CHANGED_FLAG else False
+        )
+
     if err:
         json_msg = {
             'switch': '',
@@ -188,6 +257,7 @@ def run_cli(module, cli):
         }
         results.append(json_msg)
         module.exit_json(
+            cli_metrics=CLI_METRICS,
             unreachable=False,
             failed=True,
             exception=err.strip(),
@@ -456,31 +526,31 @@ def assign_loopback_ip(module, loopback_address):
     """
     Method to add loopback interface to vrouters.
     :param module: The Ansible module to fetch input parameters.
-    :param loopback_address: The loopback ip to be assigned.
+    :param loopback_address: The loopback ip network to assign ips from.
     :return: String describing if loopback ips got assigned or not.
     """
     global CHANGED_FLAG
     output = ''
-    address = loopback_address.split('.')
-    static_part = str(address[0]) + '.' + str(address[1]) + '.'
-    static_part += str(address[2]) + '.'
+    switch_list = module.params['pn_spine_list'] + module.params['pn_leaf_list']
+    plan = get_numbering_plan(module, module.params['pn_spine_list'],
+                              module.params['pn_leaf_list'],
+                              loopback_ip=loopback_address)
 
     cli = pn_cli(module)
     clicopy = cli
-    switch_list = module.params['pn_spine_list']
-    switch_list += module.params['pn_leaf_list']
+    # The cli prefixes every row with the vrouter name.
+    cli += ' vrouter-loopback-interface-show format ip no-show-headers '
+    existing_loopbacks = set()
+    for line in run_cli(module, cli).splitlines():
+        fields = line.split()
+        if len(fields) >= 2:
+            existing_loopbacks.add((fields[0], fields[-1].split('/')[0]))
 
-    vrouter_count = 1
     for switch in switch_list:
         vrouter = switch + '-vrouter'
-        ip = static_part + str(vrouter_count)
+        ip = plan.loopback_ip(switch)
 
-        cli = clicopy
-        cli += ' vrouter-loopback-interface-show ip ' + ip
-        cli += ' format switch no-show-headers '
-        existing_vrouter = run_cli(module, cli).split()
-
-        if vrouter not in existing_vrouter:
+        if (vrouter, ip) not in existing_loopbacks:
             cli = clicopy
             cli += ' vrouter-loopback-interface-add vrouter-name '
             cli += vrouter
@@ -489,7 +559,6 @@ def assign_loopback_ip(module, loopback_address):
             CHANGED_FLAG.append(True)
 
         output += ' %s: Added loopback ip %s to %s \n' % (switch, ip, vrouter)
-        vrouter_count += 1
 
     return output
 
@@ -512,6 +581,7 @@ def auto_configure_link_ips(module):
     switch_names = list(set(switch_names))
 
     # Disable auto trunk on all switches.
+    PROGRESS.phase('Disable auto trunk')
     for switch in switch_names:
         modify_auto_trunk_setting(module, switch, 'disable')
 
@@ -527,9 +597,11 @@ def auto_configure_link_ips(module):
     vnet_name = str(fabric_name) + '-global'
 
     # Create vrouter on all switches.
+    PROGRESS.phase('Create vrouters')
     for switch in switch_names:
         output += create_vrouter(module, switch, vnet_name)
 
+    PROGRESS.phase('Assign link ips')
     for spine in spine_list:
         for leaf in leaf_list:
             cli = clicopy
@@ -570,8 +642,10 @@ def auto_configure_link_ips(module):
                     ip_count += 1
 
     # Assign loopback ip to vrouters.
+    PROGRESS.phase('Assign loopback ips')
     output += assign_loopback_ip(module, module.params['pn_loopback_ip'])
 
+    PROGRESS.phase('Enable auto trunk')
     for switch in switch_names:
         # Enable auto trunk.
         modify_auto_trunk_setting(module, switch, 'enable')
@@ -598,20 +672,34 @@ def main():
             pn_bfd_min_rx=dict(required=False, type='str'),
             pn_bfd_multiplier=dict(required=False, type='str'),
             pn_stp=dict(required=False, type='bool', default=False),
+            pn_numbering_plan=dict(required=False, type='str'),
+            pn_command_timeout=dict(required=False, type='int', default=120),
+            pn_deadline=dict(required=False, type='int'),
+            pn_status_file=dict(required=False, type='str'),
+            pn_run_id=dict(required=False, type='str'),
         )
     )
 
-    global CHANGED_FLAG
+    global CHANGED_FLAG, PROGRESS
+    PROGRESS = Progress(module.params['pn_status_file'], 'Configure L3 ZTP',
+                        len(module.params['pn_spine_list'] +
+                            module.params['pn_leaf_list']),
+                        5 + len([flag for flag in (
+                            module.params['pn_update_fabric_to_inband'],
+                            module.params['pn_stp']) if flag]),
+                        module.params['pn_run_id']).attach(module)
 
     # L3 setup (link ips)
     message = auto_configure_link_ips(module)
 
     # Update fabric network to in-band if flag is True
     if module.params['pn_update_fabric_to_inband']:
+        PROGRESS.phase('Update fabric network to in-band')
         message += update_fabric_network_to_inband(module)
 
     # Enable STP if flag is True
     if module.params['pn_stp']:
+        PROGRESS.phase('Enable STP')
         message += modify_stp(module, 'enable')
 
     message_string = message
@@ -630,6 +718,7 @@ def main():
 
     # Exit the module and return the required JSON.
     module.exit_json(
+        cli_metrics=CLI_METRICS,
         unreachable=False,
         msg='L3 ZTP configuration succeeded',
         summary=results,
@@ -19,6 +19,8 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_numbering import (get_numbering_plan,
+                                               int_to_ip, ip_to_int)
 import shlex
 
 DOCUMENTATION = """
@@ -42,7 +44,10 @@ options:
       type: str
     pn_net_address:
       description:
-        - Specify network address to be used in configuring link IPs for layer3.
+        - Specify network address of the link IPs of the existing fabric.
+          With pn_use_old_ip_range_flag, new links are numbered after the
+          last link ip of this network (of size pn_cidr). Defaults to the
+          network of the first link ip of the existing spines.
       required: False
       type: str
     pn_cidr:
@@ -109,6 +114,12 @@ options:
       required: False
       default: False
       type: bool
+    pn_numbering_plan:
+      description:
+        - Specify path of the numbering plan file. Loopback ips of the new
+          switches are numbered after the existing switches of the plan.
+      required: False
+      type: str
 """
 
 EXAMPLES = """
@@ -443,32 +454,34 @@ def delete_trunk(module, switch, switch_port, peer_switch):
             return ' %s: Deleted %s trunk successfully \n' % (switch, trunk[0])
 
 
-def assign_loopback_ip(module, loopback_address, old_switches_count, switch_list):
+def assign_loopback_ip(module, loopback_address, switch_list):
     """
     Method to add loopback interface to vrouters.
     :param module: The Ansible module to fetch input parameters.
-    :param loopback_address: The loopback ip to be assigned.
+    :param loopback_address: The loopback ip network to assign ips from.
+    :param switch_list: List of new switches.
     :return: String describing if loopback ips got assigned or not.
     """
     global CHANGED_FLAG
     output = ''
+    plan = get_numbering_plan(module, module.params['pn_spine_list'],
+                              module.params['pn_leaf_list'],
+                              new_spine_list=module.params['pn_new_spine_list'],
+                              new_leaf_list=module.params['pn_new_leaf_list'],
+                              loopback_ip=loopback_address)
+
     cli = pn_cli(module)
     clicopy = cli
-    address = loopback_address.split('.')
-    static_part = str(address[0]) + '.' + str(address[1]) + '.'
-    static_part += str(address[2]) + '.'
+    cli += ' vrouter-loopback-interface-show format switch,ip no-show-headers '
+    existing_loopbacks = set()
+    for line in run_cli(module, cli).splitlines():
+        existing_loopbacks.add(tuple(line.split()[:2]))
 
-    vrouter_count = int(old_switches_count) + 1
     for switch in switch_list:
-        vrouter = switch + '-vrouter' 
-        ip = static_part + str(vrouter_count)
-        
-        cli = clicopy
-        cli += ' vrouter-loopback-interface-show ip ' + ip
-        cli += ' format switch no-show-headers '
-        existing_vrouter = run_cli(module, cli).split()
+        vrouter = switch + '-vrouter'
+        ip = plan.loopback_ip(switch)
 
-        if vrouter not in existing_vrouter:
+        if (vrouter, ip) not in existing_loopbacks:
             cli = clicopy
             cli += ' vrouter-loopback-interface-add vrouter-name '
             cli += vrouter
@@ -483,75 +496,124 @@ def assign_loopback_ip(module, loopback_address, old_switches_count, switch_list
                 switch, ip, vrouter
             )
 
-        vrouter_count += 1
-
     return output
 
 
+def find_new_links(module):
+    """
+    Method to find the spine-leaf links which have at least one new switch
+    at either end. Only the ports of the new switches are looked up, with one
+    port-show per new switch.
+    :param module: The Ansible module to fetch input parameters.
+    :return: List of (leaf, leaf port, spine, spine port) tuples.
+    """
+    spines = set(module.params['pn_spine_list'] +
+                 module.params['pn_new_spine_list'])
+    leafs = set(module.params['pn_leaf_list'] +
+                module.params['pn_new_leaf_list'])
+    links = []
+    seen = set()
+
+    for switch in (module.params['pn_new_leaf_list'] +
+                   module.params['pn_new_spine_list']):
+        cli = pn_cli(module)
+        cli += ' switch %s port-show format port,hostname,rport ' % switch
+        cli += ' no-show-headers '
+        for line in run_cli(module, cli).splitlines():
+            fields = line.split()
+            if len(fields) != 3:
+                continue
+
+            port, hostname, rport = fields
+            if switch in leafs and hostname in spines:
+                link = (switch, port, hostname, rport)
+            elif switch in spines and hostname in leafs:
+                link = (hostname, rport, switch, port)
+            else:
+                continue
+
+            if link not in seen:
+                seen.add(link)
+                links.append(link)
+
+    return links
+
+
+def find_next_link_address(module, supernet):
+    """
+    Method to find the address following the link ips already assigned to
+    the existing spines, with one vrouter-interface-show. Only the link ips
+    of the pn_net_address/pn_cidr network are considered, so that other
+    interfaces of the spines do not move the links to their network.
+    :param module: The Ansible module to fetch input parameters.
+    :param supernet: Supernet mask of the link ips.
+    :return: Network address of the first unused link, or None if the
+    existing spines have no link ips in the network.
+    """
+    spine_vrouters = set(spine + '-vrouter'
+                         for spine in module.params['pn_spine_list'])
+    cli = pn_cli(module)
+    cli += ' vrouter-interface-show format l3-port,ip no-show-headers '
+    addresses = []
+    for line in run_cli(module, cli).splitlines():
+        fields = line.split()
+        if len(fields) == 3 and fields[0] in spine_vrouters:
+            addresses.append(ip_to_int(fields[2]))
+
+    if not addresses:
+        return None
+
+    # Without pn_net_address, the links are taken to be numbered from the
+    # start of the network holding the lowest link ip.
+    range_bits = 32 - int(module.params['pn_cidr'])
+    network = module.params['pn_net_address']
+    network = ip_to_int(network) if network else min(addresses)
+    in_range = [address for address in addresses
+                if address >> range_bits == network >> range_bits]
+    if not in_range:
+        return None
+    last_address = max(in_range)
+
+    host_bits = 32 - int(supernet)
+    return int_to_ip(((last_address >> host_bits) + 1) << host_bits)
+
+
 def auto_configure_link_ips(module):
     """
-    Method to auto configure link IPs for layer3 fabric.
+    Method to auto configure link IPs for layer3 fabric. Only the new
+    switches and the switches directly attached to them are configured.
     :param module: The Ansible module to fetch input parameters.
     :return: String describing output of configuration.
     """
-    spine_list = module.params['pn_spine_list']
-    leaf_list = module.params['pn_leaf_list']
     new_spine_list = module.params['pn_new_spine_list']
-    new_leaf_list = module.params['pn_new_leaf_list']    
+    new_leaf_list = module.params['pn_new_leaf_list']
     fabric_loopback = module.params['pn_assign_loopback']
     supernet = module.params['pn_supernet']
     output = ''
     cli = pn_cli(module)
     clicopy = cli
 
-    switch_list = []
     switch_list = new_spine_list + new_leaf_list
+    links = find_new_links(module)
 
-    total_leaf_list = []
-    total_leaf_list = new_leaf_list + leaf_list
+    # New switches and their peers, in a stable order.
+    touched_switches = list(switch_list)
+    for leaf, lport, spine, sport in links:
+        for switch in (leaf, spine):
+            if switch not in touched_switches:
+                touched_switches.append(switch)
 
-    cli = pn_cli(module)
-    clicopy = cli
-    cli += ' fabric-node-show format name no-show-headers '
-    switch_names = run_cli(module, cli).split()
-    switch_names = list(set(switch_names))
-
-    # Disable auto trunk on all switches.
-    for switch in switch_names:
+    # Disable auto trunk on the switches being configured.
+    for switch in touched_switches:
         modify_auto_trunk_setting(module, switch, 'disable')
 
     net_address = module.params['pn_new_net_address']
 
     # Get the list of available link ips to assign.
     if module.params['pn_use_old_ip_range_flag']:
-        count_ports = 0
-        run_once_flag = 0
-        for spine in spine_list:
-            for leaf in leaf_list:
-                cli = clicopy
-                cli += ' switch %s port-show hostname %s ' % (spine, leaf)
-                cli += ' format port no-show-headers'
-                port_list = run_cli(module, cli).split()
-                port_list = list(set(port_list))
-    
-                if 'Success' not in port_list and len(port_list) > 0:
-                    count_ports += int(len(port_list))
- 
-                    if run_once_flag == 0:
-                        vrouter = spine + '-vrouter'
-                        cli = clicopy
-                        cli += ' vrouter-interface-show vrouter-name %s ' % vrouter
-                        cli += ' l3-port %s format ip no-show-headers' % port_list[0]
-                        ip_address = run_cli(module, cli).split()
-                        ip_address = list(set(ip_address))
-                        ip_address.remove(vrouter)
-                        run_once_flag = 1
-
-        supernet_length = 1 << (32 - int(supernet))
-        ip_range_start = count_ports * supernet_length
-        ip_address = ip_address[0].split('.')
-        net_address = ip_address[0] + '.' + ip_address[1] + '.'
-        net_address += ip_address[2] + '.' + str(ip_range_start)
+        next_address = find_next_link_address(module, supernet)
+        if next_address is not None:
+            net_address = next_address
 
     available_ips = calculate_link_ip_addresses(net_address,
                                                 module.params['pn_cidr'],
@@ -563,96 +625,32 @@ def auto_configure_link_ips(module):
     fabric_name = list(set(run_cli(module, cli).split()))[0]
     vnet_name = str(fabric_name) + '-global'
 
-    # Create vrouter on all switches.
+    # Create vrouter on all new switches.
     for switch in switch_list:
         output += create_vrouter(module, switch, vnet_name)
 
-    if len(new_leaf_list) > 0:
-        for spine in spine_list:
-            for leaf in new_leaf_list:
-                cli = clicopy
-                cli += ' switch %s port-show hostname %s ' % (leaf, spine)
-                cli += ' format port no-show-headers '
-                leaf_port = run_cli(module, cli).split()
-                leaf_port = list(set(leaf_port))
-    
-                if 'Success' in leaf_port:
-                    continue
-    
-                while len(leaf_port) > 0:
-                    lport = leaf_port[0]
-                    ip = available_ips[0]
-                    delete_trunk(module, leaf, lport, spine)
-                    output += create_interface(module, leaf, ip, lport)
-    
-                    leaf_port.remove(lport)
-                    available_ips.remove(ip)
-                    ip = available_ips[0]
-    
-                    cli = clicopy
-                    cli += ' switch %s port-show port %s ' % (leaf, lport)
-                    cli += ' format rport no-show-headers '
-                    rport = run_cli(module, cli).split()
-                    rport = list(set(rport))
-                    rport = rport[0]
-    
-                    delete_trunk(module, spine, rport, leaf)
-                    output += create_interface(module, spine, ip, rport)
-                    available_ips.remove(ip)
-    
-                    ip_count = 0
-                    diff = 32 - int(supernet)
-                    count = (1 << diff) - 4
-                    while ip_count < count:
-                        available_ips.pop(0)
-                        ip_count += 1
-
-    if len(new_spine_list) > 0:
-        for spine in new_spine_list:
-            for leaf in total_leaf_list:
-                cli = clicopy
-                cli += ' switch %s port-show hostname %s ' % (leaf, spine)
-                cli += ' format port no-show-headers '
-                leaf_port = run_cli(module, cli).split()
-                leaf_port = list(set(leaf_port))
-
-                if 'Success' in leaf_port:
-                    continue
-
-                while len(leaf_port) > 0:
-                    lport = leaf_port[0]
-                    ip = available_ips[0]
-                    delete_trunk(module, leaf, lport, spine)
-                    output += create_interface(module, leaf, ip, lport)
-
-                    leaf_port.remove(lport)
-                    available_ips.remove(ip)
-                    ip = available_ips[0]
-
-                    cli = clicopy
-                    cli += ' switch %s port-show port %s ' % (leaf, lport)
-                    cli += ' format rport no-show-headers '
-                    rport = run_cli(module, cli).split()
-                    rport = list(set(rport))
-                    rport = rport[0]
-
-                    delete_trunk(module, spine, rport, leaf)
-                    output += create_interface(module, spine, ip, rport)
-                    available_ips.remove(ip)
-
-                    ip_count = 0
-                    diff = 32 - int(supernet)
-                    count = (1 << diff) - 4
-                    while ip_count < count:
-                        available_ips.pop(0)
-                        ip_count += 1
+    for leaf, lport, spine, sport in links:
+        ip = available_ips.pop(0)
+        delete_trunk(module, leaf, lport, spine)
+        output += create_interface(module, leaf, ip, lport)
+
+        ip = available_ips.pop(0)
+        delete_trunk(module, spine, sport, leaf)
+        output += create_interface(module, spine, ip, sport)
+
+        ip_count = 0
+        diff = 32 - int(supernet)
+        count = (1 << diff) - 4
+        while ip_count < count:
+            available_ips.pop(0)
+            ip_count += 1
 
     if fabric_loopback:
         # Assign loopback ip to vrouters.
-        old_switches_count = str(int(len(leaf_list)) + int(len(spine_list)))
-        output += assign_loopback_ip(module, module.params['pn_loopback_ip'], old_switches_count, switch_list)
+        output += assign_loopback_ip(module, module.params['pn_loopback_ip'],
+                                     switch_list)
 
-    for switch in switch_names:
+    for switch in touched_switches:
         # Enable auto trunk.
         modify_auto_trunk_setting(module, switch, 'enable')
 
@@ -665,6 +663,7 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_net_address=dict(required=False, type='str'),
             pn_new_net_address=dict(required=False, type='str'),
             pn_cidr=dict(required=False, type='str'),
             pn_supernet=dict(required=False, type='str'),
@@ -682,6 +681,7 @@ def main():
             pn_new_spine_list=dict(required=False, type='list'),
             pn_new_leaf_list=dict(required=False, type='list'),
             pn_use_old_ip_range_flag=dict(required=False, type='bool', default=False),
+            pn_numbering_plan=dict(required=False, type='str'),
         )
     )
 
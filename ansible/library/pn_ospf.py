@@ -34,23 +34,40 @@ options:
     description:
       - The C(pn_command) takes the vrouter-ospf add/remove
         command as value.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     choices: ['vrouter-ospf-add', 'vrouter-ospf-remove']
     type: str
   pn_vrouter_name:
     description:
       - specify the name of the vRouter.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
   pn_network_ip:
     description:
       - Specify the network IP address.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
   pn_ospf_area:
     description:
     - Stub area number for the configuration. Required for vrouter-ospf-add.
     type: str
+  pn_items:
+    description:
+      - List of OSPF networks to configure in one task. Every item is a
+        dictionary of the parameters above, with or without the pn_ prefix,
+        overriding the top level ones. The existing OSPF networks are read once
+        and every item is reported in results.
+    required: False
+    type: list
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time with
+        pn_items.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -82,11 +99,18 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+results:
+  description: One result per item of pn_items with its msg, changed,
+    skipped and failed flags, command and stdout/stderr.
+  returned: with pn_items
+  type: list
 """
 
 
-VROUTER_EXISTS = None
-NETWORK_EXISTS = None
+REQUIRED = ['pn_command', 'pn_vrouter_name', 'pn_network_ip']
+REQUIRED_IF = [
+    ('pn_command', 'vrouter-ospf-add', ['pn_ospf_area'])
+]
 
 
 def pn_cli(module):
@@ -109,39 +133,61 @@ def pn_cli(module):
     return cli
 
 
-def check_cli(module, cli):
+def get_index(run):
     """
-    This method checks if vRouter exists on the target node.
-    This method also checks for idempotency using the vrouter-ospf-show command.
-    If the given vRouter exists, return VROUTER_EXISTS as True else False.
-    If an OSPF network with the given ip exists on the given vRouter,
-    return NETWORK_EXISTS as True else False.
-
-    :param module: The Ansible module to fetch input parameters
-    :param cli: The CLI string
-    :return Global Booleans: VROUTER_EXISTS, NETWORK_EXISTS
+    Method to read the existing vRouters and OSPF networks with one
+    vrouter-show and one vrouter-ospf-show.
+    :param run: Function running a show command and returning its output.
+    :return: Tuple of the set of vRouter names and the set of
+    (vRouter name, network ip) of the OSPF networks.
     """
-    vrouter_name = module.params['pn_vrouter_name']
-    network_ip = module.params['pn_network_ip']
-    # Global flags
-    global VROUTER_EXISTS, NETWORK_EXISTS
+    vrouters = set(run('vrouter-show format name no-show-headers').split())
+    networks = set()
+    out = run('vrouter-ospf-show format network no-show-headers')
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            networks.add((fields[0], fields[1]))
 
-    # Check for vRouter
-    check_vrouter = cli + ' vrouter-show format name no-show-headers '
-    check_vrouter = shlex.split(check_vrouter)
-    out = module.run_command(check_vrouter)[1]
-    out = out.split()
+    return vrouters, networks
 
-    VROUTER_EXISTS = True if vrouter_name in out else False
 
-    # Check for OSPF networks
-    show = cli + ' vrouter-ospf-show vrouter-name %s ' % vrouter_name
-    show += 'format network no-show-headers'
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
-    out = out.split()
+def plan_item(params, index):
+    """
+    Method to check an OSPF network against the existing ones and build its
+    command.
+    :param params: Module parameters of the OSPF network.
+    :param index: Index returned by get_index(), updated with the change.
+    :return: Tuple of the cli command, or None if the network is skipped,
+    and the message.
+    """
+    vrouters, networks = index
+    command = params['pn_command']
+    vrouter_name = params['pn_vrouter_name']
+    network_ip = params['pn_network_ip']
+    ospf_area = params['pn_ospf_area']
+
+    if vrouter_name not in vrouters:
+        return None, 'vRouter %s does not exist' % vrouter_name
+    key = (vrouter_name, network_ip)
 
-    NETWORK_EXISTS = True if network_ip in out else False
+    if command == 'vrouter-ospf-remove':
+        if key not in networks:
+            return None, ('OSPF with network ip %s does not exist on %s'
+                          % (network_ip, vrouter_name))
+        networks.discard(key)
+        cli = (' %s vrouter-name %s network %s'
+               % (command, vrouter_name, network_ip))
+        return cli, 'OSPF network %s removed from %s' % (network_ip,
+                                                         vrouter_name)
+
+    if key in networks:
+        return None, ('OSPF with network ip %s already exists on %s'
+                      % (network_ip, vrouter_name))
+    networks.add(key)
+    cli = (' %s vrouter-name %s network %s ospf-area %s'
+           % (command, vrouter_name, network_ip, ospf_area))
+    return cli, 'OSPF network %s added to %s' % (network_ip, vrouter_name)
 
 
 def run_cli(module, cli):
@@ -194,63 +240,39 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str'),
             pn_cliswitch=dict(required=False, type='str', default='local'),
-            pn_command=dict(required=True, type='str',
+            pn_command=dict(required=False, type='str',
                             choices=['vrouter-ospf-add',
                                      'vrouter-ospf-remove']),
-            pn_vrouter_name=dict(required=True, type='str'),
-            pn_network_ip=dict(required=True, type='str'),
-            pn_ospf_area=dict(type='str')
-        ),
-        required_if=(
-            ['pn_command', 'vrouter-ospf-add',
-             ['pn_network_ip', 'pn_ospf_area']],
-            ['pn_command', 'vrouter-ospf-remove', ['pn_network_ip']]
+            pn_vrouter_name=dict(required=False, type='str'),
+            pn_network_ip=dict(required=False, type='str'),
+            pn_ospf_area=dict(type='str'),
+            pn_items=dict(required=False, type='list'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS)
         )
     )
 
-    # Accessing the arguments
-    command = module.params['pn_command']
-    vrouter_name = module.params['pn_vrouter_name']
-    network_ip = module.params['pn_network_ip']
-    ospf_area = module.params['pn_ospf_area']
+    if module.params['pn_items']:
+        apply_items(module, get_index, plan_item, REQUIRED, REQUIRED_IF)
+
+    check_required(module, REQUIRED, REQUIRED_IF)
 
     # Building the CLI command string
     cli = pn_cli(module)
-    check_cli(module, cli)
-
-    if command == 'vrouter-ospf-add':
-        if VROUTER_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='vRouter %s does not exist' % vrouter_name
-            )
-        if NETWORK_EXISTS is True:
-            module.exit_json(
-                skipped=True,
-                msg=('OSPF with network ip %s already exists on %s'
-                     % (network_ip, vrouter_name))
-            )
-        cli += (' %s vrouter-name %s network %s ospf-area %s'
-                % (command, vrouter_name, network_ip, ospf_area))
+    command, message = plan_item(module.params,
+                                 get_index(show_runner(module, cli)))
+    if command is None:
+        module.exit_json(
+            skipped=True,
+            msg=message
+        )
 
-    if command == 'vrouter-ospf-remove':
-        if VROUTER_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='vRouter %s does not exist' % vrouter_name
-            )
-        if NETWORK_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg=('OSPF with network ip %s already exists on %s'
-                     % (network_ip, vrouter_name))
-            )
-        cli += (' %s vrouter-name %s network %s'
-                % (command, vrouter_name, network_ip))
-
-    run_cli(module, cli)
+    run_cli(module, cli + ' ' + command)
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_items import (apply_items, check_required,
+                                          show_runner)
 
 if __name__ == '__main__':
     main()
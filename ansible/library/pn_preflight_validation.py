@@ -0,0 +1,123 @@
+#!/usr/bin/python
+""" PN Pre-flight Validation """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_preflight import preflight
+
+DOCUMENTATION = """
+---
+module: pn_preflight_validation
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Module to validate hosts file and csv inputs together.
+description:
+    Validates the Ansible hosts file and every csv file used by a playbook
+    in one pass, before any switch is configured. Besides the format of each
+    file, it reports duplicate switch names, host ips and csv keys, csv rows
+    referencing switches missing from the hosts file, vlans given different
+    subnets and overlapping subnets of different vlans.
+options:
+    pn_hosts_file_data:
+      description: String containing Hosts file data parsed.
+      required: True
+      type: str
+    pn_csv_data:
+      description:
+        - Dictionary of csv type and csv data to validate. Supported types
+          are vrrp_l2, vrrp_l3, vxlan, dci, third_party_bgp, hosts,
+          dlink_vlan, dlink_svi, dlink_trunk, dlink_vlag, dlink_vrrp,
+          dlink_bgp and dlink_ospf.
+      required: False
+      type: dict
+"""
+
+EXAMPLES = """
+- name: Validate hosts file and csv files
+  pn_preflight_validation:
+    pn_hosts_file_data: "{{ lookup('file', '{{ hosts_file }}') }}"
+    pn_csv_data:
+      vrrp_l3: "{{ lookup('file', '{{ vrrp_csv_file }}') }}"
+      vxlan: "{{ lookup('file', '{{ vxlan_csv_file }}') }}"
+"""
+
+RETURN = """
+summary:
+  description: It contains output of each validation.
+  returned: always
+  type: str
+changed:
+  description: Indicates whether the validation caused changes on the target.
+  returned: always
+  type: bool
+unreachable:
+  description: Empty string.
+  returned: always
+  type: bool
+failed:
+  description: Indicates if validation failed or not.
+  returned: always
+  type: bool
+exception:
+  description: Empty string.
+  returned: always
+  type: str
+task:
+  description: Name of the task getting executed.
+  returned: always
+  type: str
+msg:
+  description: Indicates whether the inputs are valid or invalid.
+  returned: always
+  type: str
+counts:
+  description: Number of switches and of csv rows loaded per csv type.
+  returned: always
+  type: dict
+"""
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_hosts_file_data=dict(required=True, type='str'),
+            pn_csv_data=dict(required=False, type='dict', default={}),
+        )
+    )
+
+    start = time.time()
+    errors, counts = preflight(module.params['pn_hosts_file_data'],
+                               module.params['pn_csv_data'])
+    counts['seconds'] = round(time.time() - start, 3)
+
+    module.exit_json(
+        unreachable=False,
+        msg='Invalid inputs' if errors else 'Valid inputs',
+        summary=''.join(error + '\n' for error in errors),
+        exception='',
+        failed=True if errors else False,
+        changed=False,
+        counts=counts,
+        task='Pre-flight validation'
+    )
+
+if __name__ == '__main__':
+    main()
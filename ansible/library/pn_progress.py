@@ -0,0 +1,186 @@
+#!/usr/bin/python
+""" PN Progress """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import errno
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_progress import read_status
+
+DOCUMENTATION = """
+---
+module: pn_progress
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Module to read the progress of a long running module.
+description:
+    pn_ebgp_ospf, pn_dci and pn_l3_ztp write their progress to the status
+    file given in pn_status_file. Started with async and poll 0, they run in
+    the background while this module reads the status file, without
+    running any cli command, until the run is finished. async_status then
+    returns the result of the run. A status file left by a previous run is
+    ignored when the run_id it holds is not pn_run_id.
+options:
+    pn_status_file:
+      description:
+        - Path of the status file given to the long running module.
+      required: True
+      type: str
+    pn_run_id:
+      description:
+        - Identifier of the run given in pn_run_id to the long running
+          module. A status file written with another run_id is reported as
+          not written yet.
+      required: False
+      type: str
+"""
+
+EXAMPLES = """
+- name: Identify the eBGP/OSPF run
+  set_fact:
+    ebgp_run_id: "{{ lookup('pipe', 'date +%s%N') }}"
+
+- name: Configure eBGP/OSPF in the background
+  pn_ebgp_ospf:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_status_file: /tmp/pn_ebgp_ospf.status
+    pn_run_id: "{{ ebgp_run_id }}"
+  async: 3600
+  poll: 0
+  register: ebgp_job
+
+- name: Wait for eBGP/OSPF configuration
+  pn_progress:
+    pn_status_file: /tmp/pn_ebgp_ospf.status
+    pn_run_id: "{{ ebgp_run_id }}"
+  register: ebgp_progress
+  until: ebgp_progress.finished
+  retries: 360
+  delay: 10
+
+- name: Result of eBGP/OSPF configuration
+  async_status:
+    jid: "{{ ebgp_job.ansible_job_id }}"
+  register: ebgp_out
+  until: ebgp_out.finished
+  retries: 30
+"""
+
+RETURN = """
+status:
+  description: Content of the status file (task, phase, phase_number,
+    phases_total, switches_done, switches_total, cli_calls, elapsed,
+    started, updated, pid, run_id, finished, failed, msg), or None before
+    the module wrote it.
+  returned: always
+  type: dict
+finished:
+  description: Indicates whether the run is over, including when its
+    process is gone without writing its last status.
+  returned: always
+  type: bool
+msg:
+  description: One line summary of the progress.
+  returned: always
+  type: str
+changed:
+  description: Indicates whether the module caused changes on the target.
+  returned: always(False)
+  type: bool
+"""
+
+
+def process_alive(pid):
+    """
+    Method to check whether a process is still running.
+    :param pid: Process id.
+    :return: True if the process exists.
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno == errno.EPERM
+    return True
+
+
+def describe(status):
+    """
+    Method to summarize a status in one line.
+    :param status: Dictionary of the status.
+    :return: String describing the progress.
+    """
+    return '%s: phase %d/%d %s, %d/%d switches, %d cli calls, %ds' % (
+        status.get('task', ''), status.get('phase_number', 0),
+        status.get('phases_total', 0), status.get('phase', ''),
+        status.get('switches_done', 0), status.get('switches_total', 0),
+        status.get('cli_calls', 0), status.get('elapsed', 0))
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_status_file=dict(required=True, type='str'),
+            pn_run_id=dict(required=False, type='str'),
+        )
+    )
+
+    status = read_status(module.params['pn_status_file'])
+    run_id = module.params['pn_run_id']
+    if status is not None and run_id and status.get('run_id') != run_id:
+        # Left by a previous run, the module did not start yet
+        status = None
+
+    if status is None:
+        module.exit_json(
+            status=None,
+            finished=False,
+            msg='No progress written yet',
+            changed=False
+        )
+
+    if status.get('finished'):
+        module.exit_json(
+            status=status,
+            finished=True,
+            msg='%s, finished: %s' % (describe(status), status.get('msg')),
+            changed=False
+        )
+
+    if status.get('pid') and not process_alive(status['pid']):
+        module.exit_json(
+            status=status,
+            finished=True,
+            failed=True,
+            msg='%s, process %d is gone' % (describe(status), status['pid']),
+            changed=False
+        )
+
+    module.exit_json(
+        status=status,
+        finished=False,
+        msg=describe(status),
+        changed=False
+    )
+
+if __name__ == '__main__':
+    main()
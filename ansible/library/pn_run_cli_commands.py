@@ -18,8 +18,11 @@
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import shlex
-import re
+from ansible.module_utils.pn_executor import (CliExecutor,
+                                               DEFAULT_MAX_WORKERS,
+                                               result_logger,
+                                               run_commands_file)
+from ansible.module_utils.pn_shard import shard_executor
 
 DOCUMENTATION = """
 ---
@@ -31,6 +34,7 @@ description:
      This module allows user to run a set of additional commands from a file.
      It performs following step:
          - Executing file commands
+     Every command is logged to the system log as soon as it completes.
 options:
     pn_cliusername:
         description:
@@ -47,6 +51,28 @@ options:
         - Specify commands to be run on the switches.
         required: True
         type: str
+    pn_max_workers:
+      description:
+        - Maximum number of switches configured at the same time. Commands
+          of a section run in order on each switch, and concurrently across
+          switches.
+      required: False
+      type: int
+      default: 10
+    pn_shard_seeds:
+      description:
+        - List of seed switches sharing the configuration of the fabric,
+          usually "{{ groups['spine'] }}" with the play running on every
+          spine. Each seed configures itself and its share of the other
+          switches; pn_shard_merge combines the results of the seeds.
+      required: False
+      type: list
+    pn_current_switch:
+      description:
+        - Name of the seed switch the module runs on, usually
+          "{{ inventory_hostname }}". Required with pn_shard_seeds.
+      required: False
+      type: str
 """
 
 EXAMPLES = """
@@ -65,145 +91,61 @@ RETURN = """
       description: Indicates whether the CLI caused changes on the target.
       returned: always
       type: bool
+    shard:
+      description: Switches configured by this seed, assignment of the fabric
+        switches to the seeds and digest of the plan, when pn_shard_seeds is
+        given.
+      returned: always
+      type: dict
 """
 
 
-def pn_cli(module):
+def describe(result):
     """
-    This method is to generate the cli portion to launch the Netvisor cli.
-    It parses the username, password, switch parameters from module.
-    :param module: The Ansible module to fetch username, password and switch
-    :return: The cli string for further processing
+    Method to describe the command of a result, as run on the cli.
+    :param result: CommandResult of the command.
+    :return: The command, prefixed with its target switch if any.
     """
-    username = module.params['pn_cliusername']
-    password = module.params['pn_clipassword']
-
-    if username and password:
-        cli = '/usr/bin/cli --quiet --user %s:%s ' % (username, password)
-    else:
-        cli = '/usr/bin/cli --quiet '
+    if result.switch:
+        return 'switch %s %s' % (result.switch, result.command)
+    return result.command
 
-    return cli
 
-
-def run_cli(module, cli):
+def execute_commands(module, commands_data):
     """
-    This method executes the cli command on the target node(s) and returns the
-    output.
+    This method executes the cli commands from a local file.
+    The file is compiled once into sections and the commands of each section
+    run concurrently across switches, in order on each switch.
     :param module: The Ansible module to fetch input parameters.
-    :param cli: the complete cli string to be executed on the target node(s).
-    :return: Output/Error or Success message depending upon the response.
+    :param commands_data: Cli commands in the form of string.
+    :return: Tuple of output of the commands and the executor used.
     """
-    cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    executor = CliExecutor(module, module.params['pn_max_workers'])
+    shard = shard_executor(module, executor, commands_data)
+    output = []
+
+    def collect(result):
+        if not result.failed:
+            output.append((result.out or 'Success ') + describe(result) +
+                          ' successfully executed ')
 
-    if out:
-        return out
+    executor.on_result = result_logger(module, collect)
+    failed = run_commands_file(executor, commands_data)
+    output = ''.join(output)
 
-    if err:
+    if failed is not None:
         module.exit_json(
+            cli_metrics=executor.metrics,
             error='1',
             failed=True,
-            stderr=err.strip(),
-            msg='Operation Failed: ' + str(cli),
-            changed=False
+            stdout=output,
+            stderr=failed.err.strip(),
+            msg='Operation Failed: ' + describe(failed),
+            shard=shard.summary() if shard else None,
+            changed=bool(output)
         )
-    else:
-        return 'Success '
 
-
-def execute_commands(module, commands_data):
-    """
-    This method executes the cli commands from a local file.
-    :param module: The Ansible module to fetch input parameters.
-    :param commands_data: Cli commands in the form of string.
-    :return: Output/Error or Success message depending upon the response.
-    """
-    output = ''
-    commands_list = commands_data.split('\n')
-    line_count = 0
-    cli = pn_cli(module)
-    clicopy = cli
-
-    while line_count < len(commands_list):
-        if commands_list[line_count] == "":
-            line_count += 1
-
-        # Execute commands from [ALL] group.
-        # It will be executed on all switches.
-        elif re.match("(^\[ALL.*)", commands_list[line_count]) is not None:
-            line_count += 1
-            cli = clicopy
-            cli += " fabric-node-show format name no-show-headers "
-            switch_list = run_cli(module, cli).split()
-
-            while (line_count < len(commands_list) and
-                           re.match("(^\[switch.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[fabric.*)",
-                                    commands_list[line_count]) is None):
-                if commands_list[line_count] != "":
-                    command = commands_list[line_count]
-                    for switch in switch_list:
-                        cli = clicopy
-                        cli += ' switch %s ' % switch
-                        cli += str(command)
-                        output += run_cli(module, cli)
-                        output += cli + ' successfully executed '
-
-                line_count += 1
-
-        # Execute commands from [fabric] group.
-        # It will be executed fabric wide on first switch from hosts file.
-        elif re.match("(^\[fabric.*)", commands_list[line_count]) is not None:
-            line_count += 1
-            while (line_count < len(commands_list) and
-                           re.match("(^\[switch.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[ALL.*)",
-                                    commands_list[line_count]) is None):
-                if commands_list[line_count] != "":
-                    command = commands_list[line_count]
-                    cli = clicopy
-                    cli += str(command)
-                    output += run_cli(module, cli)
-                    output += cli + ' successfully executed '
-
-                line_count += 1
-
-        # Execute commands from [switch] group.
-        # It will be executed on mentioned switches.
-        elif re.match("(^\[switch.*)", commands_list[line_count]) is not None:
-            switch_to_run = commands_list[line_count].split(",")
-            switch_to_run[0] = switch_to_run[0].split(" ")[1]
-            last_arg = len(switch_to_run) - 1
-            switch_to_run[last_arg] = switch_to_run[last_arg].split("]")[0]
-            line_count += 1
-
-            while (line_count < len(commands_list) and
-                           re.match("(^\[ALL.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[switch.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[fabric.*)",
-                                    commands_list[line_count]) is None):
-                if commands_list[line_count] != "":
-                    command = commands_list[line_count]
-                    for switch in switch_to_run:
-                        switch = switch.replace(" ", "")
-                        cli = clicopy
-                        cli += ' switch %s ' % switch
-                        cli += str(command)
-                        output += run_cli(module, cli)
-                        output += cli + ' successfully executed '
-
-                line_count += 1
-
-        # It will take care of comments at the top if any
-        else:
-            line_count += 1
-
-    return output
+    return output, executor
 
 
 def main():
@@ -213,16 +155,23 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
             pn_commands_file=dict(required=True, type='str'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS),
+            pn_shard_seeds=dict(required=False, type='list'),
+            pn_current_switch=dict(required=False, type='str'),
         )
     )
 
-    message = execute_commands(module, module.params['pn_commands_file'])
+    message, executor = execute_commands(module,
+                                         module.params['pn_commands_file'])
 
     module.exit_json(
+        cli_metrics=executor.metrics,
         stdout=message,
         error='0',
         failed=False,
         msg='Operation Completed',
+        shard=executor.shard.summary() if executor.shard else None,
         changed=True
     )
 
@@ -18,8 +18,10 @@
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import shlex
-import re
+from ansible.module_utils.pn_executor import (CliExecutor,
+                                               DEFAULT_MAX_WORKERS,
+                                               result_logger,
+                                               run_commands_file)
 
 DOCUMENTATION = """
 ---
@@ -31,6 +33,7 @@ description:
      This module allows user to run a set of additional commands from a file.
      It performs following step:
          - Executing file commands
+     Every command is logged to the system log as soon as it completes.
 options:
     pn_cliusername:
         description:
@@ -47,6 +50,14 @@ options:
         - Specify commands to be run on the switches.
         required: True
         type: str
+    pn_max_workers:
+      description:
+        - Maximum number of switches configured at the same time. Commands
+          of a section run in order on each switch, and concurrently across
+          switches.
+      required: False
+      type: int
+      default: 10
 """
 
 EXAMPLES = """
@@ -68,148 +79,44 @@ RETURN = """
 """
 
 
-def pn_cli(module):
+def execute_commands(module, commands_data):
     """
-    This method is to generate the cli portion to launch the Netvisor cli.
-    It parses the username, password, switch parameters from module.
-    :param module: The Ansible module to fetch username, password and switch
-    :return: The cli string for further processing
+    This method executes the cli commands from a local file.
+    The file is compiled once into sections and the commands of each section
+    run concurrently across switches, in order on each switch.
+    :param module: The Ansible module to fetch input parameters.
+    :param commands_data: Cli commands in the form of string.
+    :return: List of switch and output of every command executed.
     """
-    username = module.params['pn_cliusername']
-    password = module.params['pn_clipassword']
-
-    if username and password:
-        cli = '/usr/bin/cli --quiet --user %s:%s ' % (username, password)
-    else:
-        cli = '/usr/bin/cli --quiet '
+    executor = CliExecutor(module, module.params['pn_max_workers'])
+    summary = []
 
-    return cli
+    def collect(result):
+        summary.append({
+            'switch': result.switch or 'fabric_wide',
+            'output': u'{} executed with message {}'.format(
+                result.command, result.output.strip())
+        })
 
+    executor.on_result = result_logger(module, collect)
+    failed = run_commands_file(executor, commands_data)
 
-def run_cli(module, cli):
-    """
-    Method to execute the cli command on the target node(s) and returns the
-    output.
-    :param module: The Ansible module to fetch input parameters.
-    :param cli: The complete cli string to be executed on the target node(s).
-    :return: Output/Error or Success msg depending upon the response from cli.
-    """
-    cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
-    results = []
-    if out:
-        return out
-
-    if err:
-        json_msg = {'switch': '', 'output': u'Operation Failed: {}'.format(str(cli))}
-        results.append(json_msg)
+    if failed is not None:
         module.exit_json(
             unreachable=False,
             failed=True,
             exception='',
-            summary=results,
+            summary=[{
+                'switch': failed.switch or '',
+                'output': u'Operation Failed: {}'.format(failed.command)
+            }],
             task='Module to execute commands from a file',
-            stderr=err.strip(),
+            stderr=failed.err.strip(),
             msg='Commands execution from file failed',
             changed=False
         )
-    else:
-        return 'Success'
 
-
-def execute_commands(module, commands_data):
-    """
-    This method executes the cli commands from a local file.
-    :param module: The Ansible module to fetch input parameters.
-    :param commands_data: Cli commands in the form of string.
-    :return: Output/Error or Success message depending upon the response.
-    """
-    output = ''
-    commands_list = commands_data.split('\n')
-    line_count = 0
-    cli = pn_cli(module)
-    clicopy = cli
-
-    while line_count < len(commands_list):
-        if commands_list[line_count] == "":
-            line_count += 1
-
-        # Execute commands from [ALL] group.
-        # It will be executed on all switches.
-        elif re.match("(^\[ALL.*)", commands_list[line_count]) is not None:
-            line_count += 1
-            cli = clicopy
-            cli += " fabric-node-show format name no-show-headers "
-            switch_list = run_cli(module, cli).split()
-
-            while (line_count < len(commands_list) and
-                           re.match("(^\[switch.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[fabric.*)",
-                                    commands_list[line_count]) is None):
-                if commands_list[line_count] != "":
-                    command = commands_list[line_count]
-                    for switch in switch_list:
-                        cli = clicopy
-                        cli += ' switch %s ' % switch
-                        cli += str(command)
-                        return_msg = run_cli(module, cli)
-                        output += switch + ': ' + cli + ' executed '
-                        output += 'with message %s \n' % return_msg
-
-                line_count += 1
-
-        # Execute commands from [fabric] group.
-        # It will be executed fabric wide on first switch from hosts file.
-        elif re.match("(^\[fabric.*)", commands_list[line_count]) is not None:
-            line_count += 1
-            while (line_count < len(commands_list) and
-                           re.match("(^\[switch.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[ALL.*)",
-                                    commands_list[line_count]) is None):
-                if commands_list[line_count] != "":
-                    command = commands_list[line_count]
-                    cli = clicopy
-                    cli += str(command)
-                    return_msg = run_cli(module, cli)
-                    output += 'fabric_wide' + ': ' + cli + ' executed '
-                    output += 'with message %s \n' % return_msg
-                line_count += 1
-
-        # Execute commands from [switch] group.
-        # It will be executed on mentioned switches.
-        elif re.match("(^\[switch.*)", commands_list[line_count]) is not None:
-            switch_to_run = commands_list[line_count].split(",")
-            switch_to_run[0] = switch_to_run[0].split(" ")[1]
-            last_arg = len(switch_to_run) - 1
-            switch_to_run[last_arg] = switch_to_run[last_arg].split("]")[0]
-            line_count += 1
-
-            while (line_count < len(commands_list) and
-                           re.match("(^\[ALL.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[switch.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[fabric.*)",
-                                    commands_list[line_count]) is None):
-                if commands_list[line_count] != "":
-                    command = commands_list[line_count]
-                    for switch in switch_to_run:
-                        switch = switch.replace(" ", "")
-                        cli = clicopy
-                        cli += ' switch %s ' % switch
-                        cli += str(command)
-                        return_msg = run_cli(module, cli)
-                        output += switch + ': ' + cli + ' executed '
-                        output += 'with message %s \n' % return_msg
-                line_count += 1
-
-        # It will take care of comments at the top if any
-        else:
-            line_count += 1
-
-    return output
+    return summary
 
 
 def main():
@@ -219,19 +126,12 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
             pn_commands_file=dict(required=True, type='str'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS),
         )
     )
 
-    message = execute_commands(module, module.params['pn_commands_file'])
-
-    message_string = message
-    results = []
-
-    for line in message_string.splitlines():
-        if ': ' in line:
-            return_msg = line.split(': ')
-            json_msg = {'switch' : return_msg[0] , 'output' : return_msg[1].strip() }
-            results.append(json_msg)
+    results = execute_commands(module, module.params['pn_commands_file'])
 
     module.exit_json(
         unreachable=False,
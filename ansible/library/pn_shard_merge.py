@@ -0,0 +1,113 @@
+#!/usr/bin/python
+""" PN Shard Merge """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_shard import merge_results
+
+DOCUMENTATION = """
+---
+module: pn_shard_merge
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Module to combine the results of a sharded run.
+description:
+    A fabric-wide module run with pn_shard_seeds configures the fabric from
+    several seed switches, each seed returning the result of its share of
+    the switches. This module combines the results registered on the seeds
+    into one, after checking that the seeds worked from the same plan and
+    that every seed reported. It runs no cli command.
+options:
+    pn_results:
+      description:
+        - List of the results registered on every seed.
+      required: True
+      type: list
+"""
+
+EXAMPLES = """
+- name: Configure VRRP L3 setup from every spine
+  pn_ztp_vrrp_l3:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_csv_data: "{{ lookup('file', '{{ csv_file }}') }}"
+    pn_shard_seeds: "{{ groups['spine'] }}"
+    pn_current_switch: "{{ inventory_hostname }}"
+  register: vrrp_shard
+  ignore_errors: yes
+
+- name: Merge the results of the spines
+  pn_shard_merge:
+    pn_results: "{{ groups['spine'] | map('extract', hostvars, 'vrrp_shard') | list }}"
+  run_once: true
+  register: vrrp_out
+"""
+
+RETURN = """
+stdout:
+  description: Output of the seeds, in seed order.
+  returned: when the shards are consistent
+  type: str
+summary:
+  description: Per switch summaries of the seeds, for modules returning one.
+  returned: when the shards are consistent
+  type: list
+shards:
+  description: Switches configured by each seed and its outcome.
+  returned: when the shards are consistent
+  type: list
+cli_metrics:
+  description: Sum of the cli metrics of the seeds.
+  returned: when the shards are consistent
+  type: dict
+changed:
+  description: Indicates whether any seed made changes.
+  returned: always
+  type: bool
+failed:
+  description: Indicates whether any seed failed or the shards are not
+    consistent.
+  returned: always
+  type: bool
+"""
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_results=dict(required=True, type='list'),
+        )
+    )
+
+    merged, error = merge_results(module.params['pn_results'])
+    if error:
+        module.fail_json(msg=error, changed=False)
+
+    failed = [entry['seed'] for entry in merged['shards'] if entry['failed']]
+    if failed:
+        merged['msg'] = 'Sharded run failed on %s' % ', '.join(failed)
+    else:
+        merged['msg'] = 'Sharded run completed on %d seeds' % len(
+            merged['shards'])
+    module.exit_json(**merged)
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,7 @@
 
 import subprocess
 import shlex
+import tempfile
 
 DOCUMENTATION = """
 ---
@@ -57,6 +58,36 @@ options:
     description:
       - Specify formatting options.
     type: str
+  pn_structured:
+    description:
+      - Run the show with parsable-delim and return the rows as a list of
+        records in C(records) instead of the raw output. Integer fields are
+        returned as integers and empty fields as null. The output is parsed
+        one line at a time, so filters and limits keep memory flat on large
+        tables. pn_parameters selects the fields of the records.
+    required: False
+    type: bool
+    default: False
+  pn_filters:
+    description:
+      - List of filters the records must all match, in structured mode.
+        'field=value' matches equal values, 'field^=prefix' values starting
+        with prefix and 'field<<network/len' ipv4 addresses or networks inside
+        the network. Filtered fields need not be in pn_parameters.
+    required: False
+    type: list
+  pn_offset:
+    description:
+      - Number of matching records to skip, in structured mode.
+    required: False
+    type: int
+    default: 0
+  pn_limit:
+    description:
+      - Maximum number of records to return, in structured mode. The show is
+        stopped once the page is read.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -75,6 +106,23 @@ EXAMPLES = """
 - name: run the cluster-show command
   pn_show:
     pn_command: 'cluster-show'
+
+- name: read the first 1000 l2 table entries of vlan 10 as records
+  pn_show:
+    pn_command: 'l2-table-show'
+    pn_parameters: 'mac,vlan,ports,ip'
+    pn_structured: True
+    pn_filters:
+      - 'vlan=10'
+      - 'ip<<10.10.0.0/16'
+    pn_limit: 1000
+
+- name: read the vrouter routes learnt through bgp
+  pn_show:
+    pn_command: 'vrouter-routes-show'
+    pn_parameters: 'vrouter-name,network,next-hop'
+    pn_structured: True
+    pn_filters: 'type=bgp'
 """
 
 RETURN = """
@@ -82,8 +130,21 @@ command:
   description: the CLI command run on the target node(s).
 stdout:
   description: the set of responses from the show command.
-  returned: always
+  returned: when not structured
   type: list
+records:
+  description: the selected rows of the show command, as dictionaries of
+    field name and value.
+  returned: when structured
+  type: list
+matched:
+  description: number of matching rows read, including the skipped ones.
+  returned: when structured
+  type: int
+truncated:
+  description: True if more matching rows were left unread after pn_limit.
+  returned: when structured
+  type: bool
 stderr:
   description: the set of error responses from the show command.
   returned: on error
@@ -159,6 +220,66 @@ def run_cli(module, cli):
         )
 
 
+def run_structured(module, cli, fields, filters):
+    """
+    This method runs the show command with parsable output and exits with the
+    selected records. The output is read one line at a time and the command
+    is stopped once the requested page is read.
+    :param module: The Ansible module to fetch offset and limit.
+    :param cli: the complete cli string to be executed on the target node(s).
+    :param fields: List of fields of the records, or None for all fields.
+    :param filters: List of (field, operator, value) filter tuples.
+    """
+    command = module.params['pn_command']
+    fetch = None
+    if fields is not None:
+        fetch = fields + [field for field, _, _ in filters
+                          if field not in fields]
+        # The header line names the columns: the cli adds key columns, like
+        # the vrouter name or the switch, in front of the requested fields.
+        cli += ' %s format %s' % (command, ','.join(fetch))
+    else:
+        cli += ' %s format all' % command
+    cli += ' parsable-delim %s' % DELIMITER
+    if module.params['pn_options']:
+        cli += ' ' + module.params['pn_options']
+
+    # stderr goes to a file so that a chatty error stream can not block the
+    # command while its stdout is read.
+    errors = tempfile.TemporaryFile()
+    response = subprocess.Popen(shlex.split(cli), stderr=errors,
+                                stdout=subprocess.PIPE,
+                                universal_newlines=True)
+    records, matched, truncated = select_records(
+        iter_records(iter(response.stdout.readline, ''), None),
+        filters, fields, module.params['pn_offset'],
+        module.params['pn_limit'])
+    if truncated:
+        response.terminate()
+    response.stdout.close()
+    response.wait()
+    errors.seek(0)
+    err = errors.read().decode('utf-8', 'replace').strip()
+    errors.close()
+
+    if err and not truncated and not records:
+        module.exit_json(
+            command=cli,
+            msg='%s: ' % command,
+            stderr=err,
+            changed=False
+        )
+
+    module.exit_json(
+        command=cli,
+        msg='%s: %d records' % (command, len(records)),
+        records=records,
+        matched=matched,
+        truncated=truncated,
+        changed=False
+    )
+
+
 def main():
     """ This section is for arguments parsing """
     module = AnsibleModule(
@@ -168,7 +289,11 @@ def main():
             pn_cliswitch=dict(required=False, type='str'),
             pn_command=dict(required=True, type='str'),
             pn_parameters=dict(default='all', type='str'),
-            pn_options=dict(type='str')
+            pn_options=dict(type='str'),
+            pn_structured=dict(default=False, type='bool'),
+            pn_filters=dict(required=False, type='list'),
+            pn_offset=dict(default=0, type='int'),
+            pn_limit=dict(required=False, type='int')
         )
     )
 
@@ -180,6 +305,21 @@ def main():
     # Building the CLI command string
     cli = pn_cli(module)
 
+    if module.params['pn_structured']:
+        try:
+            filters = parse_filters(module.params['pn_filters'])
+        except ValueError as error:
+            module.fail_json(msg=str(error))
+        if module.params['pn_offset'] < 0 or (
+                module.params['pn_limit'] is not None and
+                module.params['pn_limit'] < 0):
+            module.fail_json(msg='pn_offset and pn_limit must not be negative')
+        fields = None
+        if parameters != 'all':
+            fields = [field.strip() for field in parameters.split(',')
+                      if field.strip()]
+        run_structured(module, cli, fields, filters)
+
     cli += ' %s format %s ' % (command, parameters)
 
     if options:
@@ -189,6 +329,8 @@ def main():
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_records import (DELIMITER, iter_records,
+                                             parse_filters, select_records)
 
 if __name__ == '__main__':
     main()
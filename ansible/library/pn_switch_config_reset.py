@@ -22,6 +22,8 @@ import shlex
 import time
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import (DEADLINE_EXCEEDED,
+                                              module_deadline, run_bounded)
 
 DOCUMENTATION = """
 ---
@@ -49,6 +51,19 @@ options:
         - Specify ips of all hosts/switches separated by comma.
       required: True
       type: str
+    pn_command_timeout:
+      description:
+        - Number of seconds an ssh command may run before it is killed.
+      required: False
+      type: int
+      default: 60
+    pn_deadline:
+      description:
+        - Number of seconds the module may run for, including the wait for
+          the switches to come back. Switches not reset by then are reported
+          as skipped.
+      required: False
+      type: int
 """
 
 EXAMPLES = """
@@ -101,6 +116,8 @@ def main():
         pn_clipassword=dict(required=True, type='str', no_log=True),
         pn_host_list=dict(required=True, type='list'),
         pn_host_ips=dict(required=True, type='str'),
+        pn_command_timeout=dict(required=False, type='int', default=60),
+        pn_deadline=dict(required=False, type='int'),
     ))
 
     username = module.params['pn_cliusername']
@@ -112,6 +129,7 @@ def main():
     result, reset_ips = [], []
     count = 0
     changed_flag, unreachable_flag = [], []
+    deadline = module_deadline(module)
 
     ssh_prefix = "ssh -o StrictHostKeyChecking=no"
 
@@ -120,7 +138,11 @@ def main():
         cli += '%s %s@%s ' % (ssh_prefix, username, ip)
 
         cli = shlex.split(cli)
-        rc, out, err = module.run_command(cli)
+        rc, out, err = run_bounded(module, cli)
+        if err == DEADLINE_EXCEEDED:
+            result += [{'switch': switch, 'output': 'Skipped, ' + err}
+                       for switch in switch_list[count:len(switch_ips)]]
+            break
         err = err.lower()
 
         if 'permission denied' in err:
@@ -128,7 +150,7 @@ def main():
                 'switch': switch_list[count],
                 'output': 'Switch has been already reset'
             })
-        elif 'no route to host' in err:
+        elif 'no route to host' in err or rc == -1:
             unreachable_flag.append(True)
             result.append({
                 'switch': switch_list[count],
@@ -141,7 +163,7 @@ def main():
             cli += 'switch-config-reset'
 
             cli = shlex.split(cli)
-            module.run_command(cli)
+            run_bounded(module, cli)
             changed_flag.append(True)
             reset_ips.append(ip)
 
@@ -156,7 +178,7 @@ def main():
             cli += 'switch-config-reset'                
 
             cli = shlex.split(cli)
-            module.run_command(cli)
+            run_bounded(module, cli)
             changed_flag.append(True)
             reset_ips.append(ip)
 
@@ -168,33 +190,35 @@ def main():
         count += 1
 
     if reset_ips:
-        # Wait 180 secs for nvOS to come up
-        time.sleep(180)
+        # Wait 180 secs for nvOS to come up, or until the deadline
+        time.sleep(deadline.bound(180))
 
         # Check until we are able to ssh into switches
         for ip in reset_ips:
             epocs = 0
-            while epocs <= 6:
+            while epocs <= 6 and not deadline.expired():
                 cli = 'sshpass -p %s ' % password
                 cli += '%s %s@%s ' % (ssh_prefix, username, ip)
 
                 cli = shlex.split(cli)
-                rc, out, err = module.run_command(cli)
+                rc, out, err = run_bounded(module, cli)
 
                 if 'permission denied' in err.lower():
                     break
 
-                time.sleep(10)
+                time.sleep(deadline.bound(10))
                 epocs += 1
 
     # Exit the module and return the required JSON
     module.exit_json(
         unreachable=True if True in unreachable_flag else False,
-        msg='Switch config reset completed successfully',
+        msg='Switch config reset stopped at the deadline'
+        if deadline.expired() else
+        'Switch config reset completed successfully',
         summary=result,
         exception='',
         task='Switch config reset',
-        failed=False,
+        failed=deadline.expired(),
         changed=True if True in changed_flag else False
     )
 
@@ -47,13 +47,15 @@ options:
   pn_command:
     description:
       - The C(pn_command) takes the trunk commands as value.
-    required: true
+      - Required unless given in every item of pn_items.
+    required: False
     choices: ['trunk-create', 'trunk-delete', 'trunk-modify']
     type: str
   pn_name:
     description:
       - Specify the name for the trunk configuration.
-    required: true
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
   pn_ports:
     description:
@@ -147,6 +149,20 @@ options:
     description:
       - Host facing port control setting.
     type: bool
+  pn_items:
+    description:
+      - List of trunks to configure in one task. Every item is a dictionary of
+        the parameters above, with or without the pn_ prefix, overriding the
+        top level ones. The existing trunks are read once and every item is
+        reported in results.
+    required: False
+    type: list
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time with
+        pn_items.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -177,8 +193,16 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+results:
+  description: One result per item of pn_items with its msg, changed,
+    skipped and failed flags, command and stdout/stderr.
+  returned: with pn_items
+  type: list
 """
-TRUNK_EXISTS = None
+REQUIRED = ['pn_command', 'pn_name']
+REQUIRED_IF = [
+    ('pn_command', 'trunk-create', ['pn_ports'])
+]
 
 
 def pn_cli(module):
@@ -201,24 +225,140 @@ def pn_cli(module):
     return cli
 
 
-def check_cli(module, cli):
+def get_index(run):
     """
-    This method checks for idempotency using the trunk-show command.
-    If a trunk with given name exists, return TRUNK_EXISTS as True else False.
-    :param module: The Ansible module to fetch input parameters
-    :param cli: The CLI string
-    :return Global Booleans: TRUNK_EXISTS
+    Method to read the existing trunks with one trunk-show.
+    :param run: Function running a show command and returning its output.
+    :return: Set of trunk names.
     """
-    name = module.params['pn_name']
+    return set(run('trunk-show format name no-show-headers').split())
+
+
+def plan_item(params, trunks):
+    """
+    Method to check a trunk against the existing ones and build its command.
+    :param params: Module parameters of the trunk.
+    :param trunks: Index returned by get_index(), updated with the change.
+    :return: Tuple of the cli command, or None if the trunk is skipped, and
+    the message.
+    """
+    command = params['pn_command']
+    name = params['pn_name']
+    ports = params['pn_ports']
+    speed = params['pn_speed']
+    egress_rate_limit = params['pn_egress_rate_limit']
+    jumbo = params['pn_jumbo']
+    lacp_mode = params['pn_lacp_mode']
+    lacp_priority = params['pn_lacp_priority']
+    lacp_timeout = params['pn_lacp_timeout']
+    lacp_fallback = params['pn_lacp_fallback']
+    lacp_fallback_timeout = params['pn_lacp_fallback_timeout']
+    edge_switch = params['pn_edge_switch']
+    pause = params['pn_pause']
+    description = params['pn_description']
+    loopback = params['pn_loopback']
+    mirror_receive = params['pn_mirror_receive']
+    unknown_ucast_level = params['pn_unknown_ucast_level']
+    unknown_mcast_level = params['pn_unknown_mcast_level']
+    broadcast_level = params['pn_broadcast_level']
+    port_macaddr = params['pn_port_macaddr']
+    loopvlans = params['pn_loopvlans']
+    routing = params['pn_routing']
+    host = params['pn_host']
+
+    if command == 'trunk-delete':
+        if name not in trunks:
+            return None, 'Trunk with name %s does not exist' % name
+        trunks.discard(name)
+        return ' %s name %s ' % (command, name), 'Trunk %s deleted' % name
+
+    if command == 'trunk-create':
+        if name in trunks:
+            return None, 'Trunk with name %s already exists' % name
+        trunks.add(name)
+
+    cli = ' %s name %s ' % (command, name)
+
+    # Appending options
+    if ports:
+        cli += ' ports ' + ports
+
+    if speed:
+        cli += ' speed ' + speed
+
+    if egress_rate_limit:
+        cli += ' egress-rate-limit ' + egress_rate_limit
+
+    if jumbo is True:
+        cli += ' jumbo '
+    if jumbo is False:
+        cli += ' no-jumbo '
+
+    if lacp_mode:
+        cli += ' lacp-mode ' + lacp_mode
+
+    if lacp_priority:
+        cli += ' lacp-priority ' + str(lacp_priority)
+
+    if lacp_timeout:
+        cli += ' lacp-timeout ' + lacp_timeout
+
+    if lacp_fallback:
+        cli += ' lacp-fallback ' + lacp_fallback
+
+    if lacp_fallback_timeout:
+        cli += ' lacp-fallback-timeout ' + lacp_fallback_timeout
+
+    if edge_switch is True:
+        cli += ' edge-switch '
+    if edge_switch is False:
+        cli += ' no-edge-switch '
+
+    if pause is True:
+        cli += ' pause '
+    if pause is False:
+        cli += ' no-pause '
+
+    if description:
+        cli += ' description ' + description
+
+    if loopback is True:
+        cli += ' loopback '
+    if loopback is False:
+        cli += ' no-loopback '
+
+    if mirror_receive is True:
+        cli += ' mirror-receive-only '
+    if mirror_receive is False:
+        cli += ' no-mirror-receive-only '
+
+    if unknown_ucast_level:
+        cli += ' unknown-ucast-level ' + unknown_ucast_level
+
+    if unknown_mcast_level:
+        cli += ' unknown-mcast-level ' + unknown_mcast_level
+
+    if broadcast_level:
+        cli += ' broadcast-level ' + broadcast_level
 
-    show = cli + ' trunk-show format switch,name no-show-headers'
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
+    if port_macaddr:
+        cli += ' port-mac-address ' + port_macaddr
 
-    out = out.split()
-    # Global flags
-    global TRUNK_EXISTS
-    TRUNK_EXISTS = True if name in out else False
+    if loopvlans:
+        cli += ' loopvlans ' + loopvlans
+
+    if routing is True:
+        cli += ' routing '
+    if routing is False:
+        cli += ' no-routing '
+
+    if host is True:
+        cli += ' host-enable '
+    if host is False:
+        cli += ' host-disable '
+
+    return cli, 'Trunk %s %s' % (name, 'created' if command == 'trunk-create'
+                                 else 'modified')
 
 
 def run_cli(module, cli):
@@ -271,10 +411,10 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str'),
             pn_cliswitch=dict(required=False, type='str', default='local'),
-            pn_command=dict(required=True, type='str',
+            pn_command=dict(required=False, type='str',
                             choices=['trunk-create', 'trunk-delete',
                                      'trunk-modify']),
-            pn_name=dict(required=True, type='str'),
+            pn_name=dict(required=False, type='str'),
             pn_ports=dict(type='str'),
             pn_speed=dict(type='str',
                           choices=['disable', '10m', '100m', '1g', '2.5g',
@@ -297,145 +437,35 @@ def main():
             pn_port_macaddr=dict(type='str'),
             pn_loopvlans=dict(type='str'),
             pn_routing=dict(type='bool'),
-            pn_host=dict(type='bool')
-        ),
-        required_if=(
-            ["pn_command", "trunk-create", ["pn_name", "pn_ports"]],
-            ["pn_command", "trunk-delete", ["pn_name"]],
-            ["pn_command", "trunk-modify", ["pn_name"]]
+            pn_host=dict(type='bool'),
+            pn_items=dict(required=False, type='list'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS)
         )
     )
 
-    # Accessing the arguments
-    command = module.params['pn_command']
-    name = module.params['pn_name']
-    ports = module.params['pn_ports']
-    speed = module.params['pn_speed']
-    egress_rate_limit = module.params['pn_egress_rate_limit']
-    jumbo = module.params['pn_jumbo']
-    lacp_mode = module.params['pn_lacp_mode']
-    lacp_priority = module.params['pn_lacp_priority']
-    lacp_timeout = module.params['pn_lacp_timeout']
-    lacp_fallback = module.params['pn_lacp_fallback']
-    lacp_fallback_timeout = module.params['pn_lacp_fallback_timeout']
-    edge_switch = module.params['pn_edge_switch']
-    pause = module.params['pn_pause']
-    description = module.params['pn_description']
-    loopback = module.params['pn_loopback']
-    mirror_receive = module.params['pn_mirror_receive']
-    unknown_ucast_level = module.params['pn_unknown_ucast_level']
-    unknown_mcast_level = module.params['pn_unknown_mcast_level']
-    broadcast_level = module.params['pn_broadcast_level']
-    port_macaddr = module.params['pn_port_macaddr']
-    loopvlans = module.params['pn_loopvlans']
-    routing = module.params['pn_routing']
-    host = module.params['pn_host']
+    if module.params['pn_items']:
+        apply_items(module, get_index, plan_item, REQUIRED, REQUIRED_IF)
+
+    check_required(module, REQUIRED, REQUIRED_IF)
 
     # Building the CLI command string
     cli = pn_cli(module)
+    command, message = plan_item(module.params,
+                                 get_index(show_runner(module, cli)))
+    if command is None:
+        module.exit_json(
+            skipped=True,
+            msg=message
+        )
 
-    if command == 'trunk-delete':
-
-        check_cli(module, cli)
-        if TRUNK_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='Trunk with name %s does not exist' % name
-            )
-        cli += ' %s name %s ' % (command, name)
-
-    else:
-        if command == 'trunk-create':
-            check_cli(module, cli)
-            if TRUNK_EXISTS is True:
-                module.exit_json(
-                    skipped=True,
-                    msg='Trunk with name %s already exists' % name
-                )
-        cli += ' %s name %s ' % (command, name)
-
-        # Appending options
-        if ports:
-            cli += ' ports ' + ports
-
-        if speed:
-            cli += ' speed ' + speed
-
-        if egress_rate_limit:
-            cli += ' egress-rate-limit ' + egress_rate_limit
-
-        if jumbo is True:
-            cli += ' jumbo '
-        if jumbo is False:
-            cli += ' no-jumbo '
-
-        if lacp_mode:
-            cli += ' lacp-mode ' + lacp_mode
-
-        if lacp_priority:
-            cli += ' lacp-priority ' + lacp_priority
-
-        if lacp_timeout:
-            cli += ' lacp-timeout ' + lacp_timeout
-
-        if lacp_fallback:
-            cli += ' lacp-fallback ' + lacp_fallback
-
-        if lacp_fallback_timeout:
-            cli += ' lacp-fallback-timeout ' + lacp_fallback_timeout
-
-        if edge_switch is True:
-            cli += ' edge-switch '
-        if edge_switch is False:
-            cli += ' no-edge-switch '
-
-        if pause is True:
-            cli += ' pause '
-        if pause is False:
-            cli += ' no-pause '
-
-        if description:
-            cli += ' description ' + description
-
-        if loopback is True:
-            cli += ' loopback '
-        if loopback is False:
-            cli += ' no-loopback '
-
-        if mirror_receive is True:
-            cli += ' mirror-receive-only '
-        if mirror_receive is False:
-            cli += ' no-mirror-receive-only '
-
-        if unknown_ucast_level:
-            cli += ' unknown-ucast-level ' + unknown_ucast_level
-
-        if unknown_mcast_level:
-            cli += ' unknown-mcast-level ' + unknown_mcast_level
-
-        if broadcast_level:
-            cli += ' broadcast-level ' + broadcast_level
-
-        if port_macaddr:
-            cli += ' port-mac-address ' + port_macaddr
-
-        if loopvlans:
-            cli += ' loopvlans ' + loopvlans
-
-        if routing is True:
-            cli += ' routing '
-        if routing is False:
-            cli += ' no-routing '
-
-        if host is True:
-            cli += ' host-enable '
-        if host is False:
-            cli += ' host-disable '
-
-    run_cli(module, cli)
+    run_cli(module, cli + ' ' + command)
 
 # Ansible boiler-plate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_items import (apply_items, check_required,
+                                          show_runner)
 
 if __name__ == '__main__':
     main()
@@ -30,6 +30,9 @@ description:
   - Execute vflow-create or vflow-delete or vflow-modify command.
   - vFlow is a virtual filter/rule which is created to manage switch traffic by
     assigning different actions that matches given criteria/qualifiers.
+  - With pn_flows or pn_flows_csv, a whole policy of flows is applied at once.
+    Existing flows are read with one vflow-show and only missing or different
+    flows are created, modified or deleted, switches concurrently.
 options:
   pn_cliusername:
     description:
@@ -49,13 +52,15 @@ options:
   pn_command:
     description:
       - The C(pn_command) takes the vFlow commands as value.
-    required: true
+      - Required unless pn_flows or pn_flows_csv is given.
+    required: False
     choices: ['vflow-create', 'vflow-delete', 'vflow-modify']
     type: str
   pn_name:
     description:
       - Specify the name for the vFlow configuration.
-    required: true
+      - Required unless pn_flows or pn_flows_csv is given.
+    required: False
     type: str
   pn_scope:
     description:
@@ -293,6 +298,27 @@ options:
       - Specify enable or disable flows in hardware or not.
     choices: ['enable', 'no-enable']
     type: str
+  pn_flows:
+    description:
+      - List of flows to apply. Every flow is a dictionary with a name, an
+        optional switch (defaults to pn_cliswitch), an optional state
+        (present or absent, defaults to present) and vFlow attributes named
+        like the cli keywords, for example src-ip or src_ip.
+      - Flows without scope get the scope given by pn_scope.
+    required: False
+    type: list
+  pn_flows_csv:
+    description:
+      - Flows to apply as csv data. The first line names the columns
+        (switch, name, state and vFlow attributes), every other line is
+        one flow. Values holding commas must be quoted.
+    required: False
+    type: str
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -308,6 +334,11 @@ EXAMPLES = """
   pn_vflow:
     pn_command: 'vflow-delete'
     pn_name: 'drop_src_packets'
+
+- name: apply vflow policy
+  pn_vflow:
+    pn_scope: 'local'
+    pn_flows_csv: "{{ lookup('file', 'acl.csv') }}"
 """
 
 RETURN = """
@@ -325,6 +356,11 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+summary:
+  description: Flows created, modified, deleted, unchanged and failed on every
+    switch, in bulk mode.
+  returned: with pn_flows or pn_flows_csv
+  type: list
 """
 
 
@@ -346,6 +382,16 @@ def pn_cli(module):
     return cli
 
 
+def get_switch_name(module):
+    """
+    Method to obtain fabric node name of the local switch.
+    :param module: The Ansible module to fetch input parameters.
+    :return: fabric-node-name of the switch
+    """
+    cli = pn_cli(module) + ' switch-setup-show format switch-name '
+    return module.run_command(shlex.split(cli))[1].split()[1]
+
+
 def check_vflow_exists(module, cli):
     """
     This method checks for idempotency using the vflow-show command.
@@ -397,6 +443,77 @@ def run_cli(module, cli):
         )
 
 
+def exit_bulk_errors(module, errors):
+    """
+    Method to exit the module when the requested flows are invalid or the
+    existing flows could not be read.
+    :param module: The Ansible module to fetch input parameters.
+    :param errors: List of error strings.
+    """
+    module.exit_json(
+        unreachable=False,
+        failed=True,
+        exception='\n'.join(errors),
+        summary=[{'switch': '', 'output': error} for error in errors],
+        msg='vFlow policy failed',
+        changed=False
+    )
+
+
+def apply_flow_policy(module):
+    """
+    Method to apply the flows given by pn_flows or pn_flows_csv.
+    :param module: The Ansible module to fetch input parameters.
+    """
+    if module.params['pn_flows_csv'] is not None:
+        labelled, errors = parse_flows_csv(module.params['pn_flows_csv'])
+    else:
+        labelled, errors = [], []
+        for index, flow in enumerate(module.params['pn_flows'], 1):
+            if isinstance(flow, dict):
+                labelled.append(('flow %d' % index, flow))
+            else:
+                errors.append('flow %d: expected a dictionary' % index)
+
+    if not labelled and not errors:
+        # An empty policy changes nothing.
+        module.exit_json(
+            unreachable=False,
+            failed=False,
+            summary=[],
+            msg='vFlow policy applied',
+            changed=False
+        )
+
+    switch = module.params['pn_cliswitch']
+    if switch == 'local':
+        switch = get_switch_name(module)
+
+    flows, flow_errors = parse_flows(labelled, switch,
+                                     module.params['pn_scope'])
+    errors += flow_errors
+    if errors:
+        exit_bulk_errors(module, errors)
+
+    executor = CliExecutor(module, module.params['pn_max_workers'])
+    existing, failed_show = read_flows(executor, flows)
+    if failed_show is not None:
+        exit_bulk_errors(module, ['%s: %s' % (failed_show.command,
+                                              failed_show.output)])
+
+    tasks, unchanged = plan_flows(flows, existing)
+    summary, changed, failed = apply_flows(executor, tasks, unchanged)
+
+    module.exit_json(
+        unreachable=False,
+        failed=failed,
+        summary=summary,
+        msg='vFlow policy %s' % ('failed' if failed else 'applied'),
+        changed=changed,
+        cli_metrics=executor.metrics
+    )
+
+
 def main():
     """ This portion is for arguments parsing """
     module = AnsibleModule(
@@ -404,10 +521,10 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str'),
             pn_cliswitch=dict(required=False, type='str', default='local'),
-            pn_command=dict(required=True, type='str',
+            pn_command=dict(required=False, type='str',
                             choices=['vflow-create', 'vflow-delete',
                                      'vflow-modify']),
-            pn_name=dict(required=True, type='str'),
+            pn_name=dict(required=False, type='str'),
             pn_scope=dict(required=False, type='str',
                           choices=['local', 'fabric']),
             pn_vnet=dict(required=False, type='str'),
@@ -491,7 +608,13 @@ def main():
             pn_set_dst_port=dict(required=False, type='str'),
             pn_enable=dict(required=False, type='str',
                            choices=['enable', 'no-enable']),
+            pn_flows=dict(required=False, type='list'),
+            pn_flows_csv=dict(required=False, type='str'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS),
         ),
+        mutually_exclusive=[['pn_flows', 'pn_flows_csv']],
+        required_one_of=[['pn_command', 'pn_flows', 'pn_flows_csv']],
         required_if=(
             ["pn_command", "vflow-create", ["pn_name", "pn_scope"]],
             ["pn_command", "vflow-delete", ["pn_name"]],
@@ -499,6 +622,13 @@ def main():
         )
     )
 
+    if module.params['pn_flows'] is not None or \
+            module.params['pn_flows_csv'] is not None:
+        apply_flow_policy(module)
+
+    if not module.params['pn_name']:
+        module.fail_json(msg='pn_name is required with pn_command')
+
     # Accessing the arguments
     command = module.params['pn_command']
     name = module.params['pn_name']
@@ -745,6 +875,10 @@ def main():
 
 # Ansible boiler-plate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import CliExecutor, DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_vflow import (apply_flows, parse_flows,
+                                          parse_flows_csv, plan_flows,
+                                          read_flows)
 
 if __name__ == '__main__':
     main()
@@ -50,13 +50,15 @@ options:
   pn_command:
     description:
       - The C(pn_command) takes the vlag-create/delete/modify command as value.
-    required: true
+      - Required unless given in every item of pn_items.
+    required: False
     choices: ['vlag-create', 'vlag-delete', 'vlag-modify']
     type: str
   pn_name:
     description:
       - The C(pn_name) takes a valid name for vlag configuration.
-    required: true
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
   pn_port:
     description:
@@ -104,6 +106,20 @@ options:
       - Specify the LACP fallback timeout in seconds. The range is between 30
         and 60 seconds with a default value of 50 seconds.
     type: str
+  pn_items:
+    description:
+      - List of vlags to configure in one task. Every item is a dictionary of
+        the parameters above, with or without the pn_ prefix, overriding the
+        top level ones. The existing vlags are read once and every item is
+        reported in results.
+    required: False
+    type: list
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time with
+        pn_items.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -137,9 +153,17 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+results:
+  description: One result per item of pn_items with its msg, changed,
+    skipped and failed flags, command and stdout/stderr.
+  returned: with pn_items
+  type: list
 """
 
-VLAG_EXISTS = None
+REQUIRED = ['pn_command', 'pn_name']
+REQUIRED_IF = [
+    ('pn_command', 'vlag-create', ['pn_port', 'pn_peer_port', 'pn_peer_switch'])
+]
 
 
 def pn_cli(module):
@@ -162,24 +186,74 @@ def pn_cli(module):
     return cli
 
 
-def check_cli(module, cli):
+def get_index(run):
+    """
+    Method to read the existing vlags with one vlag-show.
+    :param run: Function running a show command and returning its output.
+    :return: Set of vlag names.
+    """
+    return set(run('vlag-show format name no-show-headers').split())
+
+
+def plan_item(params, vlags):
     """
-    This method checks for idempotency using the vlag-show command.
-    If a vlag with given vlag exists, return VLAG_EXISTS as True else False.
-    :param module: The Ansible module to fetch input parameters
-    :param cli: The CLI string
-    :return Global Booleans: VLAG_EXISTS
+    Method to check a vlag against the existing ones and build its command.
+    :param params: Module parameters of the vlag.
+    :param vlags: Index returned by get_index(), updated with the change.
+    :return: Tuple of the cli command, or None if the vlag is skipped, and
+    the message.
     """
-    name = module.params['pn_name']
+    command = params['pn_command']
+    name = params['pn_name']
+    port = params['pn_port']
+    peer_port = params['pn_peer_port']
+    mode = params['pn_mode']
+    peer_switch = params['pn_peer_switch']
+    failover_action = params['pn_failover_action']
+    lacp_mode = params['pn_lacp_mode']
+    lacp_timeout = params['pn_lacp_timeout']
+    lacp_fallback = params['pn_lacp_fallback']
+    lacp_fallback_timeout = params['pn_lacp_fallback_timeout']
+
+    if command == 'vlag-delete':
+        if name not in vlags:
+            return None, 'VLAG with name %s does not exist' % name
+        vlags.discard(name)
+        return ' %s name %s ' % (command, name), 'VLAG %s deleted' % name
+
+    if command == 'vlag-create':
+        if name in vlags:
+            return None, 'VLAG with name %s already exists' % name
+        vlags.add(name)
+
+    cli = ' %s name %s ' % (command, name)
+
+    if port:
+        cli += ' port %s peer-port %s ' % (port, peer_port)
+
+    if mode:
+        cli += ' mode ' + mode
+
+    if peer_switch:
+        cli += ' peer-switch ' + peer_switch
+
+    if failover_action:
+        cli += ' failover-' + failover_action + '-L2 '
+
+    if lacp_mode:
+        cli += ' lacp-mode ' + lacp_mode
+
+    if lacp_timeout:
+        cli += ' lacp-timeout ' + lacp_timeout
 
-    show = cli + ' vlag-show format name no-show-headers'
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
+    if lacp_fallback:
+        cli += ' lacp-fallback ' + lacp_fallback
 
-    out = out.split()
-    # Global flags
-    global VLAG_EXISTS
-    VLAG_EXISTS = True if name in out else False
+    if lacp_fallback_timeout:
+        cli += ' lacp-fallback-timeout ' + lacp_fallback_timeout
+
+    return cli, 'VLAG %s %s' % (name, 'created' if command == 'vlag-create'
+                                else 'modified')
 
 
 def run_cli(module, cli):
@@ -232,10 +306,10 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str'),
             pn_cliswitch=dict(required=False, type='str', default='local'),
-            pn_command=dict(required=True, type='str',
+            pn_command=dict(required=False, type='str',
                             choices=['vlag-create', 'vlag-delete',
                                      'vlag-modify']),
-            pn_name=dict(required=True, type='str'),
+            pn_name=dict(required=False, type='str'),
             pn_port=dict(type='str'),
             pn_peer_port=dict(type='str'),
             pn_mode=dict(type='str', choices=['active-standby', 'active-active']),
@@ -244,82 +318,35 @@ def main():
             pn_lacp_mode=dict(type='str', choices=['off', 'passive', 'active']),
             pn_lacp_timeout=dict(type='str', choices=['slow', 'fast']),
             pn_lacp_fallback=dict(type='str', choices=['individual', 'bundled']),
-            pn_lacp_fallback_timeout=dict(type='str')
-        ),
-        required_if=(
-            ["pn_command", "vlag-create", ["pn_name", "pn_port", "pn_peer_port",
-                                           "pn_peer_switch"]],
-            ["pn_command", "vlag-delete", ["pn_name"]],
-            ["pn_command", "vlag-modify", ["pn_name"]]
+            pn_lacp_fallback_timeout=dict(type='str'),
+            pn_items=dict(required=False, type='list'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS)
         )
     )
 
-    # Argument accessing
-    command = module.params['pn_command']
-    name = module.params['pn_name']
-    port = module.params['pn_port']
-    peer_port = module.params['pn_peer_port']
-    mode = module.params['pn_mode']
-    peer_switch = module.params['pn_peer_switch']
-    failover_action = module.params['pn_failover_action']
-    lacp_mode = module.params['pn_lacp_mode']
-    lacp_timeout = module.params['pn_lacp_timeout']
-    lacp_fallback = module.params['pn_lacp_fallback']
-    lacp_fallback_timeout = module.params['pn_lacp_fallback_timeout']
+    if module.params['pn_items']:
+        apply_items(module, get_index, plan_item, REQUIRED, REQUIRED_IF)
+
+    check_required(module, REQUIRED, REQUIRED_IF)
 
     # Building the CLI command string
     cli = pn_cli(module)
+    command, message = plan_item(module.params,
+                                 get_index(show_runner(module, cli)))
+    if command is None:
+        module.exit_json(
+            skipped=True,
+            msg=message
+        )
 
-    if command == 'vlag-delete':
-
-        check_cli(module, cli)
-        if VLAG_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='VLAG with name %s does not exist' % name
-            )
-        cli += ' %s name %s ' % (command, name)
-
-
-    else:
-
-        if command == 'vlag-create':
-            check_cli(module, cli)
-            if VLAG_EXISTS is True:
-                module.exit_json(
-                    skipped=True,
-                    msg='VLAG with name %s already exists' % name
-                )
-        cli += ' %s name %s ' % (command, name)
-
-        if port:
-            cli += ' port %s peer-port %s ' %(port, peer_port)
-
-        if mode:
-            cli += ' mode ' + mode
-
-        if peer_switch:
-            cli += ' peer-switch ' + peer_switch
-
-        if failover_action:
-            cli += ' failover-' + failover_action + '-L2 '
-
-        if lacp_mode:
-            cli += ' lacp-mode ' + lacp_mode
-
-        if lacp_timeout:
-            cli += ' lacp-timeout ' + lacp_timeout
-
-        if lacp_fallback:
-            cli += ' lacp-fallback ' + lacp_fallback
-
-        if lacp_fallback_timeout:
-            cli += ' lacp-fallback-timeout ' + lacp_fallback_timeout
-
-    run_cli(module, cli)
+    run_cli(module, cli + ' ' + command)
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_items import (apply_items, check_required,
+                                          show_runner)
 
 if __name__ == '__main__':
     main()
@@ -51,13 +51,15 @@ options:
   pn_command:
     description:
       - The C(pn_command) takes the vrouter command as value.
-    required: true
+      - Required unless given in every item of pn_items.
+    required: False
     choices: ['vrouter-create', 'vrouter-delete', 'vrouter-modify']
     type: str
   pn_name:
     description:
       - Specify the name of the vRouter.
-    required: true
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
   pn_vnet:
     description:
@@ -124,6 +126,20 @@ options:
       - Specify other OSPF options as a whitespaces separated string within
         single quotes ''.
     type: str
+  pn_items:
+    description:
+      - List of vRouters to configure in one task. Every item is a dictionary
+        of the parameters above, with or without the pn_ prefix, overriding the
+        top level ones. The existing vRouters are read once and every item is
+        reported in results.
+    required: False
+    type: list
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time with
+        pn_items.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -155,10 +171,17 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+results:
+  description: One result per item of pn_items with its msg, changed,
+    skipped and failed flags, command and stdout/stderr.
+  returned: with pn_items
+  type: list
 """
 
-VROUTER_EXISTS = None
-VROUTER_NAME_EXISTS = None
+REQUIRED = ['pn_command', 'pn_name']
+REQUIRED_IF = [
+    ('pn_command', 'vrouter-create', ['pn_vnet'])
+]
 
 
 def pn_cli(module):
@@ -181,45 +204,113 @@ def pn_cli(module):
     return cli
 
 
-def check_cli(module, cli):
+def get_index(run):
+    """
+    Method to read the existing vRouters with one vrouter-show. A switch can
+    have only one vRouter configuration.
+    :param run: Function running a show command and returning its output.
+    :return: Tuple of the name of the switch and dictionary of vRouter name:
+    location.
+    """
+    switch = run('switch-setup-show format switch-name').split()[1]
+    vrouters = {}
+    out = run('vrouter-show format name,location no-show-headers')
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            vrouters[fields[0]] = fields[1]
+
+    return switch, vrouters
+
+
+def plan_item(params, index):
     """
-    This method checks for idempotency using the vlan-show command.
-    A switch can have only one vRouter configuration.
-    If a vRouter already exists on the given switch, return VROUTER_EXISTS as
-    True else False.
-    If a vRouter with the given name exists(on a different switch), return
-    VROUTER_NAME_EXISTS as True else False.
-
-    :param module: The Ansible module to fetch input parameters
-    :param cli: The CLI string
-    :return Global Booleans: VROUTER_EXISTS, VROUTER_NAME_EXISTS
+    Method to check a vRouter against the existing ones and build its
+    command.
+    :param params: Module parameters of the vRouter.
+    :param index: Index returned by get_index(), updated with the change.
+    :return: Tuple of the cli command, or None if the vRouter is skipped, and
+    the message.
     """
-    name = module.params['pn_name']
-    # Global flags
-    global VROUTER_EXISTS, VROUTER_NAME_EXISTS
+    switch, vrouters = index
+    command = params['pn_command']
+    name = params['pn_name']
+    vnet = params['pn_vnet']
+    service_type = params['pn_service_type']
+    service_state = params['pn_service_state']
+    router_type = params['pn_router_type']
+    hw_vrrp_id = params['pn_hw_vrrp_id']
+    router_id = params['pn_router_id']
+    bgp_as = params['pn_bgp_as']
+    bgp_redistribute = params['pn_bgp_redistribute']
+    bgp_max_paths = params['pn_bgp_max_paths']
+    bgp_options = params['pn_bgp_options']
+    rip_redistribute = params['pn_rip_redistribute']
+    ospf_redistribute = params['pn_ospf_redistribute']
+    ospf_options = params['pn_ospf_options']
+    vrrp_track_port = params['pn_vrrp_track_port']
+
+    if command == 'vrouter-delete':
+        if name not in vrouters:
+            return None, 'vRouter with name %s does not exist' % name
+        del vrouters[name]
+        return ' %s name %s ' % (command, name), 'vRouter %s deleted' % name
+
+    if command == 'vrouter-create':
+        if switch in vrouters.values():
+            return None, ('Maximum number of vRouters has been reached on '
+                          'this switch')
+        if name in vrouters:
+            return None, 'vRouter with name %s already exists' % name
+        vrouters[name] = switch
+
+    cli = ' %s name %s ' % (command, name)
+
+    if vnet:
+        cli += ' vnet ' + vnet
+
+    if service_type:
+        cli += ' %s-vnet-service ' % service_type
+
+    if service_state:
+        cli += ' ' + service_state
+
+    if router_type:
+        cli += ' router-type ' + router_type
+
+    if hw_vrrp_id:
+        cli += ' hw-vrrp-id ' + str(hw_vrrp_id)
+
+    if router_id:
+        cli += ' router-id ' + router_id
+
+    if bgp_as:
+        cli += ' bgp-as ' + str(bgp_as)
+
+    if bgp_redistribute:
+        cli += ' bgp-redistribute ' + bgp_redistribute
 
-    # Get the name of the local switch
-    location = cli + ' switch-setup-show format switch-name'
-    location = shlex.split(location)
-    out = module.run_command(location)[1]
-    location = out.split()[1]
+    if bgp_max_paths:
+        cli += ' bgp-max-paths ' + str(bgp_max_paths)
 
-    # Check for any vRouters on the switch
-    check_vrouter = cli + ' vrouter-show location %s ' % location
-    check_vrouter += 'format name no-show-headers'
-    check_vrouter = shlex.split(check_vrouter)
-    out = module.run_command(check_vrouter)[1]
+    if bgp_options:
+        cli += ' %s ' % bgp_options
 
-    VROUTER_EXISTS = True if out else False
+    if rip_redistribute:
+        cli += ' rip-redistribute ' + rip_redistribute
 
+    if ospf_redistribute:
+        cli += ' ospf-redistribute ' + ospf_redistribute
 
-    # Check for any vRouters with the given name
-    show = cli + ' vrouter-show format name no-show-headers '
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
-    out = out.split()
+    if ospf_options:
+        cli += ' %s ' % ospf_options
 
-    VROUTER_NAME_EXISTS = True if name in out else False
+    if vrrp_track_port:
+        cli += ' vrrp-track-port ' + vrrp_track_port
+
+    return cli, 'vRouter %s %s' % (name, 'created'
+                                   if command == 'vrouter-create'
+                                   else 'modified')
 
 
 def run_cli(module, cli):
@@ -272,10 +363,10 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str'),
             pn_cliswitch=dict(required=False, type='str', default='local'),
-            pn_command=dict(required=True, type='str',
+            pn_command=dict(required=False, type='str',
                             choices=['vrouter-create', 'vrouter-delete',
                                      'vrouter-modify']),
-            pn_name=dict(required=True, type='str'),
+            pn_name=dict(required=False, type='str'),
             pn_vnet=dict(type='str'),
             pn_service_type=dict(type='str', choices=['dedicated', 'shared']),
             pn_service_state=dict(type='str', choices=['enable', 'disable']),
@@ -292,108 +383,35 @@ def main():
             pn_ospf_redistribute=dict(type='str', choices=['static', 'connected',
                                                            'bgp', 'rip']),
             pn_ospf_options=dict(type='str'),
-            pn_vrrp_track_port=dict(type='str')
-        ),
-        required_if=(
-            ["pn_command", "vrouter-create", ["pn_name", "pn_vnet"]],
-            ["pn_command", "vrouter-delete", ["pn_name"]],
-            ["pn_command", "vrouter-modify", ["pn_name"]]
+            pn_vrrp_track_port=dict(type='str'),
+            pn_items=dict(required=False, type='list'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS)
         )
     )
 
-    # Accessing the arguments
-    command = module.params['pn_command']
-    name = module.params['pn_name']
-    vnet = module.params['pn_vnet']
-    service_type = module.params['pn_service_type']
-    service_state = module.params['pn_service_state']
-    router_type = module.params['pn_router_type']
-    hw_vrrp_id = module.params['pn_hw_vrrp_id']
-    router_id = module.params['pn_router_id']
-    bgp_as = module.params['pn_bgp_as']
-    bgp_redistribute = module.params['pn_bgp_redistribute']
-    bgp_max_paths = module.params['pn_bgp_max_paths']
-    bgp_options = module.params['pn_bgp_options']
-    rip_redistribute = module.params['pn_rip_redistribute']
-    ospf_redistribute = module.params['pn_ospf_redistribute']
-    ospf_options = module.params['pn_ospf_options']
-    vrrp_track_port = module.params['pn_vrrp_track_port']
+    if module.params['pn_items']:
+        apply_items(module, get_index, plan_item, REQUIRED, REQUIRED_IF)
+
+    check_required(module, REQUIRED, REQUIRED_IF)
 
     # Building the CLI command string
     cli = pn_cli(module)
+    command, message = plan_item(module.params,
+                                 get_index(show_runner(module, cli)))
+    if command is None:
+        module.exit_json(
+            skipped=True,
+            msg=message
+        )
 
-    if command == 'vrouter-delete':
-        check_cli(module, cli)
-        if VROUTER_NAME_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='vRouter with name %s does not exist' % name
-            )
-        cli += ' %s name %s ' % (command, name)
-
-    else:
-
-        if command == 'vrouter-create':
-            check_cli(module, cli)
-            if VROUTER_EXISTS is True:
-                module.exit_json(
-                    skipped=True,
-                    msg='Maximum number of vRouters has been reached on this '
-                        'switch'
-                )
-            if VROUTER_NAME_EXISTS is True:
-                module.exit_json(
-                    skipped=True,
-                    msg='vRouter with name %s already exists' % name
-                )
-        cli += ' %s name %s ' % (command, name)
-
-        if vnet:
-            cli += ' vnet ' + vnet
-
-        if service_type:
-            cli += ' %s-vnet-service ' % service_type
-
-        if service_state:
-            cli += ' ' + service_state
-
-        if router_type:
-            cli += ' router-type ' + router_type
-
-        if hw_vrrp_id:
-            cli += ' hw-vrrp-id ' + str(hw_vrrp_id)
-
-        if router_id:
-            cli += ' router-id ' + router_id
-
-        if bgp_as:
-            cli += ' bgp-as ' + str(bgp_as)
-
-        if bgp_redistribute:
-            cli += ' bgp-redistribute ' + bgp_redistribute
-
-        if bgp_max_paths:
-            cli += ' bgp-max-paths ' + str(bgp_max_paths)
-
-        if bgp_options:
-            cli += ' %s ' % bgp_options
-
-        if rip_redistribute:
-            cli += ' rip-redistribute ' + rip_redistribute
-
-        if ospf_redistribute:
-            cli += ' ospf-redistribute ' + ospf_redistribute
-
-        if ospf_options:
-            cli += ' %s ' % ospf_options
-
-        if vrrp_track_port:
-            cli += ' vrrp-track-port ' + vrrp_track_port
-
-    run_cli(module, cli)
+    run_cli(module, cli + ' ' + command)
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_items import (apply_items, check_required,
+                                          show_runner)
 
 if __name__ == '__main__':
     main()
@@ -48,13 +48,15 @@ options:
   pn_command:
     description:
       - The C(pn_command) takes the vrouter-bgp command as value.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     choices: ['vrouter-bgp-add', 'vrouter-bgp-remove', 'vrouter-bgp-modify']
     type: str
   pn_vrouter_name:
     description:
       - Specify a name for the vRouter service.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
   pn_neighbor:
     description:
@@ -144,6 +146,20 @@ options:
     description:
       - Specify outbound route map for neighbor.
     type: str
+  pn_items:
+    description:
+      - List of BGP neighbors to configure in one task. Every item is a
+        dictionary of the parameters above, with or without the pn_ prefix,
+        overriding the top level ones. The existing BGP neighbors are read once
+        and every item is reported in results.
+    required: False
+    type: list
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time with
+        pn_items.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -175,11 +191,20 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+results:
+  description: One result per item of pn_items with its msg, changed,
+    skipped and failed flags, command and stdout/stderr.
+  returned: with pn_items
+  type: list
 """
 
 
-VROUTER_EXISTS = None
-NEIGHBOR_EXISTS = None
+REQUIRED = ['pn_command', 'pn_vrouter_name']
+REQUIRED_IF = [
+    ('pn_command', 'vrouter-bgp-add', ['pn_neighbor', 'pn_remote_as']),
+    ('pn_command', 'vrouter-bgp-remove', ['pn_neighbor']),
+    ('pn_command', 'vrouter-bgp-modify', ['pn_neighbor'])
+]
 
 
 def pn_cli(module):
@@ -202,39 +227,153 @@ def pn_cli(module):
     return cli
 
 
-def check_cli(module, cli):
+def get_index(run):
     """
-    This method checks if vRouter exists on the target node.
-    This method also checks for idempotency using the vrouter-bgp-show command.
-    If the given vRouter exists, return VROUTER_EXISTS as True else False.
-    If a BGP neighbor with the given ip exists on the given vRouter,
-    return NEIGHBOR_EXISTS as True else False.
-
-    :param module: The Ansible module to fetch input parameters
-    :param cli: The CLI string
-    :return Global Booleans: VROUTER_EXISTS, NEIGHBOR_EXISTS
+    Method to read the existing vRouters and BGP neighbors with one
+    vrouter-show and one vrouter-bgp-show.
+    :param run: Function running a show command and returning its output.
+    :return: Tuple of the set of vRouter names and the set of
+    (vRouter name, neighbor ip) of the BGP neighbors.
     """
-    vrouter_name = module.params['pn_vrouter_name']
-    neighbor = module.params['pn_neighbor']
-    # Global flags
-    global VROUTER_EXISTS, NEIGHBOR_EXISTS
+    vrouters = set(run('vrouter-show format name no-show-headers').split())
+    neighbors = set()
+    out = run('vrouter-bgp-show format neighbor no-show-headers')
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            neighbors.add((fields[0], fields[1]))
+
+    return vrouters, neighbors
+
+
+def plan_item(params, index):
+    """
+    Method to check a BGP neighbor against the existing ones and build its
+    command.
+    :param params: Module parameters of the BGP neighbor.
+    :param index: Index returned by get_index(), updated with the change.
+    :return: Tuple of the cli command, or None if the neighbor is skipped,
+    and the message.
+    """
+    vrouters, neighbors = index
+    command = params['pn_command']
+    vrouter_name = params['pn_vrouter_name']
+    neighbor = params['pn_neighbor']
+    remote_as = params['pn_remote_as']
+    next_hop_self = params['pn_next_hop_self']
+    password = params['pn_password']
+    ebgp = params['pn_ebgp']
+    prefix_listin = params['pn_prefix_listin']
+    prefix_listout = params['pn_prefix_listout']
+    route_reflector = params['pn_route_reflector']
+    override_capability = params['pn_override_capability']
+    soft_reconfig = params['pn_soft_reconfig']
+    max_prefix = params['pn_max_prefix']
+    max_prefix_warn = params['pn_max_prefix_warn']
+    bfd = params['pn_bfd']
+    multiprotocol = params['pn_multiprotocol']
+    weight = params['pn_weight']
+    default_originate = params['pn_default_originate']
+    keepalive = params['pn_keepalive']
+    holdtime = params['pn_holdtime']
+    route_mapin = params['pn_route_mapin']
+    route_mapout = params['pn_route_mapout']
+
+    cli = (' %s vrouter-name %s neighbor %s '
+           % (command, vrouter_name, neighbor))
+
+    if command == 'vrouter-bgp-remove':
+        if vrouter_name not in vrouters:
+            return None, 'vRouter %s does not exist' % vrouter_name
+        if (vrouter_name, neighbor) not in neighbors:
+            return None, ('BGP neighbor with IP %s does not exist on %s'
+                          % (neighbor, vrouter_name))
+        neighbors.discard((vrouter_name, neighbor))
+        return cli, 'BGP neighbor %s removed from %s' % (neighbor,
+                                                         vrouter_name)
+
+    if command == 'vrouter-bgp-add':
+        if vrouter_name not in vrouters:
+            return None, 'vRouter %s does not exist' % vrouter_name
+        if (vrouter_name, neighbor) in neighbors:
+            return None, ('BGP neighbor with IP %s already exists on %s'
+                          % (neighbor, vrouter_name))
+        neighbors.add((vrouter_name, neighbor))
+
+    if remote_as:
+        cli += ' remote-as ' + str(remote_as)
+
+    if next_hop_self is True:
+        cli += ' next-hop-self '
+    if next_hop_self is False:
+        cli += ' no-next-hop-self '
+
+    if password:
+        cli += ' password ' + password
+
+    if ebgp:
+        cli += ' ebgp-multihop ' + str(ebgp)
+
+    if prefix_listin:
+        cli += ' prefix-list-in ' + prefix_listin
+
+    if prefix_listout:
+        cli += ' prefix-list-out ' + prefix_listout
+
+    if route_reflector is True:
+        cli += ' route-reflector-client '
+    if route_reflector is False:
+        cli += ' no-route-reflector-client '
+
+    if override_capability is True:
+        cli += ' override-capability '
+    if override_capability is False:
+        cli += ' no-override-capability '
+
+    if soft_reconfig is True:
+        cli += ' soft-reconfig-inbound '
+    if soft_reconfig is False:
+        cli += ' no-soft-reconfig-inbound '
+
+    if max_prefix:
+        cli += ' max-prefix ' + str(max_prefix)
+
+    if max_prefix_warn is True:
+        cli += ' max-prefix-warn-only '
+    if max_prefix_warn is False:
+        cli += ' no-max-prefix-warn-only '
+
+    if bfd is True:
+        cli += ' bfd '
+    if bfd is False:
+        cli += ' no-bfd '
+
+    if multiprotocol:
+        cli += ' multi-protocol ' + multiprotocol
+
+    if weight:
+        cli += ' weight ' + str(weight)
+
+    if default_originate is True:
+        cli += ' default-originate '
+    if default_originate is False:
+        cli += ' no-default-originate '
 
-    # Check for vRouter
-    check_vrouter = cli + ' vrouter-show format name no-show-headers '
-    check_vrouter = shlex.split(check_vrouter)
-    out = module.run_command(check_vrouter)[1]
-    out = out.split()
+    if keepalive:
+        cli += ' neighbor-keepalive-interval ' + keepalive
 
-    VROUTER_EXISTS = True if vrouter_name in out else False
+    if holdtime:
+        cli += ' neighbor-holdtime ' + holdtime
 
-    # Check for BGP neighbors
-    show = cli + ' vrouter-bgp-show vrouter-name %s ' % vrouter_name
-    show += 'format neighbor no-show-headers'
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
-    out = out.split()
+    if route_mapin:
+        cli += ' route-map-in ' + route_mapin
 
-    NEIGHBOR_EXISTS = True if neighbor in out else False
+    if route_mapout:
+        cli += ' route-map-out ' + route_mapout
+
+    return cli, 'BGP neighbor %s %s on %s' % (
+        neighbor, 'added' if command == 'vrouter-bgp-add' else 'modified',
+        vrouter_name)
 
 
 def run_cli(module, cli):
@@ -287,10 +426,10 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str'),
             pn_cliswitch=dict(required=False, type='str', default='local'),
-            pn_command=dict(required=True, type='str',
+            pn_command=dict(required=False, type='str',
                             choices=['vrouter-bgp-add', 'vrouter-bgp-remove',
                                      'vrouter-bgp-modify']),
-            pn_vrouter_name=dict(required=True, type='str'),
+            pn_vrouter_name=dict(required=False, type='str'),
             pn_neighbor=dict(type='str'),
             pn_remote_as=dict(type='str'),
             pn_next_hop_self=dict(type='bool'),
@@ -311,154 +450,34 @@ def main():
             pn_keepalive=dict(type='str'),
             pn_holdtime=dict(type='str'),
             pn_route_mapin=dict(type='str'),
-            pn_route_mapout=dict(type='str')
-        ),
-        required_if=(
-            ["pn_command", "vrouter-bgp-add",
-             ["pn_vrouter_name", "pn_neighbor", "pn_remote_as"]],
-            ["pn_command", "vrouter-bgp-remove",
-             ["pn_vrouter_name", "pn_neighbor"]],
-            ["pn_command", "vrouter-bgp-modify",
-             ["pn_vrouter_name", "pn_neighbor"]]
+            pn_route_mapout=dict(type='str'),
+            pn_items=dict(required=False, type='list'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS)
         )
     )
 
-    # Accessing the arguments
-    command = module.params['pn_command']
-    vrouter_name = module.params['pn_vrouter_name']
-    neighbor = module.params['pn_neighbor']
-    remote_as = module.params['pn_remote_as']
-    next_hop_self = module.params['pn_next_hop_self']
-    password = module.params['pn_password']
-    ebgp = module.params['pn_ebgp']
-    prefix_listin = module.params['pn_prefix_listin']
-    prefix_listout = module.params['pn_prefix_listout']
-    route_reflector = module.params['pn_route_reflector']
-    override_capability = module.params['pn_override_capability']
-    soft_reconfig = module.params['pn_soft_reconfig']
-    max_prefix = module.params['pn_max_prefix']
-    max_prefix_warn = module.params['pn_max_prefix_warn']
-    bfd = module.params['pn_bfd']
-    multiprotocol = module.params['pn_multiprotocol']
-    weight = module.params['pn_weight']
-    default_originate = module.params['pn_default_originate']
-    keepalive = module.params['pn_keepalive']
-    holdtime = module.params['pn_holdtime']
-    route_mapin = module.params['pn_route_mapin']
-    route_mapout = module.params['pn_route_mapout']
+    if module.params['pn_items']:
+        apply_items(module, get_index, plan_item, REQUIRED, REQUIRED_IF)
+
+    check_required(module, REQUIRED, REQUIRED_IF)
 
     # Building the CLI command string
     cli = pn_cli(module)
+    command, message = plan_item(module.params,
+                                 get_index(show_runner(module, cli)))
+    if command is None:
+        module.exit_json(
+            skipped=True,
+            msg=message
+        )
 
-    if command == 'vrouter-bgp-remove':
-        check_cli(module, cli)
-        if VROUTER_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='vRouter %s does not exist' % vrouter_name
-            )
-        if NEIGHBOR_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg=('BGP neighbor with IP %s does not exist on %s'
-                     % (neighbor, vrouter_name))
-            )
-        cli += (' %s vrouter-name %s neighbor %s '
-                % (command, vrouter_name, neighbor))
-
-    else:
-
-        if command == 'vrouter-bgp-add':
-            check_cli(module, cli)
-            if VROUTER_EXISTS is False:
-                module.exit_json(
-                    skipped=True,
-                    msg='vRouter %s does not exist' % vrouter_name
-                )
-            if NEIGHBOR_EXISTS is True:
-                module.exit_json(
-                    skipped=True,
-                    msg=('BGP neighbor with IP %s already exists on %s'
-                         % (neighbor, vrouter_name))
-                )
-
-        cli += (' %s vrouter-name %s neighbor %s '
-                % (command, vrouter_name, neighbor))
-
-        if remote_as:
-            cli += ' remote-as ' + str(remote_as)
-
-        if next_hop_self is True:
-            cli += ' next-hop-self '
-        if next_hop_self is False:
-            cli += ' no-next-hop-self '
-
-        if password:
-            cli += ' password ' + password
-
-        if ebgp:
-            cli += ' ebgp-multihop ' + str(ebgp)
-
-        if prefix_listin:
-            cli += ' prefix-list-in ' + prefix_listin
-
-        if prefix_listout:
-            cli += ' prefix-list-out ' + prefix_listout
-
-        if route_reflector is True:
-            cli += ' route-reflector-client '
-        if route_reflector is False:
-            cli += ' no-route-reflector-client '
-
-        if override_capability is True:
-            cli += ' override-capability '
-        if override_capability is False:
-            cli += ' no-override-capability '
-
-        if soft_reconfig is True:
-            cli += ' soft-reconfig-inbound '
-        if soft_reconfig is False:
-            cli += ' no-soft-reconfig-inbound '
-
-        if max_prefix:
-            cli += ' max-prefix ' + str(max_prefix)
-
-        if max_prefix_warn is True:
-            cli += ' max-prefix-warn-only '
-        if max_prefix_warn is False:
-            cli += ' no-max-prefix-warn-only '
-
-        if bfd is True:
-            cli += ' bfd '
-        if bfd is False:
-            cli += ' no-bfd '
-
-        if multiprotocol:
-            cli += ' multi-protocol ' + multiprotocol
-
-        if weight:
-            cli += ' weight ' + str(weight)
-
-        if default_originate is True:
-            cli += ' default-originate '
-        if default_originate is False:
-            cli += ' no-default-originate '
-
-        if keepalive:
-            cli += ' neighbor-keepalive-interval ' + keepalive
-
-        if holdtime:
-            cli += ' neighbor-holdtime ' + holdtime
-
-        if route_mapin:
-            cli += ' route-map-in ' + route_mapin
-
-        if route_mapout:
-            cli += ' route-map-out ' + route_mapout
-
-    run_cli(module, cli)
+    run_cli(module, cli + ' ' + command)
 # Ansible boiler-plate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_items import (apply_items, check_required,
+                                          show_runner)
 
 if __name__ == '__main__':
     main()
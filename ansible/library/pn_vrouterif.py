@@ -34,14 +34,16 @@ options:
   pn_command:
     description:
       - The C(pn_command) takes the vrouter-interface command as value.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     choices: ['vrouter-interface-add', 'vrouter-interface-remove',
              'vrouter-interface-modify']
     type: str
   pn_vrouter_name:
     description:
       - Specify the name of the vRouter interface.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
   pn_vlan:
     description:
@@ -107,6 +109,20 @@ options:
     description:
       - Specify the type of NIC. Used for vrouter-interface remove/modify.
     type: str
+  pn_items:
+    description:
+      - List of vRouter interfaces to configure in one task. Every item is a
+        dictionary of the parameters above, with or without the pn_ prefix,
+        overriding the top level ones. The existing vRouter interfaces are read
+        once and every item is reported in results.
+    required: False
+    type: list
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time with
+        pn_items.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -154,13 +170,19 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+results:
+  description: One result per item of pn_items with its msg, changed,
+    skipped and failed flags, command and stdout/stderr.
+  returned: with pn_items
+  type: list
 """
 
 
-VROUTER_EXISTS = None
-INTERFACE_EXISTS = None
-NIC_EXISTS = None
-VRRP_EXISTS = None
+REQUIRED = ['pn_command', 'pn_vrouter_name']
+REQUIRED_IF = [
+    ('pn_command', 'vrouter-interface-add', ['pn_interface_ip']),
+    ('pn_command', 'vrouter-interface-remove', ['pn_nic_str'])
+]
 
 
 def pn_cli(module):
@@ -183,85 +205,142 @@ def pn_cli(module):
     return cli
 
 
-def check_cli(module, cli):
+def get_index(run):
     """
-    This method checks if vRouter exists on the target node.
-    This method also checks for idempotency using the vrouter-interface-show
-    command.
-    If the given vRouter exists, return VROUTER_EXISTS as True else False.
+    Method to read the existing vRouters and vRouter interfaces with one
+    vrouter-show and one vrouter-interface-show.
+    :param run: Function running a show command and returning its output.
+    :return: Tuple of the set of vRouter names and the list of
+    [vRouter name, ip, nic] of the interfaces.
+    """
+    vrouters = set(run('vrouter-show format name no-show-headers').split())
+    interfaces = []
+    out = run('vrouter-interface-show format ip,nic no-show-headers')
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) == 3:
+            interfaces.append(fields)
 
-    If an interface with the given ip exists on the given vRouter,
-    return INTERFACE_EXISTS as True else False. This is required for
-    vrouter-interface-add.
+    return vrouters, interfaces
 
-    If nic_str exists on the given vRouter, return NIC_EXISTS as True else
-    False. This is required for vrouter-interface-remove.
 
-    :param module: The Ansible module to fetch input parameters
-    :param cli: The CLI string
-    :return Global Booleans: VROUTER_EXISTS, INTERFACE_EXISTS, NIC_EXISTS
-    """
-    vrouter_name = module.params['pn_vrouter_name']
-    interface_ip = module.params['pn_interface_ip']
-    nic_str = module.params['pn_nic_str']
-
-    # Global flags
-    global VROUTER_EXISTS, INTERFACE_EXISTS, NIC_EXISTS
-
-    # Check for vRouter
-    check_vrouter = cli + ' vrouter-show format name no-show-headers '
-    check_vrouter = shlex.split(check_vrouter)
-    out = module.run_command(check_vrouter)[1]
-    out = out.split()
-
-    VROUTER_EXISTS = True if vrouter_name in out else False
-
-    if interface_ip:
-        # Check for interface and VRRP and fetch nic for VRRP
-        show = cli + ' vrouter-interface-show vrouter-name %s ' % vrouter_name
-        show += 'ip %s format ip,nic no-show-headers' % interface_ip
-        show = shlex.split(show)
-        out = module.run_command(show)[1]
-        INTERFACE_EXISTS = True if out else False
-
-    if nic_str:
-        # Check for nic
-        show = cli + ' vrouter-interface-show vrouter-name %s ' % vrouter_name
-        show += ' format nic no-show-headers'
-        show = shlex.split(show)
-        out = module.run_command(show)[1]
-        NIC_EXISTS = True if nic_str in out else False
-
-
-def get_nic(module, cli):
+def same_subnet(ip, other_ip):
     """
-    This module checks if VRRP interface can be added. If No, return VRRP_EXISTS
-    as True.
-    If Yes, fetch the nic string from the primary interface and return nic and
-    VRRP_EXISTS as False.
-    :param module:
-    :param cli:
-    :return: nic, Global Boolean: VRRP_EXISTS
+    Method to check if an interface ip is in the subnet of another one.
+    :param ip: Ip address of the interface, a.b.c.d/n.
+    :param other_ip: Ip address with subnet mask, a.b.c.d/n.
+    :return: True if both addresses are in the subnet of other_ip.
     """
-    vrouter_name = module.params['pn_vrouter_name']
-    interface_ip = module.params['pn_interface_ip']
+    if '/' not in other_ip:
+        return ip.split('/')[0] == other_ip
+    mask = (0xffffffff << (32 - int(other_ip.split('/')[1]))) & 0xffffffff
+    return ip_to_int(ip) & mask == ip_to_int(other_ip) & mask
 
-    global VRRP_EXISTS
 
-    # Check for interface and VRRP and fetch nic for VRRP
-    show = cli + ' vrouter-interface-show vrouter-name %s ' % vrouter_name
-    show += 'ip %s format ip,nic no-show-headers' % interface_ip
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
-    out = out.split()
+def plan_item(params, index):
+    """
+    Method to check a vRouter interface against the existing ones and build
+    its command. A VRRP interface is added with the nic of the primary
+    interface in its subnet as vrrp-primary.
+    :param params: Module parameters of the interface.
+    :param index: Index returned by get_index(), updated with the change.
+    :return: Tuple of the cli command, or None if the interface is skipped,
+    and the message.
+    """
+    vrouters, interfaces = index
+    command = params['pn_command']
+    vrouter_name = params['pn_vrouter_name']
+    vlan = params['pn_vlan']
+    interface_ip = params['pn_interface_ip']
+    assignment = params['pn_assignment']
+    vxlan = params['pn_vxlan']
+    interface = params['pn_interface']
+    alias = params['pn_alias']
+    exclusive = params['pn_exclusive']
+    nic_enable = params['pn_nic_enable']
+    vrrp_id = params['pn_vrrp_id']
+    vrrp_priority = params['pn_vrrp_priority']
+    vrrp_adv_int = params['pn_vrrp_adv_int']
+    l3port = params['pn_l3port']
+    secondary_macs = params['pn_secondary_macs']
+    nic_str = params['pn_nic_str']
+
+    if vrouter_name not in vrouters:
+        return None, 'vRouter %s does not exist' % vrouter_name
+
+    if command == 'vrouter-interface-remove':
+        for interface_fields in interfaces:
+            if interface_fields[0] == vrouter_name and \
+                    interface_fields[2] == nic_str:
+                interfaces.remove(interface_fields)
+                cli = (' %s vrouter-name %s nic %s '
+                       % (command, vrouter_name, nic_str))
+                return cli, 'vRouter interface %s removed from %s' % (
+                    nic_str, vrouter_name)
+        return None, 'vRouter interface with nic %s does not exist' % nic_str
+
+    if vrrp_id:
+        subnet = [fields[2] for fields in interfaces
+                  if fields[0] == vrouter_name and
+                  same_subnet(fields[1], interface_ip)]
+        if len(subnet) > 1:
+            return None, ('VRRP interface on %s already exists. Check '
+                          'the IP addresses' % vrouter_name)
+        if not subnet:
+            return None, ('Primary interface of %s does not exist on %s'
+                          % (interface_ip, vrouter_name))
+        cli = ' %s vrouter-name %s ' % (command, vrouter_name)
+        cli += (' ip %s vrrp-primary %s vrrp-id %s '
+                % (interface_ip, subnet[0], str(vrrp_id)))
+        if vrrp_priority:
+            cli += ' vrrp-priority %s ' % str(vrrp_priority)
+        if vrrp_adv_int:
+            cli += ' vrrp-adv-int %s ' % vrrp_adv_int
 
-    if len(out) > 3:
-        VRRP_EXISTS = True
-        return None
     else:
-        nic = out[2]
-        VRRP_EXISTS = False
-        return nic
+        if [vrouter_name, interface_ip] in [fields[:2]
+                                            for fields in interfaces]:
+            return None, ('vRouter interface on %s already exists. Check the '
+                          'IP addresses' % vrouter_name)
+        cli = ' %s vrouter-name %s ' % (command, vrouter_name)
+        cli += ' ip %s ' % interface_ip
+
+    # The nic is only known once the interface exists.
+    interfaces.append([vrouter_name, interface_ip, None])
+
+    if vlan:
+        cli += ' vlan ' + str(vlan)
+
+    if l3port:
+        cli += ' l3-port ' + l3port
+
+    if assignment:
+        cli += ' assignment ' + assignment
+
+    if vxlan:
+        cli += ' vxlan ' + str(vxlan)
+
+    if interface:
+        cli += ' if ' + interface
+
+    if alias:
+        cli += ' alias-on ' + alias
+
+    if exclusive is True:
+        cli += ' exclusive '
+    if exclusive is False:
+        cli += ' no-exclusive '
+
+    if nic_enable is True:
+        cli += ' nic-enable '
+    if nic_enable is False:
+        cli += ' nic-disable '
+
+    if secondary_macs:
+        cli += ' secondary-macs ' + secondary_macs
+
+    return cli, 'vRouter interface %s added to %s' % (interface_ip,
+                                                      vrouter_name)
 
 
 def run_cli(module, cli):
@@ -314,12 +393,12 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str'),
             pn_cliswitch=dict(required=False, type='str', default='local'),
-            pn_command=dict(required=True, type='str',
+            pn_command=dict(required=False, type='str',
                             choices=['vrouter-interface-add',
                                      'vrouter-interface-remove']),
-            pn_vrouter_name=dict(required=True, type='str'),
+            pn_vrouter_name=dict(required=False, type='str'),
             pn_vlan=dict(type='int'),
-            pn_interface_ip=dict(required=True, type='str'),
+            pn_interface_ip=dict(required=False, type='str'),
             pn_assignment=dict(type='str',
                                choices=['none', 'dhcp', 'dhcpv6', 'autov6']),
             pn_vxlan=dict(type='int'),
@@ -332,118 +411,35 @@ def main():
             pn_vrrp_adv_int=dict(type='str'),
             pn_l3port=dict(type='str'),
             pn_secondary_macs=dict(type='str'),
-            pn_nic_str=dict(type='str')
-        ),
-        required_if=(
-            ["pn_command", "vrouter-interface-add",
-             ["pn_vrouter_name", "pn_interface_ip"]],
-            ["pn_command", "vrouter-interface-remove",
-             ["pn_vrouter_name", "pn_nic_str"]]
-        ),
+            pn_nic_str=dict(type='str'),
+            pn_items=dict(required=False, type='list'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS)
+        )
     )
 
-    # Accessing the arguments
-    command = module.params['pn_command']
-    vrouter_name = module.params['pn_vrouter_name']
-    vlan = module.params['pn_vlan']
-    interface_ip = module.params['pn_interface_ip']
-    assignment = module.params['pn_assignment']
-    vxlan = module.params['pn_vxlan']
-    interface = module.params['pn_interface']
-    alias = module.params['pn_alias']
-    exclusive = module.params['pn_exclusive']
-    nic_enable = module.params['pn_nic_enable']
-    vrrp_id = module.params['pn_vrrp_id']
-    vrrp_priority = module.params['pn_vrrp_priority']
-    vrrp_adv_int = module.params['pn_vrrp_adv_int']
-    l3port = module.params['pn_l3port']
-    secondary_macs = module.params['pn_secondary_macs']
-    nic_str = module.params['pn_nic_str']
+    if module.params['pn_items']:
+        apply_items(module, get_index, plan_item, REQUIRED, REQUIRED_IF)
+
+    check_required(module, REQUIRED, REQUIRED_IF)
 
     # Building the CLI command string
     cli = pn_cli(module)
+    command, message = plan_item(module.params,
+                                 get_index(show_runner(module, cli)))
+    if command is None:
+        module.exit_json(
+            skipped=True,
+            msg=message
+        )
 
-    check_cli(module, cli)
-    if command == 'vrouter-interface-add':
-        if VROUTER_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='vRouter %s does not exist' % vrouter_name
-            )
-
-        if vrrp_id:
-            vrrp_primary = get_nic(module, cli)
-            if VRRP_EXISTS is True:
-                module.exit_json(
-                    skipped=True,
-                    msg=('VRRP interface on %s already exists. Check '
-                         'the IP addresses' % vrouter_name)
-                )
-            cli += ' %s vrouter-name %s ' % (command, vrouter_name)
-            cli += (' ip %s vrrp-primary %s vrrp-id %s '
-                    % (interface_ip, vrrp_primary, str(vrrp_id)))
-            if vrrp_priority:
-                cli += ' vrrp-priority %s ' % str(vrrp_priority)
-            if vrrp_adv_int:
-                cli += ' vrrp-adv-int %s ' % vrrp_adv_int
-
-        else:
-            if INTERFACE_EXISTS is True:
-                module.exit_json(
-                    skipped=True,
-                    msg=('vRouter interface on %s already exists. Check the '
-                         'IP addresses' % vrouter_name)
-                )
-            cli += ' %s vrouter-name %s ' % (command, vrouter_name)
-            cli += ' ip %s ' % interface_ip
-
-        if vlan:
-            cli += ' vlan ' + str(vlan)
-
-        if l3port:
-            cli += ' l3-port ' + l3port
-
-        if assignment:
-            cli += ' assignment ' + assignment
-
-        if vxlan:
-            cli += ' vxlan ' + str(vxlan)
-
-        if interface:
-            cli += ' if ' + interface
-
-        if alias:
-            cli += ' alias-on ' + alias
-
-        if exclusive is True:
-            cli += ' exclusive '
-        if exclusive is False:
-            cli += ' no-exclusive '
-
-        if nic_enable is True:
-            cli += ' nic-enable '
-        if nic_enable is False:
-            cli += ' nic-disable '
-
-        if secondary_macs:
-            cli += ' secondary-macs ' + secondary_macs
-
-    if command == 'vrouter-interface-remove':
-        if VROUTER_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='vRouter %s does not exist' % vrouter_name
-            )
-        if NIC_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='vRouter interface with nic %s does not exist' % nic_str
-            )
-        cli += ' %s vrouter-name %s nic %s ' % (command, vrouter_name, nic_str)
-
-    run_cli(module, cli)
+    run_cli(module, cli + ' ' + command)
 # Ansible boiler-plate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_items import (apply_items, check_required,
+                                          show_runner)
+from ansible.module_utils.pn_numbering import ip_to_int
 
 if __name__ == '__main__':
     main()
@@ -50,13 +50,15 @@ options:
     description:
       - The C(pn_command) takes the vrouter-loopback-interface command
         as value.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     choices: ['vrouter-loopback-interface-add', 'vrouter-loopback-interface-remove']
     type: str
   pn_vrouter_name:
     description:
       - Specify the name of the vRouter.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
   pn_index:
     description:
@@ -65,8 +67,23 @@ options:
   pn_interface_ip:
     description:
       - Specify the IP address.
-    required: True
+      - Required unless given in every item of pn_items.
+    required: False
     type: str
+  pn_items:
+    description:
+      - List of loopback interfaces to configure in one task. Every item is a
+        dictionary of the parameters above, with or without the pn_ prefix,
+        overriding the top level ones. The existing loopback interfaces are
+        read once and every item is reported in results.
+    required: False
+    type: list
+  pn_max_workers:
+    description:
+      - Maximum number of switches configured at the same time with
+        pn_items.
+    required: False
+    type: int
 """
 
 EXAMPLES = """
@@ -98,11 +115,18 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+results:
+  description: One result per item of pn_items with its msg, changed,
+    skipped and failed flags, command and stdout/stderr.
+  returned: with pn_items
+  type: list
 """
 
 
-VROUTER_EXISTS = None
-LB_INTERFACE_EXISTS = None
+REQUIRED = ['pn_command', 'pn_vrouter_name', 'pn_interface_ip']
+REQUIRED_IF = [
+
+]
 # Index range
 MIN_INDEX = 1
 MAX_INDEX = 255
@@ -128,41 +152,73 @@ def pn_cli(module):
     return cli
 
 
-def check_cli(module, cli):
+def get_index(run):
     """
-    This method checks if vRouter exists on the target node.
-    This method also checks for idempotency using the
-    vrouter-loopback-interface-show command.
-    If the given vRouter exists, return VROUTER_EXISTS as True else False.
-    If a loopback interface with the given ip exists on the given vRouter,
-    return LB_INTERFACE_EXISTS as True else False.
-
-    :param module: The Ansible module to fetch input parameters
-    :param cli: The CLI string
-    :return Global Booleans: VROUTER_EXISTS, LB_INTERFACE_EXISTS
+    Method to read the existing vRouters and loopback interfaces with one
+    vrouter-show and one vrouter-loopback-interface-show.
+    :param run: Function running a show command and returning its output.
+    :return: Tuple of the set of vRouter names and the dictionary of
+    (vRouter name, ip): index of the loopback interfaces.
     """
-    vrouter_name = module.params['pn_vrouter_name']
-    interface_ip = module.params['pn_interface_ip']
+    vrouters = set(run('vrouter-show format name no-show-headers').split())
+    loopbacks = {}
+    out = run('vrouter-loopback-interface-show format ip,index '
+              'no-show-headers')
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) == 3:
+            loopbacks[(fields[0], fields[1])] = fields[2]
 
-    # Global flags
-    global VROUTER_EXISTS, LB_INTERFACE_EXISTS
+    return vrouters, loopbacks
 
-    # Check for vRouter
-    check_vrouter = cli + ' vrouter-show format name no-show-headers '
-    check_vrouter = shlex.split(check_vrouter)
-    out = module.run_command(check_vrouter)[1]
-    out = out.split()
 
-    VROUTER_EXISTS = True if vrouter_name in out else False
+def plan_item(params, index):
+    """
+    Method to check a loopback interface against the existing ones and
+    build its command.
+    :param params: Module parameters of the loopback interface.
+    :param index: Index returned by get_index(), updated with the change.
+    :return: Tuple of the cli command, or None if the interface is skipped,
+    and the message.
+    """
+    vrouters, loopbacks = index
+    command = params['pn_command']
+    vrouter_name = params['pn_vrouter_name']
+    interface_ip = params['pn_interface_ip']
+    lb_index = params['pn_index']
 
-    # Check for loopback interface
-    show = (cli + ' vrouter-loopback-interface-show vrouter-name %s format ip '
-            'no-show-headers' % vrouter_name)
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
-    out = out.split()
+    if lb_index:
+        if not MIN_INDEX <= lb_index <= MAX_INDEX:
+            raise ValueError('Index must be between 1 and 255')
+        lb_index = str(lb_index)
 
-    LB_INTERFACE_EXISTS = True if interface_ip in out else False
+    if vrouter_name not in vrouters:
+        return None, 'vRouter %s does not exist' % vrouter_name
+    key = (vrouter_name, interface_ip)
+
+    if command == 'vrouter-loopback-interface-remove':
+        if key not in loopbacks:
+            return None, ('Loopback interface with IP %s does not exist on %s'
+                          % (interface_ip, vrouter_name))
+        # To remove loopback interface, we need the index.
+        lb_index = lb_index or loopbacks[key]
+        del loopbacks[key]
+        cli = ' %s vrouter-name %s index %s' % (command, vrouter_name,
+                                                lb_index)
+        return cli, 'Loopback interface %s removed from %s' % (interface_ip,
+                                                               vrouter_name)
+
+    if key in loopbacks:
+        return None, ('Loopback interface with IP %s already exists on %s'
+                      % (interface_ip, vrouter_name))
+    loopbacks[key] = lb_index
+    cli = (' %s vrouter-name %s ip %s'
+           % (command, vrouter_name, interface_ip))
+    if lb_index:
+        cli += ' index %s ' % lb_index
+
+    return cli, 'Loopback interface %s added to %s' % (interface_ip,
+                                                       vrouter_name)
 
 
 def run_cli(module, cli):
@@ -215,88 +271,46 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str'),
             pn_cliswitch=dict(required=False, type='str', default='local'),
-            pn_command=dict(required=True, type='str',
+            pn_command=dict(required=False, type='str',
                             choices=['vrouter-loopback-interface-add',
                                      'vrouter-loopback-interface-remove']),
-            pn_vrouter_name=dict(required=True, type='str'),
+            pn_vrouter_name=dict(required=False, type='str'),
             pn_interface_ip=dict(type='str'),
-            pn_index=dict(type='int')
-        ),
-        required_if=(
-            ["pn_command", "vrouter-loopback-interface-add",
-             ["pn_vrouter_name", "pn_interface_ip"]],
-            ["pn_command", "vrouter-loopback-interface-remove",
-             ["pn_vrouter_name", "pn_interface_ip"]]
+            pn_index=dict(type='int'),
+            pn_items=dict(required=False, type='list'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS)
         )
     )
 
-    # Accessing the arguments
-    command = module.params['pn_command']
-    vrouter_name = module.params['pn_vrouter_name']
-    interface_ip = module.params['pn_interface_ip']
-    index = module.params['pn_index']
+    if module.params['pn_items']:
+        apply_items(module, get_index, plan_item, REQUIRED, REQUIRED_IF)
+
+    check_required(module, REQUIRED, REQUIRED_IF)
 
     # Building the CLI command string
     cli = pn_cli(module)
+    try:
+        command, message = plan_item(module.params,
+                                     get_index(show_runner(module, cli)))
+    except ValueError as error:
+        module.exit_json(
+            msg=str(error),
+            changed=False
+        )
+    if command is None:
+        module.exit_json(
+            skipped=True,
+            msg=message
+        )
 
-    if index:
-        if not MIN_INDEX <= index <= MAX_INDEX:
-            module.exit_json(
-                msg="Index must be between 1 and 255",
-                changed=False
-            )
-        index = str(index)
-
-    if command == 'vrouter-loopback-interface-remove':
-        check_cli(module, cli)
-        if VROUTER_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg='vRouter %s does not exist' % vrouter_name
-            )
-        if LB_INTERFACE_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg=('Loopback interface with IP %s does not exist on %s'
-                     % (interface_ip, vrouter_name))
-            )
-        if not index:
-            # To remove loopback interface, we need the index.
-            # If index is not specified, get the Loopback interface index
-            # using the given interface ip.
-            get_index = cli
-            get_index += (' vrouter-loopback-interface-show vrouter-name %s ip '
-                          '%s ' % (vrouter_name, interface_ip))
-            get_index += 'format index no-show-headers'
-
-            get_index = shlex.split(get_index)
-            out = module.run_command(get_index)[1]
-            index = out.split()[1]
-
-        cli += ' %s vrouter-name %s index %s' % (command, vrouter_name, index)
-
-    if command == 'vrouter-loopback-interface-add':
-        check_cli(module, cli)
-        if VROUTER_EXISTS is False:
-            module.exit_json(
-                skipped=True,
-                msg=('vRouter %s does not exist' % vrouter_name)
-            )
-        if LB_INTERFACE_EXISTS is True:
-            module.exit_json(
-                skipped=True,
-                msg=('Loopback interface with IP %s already exists on %s'
-                     % (interface_ip, vrouter_name))
-            )
-        cli += (' %s vrouter-name %s ip %s'
-                % (command, vrouter_name, interface_ip))
-        if index:
-            cli += ' index %s ' % index
-
-    run_cli(module, cli)
+    run_cli(module, cli + ' ' + command)
 
 # Ansible boiler-plate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_executor import DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_items import (apply_items, check_required,
+                                          show_runner)
 
 if __name__ == '__main__':
     main()
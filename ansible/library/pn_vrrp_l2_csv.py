@@ -19,6 +19,10 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_csv import VRRP_L2_SCHEMA, load_csv
+from ansible.module_utils.pn_executor import CliExecutor, DEFAULT_MAX_WORKERS
+from ansible.module_utils.pn_shard import shard_executor
+from ansible.module_utils.pn_vrrp import VrrpPlan, apply_vrrp_plan
 import shlex
 
 DOCUMENTATION = """
@@ -59,6 +63,27 @@ options:
         - String containing vrrp data parsed from csv file.
       required: False
       type: str
+    pn_max_workers:
+      description:
+        - Maximum number of switches configured at the same time. The
+          missing configuration of each switch is applied in order, and
+          concurrently across switches.
+      required: False
+      type: int
+    pn_shard_seeds:
+      description:
+        - List of seed switches sharing the configuration of the fabric,
+          usually "{{ groups['spine'] }}" with the play running on every
+          spine. Each seed configures itself and its share of the other
+          switches; pn_shard_merge combines the results of the seeds.
+      required: False
+      type: list
+    pn_current_switch:
+      description:
+        - Name of the seed switch the module runs on, usually
+          "{{ inventory_hostname }}". Required with pn_shard_seeds.
+      required: False
+      type: str
 """
 
 EXAMPLES = """
@@ -85,6 +110,12 @@ failed:
   description: Indicates whether or not the execution failed on the target.
   returned: always
   type: bool
+shard:
+  description: Switches configured by this seed, assignment of the fabric
+    switches to the seeds and digest of the plan, when pn_shard_seeds is
+    given.
+  returned: always
+  type: dict
 """
 
 
@@ -133,210 +164,58 @@ def run_cli(module, cli):
         return 'Success'
 
 
-def create_vlan(module, vlan_id):
-    """
-    Method to create a vlan.
-    :param module: The Ansible module to fetch input parameters.
-    :param vlan_id: vlan id to be created.
-    :return: String describing if vlan got created or if it already exists.
-    """
-    global CHANGED_FLAG
-    cli = pn_cli(module)
-    clicopy = cli
-
-    cli += ' vlan-show format id no-show-headers '
-    existing_vlans = run_cli(module, cli).split()
-    existing_vlans = list(set(existing_vlans))
-
-    if vlan_id not in existing_vlans:
-        cli = clicopy
-        cli += ' vlan-create id %s scope fabric ' % vlan_id
-        run_cli(module, cli)
-        output = ' vlan with id %s created successfully! ' % vlan_id
-        CHANGED_FLAG.append(True)
-    else:
-        output = ' vlan with id %s already exists! ' % vlan_id
-        CHANGED_FLAG.append(False)
-
-    return output
-
-
-def get_vrouter_name(module, switch_name):
+def get_global_vnet_name(module):
     """
-    Method to return name of the vrouter.
+    Method to get global vnet name, required for vrouters creation.
     :param module: The Ansible module to fetch input parameters.
-    :param switch_name: Name of the switch for which to find the vrouter.
-    :return: Vrouter name.
+    :return: Global vnet name.
     """
     cli = pn_cli(module)
-    cli += ' vrouter-show location ' + switch_name
-    cli += ' format name no-show-headers '
-    return run_cli(module, cli).split()[0]
-
-
-def create_vrouter(module, switch, vrrp_id):
-    """
-    Method to create vrouter and assign vrrp_id to the switches.
-    :param module: The Ansible module to fetch input parameters.
-    :param switch: The switch name on which vrouter will be created.
-    :param vrrp_id: The vrrp_id to be assigned.
-    :return: The output string informing details of vrouter created and
-    interface added or if vrouter already exists.
-    """
-    global CHANGED_FLAG
-    cli = pn_cli(module)
-    clicopy = cli
     cli += ' fabric-node-show format fab-name no-show-headers '
     fabric_name = list(set(run_cli(module, cli).split()))[0]
-    vnet_name = str(fabric_name) + '-global'
-    vrouter_name = switch + '-vrouter'
-    cli = clicopy
-    cli += ' switch ' + switch
-    clicopy = cli
-
-    # Check if vrouter already exists
-    cli += ' vrouter-show format name no-show-headers '
-    existing_vrouter_names = run_cli(module, cli).split()
-
-    # If vrouter doesn't exists then create it
-    if vrouter_name not in existing_vrouter_names:
-        cli = clicopy
-        cli += ' vrouter-create name %s vnet %s hw-vrrp-id %s enable ' % (
-            vrouter_name, vnet_name, vrrp_id)
-        run_cli(module, cli)
-        output = ' Created vrouter %s on switch %s! ' % (vrouter_name, switch)
-        CHANGED_FLAG.append(True)
-    else:
-        output = ' Vrouter name %s on switch %s already exists! ' % (
-            vrouter_name, switch)
-        CHANGED_FLAG.append(False)
-
-    return output
-
-
-def create_vrouter_interface(module, switch, ip, vlan_id, vrrp_id, ip_count,
-                             vrrp_priority):
-    """
-    Method to add vrouter interface and assign IP to it along with
-    vrrp_id and vrrp_priority.
-    :param module: The Ansible module to fetch input parameters.
-    :param switch: The switch name on which interfaces will be created.
-    :param ip: IP address to be assigned to vrouter interface.
-    :param vlan_id: vlan_id to be assigned.
-    :param vrrp_id: vrrp_id to be assigned.
-    :param vrrp_priority: priority to be given(110 for active switch).
-    :param ip_count: The value of fourth octet in the ip
-    :return: String describing if vrouter interface got added or not.
-    """
-    global CHANGED_FLAG
-    vrouter_name = get_vrouter_name(module, switch)
-    ip_addr = ip.split('.')
-    fourth_octet = ip_addr[3].split('/')
-    subnet = fourth_octet[1]
-
-    static_ip = ip_addr[0] + '.' + ip_addr[1] + '.' + ip_addr[2] + '.'
-    ip1 = static_ip + '1' + '/' + subnet
-    ip2 = static_ip + ip_count + '/' + subnet
-
-    cli = pn_cli(module)
-    clicopy = cli
-    cli += ' vrouter-interface-show vlan %s ip %s ' % (vlan_id, ip2)
-    cli += ' format switch no-show-headers '
-    existing_vrouter = run_cli(module, cli).split()
-    existing_vrouter = list(set(existing_vrouter))
-
-    if vrouter_name not in existing_vrouter:
-        cli = clicopy
-        cli += ' vrouter-interface-add vrouter-name ' + vrouter_name
-        cli += ' ip ' + ip2
-        cli += ' vlan %s if data ' % vlan_id
-        run_cli(module, cli)
-        output = ' Added vrouter interface with ip %s to %s!' % (ip2,
-                                                                 vrouter_name)
-        CHANGED_FLAG.append(True)
-    else:
-        output = ' Interface %s already exists for vrouter %s! ' % (
-            ip2, vrouter_name)
-        CHANGED_FLAG.append(False)
-
-    cli = clicopy
-    cli += ' vrouter-interface-show vrouter-name %s ip %s vlan %s ' % (
-        vrouter_name, ip2, vlan_id)
-    cli += ' format nic no-show-headers '
-    eth_port = run_cli(module, cli).split()
-    eth_port.remove(vrouter_name)
-
-    cli = clicopy
-    cli += ' vrouter-interface-show vlan %s ip %s vrrp-primary %s ' % (
-        vlan_id, ip1, eth_port[0])
-    cli += ' format switch no-show-headers '
-    existing_vrouter = run_cli(module, cli).split()
-    existing_vrouter = list(set(existing_vrouter))
-
-    if vrouter_name not in existing_vrouter:
-        cli = clicopy
-        cli += ' vrouter-interface-add vrouter-name ' + vrouter_name
-        cli += ' ip ' + ip1
-        cli += ' vlan %s if data vrrp-id %s ' % (vlan_id, vrrp_id)
-        cli += ' vrrp-primary %s vrrp-priority %s ' % (eth_port[0],
-                                                       vrrp_priority)
-        run_cli(module, cli)
-        output += ' Added vrouter interface with ip %s to %s! ' % (ip1,
-                                                                   vrouter_name)
-        CHANGED_FLAG.append(True)
-
-    else:
-        output += ' Interface %s already exists for vrouter %s! ' % (
-            ip1, vrouter_name)
-        CHANGED_FLAG.append(False)
-
-    return output
-
-
-def configure_vrrp(module, vrrp_id, vrrp_ip, active_switch, vlan_id):
-    """
-    Method to configure vrrp interfaces.
-    :param module: The Ansible module to fetch input parameters.
-    :param vrrp_id: The vrrp_id need to be assigned.
-    :param vrrp_ip: The vrrp_ip needed to be assigned.
-    :param active_switch: The name of the active switch.
-    :param vlan_id: The vlan_id to be assigned.
-    :return: Output of the created vrrp configuration.
-    """
-    output = create_vlan(module, vlan_id)
-    host_count = 1
-    for spine in module.params['pn_spine_list']:
-        host_count += 1
-        vrrp_priority = '110' if spine == active_switch else '100'
-        output += create_vrouter_interface(module, spine, vrrp_ip, vlan_id,
-                                           vrrp_id, str(host_count),
-                                           vrrp_priority)
-    return output
+    return str(fabric_name) + '-global'
 
 
 def configure_vrrp_l2(module, csv_data, vrrp_id):
     """
-    Method to configure VRRP for L2.
+    Method to configure VRRP for L2. The configuration of all csv rows is
+    computed first and only what is missing in the fabric gets configured.
     :param module: The Ansible module to fetch input parameters.
     :param csv_data: CSV data describing different vrrp attributes.
     :param vrrp_id: The vrrp id to be assigned.
-    :return: Output of created vrrp configuration.
+    :return: Tuple of the output of created vrrp configuration and the
+    Shard, or None.
     """
-    output = ''
-    for switch in module.params['pn_spine_list']:
-        output += create_vrouter(module, switch, vrrp_id)
-
-    csv_data = csv_data.replace(" ", "")
-    csv_data_list = csv_data.split('\n')
-    for row in csv_data_list:
-        elements = row.split(',')
-        vrrp_ip = elements[0]
-        vlan_id = elements[1]
-        active_switch = str(elements[2])
-        output += configure_vrrp(module, vrrp_id, vrrp_ip, active_switch,
-                                 vlan_id)
+    global CHANGED_FLAG
+    spine_list = module.params['pn_spine_list']
+    table = load_csv(module, csv_data, VRRP_L2_SCHEMA, switches=spine_list)
+
+    plan = VrrpPlan(get_global_vnet_name(module), report_existing=True)
+    for switch in spine_list:
+        plan.add_vrouter(switch, vrrp_id)
+
+    for row in table.rows:
+        vlan_id = str(row.vlan_id)
+        plan.add_vlan(vlan_id, row.active_switch)
+        plan.add_vrrp_pair(vlan_id, row.vrrp_ip, vrrp_id, spine_list,
+                           row.active_switch)
+
+    executor = CliExecutor(module, module.params['pn_max_workers'])
+    shard = shard_executor(module, executor, [csv_data, vrrp_id],
+                           plan.peers)
+    output, changed, failed = apply_vrrp_plan(executor, plan)
+    CHANGED_FLAG.append(changed)
+    if failed is not None:
+        module.exit_json(
+            error='1',
+            failed=True,
+            stderr=failed.err.strip(),
+            msg='Operation Failed: ' + failed.command,
+            shard=shard.summary() if shard else None,
+            changed=changed
+        )
 
-    return output
+    return output, shard
 
 
 def main():
@@ -349,16 +228,21 @@ def main():
             pn_leaf_list=dict(required=False, type='list'),
             pn_vrrp_id=dict(required=False, type='str', default='18'),
             pn_csv_data=dict(required=True, type='str'),
+            pn_max_workers=dict(required=False, type='int',
+                                default=DEFAULT_MAX_WORKERS),
+            pn_shard_seeds=dict(required=False, type='list'),
+            pn_current_switch=dict(required=False, type='str'),
         )
     )
 
     global CHANGED_FLAG
     CHANGED_FLAG = []
-    message = configure_vrrp_l2(module, module.params['pn_csv_data'],
-                                module.params['pn_vrrp_id'])
+    message, shard = configure_vrrp_l2(module, module.params['pn_csv_data'],
+                                       module.params['pn_vrrp_id'])
 
     module.exit_json(
         stdout=message,
+        shard=shard.summary() if shard else None,
         error='0',
         failed=False,
         changed=True if True in CHANGED_FLAG else False
@@ -19,6 +19,7 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_csv import VXLAN_SCHEMA, load_csv
 import re
 import shlex
 
@@ -362,29 +363,21 @@ def configure_vxlan(module, csv_data):
     :return: String describing output of vxlan configuration.
     """
     output = ''
-    csv_data = csv_data.replace(" ", "")
-    csv_data_list = csv_data.split('\n')
-    for row in csv_data_list:
-        elements = row.split(',')
-        vlan_id = elements[0]
-        leaf_switch_1 = elements[2]
-        if len(elements) == 8:
-            leaf_switch_2 = elements[3]
-            vxlan_id = elements[6]
-            loopback_port = elements[7]
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id)
-            output += configure_vtep_for_clustered_leafs(module, leaf_switch_1,
+    table = load_csv(module, csv_data, VXLAN_SCHEMA,
+                     switches=module.params['pn_leaf_list'])
+    for row in table.rows:
+        vlan_id = str(row.vlan_id)
+        vxlan_id = str(row.vxlan_id)
+        output += add_vxlan_to_vlan(module, vlan_id, vxlan_id)
+        if row.switch_2 is not None:
+            output += configure_vtep_for_clustered_leafs(module, row.switch_1,
                                                          vlan_id, vxlan_id)
-            output += configure_vtep_for_clustered_leafs(module, leaf_switch_2,
+            output += configure_vtep_for_clustered_leafs(module, row.switch_2,
                                                          vlan_id, vxlan_id)
-            add_ports_to_vxlan_loopback_trunk(module, loopback_port)
-        elif len(elements) == 5:
-            vxlan_id = elements[3]
-            loopback_port = elements[4]
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id)
+        else:
             output += configure_vtep_for_non_clustered_leafs(
-                module, leaf_switch_1, vlan_id, vxlan_id)
-            add_ports_to_vxlan_loopback_trunk(module, loopback_port)
+                module, row.switch_1, vlan_id, vxlan_id)
+        add_ports_to_vxlan_loopback_trunk(module, row.loopback_port)
 
     return output
 
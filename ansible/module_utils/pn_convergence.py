@@ -0,0 +1,318 @@
+""" PN routing convergence monitor """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Waits for the routing adjacencies of the fabric to come up after the
+configuration, and measures how long they took.
+
+The expected adjacencies are read from the configuration of the fabric:
+    - bgp: every neighbor of vrouter-bgp-show, inside the fabric or not.
+    - ospf: every point-to-point (/30 or /31) vrouter interface inside an
+      ospf network of its vrouter, whose other address belongs to another
+      fabric vrouter.
+
+The neighbor state of the whole fabric is then polled with one
+vrouter-bgp-neighbor-show and one vrouter-ospf-neighbor-show, run
+concurrently, until every expected adjacency is Established (bgp) or Full
+(ospf) or the deadline passes. The wait between polls starts at the poll
+interval and grows by BACKOFF_FACTOR up to the maximum interval.
+
+A switch converged at the first poll from which all of its adjacencies were
+up; an adjacency going down again resets it. The fabric converged when every
+switch did.
+"""
+
+import time
+
+from ansible.module_utils.pn_executor import Deadline
+from ansible.module_utils.pn_preflight import subnet_range
+from ansible.module_utils.pn_verify import (POINT_TO_POINT_PREFIXES, address,
+                                            is_vip, read_rows)
+
+PROTOCOLS = ('bgp', 'ospf')
+BACKOFF_FACTOR = 1.5
+
+# (attribute, show command, fields of the rows) of the configuration.
+PLAN_SHOWS = [
+    ('vrouters', 'vrouter-show', ['name', 'location', 'router-id']),
+    ('interfaces', 'vrouter-interface-show',
+     ['vrouter-name', 'ip', 'vrrp-state', 'is-vip']),
+    ('loopbacks', 'vrouter-loopback-interface-show', ['vrouter-name', 'ip']),
+    ('bgp', 'vrouter-bgp-show', ['vrouter-name', 'neighbor', 'remote-as']),
+    ('ospf', 'vrouter-ospf-show', ['vrouter-name', 'network']),
+]
+
+# protocol -> (show command, fields of the rows) of the neighbor state.
+STATE_SHOWS = {
+    'bgp': ('vrouter-bgp-neighbor-show', ['vrouter-name', 'neighbor',
+                                          'state']),
+    'ospf': ('vrouter-ospf-neighbor-show', ['vrouter-name', 'ip',
+                                            'neighbor', 'state']),
+}
+
+
+class Adjacency(object):
+    """
+    Routing adjacency expected between a switch and a neighbor.
+    """
+
+    def __init__(self, protocol, switch, neighbor, peer=None, router_id=None):
+        """
+        :param protocol: One of PROTOCOLS.
+        :param switch: Switch of the vrouter the adjacency is configured on.
+        :param neighbor: Ip of the neighbor.
+        :param peer: Fabric switch owning the neighbor ip, or None.
+        :param router_id: Router id of the peer, which ospf reports as the
+        neighbor.
+        """
+        self.protocol = protocol
+        self.switch = switch
+        self.neighbor = neighbor
+        self.peer = peer
+        self.router_id = router_id
+        self.up = False
+
+    def key(self):
+        """ Key of the adjacency in the neighbor state. """
+        return (self.protocol, self.switch, self.neighbor)
+
+    def describe(self):
+        """ Adjacency in the result of the module. """
+        return '%s %s -> %s%s' % (self.protocol, self.switch, self.neighbor,
+                                  ' (%s)' % self.peer if self.peer else '')
+
+
+def in_network(ip, network):
+    """
+    Method to check whether an ipv4 address is inside a network.
+    :param ip: Ip address, with or without prefix length.
+    :param network: Network in a.b.c.d/n format.
+    :return: True if the address is in the network.
+    """
+    if ':' in str(ip) or '/' not in str(network):
+        return False
+    first, last = subnet_range(network)
+    value = subnet_range(address(ip) + '/32')[0]
+    return first <= value <= last
+
+
+def other_address(ip):
+    """
+    Method to find the other host address of a point-to-point subnet.
+    :param ip: Ip address with prefix length, a.b.c.d/30 or a.b.c.d/31.
+    :return: The other address, or None if the subnet is not
+    point-to-point.
+    """
+    text, _, prefix = str(ip).partition('/')
+    if ':' in text or not prefix.isdigit() or \
+            int(prefix) not in POINT_TO_POINT_PREFIXES:
+        return None
+    first, last = subnet_range(ip)
+    value = subnet_range(text + '/32')[0]
+    if int(prefix) == 30:
+        first, last = first + 1, last - 1
+    if value not in (first, last):
+        return None
+    other = last if value == first else first
+    return '.'.join(str((other >> shift) & 0xff)
+                    for shift in (24, 16, 8, 0))
+
+
+def read_plan(executor, protocols):
+    """
+    Method to read the adjacencies expected from the configuration of the
+    fabric, the shows running concurrently.
+    :param executor: CliExecutor used to run the shows.
+    :param protocols: List of protocols to expect adjacencies for.
+    :return: Tuple of the list of Adjacency, the dictionary of vrouter name:
+    switch and the failed CommandResult, or None.
+    """
+    rows = {}
+    for _, attribute, plan_rows, failed in read_rows(
+            executor, [(None, attribute, command, fields)
+                       for attribute, command, fields in PLAN_SHOWS
+                       if attribute not in PROTOCOLS or
+                       attribute in protocols]):
+        if failed is not None:
+            return [], {}, failed
+        rows[attribute] = plan_rows
+
+    locations = dict((row['name'], row['location'])
+                     for row in rows['vrouters'])
+    router_ids = dict((row['location'], row.get('router-id'))
+                      for row in rows['vrouters'])
+    owners = {}
+    interfaces = {}
+    for row in rows['interfaces'] + rows['loopbacks']:
+        switch = locations.get(row['vrouter-name'])
+        if switch and row.get('ip') and not is_vip(row):
+            owners.setdefault(address(row['ip']), switch)
+            interfaces.setdefault(switch, []).append(row['ip'])
+
+    adjacencies = []
+    for row in rows.get('bgp', []):
+        switch = locations.get(row['vrouter-name'])
+        neighbor = address(row.get('neighbor'))
+        if switch:
+            peer = owners.get(neighbor)
+            adjacencies.append(Adjacency('bgp', switch, neighbor, peer,
+                                         router_ids.get(peer)))
+
+    seen = set()
+    for row in rows.get('ospf', []):
+        switch = locations.get(row['vrouter-name'])
+        for ip in interfaces.get(switch, []):
+            neighbor = other_address(ip)
+            peer = owners.get(neighbor)
+            if not in_network(ip, row.get('network')) or peer is None or \
+                    peer == switch or (switch, neighbor) in seen:
+                continue
+            seen.add((switch, neighbor))
+            adjacencies.append(Adjacency('ospf', switch, neighbor, peer,
+                                         router_ids.get(peer)))
+
+    return adjacencies, locations, None
+
+
+def read_state(executor, protocols, locations):
+    """
+    Method to read the neighbor state of the whole fabric, one show per
+    protocol, the shows running concurrently.
+    :param executor: CliExecutor used to run the shows.
+    :param protocols: List of protocols to read the state of.
+    :param locations: Dictionary of vrouter name: switch.
+    :return: Tuple of the set of keys of the adjacencies which are up, and
+    the failed CommandResult, or None. An ospf adjacency is keyed by both the
+    neighbor ip and the neighbor router id.
+    """
+    up = set()
+    for _, protocol, rows, failed in read_rows(
+            executor, [(None, protocol) + STATE_SHOWS[protocol]
+                       for protocol in protocols]):
+        if failed is not None:
+            return up, failed
+        for row in rows:
+            switch = locations.get(row['vrouter-name'])
+            state = str(row.get('state'))
+            if protocol == 'bgp' and state.lower() == 'established':
+                up.add(('bgp', switch, address(row.get('neighbor'))))
+            elif protocol == 'ospf' and state.lower().startswith('full'):
+                up.add(('ospf', switch, address(row.get('ip'))))
+                up.add(('ospf', switch, address(row.get('neighbor'))))
+    return up, None
+
+
+def is_up(adjacency, up):
+    """
+    Method to check an adjacency against the neighbor state.
+    :param adjacency: The Adjacency.
+    :param up: Set of keys returned by read_state().
+    :return: True if the adjacency is up.
+    """
+    if adjacency.key() in up:
+        return True
+    return adjacency.protocol == 'ospf' and adjacency.router_id is not None \
+        and ('ospf', adjacency.switch, str(adjacency.router_id)) in up
+
+
+def wait_for_convergence(executor, adjacencies, locations, protocols,
+                         timeout, interval=1.0, max_interval=10.0,
+                         sleep=time.sleep):
+    """
+    Method to poll the neighbor state until every adjacency is up or the
+    deadline passes.
+    :param executor: CliExecutor used to run the shows.
+    :param adjacencies: List of Adjacency expected.
+    :param locations: Dictionary of vrouter name: switch.
+    :param protocols: List of protocols to poll.
+    :param timeout: Seconds to wait for the adjacencies.
+    :param interval: Seconds between the first polls.
+    :param max_interval: Maximum seconds between polls.
+    :param sleep: Function used to wait, for tests.
+    :return: Tuple of the report dictionary and the failed CommandResult of
+    the last poll, or None.
+    """
+    start = time.time()
+    deadline = Deadline(timeout)
+    switches = sorted(set(adjacency.switch for adjacency in adjacencies))
+    converged_at = {}
+    polls = 0
+    failed = None
+    while True:
+        up, failed = read_state(executor, protocols, locations)
+        polls += 1
+        elapsed = round(time.time() - start, 2)
+        if failed is None:
+            for adjacency in adjacencies:
+                adjacency.up = is_up(adjacency, up)
+            for switch in switches:
+                if all(adjacency.up for adjacency in adjacencies
+                       if adjacency.switch == switch):
+                    converged_at.setdefault(switch, elapsed)
+                else:
+                    converged_at.pop(switch, None)
+            if len(converged_at) == len(switches):
+                break
+        if deadline.expired():
+            break
+        sleep(deadline.bound(interval))
+        interval = min(interval * BACKOFF_FACTOR, max_interval)
+
+    pending = [adjacency.describe() for adjacency in adjacencies
+               if not adjacency.up]
+    report = {
+        'converged': not pending and failed is None,
+        'time_to_converge': max(list(converged_at.values()) + [0.0])
+        if not pending and failed is None else None,
+        'elapsed': round(time.time() - start, 2),
+        'polls': polls,
+        'adjacencies': len(adjacencies),
+        'pending': pending,
+        'switches': dict((switch, {
+            'adjacencies': len([adjacency for adjacency in adjacencies
+                                if adjacency.switch == switch]),
+            'up': len([adjacency for adjacency in adjacencies
+                       if adjacency.switch == switch and adjacency.up]),
+            'time_to_converge': converged_at.get(switch),
+        }) for switch in switches),
+    }
+    return report, failed
+
+
+def format_report(report):
+    """
+    Method to render a convergence report, one line per switch.
+    :param report: Dictionary returned by wait_for_convergence().
+    :return: The report.
+    """
+    lines = []
+    for switch, entry in sorted(report['switches'].items()):
+        converged = entry['time_to_converge']
+        lines.append('%s: %d/%d adjacencies up, %s' % (
+            switch, entry['up'], entry['adjacencies'],
+            'converged in %.2fs' % converged if converged is not None
+            else 'not converged'))
+    lines += ['    pending: ' + adjacency for adjacency in report['pending']]
+    if report['converged']:
+        lines.append('Fabric converged in %.2fs (%d polls)' % (
+            report['time_to_converge'], report['polls']))
+    else:
+        lines.append('Fabric not converged after %.2fs (%d polls)' % (
+            report['elapsed'], report['polls']))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,424 @@
+""" PN CSV loader shared by the Pluribus modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Every csv file passed to the modules (VRRP, VXLAN, DCI, hosts...) is parsed
+here exactly once. Each row is validated against a declared schema and
+turned into a typed row object, and the rows are indexed by switch, vlan and
+cluster so that modules never have to re-scan the data.
+
+A schema lists the accepted layouts of a csv file, keyed by the number of
+columns, for example the VRRP L3 csv accepts both:
+    vlan_id, vrrp_ip, switch
+    vlan_id, vrrp_ip, switch_1, switch_2, vrrp_id, active_switch
+
+Usage from a module:
+    from ansible.module_utils.pn_csv import VRRP_L3_SCHEMA, load_csv
+
+    table = load_csv(module, module.params['pn_csv_data'], VRRP_L3_SCHEMA,
+                     switches=spine_list + leaf_list)
+    for row in table.rows:
+        row.vlan_id, row.vrrp_ip, row.switch_1 ...
+    table.by_switch['leaf1'], table.by_vlan[100], table.by_cluster[...]
+"""
+
+from collections import namedtuple
+
+MIN_VLAN_ID = 2
+MAX_VLAN_ID = 4092
+
+# Field types understood by the loader.
+STR = 'str'
+INT = 'int'
+IP = 'ip'
+CIDR = 'cidr'
+VLAN = 'vlan'
+SWITCH = 'switch'
+
+
+def parse_ip(value):
+    """
+    Method to validate an IPv4 address.
+    :param value: The address string.
+    :return: The address string.
+    """
+    octets = value.split('.')
+    if len(octets) != 4:
+        raise ValueError('invalid ip address %s' % value)
+    for octet in octets:
+        if not octet.isdigit() or int(octet) > 255:
+            raise ValueError('invalid ip address %s' % value)
+    return value
+
+
+def parse_cidr(value):
+    """
+    Method to validate an IPv4 address with a subnet mask (a.b.c.d/n).
+    :param value: The address string.
+    :return: The address string.
+    """
+    address, sep, mask = value.partition('/')
+    if not sep or not mask.isdigit() or int(mask) > 32:
+        raise ValueError('invalid ip/subnet %s' % value)
+    parse_ip(address)
+    return value
+
+
+def parse_int(value):
+    """
+    Method to validate an integer.
+    :param value: The integer string.
+    :return: The integer.
+    """
+    if not value.isdigit():
+        raise ValueError('invalid number %s' % value)
+    return int(value)
+
+
+def parse_vlan(value):
+    """
+    Method to validate a vlan id.
+    :param value: The vlan id string.
+    :return: The vlan id as an integer.
+    """
+    if not value.isdigit() or not MIN_VLAN_ID <= int(value) <= MAX_VLAN_ID:
+        raise ValueError('invalid vlan id %s, it should be between %d and %d'
+                         % (value, MIN_VLAN_ID, MAX_VLAN_ID))
+    return int(value)
+
+
+def parse_str(value):
+    """
+    Method to validate a mandatory string.
+    :param value: The string.
+    :return: The string.
+    """
+    if not value:
+        raise ValueError('missing value')
+    return value
+
+
+PARSERS = {
+    STR: parse_str,
+    INT: parse_int,
+    IP: parse_ip,
+    CIDR: parse_cidr,
+    VLAN: parse_vlan,
+    SWITCH: parse_str,
+}
+
+
+class CsvSchema(object):
+    """
+    Description of a csv file: its name, its accepted layouts and the
+    columns to index the rows with.
+    """
+
+    def __init__(self, name, layouts, cluster=None, unique=None, subnet=None,
+                 rest=None):
+        """
+        :param name: Name of the csv file used in error messages.
+        :param layouts: Dictionary of column count: list of (field, type).
+        :param cluster: Optional pair of switch fields forming a cluster.
+        :param unique: Optional list of field tuples whose values must not
+        repeat across rows.
+        :param subnet: Optional ip/subnet field holding the subnet of the
+        vlan of each row, used to detect overlapping subnets.
+        :param rest: Optional (field, type) collecting, as a tuple, all the
+        columns after the longest layout.
+        """
+        self.name = name
+        self.layouts = layouts
+        self.cluster = cluster
+        self.unique = unique or []
+        self.subnet = subnet
+        self.rest = rest
+        self.max_columns = max(layouts)
+        fields = []
+        for count in sorted(layouts):
+            for field, _ in layouts[count]:
+                if field not in fields:
+                    fields.append(field)
+        if rest:
+            fields.append(rest[0])
+        self.fields = fields
+        self.row_class = namedtuple(
+            ''.join(word.capitalize() for word in name.split()) + 'Row',
+            ['line'] + fields
+        )
+        self.switch_fields = [field for field in fields if any(
+            (field, SWITCH) in layout for layout in layouts.values())]
+        self.vlan_fields = [field for field in fields if any(
+            (field, VLAN) in layout for layout in layouts.values())]
+
+
+class CsvTable(object):
+    """
+    Result of loading a csv file: typed rows, indexes and errors.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.rows = []
+        self.errors = []
+        # switch name -> rows referencing that switch
+        self.by_switch = {}
+        # vlan id -> rows of that vlan
+        self.by_vlan = {}
+        # (switch_1, switch_2) -> rows of that cluster
+        self.by_cluster = {}
+        self._clusters = []
+
+    def _index(self, row):
+        """
+        Method to add a row to the indexes.
+        :param row: The typed row object.
+        """
+        seen = set()
+        for field in self.schema.switch_fields:
+            switch = getattr(row, field)
+            if switch is not None and switch not in seen:
+                seen.add(switch)
+                self.by_switch.setdefault(switch, []).append(row)
+
+        for field in self.schema.vlan_fields:
+            vlan = getattr(row, field)
+            if vlan is not None:
+                self.by_vlan.setdefault(vlan, []).append(row)
+
+        if self.schema.cluster:
+            pair = tuple(getattr(row, field) for field in self.schema.cluster)
+            if None not in pair:
+                if pair not in self.by_cluster:
+                    self.by_cluster[pair] = []
+                    self._clusters.append(pair)
+                self.by_cluster[pair].append(row)
+
+    def clusters(self):
+        """
+        Method to find the clusters referenced in the csv file.
+        :return: List of (switch_1, switch_2) pairs in order of appearance.
+        """
+        return list(self._clusters)
+
+
+def parse_csv(data, schema, switches=None):
+    """
+    Method to parse and validate csv data in a single pass.
+    Blank lines, comments (#) and trailing empty columns are skipped.
+    :param data: The csv data as a string.
+    :param schema: The CsvSchema to validate the rows against.
+    :param switches: Optional names of the switches of the inventory. When
+    given, switch columns must reference one of these switches.
+    :return: CsvTable holding the typed rows, indexes and line level errors.
+    """
+    table = CsvTable(schema)
+    switches = set(switches) if switches is not None else None
+    layouts = schema.layouts
+    row_class = schema.row_class
+    empty_row = dict.fromkeys(schema.fields)
+    # unique key -> line number of the row which defined it first
+    seen_keys = [{} for _ in schema.unique]
+
+    for line_number, line in enumerate(data.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        columns = [column.strip() for column in line.split(',')]
+        while columns and not columns[-1]:
+            columns.pop()
+
+        layout = layouts.get(len(columns))
+        rest_columns = ()
+        if layout is None and schema.rest and len(columns) > schema.max_columns:
+            layout = layouts[schema.max_columns]
+            rest_columns = columns[schema.max_columns:]
+        if layout is None:
+            table.errors.append(
+                'line %d: expected %s columns, found %d: %s' % (
+                    line_number,
+                    ' or '.join(str(count) for count in sorted(layouts)),
+                    len(columns), line)
+            )
+            continue
+
+        values = dict(empty_row)
+        valid = True
+        for (field, field_type), column in zip(layout, columns):
+            try:
+                values[field] = PARSERS[field_type](column)
+            except ValueError as error:
+                table.errors.append('line %d: %s: %s' % (line_number, field,
+                                                          error))
+                valid = False
+                continue
+
+            if (field_type == SWITCH and switches is not None and
+                    column not in switches):
+                table.errors.append('line %d: %s: unknown switch %s' % (
+                    line_number, field, column))
+                valid = False
+
+        if rest_columns:
+            field, field_type = schema.rest
+            try:
+                values[field] = tuple(PARSERS[field_type](column)
+                                      for column in rest_columns)
+            except ValueError as error:
+                table.errors.append('line %d: %s: %s' % (line_number, field,
+                                                          error))
+                valid = False
+
+        for key_fields, seen in zip(schema.unique, seen_keys):
+            key = tuple(values[field] for field in key_fields)
+            if None in key:
+                continue
+            if key in seen:
+                table.errors.append(
+                    'line %d: duplicate %s %s, first defined at line %d' % (
+                        line_number, ','.join(key_fields),
+                        ','.join(str(value) for value in key), seen[key])
+                )
+                valid = False
+            else:
+                seen[key] = line_number
+
+        if valid:
+            row = row_class(line=line_number, **values)
+            table.rows.append(row)
+            table._index(row)
+
+    return table
+
+
+def load_csv(module, data, schema, switches=None):
+    """
+    Method to parse csv data passed to a module. If any row is invalid, the
+    module exits with the list of line level errors before any configuration
+    is made.
+    :param module: The Ansible module to report errors with.
+    :param data: The csv data as a string.
+    :param schema: The CsvSchema to validate the rows against.
+    :param switches: Optional names of the switches of the inventory.
+    :return: CsvTable holding the typed rows and indexes.
+    """
+    table = parse_csv(data or '', schema, switches)
+    if table.errors:
+        module.exit_json(
+            unreachable=False,
+            failed=True,
+            exception='\n'.join(table.errors),
+            summary=[{'switch': '', 'output': error}
+                     for error in table.errors],
+            msg='Invalid %s csv data' % schema.name,
+            changed=False
+        )
+    return table
+
+
+VRRP_L2_SCHEMA = CsvSchema('vrrp l2', {
+    3: [('vrrp_ip', CIDR), ('vlan_id', VLAN), ('active_switch', SWITCH)],
+}, unique=[('vlan_id',)], subnet='vrrp_ip')
+
+VRRP_L3_SCHEMA = CsvSchema('vrrp l3', {
+    3: [('vlan_id', VLAN), ('vrrp_ip', CIDR), ('switch_1', SWITCH)],
+    6: [('vlan_id', VLAN), ('vrrp_ip', CIDR), ('switch_1', SWITCH),
+        ('switch_2', SWITCH), ('vrrp_id', INT), ('active_switch', SWITCH)],
+}, cluster=('switch_1', 'switch_2'), unique=[('vlan_id',)], subnet='vrrp_ip')
+
+VXLAN_SCHEMA = CsvSchema('vxlan', {
+    5: [('vlan_id', VLAN), ('vrrp_ip', CIDR), ('switch_1', SWITCH),
+        ('vxlan_id', INT), ('loopback_port', STR)],
+    8: [('vlan_id', VLAN), ('vrrp_ip', CIDR), ('switch_1', SWITCH),
+        ('switch_2', SWITCH), ('vrrp_id', INT), ('active_switch', SWITCH),
+        ('vxlan_id', INT), ('loopback_port', STR)],
+}, cluster=('switch_1', 'switch_2'), unique=[('vlan_id',)],
+    subnet='vrrp_ip')
+
+DCI_SCHEMA = CsvSchema('dci', {
+    3: [('vlan_id', VLAN), ('vrrp_ip', CIDR), ('switch_1', SWITCH)],
+    4: [('vlan_id', VLAN), ('vrrp_ip', CIDR), ('switch_1', SWITCH),
+        ('vxlan_id', INT)],
+    6: [('vlan_id', VLAN), ('vrrp_ip', CIDR), ('switch_1', SWITCH),
+        ('switch_2', SWITCH), ('vrrp_id', INT), ('active_switch', SWITCH)],
+    7: [('vlan_id', VLAN), ('vrrp_ip', CIDR), ('switch_1', SWITCH),
+        ('switch_2', SWITCH), ('vrrp_id', INT), ('active_switch', SWITCH),
+        ('vxlan_id', INT)],
+}, cluster=('switch_1', 'switch_2'), unique=[('vlan_id',)],
+    subnet='vrrp_ip')
+
+# The third party switch is not part of the inventory, so it is a plain str.
+THIRD_PARTY_BGP_SCHEMA = CsvSchema('third party bgp', {
+    5: [('neighbor_name', STR), ('neighbor_ip', IP), ('remote_as', INT),
+        ('bgp_as', INT), ('switch', SWITCH)],
+}, unique=[('switch', 'neighbor_ip')])
+
+HOSTS_SCHEMA = CsvSchema('hosts', {
+    2: [('hostname', STR), ('ip', IP)],
+}, unique=[('hostname',), ('ip',)])
+
+DLINK_VLAN_SCHEMA = CsvSchema('dlink vlan', {
+    1: [('vlan_id', VLAN)],
+}, unique=[('vlan_id',)], rest=('ports', STR))
+
+DLINK_SVI_SCHEMA = CsvSchema('dlink svi', {
+    2: [('gateway_ip', CIDR), ('vlan_id', VLAN)],
+}, unique=[('vlan_id',)], subnet='gateway_ip')
+
+DLINK_TRUNK_SCHEMA = CsvSchema('dlink trunk', {
+    2: [('switch', SWITCH), ('name', STR)],
+}, unique=[('switch', 'name')], rest=('ports', STR))
+
+DLINK_VLAG_SCHEMA = CsvSchema('dlink vlag', {
+    5: [('name', STR), ('switch_1', SWITCH), ('trunk_1', STR),
+        ('switch_2', SWITCH), ('trunk_2', STR)],
+}, cluster=('switch_1', 'switch_2'), unique=[('name',)])
+
+DLINK_VRRP_SCHEMA = CsvSchema('dlink vrrp', {
+    5: [('vlan_id', VLAN), ('gateway_ip', CIDR), ('primary_ip', CIDR),
+        ('secondary_ip', CIDR), ('active_switch', SWITCH)],
+}, unique=[('vlan_id',)], subnet='gateway_ip')
+
+DLINK_BGP_SCHEMA = CsvSchema('dlink bgp', {
+    6: [('switch', SWITCH), ('l3_port', STR), ('ip', CIDR), ('bgp_as', INT),
+        ('neighbor_ip', IP), ('remote_as', INT)],
+}, unique=[('switch', 'l3_port')])
+
+DLINK_OSPF_SCHEMA = CsvSchema('dlink ospf', {
+    4: [('switch', SWITCH), ('l3_port', STR), ('ip', CIDR),
+        ('area_id', STR)],
+}, unique=[('switch', 'l3_port')])
+
+# Schemas by csv file type, as accepted by the pre-flight validation.
+SCHEMAS = {
+    'vrrp_l2': VRRP_L2_SCHEMA,
+    'vrrp_l3': VRRP_L3_SCHEMA,
+    'vxlan': VXLAN_SCHEMA,
+    'dci': DCI_SCHEMA,
+    'third_party_bgp': THIRD_PARTY_BGP_SCHEMA,
+    'hosts': HOSTS_SCHEMA,
+    'dlink_vlan': DLINK_VLAN_SCHEMA,
+    'dlink_svi': DLINK_SVI_SCHEMA,
+    'dlink_trunk': DLINK_TRUNK_SCHEMA,
+    'dlink_vlag': DLINK_VLAG_SCHEMA,
+    'dlink_vrrp': DLINK_VRRP_SCHEMA,
+    'dlink_bgp': DLINK_BGP_SCHEMA,
+    'dlink_ospf': DLINK_OSPF_SCHEMA,
+}
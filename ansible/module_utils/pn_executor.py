@@ -0,0 +1,786 @@
+""" PN CLI execution engine shared by the Pluribus modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Runs Netvisor cli commands for the modules. Commands targeted to different
+switches (`switch X ...`) are independent, so they are grouped in batches
+per switch: the commands of a batch run in order, one after the other, and
+the batches run concurrently on a bounded pool of threads.
+
+Usage from a module:
+    from ansible.module_utils.pn_executor import CliExecutor
+
+    executor = CliExecutor(module, max_workers=10)
+    result = executor.run('fabric-node-show format name no-show-headers')
+    batches = [(switch, ['vlan-create id 10 scope local']) for switch in ...]
+    for batch in executor.run_batches(batches):
+        for result in batch:
+            result.switch, result.command, result.output, result.failed
+
+Errors never exit the module from the worker threads; they are returned in
+the results and the module decides how to report them.
+
+Commands sent through the seed switch (`switch X ...`) all go through its
+cli daemon and fabric transaction layer. On top of the thread pool, the
+number of commands in flight is adjusted by an AdaptiveLimiter, one for
+reads (show commands) and one for writes: the limit grows while commands
+complete quickly and is halved when a command is much slower than usual or
+fails with a timeout or busy error. Writes start one at a time.
+
+Commands failing with a transient error (fabric transaction in progress,
+switch temporarily unreachable, timeout) are retried after a jittered
+exponential backoff, at most RETRY_ATTEMPTS times per command and
+RETRY_BUDGET times per module run. Other errors (bad argument, object
+already exists) are returned at once. Modules running their commands one by
+one get the same retries through run_command().
+
+Modules with the pn_command_timeout, pn_switch_budget and pn_deadline
+parameters bound the time spent in commands: a command is killed after
+pn_command_timeout seconds, and retried only if it is a show since a
+killed write may have been applied. The commands of one switch may take
+pn_switch_budget seconds in total and the module stops running commands
+pn_deadline seconds after its first command. Commands past a budget or the
+deadline are not run; their result is marked expired, so that the module
+can report what was done so far.
+
+An executor restricted to a Shard (see pn_shard) only runs the batches
+writing to the switches of its shard; batches of show commands always run.
+"""
+
+import os
+import random
+import re
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+DEFAULT_MAX_WORKERS = 10
+
+# Section headers of a commands file: [ALL], [fabric] and [switch a, b].
+SECTION_RE = re.compile(r'^\[(ALL|fabric|switch)([^\]]*)\]?')
+
+# Errors telling that the switch is overloaded rather than that the command
+# is wrong.
+OVERLOAD_RE = re.compile(r'time[sd]? ?out|busy|try again|in progress',
+                         re.IGNORECASE)
+
+# Errors worth retrying the command for. Anything else is permanent.
+TRANSIENT_RE = re.compile(
+    r'time[sd]? ?out|busy|try again|in progress|temporar|unreachable|'
+    r'not reachable|connection (refused|reset)|no route to host',
+    re.IGNORECASE)
+
+DEADLINE_EXCEEDED = 'Deadline exceeded'
+# Error of a command killed at pn_command_timeout. A killed write may have
+# been applied already, so only killed reads are retried.
+COMMAND_TIMED_OUT = 'Command timed out'
+BUDGET_EXCEEDED = 'Switch time budget exceeded'
+
+RETRY_ATTEMPTS = 3
+RETRY_BUDGET = 30
+RETRY_BASE_DELAY = 0.1
+RETRY_MAX_DELAY = 2.0
+
+
+def pn_cli(module):
+    """
+    Method to generate the cli portion to launch the Netvisor cli.
+    :param module: The Ansible module to fetch username and password.
+    :return: The cli string for further processing.
+    """
+    username = module.params.get('pn_cliusername')
+    password = module.params.get('pn_clipassword')
+
+    if username and password:
+        cli = '/usr/bin/cli --quiet --user %s:%s ' % (username, password)
+    else:
+        cli = '/usr/bin/cli --quiet '
+
+    return cli
+
+
+def run_concurrently(func, items, max_workers):
+    """
+    Method to call a function on every item using a bounded pool of threads.
+    :param func: Function called with one item.
+    :param items: List of items.
+    :param max_workers: Maximum number of threads running at the same time.
+    :return: List of the return values, in the order of the items.
+    """
+    results = [None] * len(items)
+    errors = []
+    pending = iter(enumerate(items))
+    lock = threading.Lock()
+
+    def worker():
+        while not errors:
+            with lock:
+                try:
+                    index, item = next(pending)
+                except StopIteration:
+                    return
+            try:
+                results[index] = func(item)
+            except Exception as error:
+                errors.append(error)
+
+    workers = min(max(max_workers, 1), len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+def command_kind(command):
+    """
+    Method to classify a command for the concurrency limits.
+    :param command: The cli command, optionally prefixed by switch-local or
+    switch X.
+    :return: 'read' for show commands, 'write' otherwise.
+    """
+    tokens = command.split()
+    if tokens[:1] == ['switch-local']:
+        tokens = tokens[1:]
+    elif tokens[:1] == ['switch']:
+        tokens = tokens[2:]
+    return 'read' if tokens and tokens[0].endswith('-show') else 'write'
+
+
+def argv_command_kind(argv):
+    """
+    Method to classify a complete cli command line, like command_kind().
+    :param argv: List of the cli binary, its options and the command.
+    :return: 'read' for show commands, 'write' otherwise.
+    """
+    tokens = list(argv[1:])
+    while tokens and tokens[0].startswith('--'):
+        if tokens.pop(0) == '--user' and tokens:
+            tokens.pop(0)
+    return command_kind(' '.join(tokens))
+
+
+def new_metrics():
+    """ Metrics of the cli calls of a module run. """
+    return {'calls': 0, 'duration': 0.0, 'retries': 0, 'retry_wait': 0.0,
+            'retries_exhausted': 0, 'expired': 0}
+
+
+class Deadline(object):
+    """
+    Point in time by which the work of a module must be done.
+    """
+
+    def __init__(self, seconds=None):
+        """
+        :param seconds: Seconds from now, or None for no deadline.
+        """
+        self.expires_at = time.time() + seconds if seconds else None
+
+    def remaining(self):
+        """ Seconds left, or None if there is no deadline. """
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.time(), 0.0)
+
+    def bound(self, seconds):
+        """ The given number of seconds, cut short at the deadline. """
+        remaining = self.remaining()
+        return seconds if remaining is None else min(seconds, remaining)
+
+    def expired(self):
+        """ Whether the deadline has passed. """
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+
+def module_deadline(module):
+    """
+    Method to get the deadline of a module run, started on first use from
+    the pn_deadline parameter.
+    :param module: The Ansible module to fetch input parameters.
+    :return: Deadline of the module.
+    """
+    deadline = getattr(module, 'pn_deadline', None)
+    if deadline is None:
+        deadline = Deadline(module.params.get('pn_deadline'))
+        module.pn_deadline = deadline
+    return deadline
+
+
+def shortest(*limits):
+    """ Smallest of the given time limits, ignoring the ones set to None. """
+    limits = [limit for limit in limits if limit is not None]
+    return min(limits) if limits else None
+
+
+def command_timeout(module, budget=None):
+    """
+    Method to compute how long the next command of a module may run.
+    :param module: The Ansible module to fetch input parameters.
+    :param budget: Optional seconds left in the budget of the switch.
+    :return: Tuple of the timeout in seconds (None if unbounded) and whether
+    the timeout comes from the deadline or budget rather than from
+    pn_command_timeout.
+    """
+    per_command = module.params.get('pn_command_timeout')
+    limit = shortest(module_deadline(module).remaining(), budget)
+    if limit is not None and (per_command is None or limit < per_command):
+        return limit, True
+    return per_command, False
+
+
+def run_argv(module, argv, timeout=None):
+    """
+    Method to run a command, killing it and its children after a timeout.
+    :param module: The Ansible module to run the command with.
+    :param argv: List of the command and its arguments.
+    :param timeout: Seconds the command may run, or None.
+    :return: Tuple of (rc, out, err, timed out).
+    """
+    if timeout is None:
+        rc, out, err = module.run_command(argv)
+        return rc, out, err, False
+
+    # The command gets its own process group, so that sshpass and the ssh it
+    # spawns are killed together.
+    try:
+        process = subprocess.Popen(argv, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   universal_newlines=True,
+                                   preexec_fn=os.setsid)
+    except OSError as error:
+        return 127, '', str(error), False
+    killed = []
+
+    def kill():
+        killed.append(True)
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    timer = threading.Timer(timeout, kill)
+    timer.daemon = True
+    timer.start()
+    try:
+        out, err = process.communicate()
+    finally:
+        timer.cancel()
+    return process.returncode, out, err, bool(killed)
+
+
+def retry_delay(metrics, attempt, err, kind='read'):
+    """
+    Method to decide whether a failed command is retried, and account for
+    the retry.
+    :param metrics: Metrics of the module run, holding the retry budget.
+    :param attempt: Number of retries of the command so far.
+    :param err: Error output of the command.
+    :param kind: 'read' or 'write', see command_kind(). A write killed at
+    its timeout is not retried.
+    :return: Seconds to wait before retrying, or None if the error is
+    permanent or no retry is left.
+    """
+    if not err or not TRANSIENT_RE.search(err):
+        return None
+    if kind != 'read' and err.startswith(COMMAND_TIMED_OUT):
+        return None
+    if attempt >= RETRY_ATTEMPTS or \
+            metrics.get('retries', 0) >= RETRY_BUDGET:
+        metrics['retries_exhausted'] = metrics.get('retries_exhausted', 0) + 1
+        return None
+
+    # Equal jitter: half of the exponential delay, plus up to as much again.
+    delay = min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY) / 2
+    delay += random.uniform(0, delay)
+    metrics['retries'] = metrics.get('retries', 0) + 1
+    metrics['retry_wait'] = metrics.get('retry_wait', 0.0) + delay
+    return delay
+
+
+def run_bounded(module, argv):
+    """
+    Method to run a command bounded by pn_command_timeout and pn_deadline,
+    without retries.
+    :param module: The Ansible module to run the command with.
+    :param argv: List of the command and its arguments.
+    :return: Tuple of (rc, out, err). err is DEADLINE_EXCEEDED if the command
+    was not run or was killed at the deadline.
+    """
+    timeout, expiring = command_timeout(module)
+    if timeout is not None and timeout <= 0:
+        return -1, '', DEADLINE_EXCEEDED
+    rc, out, err, timed_out = run_argv(module, argv, timeout)
+    if timed_out:
+        if expiring:
+            return -1, '', DEADLINE_EXCEEDED
+        return -1, '', '%s after %ds' % (COMMAND_TIMED_OUT, timeout)
+    return rc, out, err
+
+
+def run_command(module, cli, metrics):
+    """
+    Method to run one complete cli command line, retrying transient errors
+    and bounding it with pn_command_timeout and pn_deadline.
+    :param module: The Ansible module to run the command with.
+    :param cli: The complete cli string, including /usr/bin/cli.
+    :param metrics: Dictionary of metrics to update, see new_metrics().
+    :return: Tuple of (rc, out, err) of the last attempt. err starts with
+    DEADLINE_EXCEEDED if the deadline expired.
+    """
+    argv = shlex.split(cli) if not isinstance(cli, list) else cli
+    attempt = 0
+    while True:
+        start = time.time()
+        rc, out, err = run_bounded(module, argv)
+        if err == DEADLINE_EXCEEDED:
+            metrics['expired'] = metrics.get('expired', 0) + 1
+            return rc, out, err
+        metrics['calls'] += 1
+        metrics['duration'] += time.time() - start
+        if out:
+            return rc, out, err
+        delay = retry_delay(metrics, attempt, err, argv_command_kind(argv))
+        if delay is None:
+            return rc, out, err
+        time.sleep(delay)
+        attempt += 1
+
+
+class AdaptiveLimiter(object):
+    """
+    Limit of commands in flight, adjusted with additive increase and
+    multiplicative decrease (AIMD). The limit starts small and grows by one
+    per completed command (slow start) until the first decrease, then by
+    one per limit completed commands. It is halved when a command fails with
+    an overload error or takes more than latency_factor times the average
+    latency, at most once per round of commands in flight.
+    """
+
+    def __init__(self, maximum, initial=1, minimum=1, latency_factor=3.0,
+                 latency_floor=0.5):
+        """
+        :param maximum: Upper bound of the limit.
+        :param initial: Limit to start with.
+        :param minimum: Lower bound of the limit.
+        :param latency_factor: Latency, relative to the average, above which
+        a command is considered slow.
+        :param latency_floor: Latency in seconds below which a command is
+        never considered slow.
+        """
+        self.maximum = max(maximum, 1)
+        self.minimum = max(min(minimum, self.maximum), 1)
+        self.limit = float(max(min(initial, self.maximum), self.minimum))
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.slow_start = True
+        self.in_flight = 0
+        self.average = None
+        self.error_rate = 0.0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """
+        Method to wait for a free slot.
+        :return: Time the command was let through, to pass to release().
+        """
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            return time.time()
+
+    def release(self, started, duration, overloaded):
+        """
+        Method to free the slot of a completed command and adjust the limit.
+        :param started: Value returned by acquire().
+        :param duration: Latency of the command in seconds.
+        :param overloaded: Whether the command failed with an overload error.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self.error_rate = 0.9 * self.error_rate + (0.1 if overloaded
+                                                       else 0.0)
+            slow = self.average is not None and duration > max(
+                self.average * self.latency_factor, self.latency_floor)
+            if not overloaded:
+                self.average = duration if self.average is None else \
+                    0.9 * self.average + 0.1 * duration
+
+            if overloaded or slow:
+                # Commands started before the last decrease saw the old
+                # limit; they must not decrease it again.
+                if started >= self._last_decrease and \
+                        self.limit > self.minimum:
+                    self.limit = max(self.limit / 2, self.minimum)
+                    self.slow_start = False
+                    self.decreases += 1
+                    self._last_decrease = time.time()
+            elif self.slow_start:
+                self.limit = min(self.limit + 1, self.maximum)
+            else:
+                self.limit = min(self.limit + 1 / self.limit, self.maximum)
+            self._cond.notify_all()
+
+    def stats(self):
+        """ Current limit, number of decreases and overload error rate. """
+        with self._cond:
+            return {'limit': int(self.limit), 'decreases': self.decreases,
+                    'error_rate': round(self.error_rate, 3)}
+
+
+class CommandResult(object):
+    """
+    Outcome of one cli command.
+    """
+
+    def __init__(self, switch, command, rc, out, err, duration,
+                 records=None):
+        self.switch = switch
+        self.command = command
+        self.rc = rc
+        self.out = out
+        self.err = err
+        self.duration = duration
+        # Rows of a show as dictionaries, when the backend returns them
+        # already parsed.
+        self.records = records
+        self.attempts = 1
+        # Set when the command was not run or was killed because the switch
+        # budget or the module deadline ran out.
+        self.expired = False
+
+    @property
+    def failed(self):
+        """ A command failed if it wrote to stderr and nothing to stdout. """
+        return bool(self.err) and not self.out
+
+    @property
+    def output(self):
+        """ Output of the command, 'Success' if it printed nothing. """
+        if self.out:
+            return self.out
+        return self.err.strip() if self.failed else 'Success'
+
+
+class CliExecutor(object):
+    """
+    Runs cli commands and keeps count of the calls and time spent in them.
+    """
+
+    def __init__(self, module, max_workers=DEFAULT_MAX_WORKERS,
+                 adaptive=True):
+        """
+        :param module: The Ansible module to run the commands with.
+        :param max_workers: Maximum number of switches configured at once.
+        :param adaptive: Whether to adjust the number of commands in flight
+        to the latency of the switch. If False, max_workers commands run at
+        once.
+        """
+        self.module = module
+        self.max_workers = max(max_workers or 1, 1)
+        self.cli = pn_cli(module)
+        self.metrics = new_metrics()
+        if adaptive:
+            # Reads start at half of max_workers and writes one at a time.
+            self.limiters = {
+                'read': AdaptiveLimiter(self.max_workers,
+                                        max(self.max_workers // 2, 1)),
+                'write': AdaptiveLimiter(self.max_workers),
+            }
+        else:
+            self.limiters = dict(
+                (kind, AdaptiveLimiter(self.max_workers, self.max_workers,
+                                       self.max_workers))
+                for kind in ('read', 'write'))
+        # Optional callback, called with every CommandResult as it completes.
+        self.on_result = None
+        # Optional Shard, set by pn_shard.shard_executor().
+        self.shard = None
+        self.switch_budget = module.params.get('pn_switch_budget')
+        # Seconds spent in the commands of every switch.
+        self.spent = {}
+        self._lock = threading.Lock()
+
+    def run(self, command, switch=None):
+        """
+        Method to run one command, waiting for a slot of its kind. Transient
+        errors are retried after a backoff, without holding the slot.
+        :param command: The cli command, without the cli prefix.
+        :param switch: Optional switch to target the command to.
+        :return: CommandResult of the last attempt.
+        """
+        limiter = self.limiters[command_kind(command)]
+        attempt = 0
+        while True:
+            started = limiter.acquire()
+            try:
+                result = self.execute(command, switch)
+            except Exception:
+                limiter.release(started, time.time() - started, False)
+                raise
+            limiter.release(started, result.duration, result.failed and
+                            bool(OVERLOAD_RE.search(result.err)))
+            if not result.failed or result.expired:
+                break
+
+            with self._lock:
+                delay = retry_delay(self.metrics, attempt, result.err,
+                                    command_kind(command))
+                if delay is not None:
+                    self.metrics['calls'] += 1
+                    self.metrics['duration'] += result.duration
+            if delay is None:
+                break
+            time.sleep(delay)
+            attempt += 1
+
+        result.attempts = attempt + 1
+        return self.record(result)
+
+    def execute(self, command, switch=None):
+        """
+        Method to run one cli command.
+        :param command: The cli command, without the cli prefix.
+        :param switch: Optional switch to target the command to.
+        :return: CommandResult of the command.
+        """
+        timeout, expiring = self.timeout(switch)
+        if timeout is not None and timeout <= 0:
+            return self.expired_result(command, switch)
+
+        cli = self.cli
+        if switch:
+            cli += ' switch %s ' % switch
+        cli += command
+
+        start = time.time()
+        rc, out, err, timed_out = run_argv(self.module, shlex.split(cli),
+                                           timeout)
+        duration = time.time() - start
+        self.spend(switch, duration)
+
+        if timed_out and expiring:
+            return self.expired_result(command, switch, duration)
+        if timed_out:
+            out, err = '', '%s after %ds' % (COMMAND_TIMED_OUT, timeout)
+        return CommandResult(switch, command, rc, out, err, duration)
+
+    def timeout(self, switch):
+        """
+        Method to compute how long the next command of a switch may run.
+        :param switch: Switch the command is targeted to.
+        :return: Tuple of the timeout in seconds (None if unbounded) and
+        whether it comes from the switch budget or the module deadline.
+        """
+        budget = None
+        if self.switch_budget is not None:
+            with self._lock:
+                budget = max(self.switch_budget - self.spent.get(switch, 0.0),
+                             0.0)
+        return command_timeout(self.module, budget)
+
+    def spend(self, switch, duration):
+        """ Account for time spent in a command of a switch. """
+        with self._lock:
+            self.spent[switch] = self.spent.get(switch, 0.0) + duration
+
+    def expired_result(self, command, switch, duration=0.0):
+        """
+        Method to build the result of a command stopped by the switch budget
+        or the module deadline.
+        :param command: The cli command.
+        :param switch: Switch the command is targeted to.
+        :param duration: Seconds the command ran before it was killed.
+        :return: CommandResult marked expired.
+        """
+        reason = DEADLINE_EXCEEDED if module_deadline(self.module).expired() \
+            else BUDGET_EXCEEDED
+        result = CommandResult(switch, command, -1, '', reason, duration)
+        result.expired = True
+        with self._lock:
+            self.metrics['expired'] += 1
+        return result
+
+    def record(self, result):
+        """
+        Method to account for a completed command.
+        :param result: CommandResult of the command.
+        :return: The same CommandResult.
+        """
+        with self._lock:
+            self.metrics['calls'] += 1
+            self.metrics['duration'] += result.duration
+            self.metrics['limits'] = dict(
+                (kind, limiter.stats())
+                for kind, limiter in self.limiters.items())
+            if self.on_result is not None:
+                self.on_result(result)
+
+        return result
+
+    def run_batch(self, batch, stop_on_failure=True):
+        """
+        Method to run the commands of one switch in order. It stops at the
+        first failed command unless stop_on_failure is False.
+        :param batch: Tuple of switch name (None for the local switch) and
+        list of cli commands.
+        :param stop_on_failure: Whether a failed command stops the batch.
+        :return: List of CommandResult, one per command run.
+        """
+        switch, commands = batch
+        results = []
+        for command in commands:
+            result = self.run(command, switch)
+            results.append(result)
+            if result.failed and stop_on_failure:
+                break
+        return results
+
+    def run_batches(self, batches, stop_on_failure=True):
+        """
+        Method to run batches of commands concurrently, keeping the order of
+        the commands within each batch.
+        :param batches: List of (switch, list of cli commands) tuples.
+        :param stop_on_failure: Whether a failed command stops its batch.
+        Batches of independent commands pass False.
+        :return: List of lists of CommandResult, in the order of the batches.
+        The list of a batch left to another shard is empty.
+        """
+        return run_concurrently(
+            lambda batch: self.run_batch(batch, stop_on_failure)
+            if self.in_shard(batch) else [], batches, self.max_workers)
+
+    def in_shard(self, batch):
+        """
+        Method to check whether a batch runs on this executor.
+        :param batch: Tuple of switch name and list of cli commands.
+        :return: True if the executor is not sharded, the switch belongs to
+        its shard or the batch only reads.
+        """
+        switch, commands = batch
+        if self.shard is None or self.shard.owns(switch):
+            return True
+        return all(command_kind(command) == 'read' for command in commands)
+
+
+def compile_commands_file(data):
+    """
+    Method to compile a commands file into a plan of sections.
+    Commands under [ALL] run on every switch of the fabric, commands under
+    [switch a, b] run on the mentioned switches and commands under [fabric]
+    run once on the local switch. Blank lines, comments and lines before the
+    first section are skipped.
+    :param data: String containing the commands file.
+    :return: List of (section, switches, commands) tuples, where section is
+    one of 'ALL', 'fabric' or 'switch' and switches is None unless the
+    section is 'switch'.
+    """
+    plan = []
+    commands = None
+    for line in data.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        header = SECTION_RE.match(line)
+        if header is not None:
+            section, switches = header.groups()
+            if section == 'switch':
+                switches = [name.strip() for name in switches.split(',')
+                            if name.strip()]
+            else:
+                switches = None
+            commands = []
+            plan.append((section, switches, commands))
+        elif commands is not None:
+            commands.append(line)
+
+    return [entry for entry in plan if entry[2]]
+
+
+def run_commands_file(executor, data):
+    """
+    Method to run a commands file. Sections run one after the other; within a
+    section, the commands of every switch run in order and the switches run
+    concurrently. The list of fabric nodes is fetched once, the first time
+    an [ALL] section is met. Nothing more is run after a failed command.
+    The results of the commands of the file are passed to the on_result
+    callback of the executor as they complete.
+    :param executor: CliExecutor used to run the commands.
+    :param data: String containing the commands file.
+    :return: The failed CommandResult, or None if every command succeeded.
+    """
+    fabric_nodes = None
+    for section, switches, commands in compile_commands_file(data):
+        if section == 'ALL':
+            if fabric_nodes is None:
+                # The lookup of the nodes is not a command of the file.
+                on_result, executor.on_result = executor.on_result, None
+                try:
+                    nodes = executor.run('fabric-node-show format name '
+                                         'no-show-headers')
+                finally:
+                    executor.on_result = on_result
+                if nodes.failed:
+                    return nodes
+                fabric_nodes = nodes.out.split()
+            switches = fabric_nodes
+        elif section == 'fabric':
+            switches = [None]
+
+        # A batch stops at its first failed command.
+        for batch in executor.run_batches([(switch, commands)
+                                           for switch in switches]):
+            if batch and batch[-1].failed:
+                return batch[-1]
+
+    return None
+
+
+def result_logger(module, collect=None):
+    """
+    Method to build an on_result callback of CliExecutor which logs every
+    command of a commands file to the system log as soon as it completes,
+    so a long file can be followed while the module runs.
+    :param module: The Ansible module logging the commands.
+    :param collect: Optional function also called with every CommandResult,
+    to build the result of the module as the commands complete.
+    :return: Function taking a CommandResult.
+    """
+    def log_result(result):
+        target = 'switch %s ' % result.switch if result.switch else ''
+        module.log('%s%s: %s in %.2fs' % (
+            target, result.command, 'failed' if result.failed else 'ok',
+            result.duration))
+        if collect is not None:
+            collect(result)
+    return log_result
@@ -0,0 +1,253 @@
+""" PN fabric inventory collected in one pass """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Inventory of the fabric (nodes, clusters, vrouters, vrouter interfaces, lldp
+links and vlans) read with one parsable show per kind of object, the shows
+running concurrently. The inventory is published as the pn_fabric fact:
+
+    pn_fabric:
+      nodes: {spine1: {fabric: .., mgmt_ip: .., inband_ip: .., state: ..,
+                       fab_tid: ..}}
+      clusters: {spine-cluster: [spine1, spine2]}
+      vrouters: {spine1: {name: spine1-vrouter, router_type: hardware,
+                          bgp_as: 65000, router_id: .., hw_vrrp_id: 18}}
+      interfaces: {spine1-vrouter: [{nic: eth0.4092, ip: .., vlan: 4092,
+                                     l3_port: 49}]}
+      links: [{switch: spine1, port: 49, remote_switch: leaf1,
+               remote_port: 49}]
+      vlans: {spine1: '1,4092'}
+      fabric_vlans: '100-110'
+      generation: 1f0c..
+      generation_mode: membership
+      collected_at: 1476000000
+      ttl: 3600
+
+The generation key identifies the state of the fabric the facts were read
+from. Cached facts are reused while they are younger than their ttl and the
+key computed from a single fabric-node-show still matches:
+    - membership: the key changes when nodes join or leave the fabric.
+    - transaction: the key also changes with every fabric transaction.
+
+Modules taking the fact as pn_fabric, like pn_ztp_vrrp_l3, check it with
+fresh_facts() in transaction mode before using it instead of their own
+shows, so that they never work from a fabric changed since.
+"""
+
+import hashlib
+import time
+
+from ansible.module_utils.pn_records import (DELIMITER, iter_records,
+                                             typed_value)
+from ansible.module_utils.pn_vlan_set import VlanSet
+
+GENERATION_MODES = ('membership', 'transaction')
+
+NODE_FIELDS = ['name', 'fab-name', 'mgmt-ip', 'in-band-ip', 'state',
+               'fab-tid']
+
+# (fact, switch the show runs on, show command, fields of the rows). Fabric
+# wide vrouter shows start every row with the vrouter name.
+SHOWS = [
+    ('nodes', None, 'fabric-node-show', NODE_FIELDS),
+    ('clusters', None, 'cluster-show',
+     ['name', 'cluster-node-1', 'cluster-node-2']),
+    ('vrouters', None, 'vrouter-show',
+     ['name', 'location', 'router-type', 'bgp-as', 'router-id',
+      'hw-vrrp-id']),
+    ('interfaces', None, 'vrouter-interface-show',
+     ['vrouter-name', 'nic', 'ip', 'vlan', 'l3-port']),
+    ('links', '*', 'lldp-show',
+     ['switch', 'local-port', 'sys-name', 'port-id']),
+    ('vlans', '*', 'vlan-show', ['switch', 'id', 'scope']),
+]
+
+
+def show_command(command, fields):
+    """
+    Method to build a parsable show command.
+    :param command: The show command.
+    :param fields: List of fields to display.
+    :return: The show command with its format options.
+    """
+    if fields[0] == 'vrouter-name':
+        fields = fields[1:]
+    return '%s format %s no-show-headers parsable-delim %s' % (
+        command, ','.join(fields), DELIMITER)
+
+
+def parse_rows(result, fields):
+    """
+    Method to parse the rows of a parsable show. Rows the backend returned
+    already parsed are used as they are.
+    :param result: CommandResult of the show command.
+    :param fields: List of fields of the rows.
+    :return: List of dictionaries of field: typed value.
+    """
+    if result.records is not None:
+        return [dict((key, record.get(key)) for key in fields)
+                for record in result.records]
+    return [dict((key, typed_value(value)) for key, value in record.items())
+            for record in iter_records(result.out.splitlines(), fields)]
+
+
+def generation_key(nodes, mode):
+    """
+    Method to compute the generation key of the fabric.
+    :param nodes: List of fabric-node-show rows.
+    :param mode: One of GENERATION_MODES.
+    :return: Hex digest identifying the state of the fabric.
+    """
+    keys = ['mgmt-ip', 'fab-tid'] if mode == 'transaction' else ['mgmt-ip']
+    entries = sorted('%s=%s' % (node['name'], ','.join(
+        str(node.get(key)) for key in keys)) for node in nodes)
+    return hashlib.sha1('\n'.join(entries).encode('utf-8')).hexdigest()
+
+
+def build_facts(rows, mode, ttl, now=None):
+    """
+    Method to build the pn_fabric fact from the rows of the shows.
+    :param rows: Dictionary of fact name: list of rows, one entry per SHOWS.
+    :param mode: One of GENERATION_MODES.
+    :param ttl: Number of seconds the facts may be reused for.
+    :param now: Collection time, defaults to the current time.
+    :return: Dictionary of the fact.
+    """
+    facts = {
+        'nodes': {},
+        'clusters': {},
+        'vrouters': {},
+        'interfaces': {},
+        'links': [],
+        'vlans': {},
+        'generation': generation_key(rows['nodes'], mode),
+        'generation_mode': mode,
+        'collected_at': int(now if now is not None else time.time()),
+        'ttl': ttl,
+    }
+
+    for row in rows['nodes']:
+        facts['nodes'][row['name']] = {
+            'fabric': row.get('fab-name'),
+            'mgmt_ip': row.get('mgmt-ip'),
+            'inband_ip': row.get('in-band-ip'),
+            'state': row.get('state'),
+            'fab_tid': row.get('fab-tid'),
+        }
+
+    for row in rows['clusters']:
+        facts['clusters'][row['name']] = [row.get('cluster-node-1'),
+                                          row.get('cluster-node-2')]
+
+    for row in rows['vrouters']:
+        facts['vrouters'][row.get('location')] = {
+            'name': row['name'],
+            'router_type': row.get('router-type'),
+            'bgp_as': row.get('bgp-as'),
+            'router_id': row.get('router-id'),
+            'hw_vrrp_id': row.get('hw-vrrp-id'),
+        }
+
+    for row in rows['interfaces']:
+        facts['interfaces'].setdefault(row['vrouter-name'], []).append({
+            'nic': row.get('nic'),
+            'ip': row.get('ip'),
+            'vlan': row.get('vlan'),
+            'l3_port': row.get('l3-port'),
+        })
+
+    for row in rows['links']:
+        facts['links'].append({
+            'switch': row['switch'],
+            'port': row.get('local-port'),
+            'remote_switch': row.get('sys-name'),
+            'remote_port': row.get('port-id'),
+        })
+
+    vlans = {}
+    fabric_vlans = VlanSet()
+    for row in rows['vlans']:
+        vlans.setdefault(row['switch'], VlanSet()).add(row['id'])
+        if row.get('scope') == 'fabric':
+            fabric_vlans.add(row['id'])
+    facts['vlans'] = dict((switch, str(vlan_set))
+                          for switch, vlan_set in vlans.items())
+    facts['fabric_vlans'] = str(fabric_vlans)
+
+    return facts
+
+
+def read_nodes(executor):
+    """
+    Method to read the fabric nodes.
+    :param executor: CliExecutor used to run the command.
+    :return: Tuple of the list of rows and the failed CommandResult, or None.
+    """
+    result = executor.run(show_command('fabric-node-show', NODE_FIELDS))
+    if result.failed:
+        return [], result
+    return parse_rows(result, NODE_FIELDS), None
+
+
+def collect_facts(executor, mode, ttl):
+    """
+    Method to read the inventory of the fabric, running the shows
+    concurrently.
+    :param executor: CliExecutor used to run the commands.
+    :param mode: One of GENERATION_MODES.
+    :param ttl: Number of seconds the facts may be reused for.
+    :return: Tuple of the facts and the failed CommandResult, or None.
+    """
+    batches = [(switch, [show_command(command, fields)])
+               for _, switch, command, fields in SHOWS]
+    rows = {}
+    for (fact, _, _, fields), batch in zip(
+            SHOWS, executor.run_batches(batches, stop_on_failure=False)):
+        result = batch[0]
+        if result.failed:
+            return None, result
+        rows[fact] = parse_rows(result, fields)
+    return build_facts(rows, mode, ttl), None
+
+
+def fresh_facts(executor, cached, mode, now=None):
+    """
+    Method to check whether cached facts can be reused: they must be younger
+    than their ttl and be read from the same generation of the fabric.
+    :param executor: CliExecutor used to read the fabric nodes.
+    :param cached: pn_fabric fact of a previous run, or None.
+    :param mode: One of GENERATION_MODES.
+    :param now: Current time, defaults to time.time().
+    :return: True if the cached facts are still valid.
+    """
+    if not isinstance(cached, dict) or cached.get('generation_mode') != mode:
+        return False
+    try:
+        age = (now if now is not None else time.time()) - \
+            int(cached['collected_at'])
+        ttl = int(cached['ttl'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    if age < 0 or age >= ttl:
+        return False
+
+    nodes, failed = read_nodes(executor)
+    if failed is not None:
+        return False
+    return generation_key(nodes, mode) == cached.get('generation')
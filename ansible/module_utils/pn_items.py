@@ -0,0 +1,244 @@
+""" PN items mode shared by the single-object modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+The single-object modules (pn_trunk, pn_vlag, pn_cluster, pn_vrouter,
+pn_vrouterif, pn_vrouterbgp, pn_vrouterlbif and pn_ospf) accept a list of
+items in pn_items, so that a role configures all its objects in one task.
+Every item is a dictionary of module parameters, with or without their pn_
+prefix, overriding the top level parameters:
+
+    - pn_vrouterbgp:
+        pn_command: 'vrouter-bgp-add'
+        pn_items:
+          - {vrouter_name: spine1-vrouter, neighbor: 10.0.0.1, remote_as: 65001}
+          - {vrouter_name: spine1-vrouter, neighbor: 10.0.0.5, remote_as: 65002}
+
+A module provides two functions, used by both the single object and the
+items mode:
+    get_index(run): runs the idempotency shows through run(command), which
+        returns the output, and indexes the existing objects for exact
+        field matching.
+    plan_item(params, index): checks one object against the index, records
+        the change in the index and returns (command, message). command is
+        None when there is nothing to do. It raises ValueError for invalid
+        parameters.
+
+In items mode the index is read once per target switch (pn_cliswitch), the
+items are planned in order, and their commands run in batches per switch,
+switches concurrently. A failed item does not stop the following ones.
+"""
+
+import shlex
+
+from ansible.module_utils.pn_executor import CliExecutor
+
+TRUE_VALUES = (True, 1, '1', 'true', 'yes', 'on')
+FALSE_VALUES = (False, 0, '0', 'false', 'no', 'off')
+
+
+def convert_value(value, value_type):
+    """
+    Method to convert an item value to the type of its module parameter.
+    :param value: The value given in the item.
+    :param value_type: The type of the parameter in the argument spec.
+    :return: The converted value.
+    """
+    if value is None:
+        return None
+    if value_type == 'int':
+        return int(value)
+    if value_type == 'bool':
+        lowered = value.lower() if hasattr(value, 'lower') else value
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+        raise ValueError('%s is not a valid boolean' % value)
+    if value_type == 'list':
+        return value if isinstance(value, list) else str(value).split(',')
+    return str(value)
+
+
+def item_params(module, item):
+    """
+    Method to build the parameters of one item.
+    :param module: The Ansible module to fetch input parameters.
+    :param item: Dictionary of parameters of the item.
+    :return: Dictionary of parameters.
+    """
+    params = dict(module.params)
+    for key, value in item.items():
+        key = key if key.startswith('pn_') else 'pn_' + key
+        spec = module.argument_spec.get(key)
+        if spec is None or key in ('pn_items', 'pn_max_workers'):
+            raise ValueError('unsupported parameter %s' % key)
+        try:
+            value = convert_value(value, spec.get('type', 'str'))
+        except (TypeError, ValueError):
+            raise ValueError('invalid value %s for %s' % (value, key))
+        if spec.get('choices') and value is not None and \
+                value not in spec['choices']:
+            raise ValueError('value of %s must be one of: %s, got: %s' % (
+                key, ', '.join(str(choice) for choice in spec['choices']),
+                value))
+        params[key] = value
+    return params
+
+
+def missing_params(params, required, required_if):
+    """
+    Method to check the mandatory parameters.
+    :param params: Dictionary of parameters.
+    :param required: List of parameters always required.
+    :param required_if: List of (parameter, value, list of parameters)
+    required when the parameter has the value.
+    :return: Error message, or None if nothing is missing.
+    """
+    missing = [key for key in required if params.get(key) is None]
+    if missing:
+        return 'missing required arguments: %s' % ', '.join(missing)
+
+    for key, value, keys in required_if:
+        if params.get(key) == value:
+            missing = [name for name in keys if params.get(name) is None]
+            if missing:
+                return '%s is %s but all of the following are missing: %s' % (
+                    key, value, ', '.join(missing))
+    return None
+
+
+def check_required(module, required, required_if):
+    """
+    Method to fail the module in single object mode when a mandatory
+    parameter is missing.
+    :param module: The Ansible module to fetch input parameters.
+    :param required: List of parameters always required.
+    :param required_if: List of (parameter, value, list of parameters).
+    """
+    message = missing_params(module.params, required, required_if)
+    if message:
+        module.fail_json(msg=message)
+
+
+def show_runner(module, cli):
+    """
+    Method to build the run function of get_index() in single object mode.
+    :param module: The Ansible module to run the commands with.
+    :param cli: The cli prefix, including the switch.
+    :return: Function running a show command and returning its output.
+    """
+    return lambda command: module.run_command(shlex.split(cli + ' ' +
+                                                          command))[1]
+
+
+def switch_command(switch, command):
+    """
+    Method to target a command to the switch of an item.
+    :param switch: pn_cliswitch of the item, 'local' for the local switch.
+    :param command: The cli command.
+    :return: Tuple of the switch for the executor and the command.
+    """
+    if switch == 'local':
+        return None, 'switch-local ' + command
+    return switch, command
+
+
+def apply_items(module, get_index, plan_item, required=(), required_if=()):
+    """
+    Method to configure the items given in pn_items and exit the module with
+    one result per item.
+    :param module: The Ansible module to fetch input parameters.
+    :param get_index: Function reading the index of the existing objects.
+    :param plan_item: Function checking one item and building its command.
+    :param required: List of parameters required by every item.
+    :param required_if: List of (parameter, value, list of parameters).
+    """
+    executor = CliExecutor(module, module.params['pn_max_workers'])
+    items = module.params['pn_items']
+    results = [None] * len(items)
+    indexes = {}
+    order = []
+    batches = {}
+
+    def run_show(switch):
+        def run(command):
+            target, command = switch_command(switch, command)
+            return executor.run(command, target).out
+        return run
+
+    for number, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('item must be a dictionary')
+            params = item_params(module, item)
+            error = missing_params(params, required, required_if)
+            if error:
+                raise ValueError(error)
+
+            switch = params['pn_cliswitch']
+            if switch not in indexes:
+                indexes[switch] = get_index(run_show(switch))
+            command, message = plan_item(params, indexes[switch])
+        except ValueError as error:
+            results[number] = {'item': number, 'failed': True,
+                               'changed': False, 'msg': str(error)}
+            continue
+
+        if command is None:
+            results[number] = {'item': number, 'skipped': True,
+                               'changed': False, 'msg': message}
+            continue
+
+        target, command = switch_command(switch, command.strip())
+        if target not in batches:
+            order.append(target)
+            batches[target] = []
+        batches[target].append((number, command, message,
+                                params['pn_command']))
+
+    batch_results = executor.run_batches(
+        [(target, [entry[1] for entry in batches[target]])
+         for target in order], stop_on_failure=False)
+
+    for target, batch in zip(order, batch_results):
+        for (number, command, message, cli_command), result in zip(
+                batches[target], batch):
+            results[number] = {'item': number, 'command': command,
+                               'changed': not result.failed,
+                               'msg': message}
+            if result.failed:
+                results[number].update(
+                    failed=True, stderr=result.err.strip(),
+                    msg='%s operation failed' % cli_command)
+            elif result.out:
+                results[number]['stdout'] = result.out.strip()
+
+    changed = len([result for result in results if result['changed']])
+    skipped = len([result for result in results if result.get('skipped')])
+    failed = len([result for result in results if result.get('failed')])
+
+    module.exit_json(
+        results=results,
+        msg='%d items: %d changed, %d skipped, %d failed' % (
+            len(results), changed, skipped, failed),
+        changed=changed > 0,
+        failed=failed > 0,
+        cli_metrics=executor.metrics
+    )
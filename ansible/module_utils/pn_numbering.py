@@ -0,0 +1,290 @@
+""" PN fabric numbering plan """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Numbering of the fabric switches: bgp-as, ospf area id, router-id, loopback
+ip and in-band ip. The plan is derived in one pass from the spine list, the
+leaf list and the leaf clusters, and only two numbers are kept per switch:
+    - index: position of the switch in the fabric (spines first, then
+      leafs). Loopback ip, router-id and in-band ip are derived from it.
+    - group: 0 for spines, then one number per leaf cluster followed by one
+      per non clustered leaf. bgp-as and ospf area id are derived from it.
+
+The plan can be persisted to a small json file. When it is loaded again,
+switches keep their numbers and new switches get the next free ones, so the
+numbering of a fabric is stable when switches are added.
+"""
+
+import json
+import os
+
+PLAN_VERSION = 1
+
+
+def ip_to_int(address):
+    """
+    Method to convert a dotted ip address to an integer.
+    :param address: Ip address, optionally followed by /mask.
+    :return: Integer value of the address.
+    """
+    value = 0
+    for octet in address.split('/')[0].split('.'):
+        value = (value << 8) | int(octet)
+    return value
+
+
+def int_to_ip(value):
+    """
+    Method to convert an integer to a dotted ip address.
+    :param value: Integer value of the address.
+    :return: Ip address string.
+    """
+    return '.'.join(str((value >> shift) & 0xff) for shift in (24, 16, 8, 0))
+
+
+class NumberingPlan(object):
+    """
+    Numbers of every switch of the fabric. Lookups are dictionary accesses.
+    """
+
+    def __init__(self, switches=None, bgp_as='65000', area_id='0',
+                 loopback_ip='109.109.109.0/24', inband_ip='172.16.0.0/24'):
+        """
+        :param switches: Dictionary of switch name: [index, group].
+        :param bgp_as: bgp-as of the spines, leafs count up from it.
+        :param area_id: ospf area id to count leaf area ids up from.
+        :param loopback_ip: Network of the loopback ips.
+        :param inband_ip: Network of the /30 in-band ip blocks.
+        """
+        self.switches = switches if switches is not None else {}
+        self.bgp_as_start = int(bgp_as)
+        self.area_id_start = int(area_id)
+        self.loopback_network = loopback_ip
+        self.inband_network = inband_ip
+
+    def index(self, switch):
+        """ Position of the switch in the fabric, starting at 0. """
+        return self.switches[switch][0]
+
+    def position(self, switch):
+        """ Position of the switch in the fabric, starting at 1. """
+        return self.switches[switch][0] + 1
+
+    def bgp_as(self, switch):
+        """ bgp-as of the switch. """
+        return str(self.bgp_as_start + self._group(switch))
+
+    def area_id(self, switch):
+        """ ospf area id of the switch. """
+        return str(self.area_id_start + self._group(switch))
+
+    def loopback_ip(self, switch):
+        """ Loopback ip of the switch, without mask. """
+        return self._address(self.loopback_network, self.index(switch) + 1)
+
+    def router_id(self, switch):
+        """ Router id of the switch, which is same as its loopback ip. """
+        return self.loopback_ip(switch)
+
+    def dci_router_id(self, switch):
+        """
+        Router id and loopback ip of a DCI switch, the first two octets of
+        the loopback network followed by N.N, N being the position of the
+        switch, as pn_dci numbered the vrouters of deployed fabrics.
+        """
+        position = self.position(switch)
+        return '%s.%d.%d' % ('.'.join(self.loopback_network.split('.')[:2]),
+                             position, position)
+
+    def inband_ip(self, switch):
+        """ In-band ip of the switch, the first host of its /30 block. """
+        return '%s/30' % self._address(self.inband_network,
+                                       4 * self.index(switch) + 1)
+
+    def bgp_as_dict(self, switch_list):
+        """ Dictionary of switch: bgp-as of the given switches. """
+        return dict((switch, self.bgp_as(switch)) for switch in switch_list)
+
+    def area_id_dict(self, switch_list):
+        """ Dictionary of switch: ospf area id of the given switches. """
+        return dict((switch, self.area_id(switch)) for switch in switch_list)
+
+    def _group(self, switch):
+        group = self.switches[switch][1]
+        if group is None:
+            raise KeyError('%s is not numbered for bgp-as/area id' % switch)
+        return group
+
+    @staticmethod
+    def _address(network, offset):
+        address, mask = network.split('/')
+        host_bits = 32 - int(mask)
+        if offset >= (1 << host_bits) - 1:
+            raise ValueError('Network %s has no address left for switch '
+                             'number %d' % (network, offset))
+        return int_to_ip(((ip_to_int(address) >> host_bits) << host_bits) +
+                         offset)
+
+
+def build_plan(spine_list, leaf_list, clusters=None, previous=None,
+               **settings):
+    """
+    Method to number the switches of the fabric in one pass.
+    :param spine_list: List of spine switches.
+    :param leaf_list: List of leaf switches.
+    :param clusters: List of (node1, node2) leaf clusters. If None, groups
+    (bgp-as and area id) of new leafs are left unassigned.
+    :param previous: NumberingPlan to keep the numbers of known switches from.
+    :param settings: Keyword arguments of NumberingPlan.
+    :return: NumberingPlan of the fabric.
+    """
+    known = dict(previous.switches) if previous is not None else {}
+    switches = {}
+    used_indexes = set(entry[0] for entry in known.values())
+    next_index = max(used_indexes) + 1 if used_indexes else 0
+
+    for switch in list(spine_list) + list(leaf_list):
+        if switch in switches:
+            continue
+        if switch in known:
+            switches[switch] = list(known[switch])
+        else:
+            switches[switch] = [next_index, None]
+            next_index += 1
+
+    for spine in spine_list:
+        switches[spine][1] = 0
+
+    if clusters is not None:
+        leafs = set(leaf_list)
+        groups = [list(pair) for pair in clusters
+                  if pair[0] in leafs and pair[1] in leafs]
+        clustered = set(node for pair in groups for node in pair)
+        groups += [[leaf] for leaf in leaf_list if leaf not in clustered]
+        assign_groups(switches, groups, set(spine_list), known)
+
+    # Keep switches which are not in the inventory any more, so that their
+    # numbers are not given to other switches.
+    for switch, entry in known.items():
+        switches.setdefault(switch, list(entry))
+
+    return NumberingPlan(switches, **settings)
+
+
+def assign_groups(switches, groups, spines, known):
+    """
+    Method to give one group number to every leaf group (cluster or single
+    leaf). A group keeps the number of one of its members if no switch
+    outside the group uses it, otherwise it gets the next free number.
+    :param switches: Dictionary of switch name: [index, group] to update.
+    :param groups: List of lists of leaf switches.
+    :param spines: Set of spine switches.
+    :param known: Dictionary of switch name: [index, group] of the previous
+    plan.
+    """
+    holders = {}
+    for switch, entry in known.items():
+        if entry[1] and switch not in spines:
+            holders.setdefault(entry[1], set()).add(switch)
+    next_group = max(holders) + 1 if holders else 1
+
+    for group in groups:
+        members = set(group)
+        number = None
+        for switch in group:
+            candidate = known.get(switch, [None, None])[1]
+            if candidate and candidate in holders and \
+                    holders[candidate] <= members:
+                number = candidate
+                break
+
+        if number is None:
+            number = next_group
+            next_group += 1
+        for switch in group:
+            switches[switch][1] = number
+
+
+def load_plan(path, **settings):
+    """
+    Method to load a numbering plan saved by save_plan().
+    :param path: Path of the plan file.
+    :param settings: Keyword arguments of NumberingPlan.
+    :return: NumberingPlan, or None if the file is missing or invalid.
+    """
+    try:
+        with open(path) as plan_file:
+            data = json.load(plan_file)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if not isinstance(data, dict) or data.get('version') != PLAN_VERSION:
+        return None
+    return NumberingPlan(data.get('switches', {}), **settings)
+
+
+def save_plan(path, plan):
+    """
+    Method to save a numbering plan. The file is replaced atomically.
+    :param path: Path of the plan file.
+    :param plan: NumberingPlan to save.
+    """
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp_path, 'w') as plan_file:
+        json.dump({'version': PLAN_VERSION, 'switches': plan.switches},
+                  plan_file, separators=(',', ':'), sort_keys=True)
+    os.rename(temp_path, path)
+
+
+def get_numbering_plan(module, spine_list, leaf_list, clusters=None,
+                       new_spine_list=None, new_leaf_list=None, **settings):
+    """
+    Method to get the numbering plan of the fabric for a module. If the
+    module is given a pn_numbering_plan file, the plan is loaded from it and
+    saved back when switches got numbered.
+    :param module: The Ansible module to fetch input parameters.
+    :param spine_list: List of spine switches.
+    :param leaf_list: List of leaf switches.
+    :param clusters: List of (node1, node2) leaf clusters, or None.
+    :param new_spine_list: List of spine switches added to the fabric. They
+    are numbered after all the existing switches.
+    :param new_leaf_list: List of leaf switches added to the fabric.
+    :param settings: Keyword arguments of NumberingPlan.
+    :return: NumberingPlan of the fabric.
+    """
+    path = module.params.get('pn_numbering_plan')
+    loaded = previous = load_plan(path) if path else None
+    if new_spine_list or new_leaf_list:
+        # Number the existing switches first, so that they keep the numbers
+        # they were given when the fabric was built without a plan file.
+        previous = build_plan(spine_list, leaf_list, previous=previous)
+        spine_list = list(spine_list) + list(new_spine_list or [])
+        leaf_list = list(leaf_list) + list(new_leaf_list or [])
+
+    plan = build_plan(spine_list, leaf_list, clusters, previous, **settings)
+
+    if path and (loaded is None or loaded.switches != plan.switches):
+        try:
+            save_plan(path, plan)
+        except (IOError, OSError) as error:
+            module.fail_json(
+                msg='Could not save numbering plan %s: %s' % (path, error)
+            )
+
+    return plan
@@ -0,0 +1,212 @@
+""" PN pre-flight validation of the hosts file and csv inputs """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Loads the hosts file and every csv input of a playbook run in one pass and
+cross-checks them before any switch is touched:
+    - duplicate switch names, host ips and csv keys (hash lookups),
+    - csv rows referencing switches which are not in the hosts file,
+    - a vlan given different subnets in different csv files,
+    - subnets of different vlans which overlap (sorted interval sweep).
+"""
+
+import re
+import socket
+
+from ansible.module_utils.pn_csv import SCHEMAS, parse_csv
+
+HOSTS_GROUPS = ('[spine]', '[leaf]', '[third_party_spine]')
+CONNECTION_STR = ('ansible_user="{{ SSH_USER }}" '
+                  'ansible_ssh_pass="{{ SSH_PASS }}"')
+SWITCH_NAME_RE = re.compile(r'^[a-zA-Z0-9_.:-]+$')
+
+
+class Inventory(object):
+    """
+    Switches of the hosts file, indexed by name and by group.
+    """
+
+    def __init__(self):
+        # switch name -> line number
+        self.switches = {}
+        # host ip -> line number
+        self.host_ips = {}
+        # group name -> list of switch names
+        self.groups = {}
+        self.errors = []
+
+
+def parse_hosts_file(data):
+    """
+    Method to parse and validate hosts file data.
+    HOSTS file format: switch_name ansible_hosts=ip_address connection vars
+    :param data: String containing hosts file data.
+    :return: Inventory of the switches along with the validation errors.
+    """
+    inventory = Inventory()
+    errors = inventory.errors
+    if not data:
+        errors.append('Hosts file should not be empty')
+        return inventory
+
+    rows = [row.strip() for row in data.split('\n')]
+    if '[spine]' not in rows and '[third_party_spine]' not in rows:
+        errors.append(
+            '[spine]/[third_party_spine] section is missing from the hosts file'
+        )
+    if '[leaf]' not in rows:
+        errors.append('[leaf] section is missing from the hosts file')
+    if errors:
+        return inventory
+
+    group = None
+    for line_count, row in enumerate(rows, 1):
+        if not row or row.startswith('#'):
+            # Skip blank lines and comments which starts with '#'
+            continue
+
+        elements = row.split(' ', 2)
+        if len(elements) == 1 and elements[0] in HOSTS_GROUPS:
+            group = elements[0][1:-1]
+            inventory.groups.setdefault(group, [])
+            continue
+
+        host = elements[1].split('=') if len(elements) == 3 else []
+        if (len(host) != 2 or host[0] != 'ansible_host' or
+                elements[2] != CONNECTION_STR):
+            errors.append('Invalid entry at line number {}'.format(line_count))
+            continue
+
+        switch, ip = elements[0], host[1]
+
+        # Switch name validation
+        if switch in inventory.switches:
+            errors.append('Duplicate switch name {} at line number {}'.format(
+                switch, line_count))
+        else:
+            inventory.switches[switch] = line_count
+            if group is not None:
+                inventory.groups[group].append(switch)
+            if SWITCH_NAME_RE.match(switch) is None:
+                errors.append('Invalid switch name {} at line number {}'.format(
+                    switch, line_count))
+
+        # Host ip validation
+        if ip in inventory.host_ips:
+            errors.append('Duplicate host ip {} at line number {}'.format(
+                ip, line_count))
+        else:
+            inventory.host_ips[ip] = line_count
+            try:
+                if ip.count('.') != 3:
+                    raise socket.error
+                socket.inet_aton(ip)
+            except socket.error:
+                errors.append('Invalid host ip {} at line number {}'.format(
+                    ip, line_count))
+
+    return inventory
+
+
+def subnet_range(subnet):
+    """
+    Method to find the first and last address of a subnet.
+    :param subnet: Subnet in a.b.c.d/n format.
+    :return: Tuple of first and last address as integers.
+    """
+    address, mask = subnet.split('/')
+    value = 0
+    for octet in address.split('.'):
+        value = (value << 8) | int(octet)
+    host_bits = 32 - int(mask)
+    first = (value >> host_bits) << host_bits
+    return first, first | ((1 << host_bits) - 1)
+
+
+def find_overlapping_subnets(entries):
+    """
+    Method to find subnets of different vlans which overlap. The subnets are
+    sorted by first address and swept once, keeping the subnet which reaches
+    the furthest so far.
+    :param entries: List of (subnet, vlan, location) tuples.
+    :return: List of error messages.
+    """
+    errors = []
+    ranges = sorted((subnet_range(subnet), vlan, subnet, location)
+                    for subnet, vlan, location in entries)
+    widest = None
+    for (first, last), vlan, subnet, location in ranges:
+        if widest is not None and first <= widest[0][1] and vlan != widest[1]:
+            errors.append(
+                '{}: subnet {} of vlan {} overlaps subnet {} of vlan {} at '
+                '{}'.format(location, subnet, vlan, widest[2], widest[1],
+                            widest[3])
+            )
+        if widest is None or last > widest[0][1]:
+            widest = ((first, last), vlan, subnet, location)
+
+    return errors
+
+
+def preflight(hosts_data, csv_inputs):
+    """
+    Method to validate the hosts file and all csv inputs together.
+    :param hosts_data: String containing hosts file data.
+    :param csv_inputs: Dictionary of csv type (see pn_csv.SCHEMAS): csv data.
+    :return: Tuple of the list of error messages and a dictionary counting
+    switches and rows loaded per csv type.
+    """
+    inventory = parse_hosts_file(hosts_data)
+    errors = list(inventory.errors)
+    counts = {'switches': len(inventory.switches)}
+    subnets = []
+    # vlan id -> (subnet, location) of the first row defining it
+    vlan_subnets = {}
+
+    for name in sorted(csv_inputs):
+        schema = SCHEMAS.get(name)
+        if schema is None:
+            errors.append('{}: unknown csv type, expected one of {}'.format(
+                name, ', '.join(sorted(SCHEMAS))))
+            continue
+
+        table = parse_csv(csv_inputs[name] or '', schema, inventory.switches)
+        counts[name] = len(table.rows)
+        errors += ['{}: {}'.format(name, error) for error in table.errors]
+        if not schema.subnet:
+            continue
+
+        for row in table.rows:
+            subnet = getattr(row, schema.subnet)
+            location = '{}: line {}'.format(name, row.line)
+            network = '%d/%s' % (subnet_range(subnet)[0],
+                                 subnet.split('/')[1])
+            defined = vlan_subnets.setdefault(row.vlan_id,
+                                              (network, subnet, location))
+            if defined[0] != network:
+                errors.append(
+                    '{}: vlan {} uses subnet {} but subnet {} at {}'.format(
+                        location, row.vlan_id, subnet, defined[1],
+                        defined[2])
+                )
+            elif defined[2] == location:
+                subnets.append((subnet, row.vlan_id, location))
+
+    errors += find_overlapping_subnets(subnets)
+    return errors, counts
@@ -0,0 +1,207 @@
+""" PN progress status file of long running modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Modules configuring the whole fabric (pn_ebgp_ospf, pn_dci, pn_l3_ztp) can
+run for a long time. Run with Ansible async (async: N, poll: 0), they write
+their progress to the JSON status file given in pn_status_file, which the
+controller polls with pn_progress:
+
+    {"task": "Configure eBGP/OSPF", "phase": "Configure BGP",
+     "phase_number": 3, "phases_total": 5, "switches_done": 4,
+     "switches_total": 10, "cli_calls": 120, "elapsed": 85.2,
+     "started": 1476000000.0, "updated": 1476000085.2, "pid": 1234,
+     "run_id": "1476000000123", "finished": false, "failed": false,
+     "msg": ""}
+
+The file is replaced atomically, at most once per WRITE_INTERVAL seconds
+while commands run and at every phase change, and a last time with
+finished set when the module exits. The first status is written when the
+module starts, before any command, replacing the file of a previous run; the
+run_id given in pn_run_id lets pn_progress tell the status of the run it
+waits for from one left by a previous run. A switch counts as done in a phase once
+the commands of the phase moved on to another switch.
+"""
+
+import json
+import os
+import shlex
+import tempfile
+import time
+
+WRITE_INTERVAL = 1.0
+
+
+def command_switch(cli):
+    """
+    Method to find the switch a cli command is targeted to.
+    :param cli: The cli command, as a string or a list of arguments.
+    :return: The switch name, or None for the local switch.
+    """
+    tokens = shlex.split(cli) if hasattr(cli, 'split') else list(cli)
+    for number, token in enumerate(tokens[:-1]):
+        if token == 'switch':
+            return tokens[number + 1]
+    return None
+
+
+def read_status(path):
+    """
+    Method to read a status file.
+    :param path: Path of the status file.
+    :return: Dictionary of the status, or None if the file does not exist
+    yet or is not a status file.
+    """
+    try:
+        with open(path) as status_file:
+            status = json.load(status_file)
+    except (IOError, OSError, ValueError):
+        return None
+    return status if isinstance(status, dict) else None
+
+
+class Progress(object):
+    """
+    Progress of a module, written to a status file.
+    """
+
+    def __init__(self, path=None, task='', switches_total=0,
+                 phases_total=0, run_id=None):
+        """
+        :param path: Path of the status file, None to keep the progress in
+        memory only.
+        :param task: Name of the task, like the task field of the result.
+        :param switches_total: Number of switches of the fabric.
+        :param phases_total: Number of phases of the module.
+        :param run_id: Identifier of the run given by the playbook, written
+        to the status file for pn_progress.
+        """
+        self.path = path
+        self.started = time.time()
+        self.written = 0.0
+        self.current = None
+        self.done = set()
+        self.status = {
+            'task': task,
+            'phase': '',
+            'phase_number': 0,
+            'phases_total': phases_total,
+            'switches_done': 0,
+            'switches_total': switches_total,
+            'cli_calls': 0,
+            'elapsed': 0.0,
+            'started': self.started,
+            'updated': self.started,
+            'pid': os.getpid(),
+            'run_id': run_id,
+            'finished': False,
+            'failed': False,
+            'msg': '',
+        }
+
+    def phase(self, name):
+        """
+        Method to start a new phase.
+        :param name: Name of the phase.
+        """
+        self.current = None
+        self.done = set()
+        self.status.update(phase=name,
+                           phase_number=self.status['phase_number'] + 1,
+                           switches_done=0)
+        self.write(force=True)
+
+    def command(self, cli):
+        """
+        Method to account for a cli command which completed.
+        :param cli: The cli command, as a string or a list of arguments.
+        """
+        switch = command_switch(cli)
+        if switch != self.current and self.current is not None:
+            self.done.add(self.current)
+        self.current = switch
+        self.status['cli_calls'] += 1
+        self.status['switches_done'] = len(self.done - set([switch]))
+        self.write()
+
+    def finish(self, failed=False, msg=''):
+        """
+        Method to record the end of the module.
+        :param failed: Whether the module failed.
+        :param msg: The msg of the module result.
+        """
+        if self.current is not None:
+            self.done.add(self.current)
+        self.status.update(finished=True, failed=bool(failed), msg=msg,
+                           switches_done=len(self.done))
+        self.write(force=True)
+
+    def attach(self, module):
+        """
+        Method to write the first status and record the end of the module
+        when it exits: exit_json and fail_json of the module write the last
+        status before exiting.
+        :param module: The Ansible module.
+        :return: The Progress itself.
+        """
+        exit_json = module.exit_json
+        fail_json = module.fail_json
+
+        def progress_exit_json(**kwargs):
+            self.finish(kwargs.get('failed', False), kwargs.get('msg', ''))
+            exit_json(**kwargs)
+
+        def progress_fail_json(**kwargs):
+            self.finish(True, kwargs.get('msg', ''))
+            fail_json(**kwargs)
+
+        module.exit_json = progress_exit_json
+        module.fail_json = progress_fail_json
+        self.write(force=True)
+        return self
+
+    def write(self, force=False):
+        """
+        Method to replace the status file, at most once per WRITE_INTERVAL
+        seconds unless forced. Errors writing the file are ignored, the
+        status file must not fail the configuration.
+        :param force: Whether to write regardless of the interval.
+        """
+        now = time.time()
+        self.status.update(elapsed=round(now - self.started, 1), updated=now)
+        if not self.path or (not force and
+                             now - self.written < WRITE_INTERVAL):
+            return
+
+        self.written = now
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            handle, temp_path = tempfile.mkstemp(dir=directory,
+                                                 prefix='.pn_progress')
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(handle, 'w') as temp_file:
+                json.dump(self.status, temp_file)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
@@ -0,0 +1,192 @@
+""" PN streaming parser of parsable show output """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Show commands run with 'parsable-delim |' print one row per line. The rows
+are parsed one line at a time into records (dictionaries of field: value),
+filtered, paged and projected as they are read, so that only the selected
+records are kept in memory:
+
+    lines = iter(response.stdout.readline, '')
+    records = iter_records(lines, ['mac', 'vlan', 'ports'])
+    selected, matched, truncated = select_records(
+        records, parse_filters(['vlan=10', 'mac^=00:11']), ['mac', 'ports'],
+        limit=100)
+
+Filters are strings of the form:
+    field=value             the field is equal to value
+    field^=prefix           the field starts with prefix
+    field<<network/len      the field is an ipv4 address or network inside
+                            the network
+All the filters of a list must match.
+"""
+
+import re
+
+from ansible.module_utils.pn_numbering import ip_to_int
+
+DELIMITER = '|'
+
+# Longest operators first, so that '^=' is not read as '='.
+FILTER_OPERATORS = ('^=', '<<', '=')
+
+INTEGER_RE = re.compile(r'^-?(0|[1-9][0-9]*)$')
+IPV4_RE = re.compile(r'^\d{1,3}(\.\d{1,3}){3}(/\d{1,2})?$')
+
+
+def parse_filter(text):
+    """
+    Method to parse a filter string.
+    :param text: Filter like 'vlan=10', 'mac^=00:11' or 'ip<<10.0.0.0/8'.
+    :return: Tuple of (field, operator, value).
+    """
+    positions = [(text.find(operator), operator)
+                 for operator in FILTER_OPERATORS if operator in text]
+    if not positions:
+        raise ValueError('Invalid filter %s, expected field=value, '
+                         'field^=prefix or field<<network' % text)
+
+    # The first operator of the string separates the field from the value.
+    position, operator = min(positions, key=lambda entry: (entry[0],
+                                                           -len(entry[1])))
+    field = text[:position].strip()
+    value = text[position + len(operator):].strip()
+    if not field:
+        raise ValueError('Invalid filter %s, field name is missing' % text)
+    if operator == '<<' and not network_bits(value):
+        raise ValueError('Invalid filter %s, %s is not an ipv4 network' % (
+            text, value))
+    return field, operator, value
+
+
+def parse_filters(filters):
+    """
+    Method to parse a list of filter strings.
+    :param filters: List of filter strings, or None.
+    :return: List of (field, operator, value) tuples.
+    """
+    return [parse_filter(text) for text in filters or []]
+
+
+def network_bits(value):
+    """
+    Method to split an ipv4 address or network into integers.
+    :param value: Address like '10.1.1.1' or network like '10.0.0.0/8'.
+    :return: Tuple of (address, prefix length), or None if value is not ipv4.
+    """
+    if not IPV4_RE.match(value):
+        return None
+    address, _, length = value.partition('/')
+    length = int(length) if length else 32
+    if length > 32 or [octet for octet in address.split('.')
+                       if int(octet) > 255]:
+        return None
+    return ip_to_int(address), length
+
+
+def match_filter(record, field, operator, value):
+    """
+    Method to check one filter against a record.
+    :param record: Dictionary of field: raw string value.
+    :param field: Field name of the filter.
+    :param operator: One of FILTER_OPERATORS.
+    :param value: Value of the filter.
+    :return: True if the record matches.
+    """
+    actual = record.get(field)
+    if actual is None:
+        return False
+    if operator == '=':
+        return actual == value
+    if operator == '^=':
+        return actual.startswith(value)
+
+    network, length = network_bits(value)
+    inside = network_bits(actual)
+    if inside is None or inside[1] < length:
+        return False
+    shift = 32 - length
+    return inside[0] >> shift == network >> shift
+
+
+def typed_value(value):
+    """
+    Method to convert a raw field value to its type.
+    :param value: Raw string value.
+    :return: int for integers, None for empty values, otherwise the string.
+    """
+    if value == '':
+        return None
+    if INTEGER_RE.match(value):
+        return int(value)
+    return value
+
+
+def iter_records(lines, fields=None, delimiter=DELIMITER):
+    """
+    Method to parse parsable show output one line at a time.
+    :param lines: Iterable of output lines.
+    :param fields: List of field names of the columns, or None if the first
+    line is the header line.
+    :param delimiter: Column delimiter given to parsable-delim.
+    :return: Generator of dictionaries of field: raw string value.
+    """
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        values = line.split(delimiter)
+        if fields is None:
+            fields = [value.strip() for value in values]
+            continue
+        if len(values) > len(fields):
+            # The last column keeps the delimiters it contains.
+            values[len(fields) - 1:] = [delimiter.join(
+                values[len(fields) - 1:])]
+        yield dict(zip(fields, values))
+
+
+def select_records(records, filters=None, fields=None, offset=0,
+                   limit=None):
+    """
+    Method to filter, page and project records while they are read. Reading
+    stops after the first record past the requested page.
+    :param records: Iterable of dictionaries of field: raw string value.
+    :param filters: List of (field, operator, value) tuples.
+    :param fields: List of fields to keep, or None to keep all of them.
+    :param offset: Number of matching records to skip.
+    :param limit: Maximum number of records to return, or None.
+    :return: Tuple of (list of typed records, number of matching records
+    read, True if more matching records were left unread).
+    """
+    selected = []
+    matched = 0
+    for record in records:
+        if filters and not all(match_filter(record, *entry)
+                               for entry in filters):
+            continue
+        if limit is not None and matched >= offset + limit:
+            return selected, matched, True
+        matched += 1
+        if matched <= offset:
+            continue
+        keys = fields if fields is not None else record.keys()
+        selected.append(dict((key, typed_value(record.get(key, '')))
+                             for key in keys))
+    return selected, matched, False
@@ -0,0 +1,384 @@
+""" PN Netvisor REST API execution backend """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Runs show commands through the Netvisor REST API (vRest) enabled by
+pn_fabric_creation, instead of forking the cli binary for every command.
+RestExecutor is a drop-in replacement of CliExecutor:
+
+    from ansible.module_utils.pn_rest import make_executor
+
+    executor = make_executor(module, max_workers=10)
+    result = executor.run('vlan-show format id,scope no-show-headers', '*')
+    result.records      # [{'switch': 'spine1', 'id': 10, 'scope': 'fabric'}]
+    result.out          # same text as the cli would print
+
+A show command is translated to a GET of its resource, with the remaining
+arguments as query parameters:
+    vlan-show scope fabric                 GET /vRest/vlans?scope=fabric
+    switch leaf1 vrouter-interface-show    GET /vRest/switches/leaf1/
+                                               vrouter-interfaces
+The JSON rows are returned in result.records and also rendered as the cli
+would print them (format, no-show-headers and parsable-delim are honoured),
+so callers parsing the text keep working. Shows on switch '*' query every
+fabric node concurrently and add the switch field to the rows. Commands
+other than shows run through the cli.
+
+HTTP connections are kept alive and reused from a pool holding one
+connection per worker thread.
+"""
+
+import base64
+import json
+import shlex
+import socket
+import ssl
+import threading
+import time
+
+try:
+    import http.client as httplib
+    from urllib.parse import quote, urlencode, urlparse
+except ImportError:
+    import httplib
+    from urllib import quote, urlencode
+    from urlparse import urlparse
+
+from ansible.module_utils.pn_executor import (CliExecutor, CommandResult,
+                                              DEFAULT_MAX_WORKERS,
+                                              run_concurrently)
+from ansible.module_utils.pn_records import typed_value
+
+BACKENDS = ('cli', 'rest')
+DEFAULT_REST_URL = 'https://127.0.0.1'
+API_PATH = '/vRest'
+TIMEOUT = 30
+
+# Show commands whose resource is not the object name followed by 's'.
+RESOURCES = {
+    'lldp': 'lldp',
+    'switch-setup': 'switch-setup',
+    'vrouter-bgp': 'vrouter-bgp',
+    'vrouter-ospf': 'vrouter-ospf',
+}
+
+OUTPUT_FLAGS = ('no-show-headers',)
+OUTPUT_OPTIONS = ('format', 'parsable-delim', 'layout', 'sort-asc',
+                  'sort-desc')
+
+
+class ConnectionPool(object):
+    """
+    Pool of keep-alive HTTP connections to one server.
+    """
+
+    def __init__(self, url, size=DEFAULT_MAX_WORKERS, timeout=TIMEOUT):
+        """
+        :param url: Base url of the server, like https://127.0.0.1.
+        :param size: Maximum number of idle connections kept open.
+        :param timeout: Socket timeout of the connections, in seconds.
+        """
+        parsed = urlparse(url)
+        self.scheme = parsed.scheme or 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.size = size
+        self.timeout = timeout
+        self.stats = {'connections': 0, 'requests': 0}
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.scheme == 'https':
+            # The switch web server uses a self-signed certificate.
+            context = ssl._create_unverified_context()
+            connection = httplib.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout, context=context)
+        else:
+            connection = httplib.HTTPConnection(self.host, self.port,
+                                                timeout=self.timeout)
+        with self._lock:
+            self.stats['connections'] += 1
+        return connection
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Method to send a request on a pooled connection. A request failing on
+        a reused connection, which the server may have closed while idle, is
+        sent again on a new one.
+        :param method: HTTP method.
+        :param path: Path of the request, including the query string.
+        :param body: Optional request body.
+        :param headers: Dictionary of request headers.
+        :return: Tuple of the status code and the response body.
+        """
+        connection, reused = self._acquire()
+        while True:
+            try:
+                connection.request(method, path, body, headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (httplib.HTTPException, socket.error):
+                connection.close()
+                if not reused:
+                    raise
+                connection, reused = self._connect(), False
+                continue
+
+            with self._lock:
+                self.stats['requests'] += 1
+            if response.getheader('connection', '').lower() == 'close':
+                connection.close()
+            else:
+                self._release(connection)
+            return response.status, data
+
+    def close(self):
+        """ Close the idle connections. """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+def parse_show(command):
+    """
+    Method to split a show command into its resource, query parameters and
+    output options.
+    :param command: The cli show command, without the switch prefix.
+    :return: Tuple of (resource, dictionary of query parameters, dictionary
+    of output options), or None if the command is not a show.
+    """
+    tokens = shlex.split(command)
+    if not tokens or not tokens[0].endswith('-show'):
+        return None
+
+    name = tokens[0][:-len('-show')]
+    resource = RESOURCES.get(name, name + 's')
+    query = {}
+    options = {}
+    args = tokens[1:]
+    while args:
+        key = args.pop(0)
+        if key in OUTPUT_FLAGS:
+            options[key] = True
+        elif key in OUTPUT_OPTIONS:
+            options[key] = args.pop(0) if args else ''
+        elif args:
+            query[key] = args.pop(0)
+        else:
+            query[key] = 'true'
+    return resource, query, options
+
+
+def response_rows(status, data):
+    """
+    Method to read the rows of a vRest response.
+    :param status: HTTP status code.
+    :param data: Response body.
+    :return: Tuple of the list of rows and an error message, or None.
+    """
+    try:
+        document = json.loads(data.decode('utf-8') if isinstance(data, bytes)
+                              else data)
+    except ValueError:
+        return [], 'Invalid JSON response (HTTP %d)' % status
+
+    result = document.get('result', {}) if isinstance(document, dict) else {}
+    messages = [entry.get('message') for entry in result.get('result', [])
+                if isinstance(entry, dict) and entry.get('message') and
+                entry.get('status', 'Success') != 'Success']
+    if status >= 400 or result.get('status', 'Success') != 'Success':
+        return [], '; '.join(messages) or 'HTTP %d' % status
+
+    rows = document.get('data', []) if isinstance(document, dict) else []
+    if isinstance(rows, dict):
+        rows = [rows]
+    return rows, None
+
+
+def render_rows(rows, options, resource):
+    """
+    Method to print rows the way the cli prints a show.
+    :param rows: List of dictionaries of field: value.
+    :param options: Dictionary of output options of the show.
+    :param resource: Resource of the show.
+    :return: Text output of the show.
+    """
+    fields = options.get('format', 'all')
+    if fields == 'all':
+        fields = []
+        for row in rows:
+            fields += [key for key in row if key not in fields]
+    else:
+        fields = fields.split(',')
+
+    # Fabric wide vrouter shows start every row with the vrouter name.
+    if resource.startswith('vrouter-') and 'vrouter-name' not in fields and \
+            [row for row in rows if 'vrouter-name' in row]:
+        fields = ['vrouter-name'] + fields
+
+    delimiter = options.get('parsable-delim')
+    lines = []
+    if not options.get('no-show-headers'):
+        lines.append(fields)
+    for row in rows:
+        lines.append(['' if row.get(field) is None else str(row.get(field))
+                      for field in fields])
+    if delimiter:
+        return ''.join(delimiter.join(line) + '\n' for line in lines)
+    return ''.join(' '.join(line) + '\n' for line in lines)
+
+
+class RestExecutor(CliExecutor):
+    """
+    Runs show commands through the REST API and other commands through the
+    cli, keeping count of the calls and time spent in them.
+    """
+
+    def __init__(self, module, max_workers=DEFAULT_MAX_WORKERS,
+                 url=DEFAULT_REST_URL):
+        """
+        :param module: The Ansible module to fetch username and password.
+        :param max_workers: Maximum number of requests sent at once.
+        :param url: Base url of the web server of the switch.
+        """
+        CliExecutor.__init__(self, module, max_workers)
+        self.pool = ConnectionPool(url, self.max_workers)
+        self.headers = {'Accept': 'application/json'}
+        username = module.params.get('pn_cliusername')
+        password = module.params.get('pn_clipassword')
+        if username and password:
+            token = base64.b64encode(('%s:%s' % (username, password)).encode(
+                'utf-8')).decode('ascii')
+            self.headers['Authorization'] = 'Basic ' + token
+        self.metrics['requests'] = 0
+
+    def get(self, resource, query, switch=None):
+        """
+        Method to read the rows of a resource.
+        :param resource: Resource name, like vlans.
+        :param query: Dictionary of query parameters.
+        :param switch: Optional switch to read the rows from.
+        :return: Tuple of the list of rows and an error message, or None.
+        """
+        path = API_PATH
+        if switch:
+            path += '/switches/' + quote(switch)
+        path += '/' + resource
+        if query:
+            path += '?' + urlencode(sorted(query.items()))
+        try:
+            status, data = self.pool.request('GET', path,
+                                             headers=self.headers)
+        except (httplib.HTTPException, socket.error) as error:
+            return [], 'REST request %s failed: %s' % (path, error)
+        with self._lock:
+            self.metrics['requests'] += 1
+        return response_rows(status, data)
+
+    def fabric_nodes(self):
+        """
+        Method to list the fabric nodes.
+        :return: Tuple of the list of node names and an error message, or
+        None.
+        """
+        rows, error = self.get('fabric-nodes', {})
+        return [row['name'] for row in rows if row.get('name')], error
+
+    def execute(self, command, switch=None):
+        """
+        Method to run one cli command, through the REST API if it is a show.
+        :param command: The cli command, without the cli prefix.
+        :param switch: Optional switch to target the command to, '*' for
+        every fabric node.
+        :return: CommandResult of the command.
+        """
+        show = parse_show(command)
+        if show is None:
+            return CliExecutor.execute(self, command, switch)
+        timeout, _ = self.timeout(switch)
+        if timeout is not None and timeout <= 0:
+            return self.expired_result(command, switch)
+
+        resource, query, options = show
+        start = time.time()
+        if switch == '*':
+            rows, error = self.fabric_rows(resource, query)
+        else:
+            rows, error = self.get(resource, query, switch)
+
+        self.spend(switch, time.time() - start)
+        out = render_rows(rows, options, resource) if rows else ''
+        records = [dict((key, typed_value(value) if hasattr(value, 'lower')
+                         else value) for key, value in row.items())
+                   for row in rows]
+        return CommandResult(switch, command, 1 if error else 0, out,
+                             error or '', time.time() - start, records)
+
+    def fabric_rows(self, resource, query):
+        """
+        Method to read the rows of a resource from every fabric node, the
+        nodes being queried concurrently.
+        :param resource: Resource name, like vlans.
+        :param query: Dictionary of query parameters.
+        :return: Tuple of the list of rows and an error message, or None.
+        """
+        nodes, error = self.fabric_nodes()
+        if error:
+            return [], error
+
+        rows = []
+        for node, (node_rows, error) in zip(nodes, run_concurrently(
+                lambda node: self.get(resource, query, node), nodes,
+                self.max_workers)):
+            if error:
+                return [], '%s: %s' % (node, error)
+            for row in node_rows:
+                row.setdefault('switch', node)
+                rows.append(row)
+        return rows, None
+
+
+def make_executor(module, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Method to create the executor of the backend selected by the pn_backend
+    parameter of the module.
+    :param module: The Ansible module to fetch input parameters.
+    :param max_workers: Maximum number of commands run at once.
+    :return: CliExecutor or RestExecutor.
+    """
+    if module.params.get('pn_backend') == 'rest':
+        return RestExecutor(module, max_workers,
+                            module.params.get('pn_rest_url') or
+                            DEFAULT_REST_URL)
+    return CliExecutor(module, max_workers)
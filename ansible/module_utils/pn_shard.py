@@ -0,0 +1,312 @@
+""" PN sharded execution across several seed switches """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+A fabric-wide module normally runs on a single seed switch, which sends the
+commands of every switch through its own cli. In sharded mode the module
+runs on several seed switches at once (usually every spine), each seed
+configuring its own share of the fabric:
+
+    - name: Configure VRRP L3 setup
+      hosts: spine
+      tasks:
+        - pn_ztp_vrrp_l3:
+            ...
+            pn_shard_seeds: "{{ groups['spine'] }}"
+            pn_current_switch: "{{ inventory_hostname }}"
+          register: vrrp_shard
+
+Every seed reads the fabric nodes, lldp links and clusters and computes the
+same assignment of switches to seeds: a seed owns itself, and every other
+switch goes to the least loaded seed it has an lldp link to (any seed if it
+has none), switches and seeds being taken in name order. The nodes of a
+cluster, existing or planned, and the switches sharing a VIP go to the same
+seed. A spine thus drives its own share of the leaves. Every seed also
+builds the whole plan from the same inputs, but only runs the write batches
+of the switches it owns; show commands run everywhere. Commands on the local
+switch (fabric scope objects, [fabric] sections) run on the first seed only,
+and the other seeds wait for the fabric scope objects they depend on before
+using them.
+
+Each seed returns a shard summary holding the assignment and a digest of the
+plan inputs. pn_shard_merge combines the results of the seeds, checking that
+they all worked from the same plan and that every switch was configured by
+exactly one of them.
+"""
+
+import hashlib
+import json
+
+from ansible.module_utils.pn_records import DELIMITER, iter_records
+
+
+class Shard(object):
+    """
+    Share of the fabric configured by one seed switch.
+    """
+
+    def __init__(self, seed, owners, digest, seeds=None):
+        """
+        :param seed: Name of the seed switch running the module.
+        :param owners: Dictionary of switch: seed configuring it.
+        :param digest: Digest of the plan inputs and the assignment.
+        :param seeds: List of all the seeds, some of which may own no switch
+        when they are clustered with another seed. Defaults to the owners.
+        """
+        self.seed = seed
+        self.owners = owners
+        self.seeds = sorted(set(seeds or owners.values()))
+        self.primary = self.seeds[0]
+        self.digest = digest
+
+    def owns(self, switch):
+        """
+        Method to check whether the seed configures a switch. Commands on
+        the local switch and switches unknown to the fabric belong to the
+        first seed.
+        :param switch: Switch name, or None for the local switch.
+        :return: True if the commands of the switch run on this seed.
+        """
+        if not switch or switch == '*':
+            return self.seed == self.primary
+        return self.owners.get(switch, self.primary) == self.seed
+
+    def switches(self):
+        """
+        Method to list the switches configured by the seed.
+        :return: Sorted list of switch names.
+        """
+        return sorted(switch for switch, seed in self.owners.items()
+                      if seed == self.seed)
+
+    def summary(self):
+        """
+        Method to describe the shard in the module result.
+        :return: Dictionary of the shard, read by pn_shard_merge.
+        """
+        return {
+            'seed': self.seed,
+            'primary': self.seed == self.primary,
+            'switches': self.switches(),
+            'seeds': self.seeds,
+            'assignment': self.owners,
+            'plan_digest': self.digest,
+        }
+
+
+def group_switches(nodes, groups):
+    """
+    Method to merge the nodes into the groups of switches configured
+    together, groups sharing a switch being merged.
+    :param nodes: List of fabric node names.
+    :param groups: List of lists of switch names configured together.
+    :return: List of sorted lists of switch names, in name order.
+    """
+    group_of = dict((node, frozenset([node])) for node in nodes)
+    for group in groups or []:
+        merged = frozenset(switch for switch in group if switch)
+        for switch in list(merged):
+            merged |= group_of.get(switch, frozenset())
+        for switch in merged:
+            group_of[switch] = merged
+    return sorted(sorted(group) for group in set(group_of.values()))
+
+
+def assign_switches(nodes, seeds, links, groups=None):
+    """
+    Method to assign every fabric node to a seed switch. The assignment only
+    depends on its inputs, so that every seed computes the same one.
+    :param nodes: List of fabric node names.
+    :param seeds: List of seed switch names.
+    :param links: List of (switch, remote switch) lldp links.
+    :param groups: List of lists of switches to assign to the same seed,
+    like the nodes of a cluster.
+    :return: Dictionary of switch: seed.
+    """
+    seeds = sorted(set(seeds))
+    owners = {}
+    load = dict((seed, 0) for seed in seeds)
+    neighbours = {}
+    for switch, remote in links:
+        neighbours.setdefault(switch, set()).add(remote)
+        neighbours.setdefault(remote, set()).add(switch)
+
+    groups = group_switches(set(nodes) | set(seeds), groups)
+    # Groups holding a seed go to that seed (the first one if several),
+    # before the other groups are balanced.
+    for group in sorted(groups, key=lambda group: not set(group) & set(seeds)):
+        members = [seed for seed in seeds if seed in group]
+        if not members:
+            linked = set()
+            for switch in group:
+                linked |= neighbours.get(switch, set())
+            members = [seed for seed in seeds if seed in linked] or seeds
+        owner = min(members, key=lambda seed: (load[seed], seed))
+        for switch in group:
+            owners[switch] = owner
+        load[owner] += len(group)
+
+    return owners
+
+
+def plan_digest(plan_input, owners):
+    """
+    Method to compute the digest identifying the plan of a sharded run.
+    :param plan_input: Data the plan is built from, like the csv data.
+    :param owners: Dictionary of switch: seed.
+    :return: Hex digest.
+    """
+    text = json.dumps([plan_input, sorted(owners.items())], sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def read_topology(executor):
+    """
+    Method to read the fabric nodes and the lldp links between them.
+    :param executor: CliExecutor used to run the shows.
+    :return: Tuple of the list of nodes, the list of (switch, remote switch)
+    links, the list of (node 1, node 2) clusters and the failed
+    CommandResult, or None.
+    """
+    nodes, links, clusters = executor.run_batches([
+        (None, ['fabric-node-show format name no-show-headers']),
+        ('*', ['lldp-show format switch,sys-name no-show-headers '
+               'parsable-delim %s' % DELIMITER]),
+        (None, ['cluster-show format cluster-node-1,cluster-node-2 '
+                'no-show-headers']),
+    ], stop_on_failure=False)
+    for batch in (nodes, links, clusters):
+        if batch[0].failed:
+            return [], [], [], batch[0]
+
+    return nodes[0].out.split(), [
+        (record['switch'].strip(), record['sys-name'].strip())
+        for record in iter_records(links[0].out.splitlines(),
+                                   ['switch', 'sys-name'])
+    ], [tuple(line.split()[-2:]) for line in clusters[0].out.splitlines()
+        if len(line.split()) >= 2], None
+
+
+def shard_executor(module, executor, plan_input, groups=None):
+    """
+    Method to restrict an executor to the share of the fabric of the seed
+    the module runs on, when pn_shard_seeds is given.
+    :param module: The Ansible module to fetch input parameters.
+    :param executor: CliExecutor running the commands of the module.
+    :param plan_input: Data the plan is built from, like the csv data.
+    :param groups: List of lists of switches the plan configures together,
+    like planned clusters. Existing clusters are always kept together.
+    :return: The Shard, or None when the module is not sharded. The module
+    fails if the seeds are not fabric nodes.
+    """
+    seeds = module.params.get('pn_shard_seeds')
+    if not seeds:
+        return None
+
+    seed = module.params.get('pn_current_switch')
+    if seed not in seeds:
+        module.fail_json(msg='pn_current_switch %s is not one of the '
+                             'pn_shard_seeds' % seed)
+
+    nodes, links, clusters, failed = read_topology(executor)
+    if failed is not None:
+        module.fail_json(msg='Could not read the fabric topology: %s failed'
+                             % failed.command, stderr=failed.err.strip())
+
+    unknown = sorted(set(seeds) - set(nodes))
+    if unknown:
+        module.fail_json(msg='Shard seeds are not fabric nodes: %s' %
+                             ', '.join(unknown))
+
+    owners = assign_switches(nodes, seeds, links,
+                             clusters + list(groups or []))
+    executor.shard = Shard(seed, owners, plan_digest(plan_input, owners),
+                           seeds)
+    return executor.shard
+
+
+def add_metrics(total, metrics):
+    """
+    Method to add the cli metrics of one seed to a total.
+    :param total: Dictionary of metric: value, updated in place.
+    :param metrics: cli_metrics of the result of a seed, or None.
+    """
+    for key, value in (metrics or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+
+
+def merge_results(results):
+    """
+    Method to combine the results of the seeds of a sharded run.
+    :param results: List of the module results registered on every seed.
+    :return: Tuple of the merged result and an error message, or None when
+    the shards are consistent: they worked from the same plan, and every
+    seed of the assignment reported once.
+    """
+    shards = []
+    for number, result in enumerate(results):
+        shard = result.get('shard') if isinstance(result, dict) else None
+        if not shard:
+            return None, 'Result %d is not the result of a sharded run' % (
+                number)
+        shards.append((shard['seed'], shard, result))
+    shards.sort(key=lambda entry: entry[0])
+
+    digests = sorted(set(shard['plan_digest'] for _, shard, _ in shards))
+    if len(digests) > 1:
+        return None, 'Seeds worked from different plans: %s' % ', '.join(
+            '%s=%s' % (seed, shard['plan_digest'][:12])
+            for seed, shard, _ in shards)
+
+    expected = sorted(set(shards[0][1].get('seeds') or
+                          shards[0][1]['assignment'].values()))
+    reported = [seed for seed, _, _ in shards]
+    if reported != expected:
+        return None, 'Expected one result per seed %s, got %s' % (
+            ', '.join(expected), ', '.join(reported))
+
+    merged = {
+        'changed': False,
+        'failed': False,
+        'stdout': '',
+        'summary': [],
+        'cli_metrics': {},
+        'shards': [],
+        'plan_digest': digests[0],
+    }
+    for seed, shard, result in shards:
+        merged['changed'] = merged['changed'] or bool(result.get('changed'))
+        merged['failed'] = merged['failed'] or bool(result.get('failed'))
+        merged['stdout'] += result.get('stdout') or ''
+        merged['summary'] += result.get('summary') or []
+        add_metrics(merged['cli_metrics'], result.get('cli_metrics'))
+        entry = {
+            'seed': seed,
+            'switches': shard['switches'],
+            'changed': bool(result.get('changed')),
+            'failed': bool(result.get('failed')),
+            'msg': result.get('msg', ''),
+        }
+        if result.get('failed'):
+            entry['stderr'] = result.get('stderr') or \
+                result.get('exception') or ''
+        merged['shards'].append(entry)
+
+    return merged, None
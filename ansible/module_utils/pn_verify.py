@@ -0,0 +1,538 @@
+""" PN fabric verification against a snapshot of the fabric """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Verifies a configured fabric in two steps. A snapshot of the fabric is read
+first: one parsable show per kind of fabric-wide object (nodes, clusters,
+vrouters, vrouter interfaces, loopbacks, BGP neighbors), the shows running
+concurrently, then the switch-local state (lldp links, vlans) of every node,
+the nodes being read concurrently. The invariants of CHECKS are then
+evaluated on the snapshot in memory, every check returning the precise list
+of what is wrong:
+
+    nodes            expected switches are online fabric nodes
+    clusters         cluster nodes are lldp-connected fabric nodes, each in
+                     one cluster only
+    vrouters         expected switches have one vrouter, router ids are
+                     unique
+    link_interfaces  every spine-leaf link has a vrouter interface on the
+                     port at both ends, the two in the same /30 or /31
+    interface_ips    vrouter interface ips other than VIPs are unique
+    loopbacks        every vrouter has a loopback, loopback ips are unique
+    bgp_neighbors    every BGP neighbor inside the fabric has the right
+                     remote-as and a reverse neighbor
+    vrrp             every VRRP group has exactly one master
+    vlans            expected vlans exist on every expected switch
+
+Usage from a module:
+    from ansible.module_utils.pn_verify import (Expectation, run_checks,
+                                                take_snapshot)
+
+    snapshot, failed = take_snapshot(executor)
+    results = run_checks(snapshot, Expectation(spines, leaves))
+"""
+
+from ansible.module_utils.pn_fabric_facts import parse_rows, show_command
+from ansible.module_utils.pn_preflight import subnet_range
+from ansible.module_utils.pn_vlan_set import VlanSet
+
+# (snapshot attribute, show command, fields of the rows), read once for the
+# whole fabric.
+FABRIC_SHOWS = [
+    ('nodes', 'fabric-node-show', ['name', 'fab-name', 'state']),
+    ('clusters', 'cluster-show', ['name', 'cluster-node-1',
+                                  'cluster-node-2']),
+    ('vrouters', 'vrouter-show', ['name', 'location', 'router-id',
+                                  'bgp-as']),
+    ('interfaces', 'vrouter-interface-show',
+     ['vrouter-name', 'nic', 'ip', 'vlan', 'l3-port', 'vrrp-id',
+      'vrrp-state', 'is-vip']),
+    ('loopbacks', 'vrouter-loopback-interface-show',
+     ['vrouter-name', 'index', 'ip']),
+    ('bgp_neighbors', 'vrouter-bgp-show',
+     ['vrouter-name', 'neighbor', 'remote-as']),
+]
+
+# (snapshot attribute, show command, fields of the rows), read on every node.
+SWITCH_SHOWS = [
+    ('links', 'lldp-show', ['local-port', 'sys-name', 'port-id']),
+    ('vlans', 'vlan-show', ['id']),
+]
+
+ONLINE_STATES = ('online',)
+POINT_TO_POINT_PREFIXES = (30, 31)
+
+
+class Expectation(object):
+    """
+    What the fabric is expected to hold, from the module parameters.
+    """
+
+    def __init__(self, spines=None, leaves=None, vrouter_switches=None,
+                 vlans=None):
+        """
+        :param spines: List of spine switch names.
+        :param leaves: List of leaf switch names.
+        :param vrouter_switches: List of switches expected to have a
+        vrouter, defaults to the spines and leaves.
+        :param vlans: VlanSet of the vlans expected on every switch, or None.
+        """
+        self.spines = list(spines or [])
+        self.leaves = list(leaves or [])
+        self.switches = self.spines + [leaf for leaf in self.leaves
+                                       if leaf not in self.spines]
+        self.vrouter_switches = self.switches if vrouter_switches is None \
+            else list(vrouter_switches)
+        self.vlans = vlans
+
+
+class Snapshot(object):
+    """
+    State of the fabric read by take_snapshot(), indexed for the checks.
+    """
+
+    def __init__(self, rows):
+        """
+        :param rows: Dictionary of snapshot attribute: list of rows, one
+        entry per FABRIC_SHOWS and SWITCH_SHOWS. Rows of the switch shows
+        carry the switch they were read from.
+        """
+        self.errors = []
+        self.nodes = dict((row['name'], row) for row in rows['nodes'])
+        self.clusters = rows['clusters']
+        # switch -> vrouter row, vrouter name -> switch
+        self.vrouters = {}
+        self.locations = {}
+        for row in rows['vrouters']:
+            self.vrouters[row['location']] = row
+            self.locations[row['name']] = row['location']
+
+        # switch -> list of rows
+        self.interfaces = self._by_switch(rows['interfaces'])
+        self.loopbacks = self._by_switch(rows['loopbacks'])
+        self.bgp_neighbors = self._by_switch(rows['bgp_neighbors'])
+        self.links = {}
+        for row in rows['links']:
+            self.links.setdefault(row['switch'], []).append(row)
+        self.vlans = {}
+        for row in rows['vlans']:
+            self.vlans.setdefault(row['switch'], VlanSet()).add(row['id'])
+
+        # ip without prefix length -> switch owning it, VIPs excluded
+        self.owners = {}
+        for switch, interfaces in self.interfaces.items():
+            for row in interfaces:
+                if row.get('ip') and not is_vip(row):
+                    self.owners.setdefault(address(row['ip']), switch)
+        for switch, loopbacks in self.loopbacks.items():
+            for row in loopbacks:
+                if row.get('ip'):
+                    self.owners.setdefault(address(row['ip']), switch)
+        # switch -> set of the ips it owns
+        self.addresses = {}
+        for ip, owner in self.owners.items():
+            self.addresses.setdefault(owner, set()).add(ip)
+
+    def _by_switch(self, rows):
+        by_switch = {}
+        for row in rows:
+            switch = self.locations.get(row['vrouter-name'])
+            by_switch.setdefault(switch or row['vrouter-name'], []).append(row)
+        return by_switch
+
+
+def address(ip):
+    """
+    Method to strip the prefix length of an ip.
+    :param ip: Ip, with or without prefix length.
+    :return: The address.
+    """
+    return str(ip).split('/')[0]
+
+
+def is_vip(row):
+    """
+    Method to check whether a vrouter interface is a VRRP VIP.
+    :param row: vrouter-interface-show row.
+    :return: True for a VIP.
+    """
+    return row.get('is-vip') in ('yes', 'true', True) or \
+        row.get('vrrp-state') in ('master', 'slave')
+
+
+def read_rows(executor, batches):
+    """
+    Method to run one show per batch concurrently.
+    :param executor: CliExecutor used to run the shows.
+    :param batches: List of (switch, attribute, command, fields).
+    :return: List of (switch, attribute, rows or None, failed CommandResult
+    or None), in the order of the batches.
+    """
+    results = executor.run_batches(
+        [(switch, [show_command(command, fields)])
+         for switch, _, command, fields in batches], stop_on_failure=False)
+    rows = []
+    for (switch, attribute, _, fields), batch in zip(batches, results):
+        result = batch[0]
+        if result.failed:
+            rows.append((switch, attribute, None, result))
+        else:
+            rows.append((switch, attribute, parse_rows(result, fields), None))
+    return rows
+
+
+def take_snapshot(executor):
+    """
+    Method to read the snapshot of the fabric: the fabric-wide shows
+    concurrently, then the switch shows of every node concurrently. A node
+    whose shows fail is reported in the snapshot errors, the checks carry on
+    with the rest of the fabric.
+    :param executor: CliExecutor used to run the shows.
+    :return: Tuple of the Snapshot and the failed CommandResult of a
+    fabric-wide show, or None.
+    """
+    rows = {}
+    for _, attribute, fabric_rows, failed in read_rows(
+            executor, [(None, attribute, command, fields)
+                       for attribute, command, fields in FABRIC_SHOWS]):
+        if failed is not None:
+            return None, failed
+        rows[attribute] = fabric_rows
+
+    nodes = sorted(row['name'] for row in rows['nodes'])
+    errors = []
+    for attribute, _, _ in SWITCH_SHOWS:
+        rows[attribute] = []
+    for switch, attribute, switch_rows, failed in read_rows(
+            executor, [(node, attribute, command, fields) for node in nodes
+                       for attribute, command, fields in SWITCH_SHOWS]):
+        if failed is not None:
+            errors.append('%s: %s failed: %s' % (
+                switch, failed.command.split()[0], failed.err.strip()))
+            continue
+        for row in switch_rows:
+            row['switch'] = switch
+            rows[attribute].append(row)
+
+    snapshot = Snapshot(rows)
+    snapshot.errors = errors
+    return snapshot, None
+
+
+def check_nodes(snapshot, expected):
+    """
+    Method to check that the expected switches are online fabric nodes of
+    one fabric.
+    """
+    violations = ['%s: not a fabric node' % switch
+                  for switch in expected.switches
+                  if switch not in snapshot.nodes]
+    for name, node in sorted(snapshot.nodes.items()):
+        if node.get('state') not in ONLINE_STATES:
+            violations.append('%s: state is %s' % (name, node.get('state')))
+    fabrics = sorted(set(str(node.get('fab-name'))
+                         for node in snapshot.nodes.values()))
+    if len(fabrics) > 1:
+        violations.append('nodes belong to several fabrics: %s' %
+                          ', '.join(fabrics))
+    return violations
+
+
+def check_clusters(snapshot, expected):
+    """
+    Method to check that the nodes of every cluster are fabric nodes with an
+    lldp link between them, and that no switch is in two clusters.
+    """
+    violations = []
+    membership = {}
+    for cluster in snapshot.clusters:
+        pair = [cluster.get('cluster-node-1'), cluster.get('cluster-node-2')]
+        for node in pair:
+            if node not in snapshot.nodes:
+                violations.append('%s: %s is not a fabric node' % (
+                    cluster['name'], node))
+            membership.setdefault(node, []).append(cluster['name'])
+        neighbours = set(row.get('sys-name')
+                         for row in snapshot.links.get(pair[0], []))
+        if pair[0] in snapshot.links and pair[1] not in neighbours:
+            violations.append('%s: no lldp link between %s and %s' % (
+                cluster['name'], pair[0], pair[1]))
+    for node, clusters in sorted(membership.items()):
+        if len(clusters) > 1:
+            violations.append('%s: in several clusters: %s' % (
+                node, ', '.join(sorted(clusters))))
+    return violations
+
+
+def check_vrouters(snapshot, expected):
+    """
+    Method to check that the expected switches have a vrouter and that the
+    router ids are unique.
+    """
+    violations = ['%s: no vrouter' % switch
+                  for switch in expected.vrouter_switches
+                  if switch not in snapshot.vrouters]
+    router_ids = {}
+    for switch, vrouter in sorted(snapshot.vrouters.items()):
+        if vrouter.get('router-id'):
+            router_ids.setdefault(vrouter['router-id'], []).append(switch)
+    for router_id, switches in sorted(router_ids.items()):
+        if len(switches) > 1:
+            violations.append('router-id %s: used by %s' % (
+                router_id, ', '.join(switches)))
+    return violations
+
+
+def port_interface(snapshot, switch, port):
+    """
+    Method to find the vrouter interface of a switch on a port.
+    :return: vrouter-interface-show row, or None.
+    """
+    for row in snapshot.interfaces.get(switch, []):
+        if row.get('l3-port') is not None and \
+                str(row['l3-port']) == str(port):
+            return row
+    return None
+
+
+def check_link_interfaces(snapshot, expected):
+    """
+    Method to check that both ends of every spine-leaf link have a vrouter
+    interface on the port, the two ips in the same point-to-point subnet.
+    """
+    spines = set(expected.spines)
+    leaves = set(expected.leaves)
+    violations = []
+    seen = set()
+    for switch in sorted(snapshot.links):
+        for link in snapshot.links[switch]:
+            remote = link.get('sys-name')
+            if not ((switch in spines and remote in leaves) or
+                    (switch in leaves and remote in spines)):
+                continue
+            ends = tuple(sorted([(switch, str(link.get('local-port'))),
+                                 (remote, str(link.get('port-id')))]))
+            if ends in seen:
+                continue
+            seen.add(ends)
+
+            name = '%s:%s <-> %s:%s' % (ends[0] + ends[1])
+            rows = [port_interface(snapshot, end_switch, port)
+                    for end_switch, port in ends]
+            missing = [end[0] for end, row in zip(ends, rows) if row is None]
+            if missing:
+                violations.append('%s: no vrouter interface on %s' % (
+                    name, ' and '.join(missing)))
+                continue
+
+            ips = [str(row.get('ip')) for row in rows]
+            if ':' in ips[0] or ':' in ips[1]:
+                continue
+            prefixes = [ip.partition('/')[2] for ip in ips]
+            if [prefix for prefix in prefixes
+                    if not prefix.isdigit() or
+                    int(prefix) not in POINT_TO_POINT_PREFIXES]:
+                violations.append('%s: %s and %s are not /30 or /31' % (
+                    name, ips[0], ips[1]))
+            elif prefixes[0] != prefixes[1] or subnet_range(ips[0]) != \
+                    subnet_range(ips[1]):
+                violations.append('%s: %s and %s are not in the same '
+                                  'subnet' % (name, ips[0], ips[1]))
+            elif address(ips[0]) == address(ips[1]):
+                violations.append('%s: both ends use %s' % (name, ips[0]))
+    return violations
+
+
+def duplicates(entries, label):
+    """
+    Method to report the values used by more than one switch.
+    :param entries: List of (value, switch) tuples.
+    :param label: Name of the value in the messages.
+    :return: List of violations.
+    """
+    users = {}
+    for value, switch in entries:
+        users.setdefault(value, []).append(switch)
+    return ['%s %s: used by %s' % (label, value, ', '.join(sorted(switches)))
+            for value, switches in sorted(users.items())
+            if len(switches) > 1]
+
+
+def check_interface_ips(snapshot, expected):
+    """
+    Method to check that the vrouter interface ips, VIPs aside, are unique.
+    """
+    return duplicates([(address(row['ip']), switch)
+                       for switch, rows in snapshot.interfaces.items()
+                       for row in rows if row.get('ip') and not is_vip(row)],
+                      'interface ip')
+
+
+def check_loopbacks(snapshot, expected):
+    """
+    Method to check that every vrouter has a loopback and that the loopback
+    ips are unique.
+    """
+    violations = ['%s: no loopback interface' % switch
+                  for switch in sorted(snapshot.vrouters)
+                  if not snapshot.loopbacks.get(switch)]
+    return violations + duplicates(
+        [(address(row['ip']), switch)
+         for switch, rows in snapshot.loopbacks.items()
+         for row in rows if row.get('ip')], 'loopback ip')
+
+
+def check_bgp_neighbors(snapshot, expected):
+    """
+    Method to check that every BGP neighbor owned by a fabric vrouter has its
+    remote-as and a neighbor back. Neighbors outside the fabric are skipped.
+    """
+    violations = []
+    for switch in sorted(snapshot.bgp_neighbors):
+        for row in snapshot.bgp_neighbors[switch]:
+            neighbor = address(row.get('neighbor'))
+            peer = snapshot.owners.get(neighbor)
+            if peer is None or peer not in snapshot.vrouters:
+                continue
+            name = '%s -> %s (%s)' % (switch, peer, neighbor)
+            peer_as = snapshot.vrouters[peer].get('bgp-as')
+            if str(row.get('remote-as')) != str(peer_as):
+                violations.append('%s: remote-as %s, %s is in AS %s' % (
+                    name, row.get('remote-as'), peer, peer_as))
+
+            switch_ips = snapshot.addresses.get(switch, set())
+            switch_as = snapshot.vrouters.get(switch, {}).get('bgp-as')
+            back = [peer_row for peer_row in
+                    snapshot.bgp_neighbors.get(peer, [])
+                    if address(peer_row.get('neighbor')) in switch_ips]
+            if not back:
+                violations.append('%s: no neighbor back to %s' % (
+                    name, switch))
+            elif not [peer_row for peer_row in back
+                      if str(peer_row.get('remote-as')) == str(switch_as)]:
+                violations.append('%s: neighbor back has remote-as %s, %s '
+                                  'is in AS %s' % (
+                                      name, back[0].get('remote-as'), switch,
+                                      switch_as))
+    return violations
+
+
+def check_vrrp(snapshot, expected):
+    """
+    Method to check that every VRRP group (vlan, vrrp-id) has one master.
+    """
+    groups = {}
+    for switch, rows in snapshot.interfaces.items():
+        for row in rows:
+            if row.get('vrrp-state') in ('master', 'slave'):
+                key = (row.get('vlan'), row.get('vrrp-id'))
+                groups.setdefault(key, []).append((switch,
+                                                   row['vrrp-state']))
+
+    violations = []
+    for (vlan, vrrp_id), members in sorted(groups.items(),
+                                           key=lambda item: str(item[0])):
+        masters = sorted(switch for switch, state in members
+                         if state == 'master')
+        if len(masters) != 1:
+            violations.append('vlan %s vrrp-id %s: %d masters (%s)' % (
+                vlan, vrrp_id, len(masters), ', '.join(
+                    '%s=%s' % member for member in sorted(members))))
+    return violations
+
+
+def check_vlans(snapshot, expected):
+    """
+    Method to check that the expected vlans exist on every expected switch,
+    or on every node if no switch is expected. Expected switches which are
+    not fabric nodes are left to the nodes check.
+    """
+    if not expected.vlans:
+        return []
+    violations = []
+    for switch in [switch for switch in expected.switches
+                   if switch in snapshot.nodes] or sorted(snapshot.nodes):
+        missing = expected.vlans - snapshot.vlans.get(switch, VlanSet())
+        if missing:
+            violations.append('%s: missing vlans %s' % (switch, missing))
+    return violations
+
+
+# (name, description, check function) of the invariants, in report order.
+# A check is called with the Snapshot and the Expectation and returns the list
+# of its violations.
+CHECKS = [
+    ('nodes', 'Fabric nodes online', check_nodes),
+    ('clusters', 'Clusters', check_clusters),
+    ('vrouters', 'Vrouters and router ids', check_vrouters),
+    ('link_interfaces', 'Spine-leaf link interfaces', check_link_interfaces),
+    ('interface_ips', 'Unique interface ips', check_interface_ips),
+    ('loopbacks', 'Loopback interfaces', check_loopbacks),
+    ('bgp_neighbors', 'BGP neighbor symmetry', check_bgp_neighbors),
+    ('vrrp', 'VRRP masters', check_vrrp),
+    ('vlans', 'Vlans', check_vlans),
+]
+
+CHECK_NAMES = [name for name, _, _ in CHECKS]
+
+
+def run_checks(snapshot, expected, names=None):
+    """
+    Method to evaluate checks on a snapshot. Switches whose shows failed
+    are reported by an additional snapshot check.
+    :param snapshot: Snapshot of the fabric.
+    :param expected: Expectation of the fabric.
+    :param names: List of the names of the checks to run, defaults to all.
+    :return: List of dictionaries of check, description, passed and
+    violations.
+    """
+    results = []
+    if snapshot.errors:
+        results.append({
+            'check': 'snapshot',
+            'description': 'Fabric snapshot',
+            'passed': False,
+            'violations': list(snapshot.errors),
+        })
+    for name, description, check in CHECKS:
+        if names and name not in names:
+            continue
+        violations = check(snapshot, expected)
+        results.append({
+            'check': name,
+            'description': description,
+            'passed': not violations,
+            'violations': violations,
+        })
+    return results
+
+
+def format_results(results):
+    """
+    Method to render check results, one line per check followed by its
+    violations.
+    :param results: List returned by run_checks().
+    :return: The report.
+    """
+    lines = []
+    for result in results:
+        lines.append('%s: %s' % (result['description'], 'Successful'
+                                 if result['passed'] else 'Failed'))
+        lines += ['    ' + violation for violation in result['violations']]
+    return '\n'.join(lines) + '\n'
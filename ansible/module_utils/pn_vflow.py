@@ -0,0 +1,374 @@
+""" PN bulk vFlow policy engine """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Applies a whole vFlow policy (ACL, QoS...) at once. The flows are given as a
+list of dictionaries or as csv data with a header line naming the columns:
+    switch,name,state,scope,src-ip,proto,action
+    leaf1,drop_src_1,present,local,10.10.100.1,,drop
+    leaf1,old_rule,absent
+
+Existing flows are read with one parsable vflow-show across the fabric and
+indexed by (switch, name). Every requested flow is diffed against the index:
+missing flows are created, flows with different attributes are modified
+(or deleted and created again when their scope changes) and flows with
+state absent are deleted. Attributes which are not given are left as they
+are. The commands are run in batches per switch, switches concurrently.
+
+Usage from a module:
+    from ansible.module_utils.pn_vflow import (parse_flows, read_flows,
+                                               plan_flows, apply_flows)
+
+    flows, errors = parse_flows(labelled_flows, default_switch)
+    existing, failed_show = read_flows(executor, flows)
+    tasks, unchanged = plan_flows(flows, existing)
+    summary, changed, failed = apply_flows(executor, tasks, unchanged)
+"""
+
+import csv
+from collections import namedtuple
+
+# Attributes of vflow-create/vflow-modify. VALUE attributes are given as
+# 'keyword value', FLAG attributes as 'keyword' or 'no-keyword'.
+VALUE, FLAG = 'value', 'flag'
+
+FLOW_ATTRIBUTES = [
+    ('scope', VALUE), ('vnet', VALUE), ('vlan', VALUE), ('in-port', VALUE),
+    ('out-port', VALUE), ('ether-type', VALUE), ('src-mac', VALUE),
+    ('src-mac-mask', VALUE), ('dst-mac', VALUE), ('dst-mac-mask', VALUE),
+    ('src-ip', VALUE), ('src-ip-mask', VALUE), ('dst-ip', VALUE),
+    ('dst-ip-mask', VALUE), ('src-port', VALUE), ('src-port-mask', VALUE),
+    ('dst-port', VALUE), ('dst-port-mask', VALUE), ('dscp-start', VALUE),
+    ('dscp-end', VALUE), ('dscp', VALUE), ('tos-start', VALUE),
+    ('tos-end', VALUE), ('tos', VALUE), ('vlan-pri', VALUE), ('ttl', VALUE),
+    ('proto', VALUE), ('flow-class', VALUE), ('ingress-tunnel', VALUE),
+    ('egress-tunnel', VALUE), ('bw-min', VALUE), ('bw-max', VALUE),
+    ('precedence', VALUE), ('action', VALUE), ('action-value', VALUE),
+    ('action-set-mac-value', VALUE), ('action-to-ports-value', VALUE),
+    ('mirror', VALUE), ('process-mirror', FLAG), ('log-packets', FLAG),
+    ('packet-log-max', VALUE), ('log-stats', FLAG),
+    ('stats-interval', VALUE), ('dur', VALUE), ('metadata', VALUE),
+    ('transient', FLAG), ('vxlan', VALUE), ('vxlan-ether-type', VALUE),
+    ('vxlan-proto', VALUE), ('set-src', VALUE), ('set-dst', VALUE),
+    ('set-src-port', VALUE), ('set-dst-port', VALUE), ('enable', FLAG),
+]
+
+KINDS = dict(FLOW_ATTRIBUTES)
+ORDER = dict((keyword, index)
+             for index, (keyword, _) in enumerate(FLOW_ATTRIBUTES))
+
+# Attributes vflow-modify cannot change, the flow is created again.
+RECREATE_ATTRIBUTES = ('scope',)
+
+TRUE_VALUES = ('true', 'yes', 'on')
+FALSE_VALUES = ('false', 'no', 'off')
+
+# Results of a flow, in the order they are reported.
+STATUSES = ('created', 'modified', 'deleted', 'unchanged', 'absent')
+
+# One requested flow. attributes is a tuple of (keyword, value) pairs.
+Flow = namedtuple('Flow', 'switch name state attributes')
+
+# One command of the plan and the status of its flow once it succeeded.
+FlowTask = namedtuple('FlowTask', 'switch name command status')
+
+
+def attribute_keyword(key):
+    """
+    Method to turn a flow key (src_ip, pn_src_ip or src-ip) into the cli
+    keyword of the attribute.
+    :param key: The key of the flow dictionary or csv header.
+    :return: The cli keyword.
+    """
+    key = key.strip().lower()
+    if key.startswith('pn_'):
+        key = key[3:]
+    return key.replace('_', '-')
+
+
+def flag_value(keyword, value):
+    """
+    Method to normalize the value of a FLAG attribute.
+    :param keyword: The cli keyword, for example log-packets.
+    :param value: keyword, no-keyword, or a boolean like value.
+    :return: keyword or no-keyword.
+    """
+    value = str(value).strip().lower()
+    if value == keyword or value in TRUE_VALUES:
+        return keyword
+    if value == 'no-' + keyword or value in FALSE_VALUES:
+        return 'no-' + keyword
+    raise ValueError('invalid value %s for %s' % (value, keyword))
+
+
+def parse_flows(flows, default_switch, default_scope=None):
+    """
+    Method to validate the requested flows.
+    :param flows: List of (label, dictionary) tuples, where label names the
+    flow in error messages (for example 'line 3').
+    :param default_switch: Switch of the flows which do not name one.
+    :param default_scope: Scope of the created flows which do not name one.
+    :return: Tuple of list of Flow and list of error strings.
+    """
+    parsed = []
+    errors = []
+    seen = {}
+    for label, flow in flows:
+        values = dict((attribute_keyword(str(key)), value)
+                      for key, value in flow.items()
+                      if value is not None and str(value).strip() != '')
+        name = str(values.pop('name', '')).strip()
+        switch = str(values.pop('switch', default_switch)).strip()
+        state = str(values.pop('state', 'present')).strip().lower()
+        if not name:
+            errors.append('%s: missing name' % label)
+            continue
+        if state not in ('present', 'absent'):
+            errors.append('%s: invalid state %s' % (label, state))
+            continue
+        if (switch, name) in seen:
+            errors.append('%s: duplicate flow %s on %s, first defined at %s'
+                          % (label, name, switch, seen[(switch, name)]))
+            continue
+        seen[(switch, name)] = label
+
+        if state == 'present' and 'scope' not in values and default_scope:
+            values['scope'] = default_scope
+
+        attributes = []
+        for keyword, value in values.items():
+            if keyword not in KINDS:
+                errors.append('%s: unknown attribute %s' % (label, keyword))
+                continue
+            try:
+                if KINDS[keyword] == FLAG:
+                    value = flag_value(keyword, value)
+                else:
+                    value = str(value).strip()
+            except ValueError as error:
+                errors.append('%s: %s' % (label, error))
+                continue
+            attributes.append((keyword, value))
+
+        attributes.sort(key=lambda attribute: ORDER[attribute[0]])
+        parsed.append(Flow(switch, name, state, tuple(attributes)))
+
+    return parsed, errors
+
+
+def parse_flows_csv(data):
+    """
+    Method to read flows from csv data. The first line names the columns,
+    every other line is one flow. Blank lines and comments (#) are skipped
+    and values holding commas (port lists) must be quoted.
+    :param data: The csv data as a string.
+    :return: Tuple of list of (label, dictionary) tuples and list of error
+    strings.
+    """
+    flows = []
+    errors = []
+    lines = [(number, line) for number, line in
+             enumerate(data.splitlines(), 1)
+             if line.strip() and not line.strip().startswith('#')]
+    if not lines:
+        return flows, errors
+
+    rows = csv.reader([line for _, line in lines], skipinitialspace=True)
+    header = [column.strip() for column in next(rows)]
+    for (number, line), row in zip(lines[1:], rows):
+        while row and not row[-1].strip():
+            row.pop()
+        if len(row) > len(header):
+            errors.append('line %d: expected at most %d columns, found %d: %s'
+                          % (number, len(header), len(row), line))
+            continue
+        flows.append(('line %d' % number, dict(zip(header, row))))
+
+    return flows, errors
+
+
+def read_flows(executor, flows):
+    """
+    Method to read the existing flows of the fabric with one vflow-show.
+    Only the attributes used by the requested flows are read.
+    :param executor: CliExecutor used to run the command.
+    :param flows: List of requested Flow.
+    :return: Tuple of dictionary of (switch, name): {keyword: value} and the
+    failed CommandResult, or None if the show succeeded.
+    """
+    keywords = set(['scope'])
+    for flow in flows:
+        keywords.update(keyword for keyword, _ in flow.attributes)
+    keywords = sorted(keywords, key=ORDER.get)
+
+    result = executor.run('vflow-show format switch,name,%s no-show-headers '
+                          'parsable-delim |' % ','.join(keywords), '*')
+    if result.failed:
+        return {}, result
+
+    existing = {}
+    for line in result.out.splitlines():
+        fields = line.strip().split('|')
+        if len(fields) != len(keywords) + 2:
+            continue
+        attributes = {}
+        for keyword, value in zip(keywords, fields[2:]):
+            value = value.strip()
+            if not value:
+                continue
+            if KINDS[keyword] == FLAG:
+                value = keyword if value.lower() in TRUE_VALUES + (
+                    keyword,) else 'no-' + keyword
+            attributes[keyword] = value
+        existing[(fields[0], fields[1])] = attributes
+
+    return existing, None
+
+
+def flow_arguments(attributes):
+    """
+    Method to build the cli arguments of flow attributes.
+    :param attributes: List of (keyword, value) pairs.
+    :return: The arguments string.
+    """
+    return ' '.join(value if KINDS[keyword] == FLAG else
+                    '%s %s' % (keyword, value)
+                    for keyword, value in attributes)
+
+
+def plan_flows(flows, existing):
+    """
+    Method to diff the requested flows against the existing ones. A fabric
+    scope flow is visible from every switch, so it is found by name and
+    changed only once.
+    :param flows: List of requested Flow.
+    :param existing: Dictionary of (switch, name): {keyword: value}.
+    :return: List of FlowTask, and list of (switch, name, status) of the
+    flows needing no change.
+    """
+    fabric = {}
+    for (switch, name), attributes in existing.items():
+        if attributes.get('scope') == 'fabric':
+            fabric.setdefault(name, attributes)
+
+    tasks = []
+    unchanged = []
+    done = set()
+    for flow in flows:
+        current = existing.get((flow.switch, flow.name))
+        if current is None:
+            current = fabric.get(flow.name)
+        is_fabric = current is not None and current.get('scope') == 'fabric'
+        if is_fabric and flow.name in done:
+            continue
+        if is_fabric:
+            done.add(flow.name)
+
+        def task(command, status):
+            tasks.append(FlowTask(flow.switch, flow.name,
+                                  command % flow.name, status))
+
+        if flow.state == 'absent':
+            if current is None:
+                unchanged.append((flow.switch, flow.name, 'absent'))
+            else:
+                task('vflow-delete name %s', 'deleted')
+            continue
+
+        if current is None:
+            task('vflow-create name %s ' + flow_arguments(flow.attributes),
+                 'created')
+            continue
+
+        diff = [(keyword, value) for keyword, value in flow.attributes
+                if current.get(keyword) != value]
+        if any(keyword in RECREATE_ATTRIBUTES for keyword, _ in diff):
+            task('vflow-delete name %s', 'modified')
+            task('vflow-create name %s ' + flow_arguments(flow.attributes),
+                 'modified')
+        elif diff:
+            task('vflow-modify name %s ' + flow_arguments(diff), 'modified')
+        else:
+            unchanged.append((flow.switch, flow.name, 'unchanged'))
+
+    return tasks, unchanged
+
+
+def apply_flows(executor, tasks, unchanged=()):
+    """
+    Method to run the planned flow commands, in batches per switch.
+    A switch stops at its first failed command.
+    :param executor: CliExecutor used to run the commands.
+    :param tasks: List of FlowTask.
+    :param unchanged: List of (switch, name, status) of the flows needing no
+    change.
+    :return: Tuple of summary list with one entry per switch, changed flag
+    and failed flag.
+    """
+    order = []
+    batches = {}
+    for task in tasks:
+        if task.switch not in batches:
+            order.append(task.switch)
+            batches[task.switch] = []
+        batches[task.switch].append(task)
+
+    # (switch, name) -> status, failed flows keep their error.
+    statuses = dict(((switch, name), status)
+                    for switch, name, status in unchanged)
+    errors = {}
+    results = executor.run_batches([(switch, [task.command for task in
+                                              batches[switch]])
+                                    for switch in order])
+    for switch, batch in zip(order, results):
+        for index, task in enumerate(batches[switch]):
+            key = (switch, task.name)
+            if key in errors:
+                continue
+            if index >= len(batch):
+                errors[key] = 'not run'
+            elif batch[index].failed:
+                errors[key] = batch[index].output
+            else:
+                statuses[key] = task.status
+
+    for key in errors:
+        statuses.pop(key, None)
+
+    counts = {}
+    for (switch, name), status in statuses.items():
+        counts.setdefault(switch, {}).setdefault(status, 0)
+        counts[switch][status] += 1
+    failures = {}
+    for (switch, name), error in sorted(errors.items()):
+        failures.setdefault(switch, []).append('%s (%s)' % (name, error))
+
+    summary = []
+    for switch in sorted(set(counts) | set(failures)):
+        parts = ['%s %d' % (status, counts[switch][status])
+                 for status in STATUSES if status in counts.get(switch, {})]
+        output = ', '.join(parts)
+        if switch in failures:
+            output += '; failed %d: %s' % (len(failures[switch]),
+                                           ', '.join(failures[switch]))
+        summary.append({'switch': switch, 'output': output.lstrip('; ')})
+
+    changed = any(status not in ('unchanged', 'absent')
+                  for status in statuses.values())
+    return summary, changed, bool(errors)
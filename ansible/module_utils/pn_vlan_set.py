@@ -0,0 +1,229 @@
+""" PN vlan set with range coalescing """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Set of vlan ids backed by a 4096 bit bitmap. Requested vlans are diffed
+against the existing ones with bitwise operations, and the vlans to create
+or delete are turned into the fewest vlan-create/vlan-delete commands, one
+per contiguous range of vlans sharing the same attributes:
+    vlan-create range 100-3999 scope fabric
+instead of one vlan-create per vlan.
+
+Usage from a module:
+    from ansible.module_utils.pn_vlan_set import VlanSet, vlan_create_commands
+
+    existing = VlanSet.parse(run_cli(module, vlan_show).split())
+    requested = VlanSet.parse('100-3999')
+    for command in vlan_create_commands(requested - existing,
+                                        'scope fabric'):
+        run_cli(module, cli + command)
+"""
+
+MIN_VLAN_ID = 2
+MAX_VLAN_ID = 4092
+VLAN_BITS = 4096
+
+
+class VlanSet(object):
+    """
+    Set of vlan ids. Bit n of the bitmap is set when vlan n is in the set.
+    """
+
+    def __init__(self, vlans=None):
+        """
+        :param vlans: Optional iterable of vlan ids (int or str).
+        """
+        self.bitmap = 0
+        for vlan in vlans or ():
+            self.add(vlan)
+
+    @classmethod
+    def parse(cls, value):
+        """
+        Method to build a vlan set from a string like '10, 20-30' or from a
+        list of such strings.
+        :param value: String or list of strings of vlan ids and ranges.
+        :return: VlanSet of the vlans.
+        """
+        if not isinstance(value, (list, tuple, set)):
+            value = [value]
+
+        vlans = cls()
+        for item in value:
+            for token in str(item).split(','):
+                token = token.strip()
+                if not token:
+                    continue
+                if '-' in token:
+                    low, high = token.split('-', 1)
+                    vlans.add_range(int(low), int(high))
+                else:
+                    vlans.add(int(token))
+        return vlans
+
+    @staticmethod
+    def _check(vlan):
+        vlan = int(vlan)
+        if not 0 <= vlan < VLAN_BITS:
+            raise ValueError('Invalid vlan id %d' % vlan)
+        return vlan
+
+    def add(self, vlan):
+        """ Add a vlan id to the set. """
+        self.bitmap |= 1 << self._check(vlan)
+
+    def add_range(self, low, high):
+        """ Add the vlan ids from low to high, both included. """
+        low, high = self._check(low), self._check(high)
+        if low > high:
+            raise ValueError('Invalid vlan range %d-%d' % (low, high))
+        self.bitmap |= ((1 << (high - low + 1)) - 1) << low
+
+    def discard(self, vlan):
+        """ Remove a vlan id from the set if present. """
+        self.bitmap &= ~(1 << self._check(vlan))
+
+    def __contains__(self, vlan):
+        return bool(self.bitmap >> int(vlan) & 1)
+
+    def __len__(self):
+        return bin(self.bitmap).count('1')
+
+    def __bool__(self):
+        return self.bitmap != 0
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        return isinstance(other, VlanSet) and self.bitmap == other.bitmap
+
+    def __ne__(self, other):
+        return not self == other
+
+    def _new(self, bitmap):
+        vlans = VlanSet()
+        vlans.bitmap = bitmap
+        return vlans
+
+    def __or__(self, other):
+        return self._new(self.bitmap | other.bitmap)
+
+    def __and__(self, other):
+        return self._new(self.bitmap & other.bitmap)
+
+    def __sub__(self, other):
+        return self._new(self.bitmap & ~other.bitmap)
+
+    def ranges(self):
+        """
+        Method to list the contiguous ranges of the set.
+        :return: List of (first, last) vlan id tuples, in increasing order.
+        """
+        ranges = []
+        bitmap = self.bitmap
+        offset = 0
+        while bitmap:
+            # Skip to the lowest set bit, then measure the run of ones.
+            zeros = (bitmap & -bitmap).bit_length() - 1
+            bitmap >>= zeros
+            offset += zeros
+            ones = (bitmap ^ (bitmap + 1)).bit_length() - 1
+            ranges.append((offset, offset + ones - 1))
+            bitmap >>= ones
+            offset += ones
+        return ranges
+
+    def __iter__(self):
+        for low, high in self.ranges():
+            for vlan in range(low, high + 1):
+                yield vlan
+
+    def __str__(self):
+        return ','.join(str(low) if low == high else '%d-%d' % (low, high)
+                        for low, high in self.ranges())
+
+    def __repr__(self):
+        return 'VlanSet(%r)' % str(self)
+
+    def invalid(self):
+        """ Vlan ids of the set outside the configurable 2-4092 range. """
+        valid = VlanSet()
+        valid.add_range(MIN_VLAN_ID, MAX_VLAN_ID)
+        return self - valid
+
+
+def range_arguments(vlans):
+    """
+    Method to turn a vlan set into the id/range arguments of vlan commands.
+    :param vlans: VlanSet of the vlans.
+    :return: List of 'id N' or 'range N-M' strings, one per contiguous range.
+    """
+    return ['id %d' % low if low == high else 'range %d-%d' % (low, high)
+            for low, high in vlans.ranges()]
+
+
+def vlan_create_commands(vlans, attributes=''):
+    """
+    Method to build the fewest vlan-create commands creating a set of vlans
+    with the same attributes.
+    :param vlans: VlanSet of the vlans to create.
+    :param attributes: Attributes of the vlans, for example 'scope fabric'.
+    :return: List of vlan-create commands.
+    """
+    return [('vlan-create %s %s' % (argument, attributes)).strip()
+            for argument in range_arguments(vlans)]
+
+
+def vlan_delete_commands(vlans):
+    """
+    Method to build the fewest vlan-delete commands deleting a set of vlans.
+    :param vlans: VlanSet of the vlans to delete.
+    :return: List of vlan-delete commands.
+    """
+    return ['vlan-delete %s' % argument for argument in range_arguments(vlans)]
+
+
+def coalesce_vlan_creates(requests, existing):
+    """
+    Method to diff requested vlans against the existing ones and build the
+    vlan-create commands of the missing vlans. Vlans are grouped by their
+    attributes (scope, vnet, ports, untagged-ports...) and every group is
+    created with one command per contiguous range.
+    :param requests: List of (vlan id, attributes string) tuples.
+    :param existing: VlanSet of the existing vlans.
+    :return: List of vlan-create commands, grouped by attributes in the order
+    the attributes were first requested.
+    """
+    order = []
+    groups = {}
+    for vlan, attributes in requests:
+        if attributes not in groups:
+            order.append(attributes)
+            groups[attributes] = VlanSet()
+        groups[attributes].add(vlan)
+
+    commands = []
+    created = VlanSet()
+    for attributes in order:
+        # A vlan requested with different attributes is created only once,
+        # with the attributes it was first requested with.
+        missing = groups[attributes] - existing - created
+        created = created | missing
+        commands += vlan_create_commands(missing, attributes)
+    return commands
@@ -0,0 +1,526 @@
+""" PN bulk VRRP provisioning engine """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Configures VRRP for a whole csv sheet at once. Instead of checking and
+configuring one csv row at a time, the complete set of vlans, clusters,
+vrouters, interfaces and VIPs is computed first and diffed against a single
+snapshot of the fabric (vlan-show, cluster-show, vrouter-show and
+vrouter-interface-show). Only the missing pieces are configured, in batches
+per switch which run concurrently. Missing vlans are created with one
+vlan-create per contiguous range of vlan ids.
+
+The VIP interfaces reference the nic of the primary interface of the same
+vlan (vrrp-primary), which is only known once the primary interface exists,
+so they are configured after a second vrouter-interface-show.
+
+The fabric scope vlans are created before anything else. In a sharded run
+(see pn_shard) only the primary seed creates them, the other seeds poll
+vlan-show until they exist before configuring interfaces in them.
+
+Usage from a module:
+    from ansible.module_utils.pn_executor import CliExecutor
+    from ansible.module_utils.pn_vrrp import VrrpPlan, apply_vrrp_plan
+
+    plan = VrrpPlan(vnet_name)
+    plan.add_vrrp_pair(vlan_id, vrrp_ip, vrrp_id, [node1, node2], active)
+    output, changed, failed = apply_vrrp_plan(CliExecutor(module), plan)
+"""
+
+import time
+from collections import namedtuple
+
+from ansible.module_utils.pn_executor import CommandResult, Deadline
+from ansible.module_utils.pn_vlan_set import VlanSet, range_arguments
+
+# Phases of the configuration, every phase depends on the previous ones.
+SETUP, INTERFACES, VIPS = range(3)
+
+# Seconds a seed of a sharded run waits for the fabric scope vlans created
+# by the primary seed, and seconds between two vlan-show.
+FABRIC_WAIT_TIMEOUT = 120
+FABRIC_WAIT_INTERVAL = 2
+
+# One piece of configuration. key identifies it in the fabric snapshot,
+# message is reported when it gets configured and exists_message when it is
+# already present.
+Task = namedtuple('Task', 'phase switch key command message exists_message')
+
+
+def host_ip(ip, host):
+    """
+    Method to replace the fourth octet of an ip.
+    :param ip: Ip address with subnet mask, a.b.c.d/n.
+    :param host: The value of fourth octet.
+    :return: Ip address a.b.c.host/n.
+    """
+    address, mask = ip.split('/')
+    return '%s.%s/%s' % (address.rsplit('.', 1)[0], host, mask)
+
+
+class FabricSnapshot(object):
+    """
+    VRRP related configuration present in the fabric.
+    """
+
+    def __init__(self):
+        self.vlans = VlanSet()
+        self.clusters = set()
+        # switch -> (vrouter name, hw-vrrp-id)
+        self.vrouters = {}
+        # (vrouter name, vlan, ip) -> nic
+        self.interfaces = {}
+
+    def vrouter_name(self, switch):
+        """ Name of the vrouter of a switch, existing or to be created. """
+        if switch in self.vrouters:
+            return self.vrouters[switch][0]
+        return switch + '-vrouter'
+
+    def contains(self, key):
+        """ Whether the configuration identified by key is present. """
+        kind = key[0]
+        if kind == 'cluster':
+            return key[1] in self.clusters
+        if kind == 'vrouter':
+            return key[1] in self.vrouters
+        if kind == 'vrrp-id':
+            vrouter = self.vrouters.get(key[1])
+            return vrouter is None or vrouter[1] == key[2]
+        if kind == 'interface':
+            return (self.vrouter_name(key[1]), key[2], key[3]) in \
+                self.interfaces
+        return False
+
+
+def read_interfaces(executor, snapshot):
+    """
+    Method to read the vlan interfaces of all vrouters into a snapshot.
+    :param executor: CliExecutor used to run the command.
+    :param snapshot: FabricSnapshot to update.
+    :return: The failed CommandResult, or None.
+    """
+    result = executor.run('vrouter-interface-show format vlan,ip,nic '
+                          'no-show-headers')
+    if result.failed:
+        return result
+
+    snapshot.interfaces = {}
+    for line in result.out.splitlines():
+        fields = line.split()
+        if len(fields) == 4:
+            snapshot.interfaces[(fields[0], fields[1], fields[2])] = fields[3]
+    return None
+
+
+def take_snapshot(executor):
+    """
+    Method to read the VRRP related configuration of the fabric, with one
+    show command per kind of configuration.
+    :param executor: CliExecutor used to run the commands.
+    :return: Tuple of FabricSnapshot and the failed CommandResult, or None.
+    """
+    snapshot = FabricSnapshot()
+
+    result = executor.run('vlan-show format id no-show-headers')
+    if result.failed:
+        return snapshot, result
+    snapshot.vlans = VlanSet.parse(result.out.split())
+
+    result = executor.run('cluster-show format name no-show-headers')
+    if result.failed:
+        return snapshot, result
+    snapshot.clusters = set(result.out.split())
+
+    result = executor.run('vrouter-show format name,location,hw-vrrp-id '
+                          'no-show-headers')
+    if result.failed:
+        return snapshot, result
+    for line in result.out.splitlines():
+        fields = line.split()
+        if len(fields) >= 2:
+            hw_vrrp_id = fields[2] if len(fields) > 2 else None
+            snapshot.vrouters[fields[1]] = (fields[0], hw_vrrp_id)
+
+    return snapshot, read_interfaces(executor, snapshot)
+
+
+def snapshot_from_facts(facts):
+    """
+    Method to build a snapshot from the pn_fabric fact of pn_fabric_facts,
+    instead of reading the fabric again.
+    :param facts: Dictionary of the pn_fabric fact.
+    :return: FabricSnapshot of the fabric.
+    """
+    snapshot = FabricSnapshot()
+    for vlans in list(facts.get('vlans', {}).values()) + [
+            facts.get('fabric_vlans', '')]:
+        snapshot.vlans |= VlanSet.parse(str(vlans))
+    snapshot.clusters = set(facts.get('clusters', {}))
+    for switch, vrouter in facts.get('vrouters', {}).items():
+        hw_vrrp_id = vrouter.get('hw_vrrp_id')
+        snapshot.vrouters[switch] = (
+            vrouter['name'], str(hw_vrrp_id) if hw_vrrp_id is not None
+            else None)
+    for vrouter, interfaces in facts.get('interfaces', {}).items():
+        for interface in interfaces:
+            snapshot.interfaces[(vrouter, str(interface.get('vlan')),
+                                 str(interface.get('ip')))] = \
+                interface.get('nic')
+    return snapshot
+
+
+class VrrpPlan(object):
+    """
+    Desired VRRP configuration of the fabric, built from the csv rows.
+    """
+
+    def __init__(self, vnet_name, router_type=None, report_existing=False):
+        """
+        :param vnet_name: The name of the vnet for vrouter creation.
+        :param router_type: Optional router-type of the created vrouters.
+        :param report_existing: Flag to report configuration which already
+        exists in the output.
+        """
+        self.vnet_name = vnet_name
+        self.router_type = router_type
+        self.report_existing = report_existing
+        self.tasks = []
+        # vlan id -> switch reported in the output
+        self.vlans = {}
+        # key -> index in tasks, a piece of configuration is planned once
+        self._keys = {}
+        # switch -> hw-vrrp-id, the last row setting it wins
+        self._vrrp_ids = {}
+        # (switch, vlan, vip, vrrp_id, primary ip, vrrp_priority)
+        self.vips = []
+        # Lists of switches configured together: the nodes of a cluster and
+        # the switches sharing a VIP, kept on the same seed when sharded.
+        self.peers = []
+
+    def _add(self, phase, switch, key, command, message, exists_message=None):
+        if key in self._keys:
+            return
+        self._keys[key] = len(self.tasks)
+        self.tasks.append(Task(phase, switch, key, command, message,
+                               exists_message))
+
+    def add_vlan(self, vlan_id, switch):
+        """
+        Method to plan a fabric scope vlan.
+        :param vlan_id: vlan id to be created.
+        :param switch: Name of the switch reported in the output.
+        """
+        self.vlans.setdefault(int(vlan_id), switch)
+
+    def _vlan_tasks(self, snapshot):
+        """
+        Method to plan the creation of the missing vlans, with one
+        vlan-create per contiguous range of vlans.
+        :param snapshot: FabricSnapshot of the fabric.
+        :return: List of Task.
+        """
+        tasks = []
+        missing = VlanSet(self.vlans) - snapshot.vlans
+        for argument, (low, high) in zip(range_arguments(missing),
+                                         missing.ranges()):
+            message = ''
+            for vlan in range(low, high + 1):
+                if vlan in self.vlans:
+                    message += ' %s: Created vlan id %s with scope fabric ' \
+                               '\n' % (self.vlans[vlan], vlan)
+            tasks.append(Task(SETUP, None, ('vlan', argument),
+                              'vlan-create %s scope fabric' % argument,
+                              message, None))
+        return tasks
+
+    def add_cluster(self, node1, node2):
+        """
+        Method to plan a cluster between two switches.
+        :param node1: First node of the cluster.
+        :param node2: Second node of the cluster.
+        """
+        # Cluster names are limited to 59 characters.
+        name = (node1 + '-to-' + node2 + '-cluster')[:59]
+        self.peers.append([node1, node2])
+        self._add(SETUP, node2, ('cluster', name),
+                  'cluster-create name %s cluster-node-1 %s cluster-node-2 '
+                  '%s' % (name, node1, node2),
+                  ' %s: Created %s \n' % (node2, name),
+                  ' %s: %s already exists \n' % (node2, name))
+
+    def add_vrouter(self, switch, vrrp_id=None):
+        """
+        Method to plan the vrouter of a switch.
+        :param switch: The switch name on which vrouter will be created.
+        :param vrrp_id: The hw-vrrp-id of the vrouter, or None.
+        """
+        name = switch + '-vrouter'
+        command = 'vrouter-create name %s vnet %s' % (name, self.vnet_name)
+        if vrrp_id is not None:
+            command += ' hw-vrrp-id %s enable' % vrrp_id
+            self._vrrp_ids[switch] = vrrp_id
+        if self.router_type:
+            command += ' router-type %s' % self.router_type
+
+        key = ('vrouter', switch)
+        if key in self._keys and vrrp_id is not None:
+            index = self._keys[key]
+            self.tasks[index] = self.tasks[index]._replace(command=command)
+            return
+
+        self._add(SETUP, switch, key, command,
+                  ' %s: Created vrouter with name %s \n' % (switch, name),
+                  ' %s: Vrouter with name %s already exists \n' % (switch,
+                                                                  name))
+
+    def add_gateway(self, switch, vlan_id, ip):
+        """
+        Method to plan the gateway interface of a non clustered switch.
+        :param switch: Name of the switch.
+        :param vlan_id: vlan id of the interface.
+        :param ip: Ip of the vlan, the gateway gets the first host address.
+        """
+        ip_gateway = host_ip(ip, 1)
+        self._add(INTERFACES, switch, ('interface', switch, vlan_id,
+                                       ip_gateway),
+                  'vrouter-interface-add vrouter-name %%(vrouter)s vlan %s '
+                  'ip %s' % (vlan_id, ip_gateway),
+                  ' %s: Added vrouter interface with ip %s on %%(vrouter)s '
+                  '\n' % (switch, ip_gateway),
+                  ' %s: Vrouter interface %s already exists on %%(vrouter)s '
+                  '\n' % (switch, ip_gateway))
+
+    def add_vrrp_interfaces(self, switch, vlan_id, ip, vrrp_id, host,
+                            vrrp_priority):
+        """
+        Method to plan the primary and VIP interfaces of a switch.
+        :param switch: Name of the switch.
+        :param vlan_id: vlan id of the interfaces.
+        :param ip: Ip of the vlan, the VIP gets the first host address.
+        :param vrrp_id: vrrp id of the VIP.
+        :param host: The value of fourth octet of the primary interface ip.
+        :param vrrp_priority: priority to be given (110 for active switch).
+        """
+        ip_primary = host_ip(ip, host)
+        self._add(INTERFACES, switch, ('interface', switch, vlan_id,
+                                       ip_primary),
+                  'vrouter-interface-add vrouter-name %%(vrouter)s ip %s '
+                  'vlan %s if data' % (ip_primary, vlan_id),
+                  ' %s: Added vrouter interface with ip %s to %%(vrouter)s '
+                  '\n' % (switch, ip_primary),
+                  ' %s: Vrouter interface %s already exists for %%(vrouter)s '
+                  '\n' % (switch, ip_primary))
+        self.vips.append((switch, vlan_id, host_ip(ip, 1), vrrp_id,
+                           ip_primary, vrrp_priority))
+
+    def add_vrrp_pair(self, vlan_id, ip, vrrp_id, switch_list, active_switch):
+        """
+        Method to plan VRRP of a vlan on a pair of switches.
+        :param vlan_id: vlan id to be assigned.
+        :param ip: Ip of the vlan.
+        :param vrrp_id: The vrrp_id to be assigned.
+        :param switch_list: List of the switches sharing the VIP.
+        :param active_switch: The name of the active switch.
+        """
+        self.peers.append(list(switch_list))
+        host_count = 1
+        for switch in switch_list:
+            host_count += 1
+            vrrp_priority = '110' if switch == active_switch else '100'
+            self.add_vrrp_interfaces(switch, vlan_id, ip, vrrp_id,
+                                     host_count, vrrp_priority)
+
+    def compile(self, snapshot):
+        """
+        Method to diff the plan against the fabric.
+        :param snapshot: FabricSnapshot of the fabric.
+        :return: Tuple of the list of missing tasks and the output describing
+        the configuration which already exists.
+        """
+        output = ''
+        missing = self._vlan_tasks(snapshot)
+        tasks = list(self.tasks)
+        for switch, vrrp_id in self._vrrp_ids.items():
+            name = snapshot.vrouter_name(switch)
+            tasks.append(Task(SETUP, switch, ('vrrp-id', switch, vrrp_id),
+                              'vrouter-modify name %s hw-vrrp-id %s' % (
+                                  name, vrrp_id), '', None))
+
+        for task in tasks:
+            values = {'vrouter': snapshot.vrouter_name(task.switch or '')}
+            if snapshot.contains(task.key):
+                if self.report_existing and task.exists_message:
+                    output += task.exists_message % values
+            else:
+                missing.append(task._replace(
+                    command=task.command % values,
+                    message=task.message % values
+                ))
+
+        return missing, output
+
+    def compile_vips(self, snapshot):
+        """
+        Method to diff the VIP interfaces against the fabric, once the
+        primary interfaces exist.
+        :param snapshot: FabricSnapshot of the fabric.
+        :return: Tuple of the list of missing tasks and the output describing
+        the VIPs which already exist.
+        """
+        output = ''
+        missing = []
+        for switch, vlan_id, vip, vrrp_id, ip_primary, priority in self.vips:
+            vrouter = snapshot.vrouter_name(switch)
+            if (vrouter, vlan_id, vip) in snapshot.interfaces:
+                if self.report_existing:
+                    output += ' %s: Vrouter interface %s already exists for ' \
+                              '%s \n' % (switch, vip, vrouter)
+                continue
+
+            nic = snapshot.interfaces.get((vrouter, vlan_id, ip_primary))
+            missing.append(Task(
+                VIPS, switch, ('interface', switch, vlan_id, vip),
+                'vrouter-interface-add vrouter-name %s ip %s vlan %s if data '
+                'vrrp-id %s vrrp-primary %s vrrp-priority %s' % (
+                    vrouter, vip, vlan_id, vrrp_id, nic, priority),
+                ' %s: Added vrouter interface with ip %s to %s \n' % (
+                    switch, vip, vrouter),
+                None))
+
+        return missing, output
+
+
+def run_tasks(executor, tasks):
+    """
+    Method to run tasks in batches per switch. Commands of a switch run in
+    order, the switches run concurrently.
+    :param executor: CliExecutor used to run the commands.
+    :param tasks: List of Task.
+    :return: Tuple of the output, the number of commands which succeeded and
+    the failed CommandResult, or None.
+    """
+    order = []
+    batches = {}
+    for task in tasks:
+        if task.switch not in batches:
+            order.append(task.switch)
+            batches[task.switch] = []
+        batches[task.switch].append(task)
+
+    output = ''
+    count = 0
+    failed = None
+    results = executor.run_batches([
+        (switch, [task.command for task in batches[switch]])
+        for switch in order
+    ])
+    for switch, batch in zip(order, results):
+        for task, result in zip(batches[switch], batch):
+            if result.failed:
+                failed = failed or result
+            else:
+                output += task.message
+                count += 1
+
+    return output, count, failed
+
+
+def wait_for_vlans(executor, vlans, timeout=FABRIC_WAIT_TIMEOUT,
+                   interval=FABRIC_WAIT_INTERVAL, sleep=time.sleep):
+    """
+    Method to wait for fabric scope vlans created by another seed.
+    :param executor: CliExecutor used to run the commands.
+    :param vlans: VlanSet of the vlans to wait for.
+    :param timeout: Seconds to wait for the vlans.
+    :param interval: Seconds between two vlan-show.
+    :param sleep: Function used to wait, for tests.
+    :return: The failed CommandResult, or None once every vlan exists.
+    """
+    deadline = Deadline(timeout)
+    while True:
+        result = executor.run('vlan-show format id no-show-headers')
+        if result.failed:
+            return result
+        pending = vlans - VlanSet.parse(result.out.split())
+        if not pending:
+            return None
+        if deadline.expired():
+            return CommandResult(
+                None, result.command, 1, '',
+                'vlans %s not created by the primary seed after %ds' % (
+                    pending, timeout), 0.0)
+        sleep(deadline.bound(interval))
+
+
+def apply_vrrp_plan(executor, plan, snapshot=None):
+    """
+    Method to configure the missing pieces of a VRRP plan.
+    :param executor: CliExecutor used to run the commands.
+    :param plan: VrrpPlan to apply.
+    :param snapshot: Optional FabricSnapshot, taken if not given.
+    :return: Tuple of the output, a flag telling if anything got configured
+    and the failed CommandResult, or None.
+    """
+    if snapshot is None:
+        snapshot, failed = take_snapshot(executor)
+        if failed is not None:
+            return '', False, failed
+
+    missing, output = plan.compile(snapshot)
+    fabric_tasks = [task for task in missing if task.switch is None]
+    output_fabric, changed, failed = run_tasks(executor, fabric_tasks)
+    output += output_fabric
+    if failed is not None:
+        return output, changed > 0, failed
+
+    # Only the primary seed of a sharded run creates the fabric scope
+    # objects, the other seeds wait for them.
+    shard = getattr(executor, 'shard', None)
+    if fabric_tasks and shard is not None and not shard.owns(None):
+        failed = wait_for_vlans(executor, VlanSet(plan.vlans))
+        if failed is not None:
+            return output, changed > 0, failed
+
+    for phase in (SETUP, INTERFACES):
+        message, count, failed = run_tasks(
+            executor, [task for task in missing
+                       if task.phase == phase and task.switch is not None])
+        output += message
+        changed += count
+        if failed is not None:
+            return output, changed > 0, failed
+
+    if not plan.vips:
+        return output, changed > 0, None
+
+    failed = read_interfaces(executor, snapshot)
+    if failed is not None:
+        return output, changed > 0, failed
+
+    missing, message = plan.compile_vips(snapshot)
+    output += message
+    for task in missing:
+        if 'vrrp-primary None' in task.command:
+            return output, changed > 0, CommandResult(
+                task.switch, task.command, 1, '',
+                'No primary interface found for VIP %s' % task.key[3], 0.0)
+
+    message, count, failed = run_tasks(executor, missing)
+    return output + message, changed + count > 0, failed
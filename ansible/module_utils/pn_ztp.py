@@ -0,0 +1,289 @@
+""" PN fabric-wide post-join setup of the initial ZTP """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+The initial ZTP configures every switch over its own ssh session. Only the
+bootstrap (EULA, switch name, static management setup and fabric
+create/join) needs the switch itself; once a switch is a fabric node the
+rest of its setup can be sent from any node with 'switch X':
+
+    - fabric control network
+    - web api
+    - STP
+    - enable the ports
+    - toggle unused 40g ports to 10g
+    - in-band ip
+
+setup_fabric() runs these steps for all the switches from the seed switch,
+the steps of a switch in order and the switches concurrently. A switch which
+fails a step is not set up further, the other switches carry on.
+"""
+
+import time
+
+from ansible.module_utils.pn_executor import run_concurrently
+
+# Seconds given to the ports toggled from 40g to 10g to come up.
+TOGGLE_40G_WAIT = 10
+
+# Common switch setup parameters, the management ip being per switch.
+STATIC_SETUP = (
+    ('pn_gateway_ip', 'gateway-ip'),
+    ('pn_dns_ip', 'dns-ip'),
+    ('pn_dns_secondary_ip', 'dns-secondary-ip'),
+    ('pn_domain_name', 'domain-name'),
+    ('pn_ntp_server', 'ntp-server'),
+)
+
+
+def inband_ips(network, switches):
+    """
+    Method to number the in-band ips of the switches, in list order.
+    :param network: In-band network, like 172.16.0.0/24.
+    :param switches: List of switch names.
+    :return: Dictionary of switch: in-band ip with prefix length.
+    """
+    address, _, subnet = network.partition('/')
+    static_part = '.'.join(address.split('.')[:3]) + '.'
+    return dict((switch, '%s%d/%s' % (static_part, count, subnet))
+                for count, switch in enumerate(switches, 1))
+
+
+def read_fabric_nodes(executor):
+    """
+    Method to list the fabric nodes.
+    :param executor: CliExecutor used to run the command.
+    :return: Tuple of the list of node names and the failed CommandResult,
+    or None.
+    """
+    result = executor.run('fabric-node-show format name no-show-headers')
+    if result.failed:
+        return [], result
+    return result.out.split(), None
+
+
+class SwitchSetup(object):
+    """
+    Post-join setup of one fabric node, sent from the seed switch.
+    """
+
+    def __init__(self, executor, switch, params, inband_ip):
+        """
+        :param executor: CliExecutor used to run the commands.
+        :param switch: Name of the fabric node to set up.
+        :param params: Dictionary of module parameters.
+        :param inband_ip: In-band ip to assign to the switch.
+        """
+        self.executor = executor
+        self.switch = switch
+        self.params = params
+        self.inband_ip = inband_ip
+        self.summary = []
+        self.changed = False
+        self.failed = None
+
+    def run(self, command):
+        """
+        Method to run one command on the switch.
+        :param command: The cli command, without the switch prefix.
+        :return: The output of the command, or None if it failed.
+        """
+        result = self.executor.run(command, self.switch)
+        if result.failed:
+            self.failed = result
+            return None
+        return result.out
+
+    def modify(self, command):
+        """
+        Method to run a command changing the switch.
+        :param command: The cli command, without the switch prefix.
+        :return: True if the command succeeded.
+        """
+        if self.run(command) is None:
+            return False
+        self.changed = True
+        return True
+
+    def report(self, output):
+        """ Add a line to the summary of the switch. """
+        self.summary.append({'switch': self.switch, 'output': output})
+
+    def static_setup(self):
+        """
+        Method to assign the common static switch setup parameters.
+        """
+        command = ''
+        for param, field in STATIC_SETUP:
+            if self.params.get(param):
+                command += ' %s %s' % (field, self.params[param])
+        if command and self.modify('switch-setup-modify' + command):
+            self.report('Static switch setup assigned')
+
+    def control_network(self):
+        """
+        Method to configure the fabric control network.
+        """
+        network = self.params['pn_fabric_control_network']
+        out = self.run('fabric-info format control-network')
+        if out is None:
+            return
+        if out.split()[1:2] != [network]:
+            if not self.modify('fabric-local-modify control-network ' +
+                               network):
+                return
+        self.report(u"Configured fabric control network to '{}'".format(
+            network))
+
+    def web_api(self):
+        """
+        Method to enable the web api.
+        """
+        self.run('admin-service-modify web if mgmt')
+
+    def stp(self):
+        """
+        Method to enable STP (Spanning Tree Protocol).
+        """
+        out = self.run('stp-show format enable')
+        if out is None:
+            return
+        if out.split()[1:2] != ['yes']:
+            if not self.modify('stp-modify enable'):
+                return
+        self.report('STP enabled')
+
+    def ports_40g(self):
+        """
+        Method to list the 40g ports of the switch.
+        :return: List of port numbers, or None if the show failed.
+        """
+        out = self.run('port-config-show format port speed 40g '
+                       'no-show-headers')
+        return None if out is None else sorted(set(out.split()), key=int)
+
+    def enable_ports(self):
+        """
+        Method to enable all the ports, except the lanes of the 40g ports.
+        """
+        out = self.run('port-config-show format enable no-show-headers')
+        if out is None:
+            return
+        if 'off' in out.split():
+            ports = self.run('port-config-show format port no-show-headers')
+            ports_40g = self.ports_40g()
+            if ports is None or ports_40g is None:
+                return
+            lanes = set(str(int(port) + lane) for port in ports_40g
+                        for lane in (1, 2, 3))
+            ports = sorted(set(ports.split()) - lanes, key=int)
+            if ports and not self.modify('port-config-modify port %s enable' %
+                                         ','.join(ports)):
+                return
+        self.report('Ports enabled')
+
+    def toggle_40g(self):
+        """
+        Method to toggle the 40g ports without lldp neighbour to 10g ports.
+        """
+        local_ports = self.run('lldp-show format local-port no-show-headers')
+        ports_40g = self.ports_40g()
+        if local_ports is None or ports_40g is None:
+            return
+
+        toggled = False
+        for port in [port for port in ports_40g
+                     if port not in local_ports.split()]:
+            bezel_port = self.run('port-show port %d format bezel-port '
+                                  'no-show-headers' % (int(port) + 1))
+            if bezel_port is None:
+                return
+            if '.2' not in bezel_port:
+                continue
+            range_port = '%s-%d' % (port, int(port) + 3)
+            for command in ('port-config-modify port %s disable' % port,
+                            'port-config-modify port %s speed 10g' % port,
+                            'port-config-modify port %s enable' % range_port):
+                if not self.modify(command):
+                    return
+            toggled = True
+
+        if toggled:
+            time.sleep(TOGGLE_40G_WAIT)
+            self.report('Toggled 40G ports to 10G')
+
+    def assign_inband_ip(self):
+        """
+        Method to assign the in-band ip.
+        """
+        out = self.run('switch-setup-show format in-band-ip')
+        if out is None:
+            return
+        if self.inband_ip not in out:
+            if not self.modify('switch-setup-modify in-band-ip ' +
+                               self.inband_ip):
+                return
+        self.report('Assigned in-band ip ' + self.inband_ip)
+
+    def apply(self):
+        """
+        Method to run the steps of the setup in order, stopping at the first
+        failed command.
+        :return: The SwitchSetup itself.
+        """
+        steps = [self.control_network]
+        if self.params['pn_static_setup']:
+            steps.insert(0, self.static_setup)
+        if self.params['pn_web_api']:
+            steps.append(self.web_api)
+        steps += [self.stp, self.enable_ports]
+        if self.params['pn_toggle_40g']:
+            steps.append(self.toggle_40g)
+        steps.append(self.assign_inband_ip)
+
+        for step in steps:
+            step()
+            if self.failed is not None:
+                break
+        return self
+
+
+def setup_fabric(executor, switches, params):
+    """
+    Method to run the post-join setup of every switch from the seed switch.
+    :param executor: CliExecutor used to run the commands.
+    :param switches: List of switch names, spines first, in the order used
+    to number the in-band ips.
+    :param params: Dictionary of module parameters.
+    :return: Tuple of the list of SwitchSetup of the fabric nodes, the list
+    of switches which are not fabric nodes and the failed CommandResult of
+    the fabric node show, or None.
+    """
+    nodes, failed = read_fabric_nodes(executor)
+    if failed is not None:
+        return [], [], failed
+
+    ips = inband_ips(params['pn_inband_ip'], switches)
+    joined = [switch for switch in switches if switch in nodes]
+    setups = run_concurrently(
+        lambda switch: SwitchSetup(executor, switch, params,
+                                   ips[switch]).apply(),
+        joined, executor.max_workers)
+    return setups, [switch for switch in switches if switch not in nodes], \
+        None
@@ -0,0 +1,75 @@
+""" Tests of the numbering given to deployed fabrics """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Run from the top of the repository:
+
+    python -m pytest ansible/module_utils/tests
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ansible.module_utils.pn_numbering import get_numbering_plan
+
+
+class FakeModule(object):
+    def __init__(self, plan_path=None):
+        self.params = {'pn_numbering_plan': plan_path}
+
+    def fail_json(self, **kwargs):
+        raise AssertionError(kwargs['msg'])
+
+
+class DciNumberingTest(unittest.TestCase):
+    """
+    pn_dci numbered the vrouter of leaf N (starting at 1) with the router-id
+    and loopback <loopback_static_part>N.N. A deployed fabric must keep
+    these numbers, with or without a plan file.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'plan.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def plan(self, leaf_list, path=None):
+        return get_numbering_plan(FakeModule(path), [], leaf_list,
+                                  loopback_ip='108.108.108.0/24')
+
+    def test_deployed_fabric_without_plan(self):
+        plan = self.plan(['leaf1', 'leaf2', 'leaf3'])
+        self.assertEqual([plan.dci_router_id(leaf)
+                          for leaf in ('leaf1', 'leaf2', 'leaf3')],
+                         ['108.108.1.1', '108.108.2.2', '108.108.3.3'])
+
+    def test_numbers_kept_when_leafs_are_added(self):
+        self.plan(['leaf1', 'leaf2'], self.path)
+        plan = self.plan(['leaf0', 'leaf1', 'leaf2'], self.path)
+        self.assertEqual(plan.dci_router_id('leaf1'), '108.108.1.1')
+        self.assertEqual(plan.dci_router_id('leaf2'), '108.108.2.2')
+        self.assertEqual(plan.dci_router_id('leaf0'), '108.108.3.3')
+
+
+if __name__ == '__main__':
+    unittest.main()
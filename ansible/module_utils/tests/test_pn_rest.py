@@ -0,0 +1,161 @@
+""" Tests of the REST backend against a local stub of the vRest API """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Run from the top of the repository:
+
+    python -m pytest ansible/module_utils/tests
+"""
+
+import json
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from ansible.module_utils.pn_rest import RestExecutor
+
+# Rows served by the stub, by request path.
+RESPONSES = {
+    '/vRest/fabric-nodes': [{'name': 'spine1'}, {'name': 'leaf1'}],
+    '/vRest/switches/spine1/vlans': [
+        {'id': 10, 'scope': 'fabric', 'description': None},
+        {'id': 20, 'scope': 'local', 'description': 'web'},
+    ],
+    '/vRest/switches/leaf1/vlans': [
+        {'id': 10, 'scope': 'fabric', 'description': None},
+    ],
+    '/vRest/switches/spine1/vrouter-interfaces': [
+        {'vrouter-name': 'spine1-vrouter', 'ip': '10.0.0.1/30', 'nic': 'eth0'},
+    ],
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET requests with the rows of RESPONSES, keeping connections
+    alive like the switch web server.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        self.server.paths.append(self.path)
+        if path in RESPONSES:
+            status = 200
+            document = {'result': {'status': 'Success', 'result': []},
+                        'data': RESPONSES[path]}
+        else:
+            status = 404
+            document = {'result': {'status': 'Failure', 'result': [
+                {'status': 'Failure', 'message': 'Not found: ' + path}]}}
+        body = json.dumps(document).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeModule(object):
+    def __init__(self):
+        self.params = {'pn_cliusername': 'network-admin',
+                       'pn_clipassword': 'admin'}
+
+
+class RestExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(('127.0.0.1', 0), StubHandler)
+        self.server.paths = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.executor = RestExecutor(FakeModule(), 4, url)
+
+    def tearDown(self):
+        self.executor.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_render_format_no_headers(self):
+        result = self.executor.execute(
+            'vlan-show format id,scope no-show-headers', 'spine1')
+        self.assertEqual(result.rc, 0)
+        self.assertEqual(result.out, '10 fabric\n20 local\n')
+        self.assertEqual(result.records[1],
+                         {'id': 20, 'scope': 'local', 'description': 'web'})
+
+    def test_render_headers_and_delimiter(self):
+        result = self.executor.execute(
+            'vlan-show format id,description parsable-delim ,', 'spine1')
+        self.assertEqual(result.out, 'id,description\n10,\n20,web\n')
+
+    def test_vrouter_name_first(self):
+        result = self.executor.execute(
+            'vrouter-interface-show format ip no-show-headers', 'spine1')
+        self.assertEqual(result.out, 'spine1-vrouter 10.0.0.1/30\n')
+
+    def test_query_parameters(self):
+        self.executor.execute('vlan-show scope fabric format id', 'spine1')
+        self.assertEqual(self.server.paths,
+                         ['/vRest/switches/spine1/vlans?scope=fabric'])
+
+    def test_fabric_fan_out(self):
+        result = self.executor.execute(
+            'vlan-show format switch,id no-show-headers', '*')
+        self.assertEqual(result.rc, 0)
+        self.assertEqual(sorted(result.out.splitlines()),
+                         ['leaf1 10', 'spine1 10', 'spine1 20'])
+        self.assertEqual(sorted(self.server.paths), [
+            '/vRest/fabric-nodes',
+            '/vRest/switches/leaf1/vlans',
+            '/vRest/switches/spine1/vlans',
+        ])
+        self.assertEqual(set(record['switch'] for record in result.records),
+                         set(['spine1', 'leaf1']))
+
+    def test_error_message(self):
+        result = self.executor.execute('lldp-show', 'spine1')
+        self.assertEqual(result.rc, 1)
+        self.assertEqual(result.out, '')
+        self.assertEqual(result.err, 'Not found: /vRest/switches/spine1/lldp')
+
+    def test_connections_reused(self):
+        for _ in range(3):
+            self.executor.execute('vlan-show format id', 'spine1')
+        self.assertEqual(self.executor.pool.stats['connections'], 1)
+        self.assertEqual(self.executor.pool.stats['requests'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,14 @@
 """
 This python script is to validate an output of a Ansible playbook.
 It validates whether output of a playbook is a valid JSON object or not.
-It also checks if all the required fields mentioned under in
-`fields_to_check` variable are present in the JSON object or not.
+It also checks every JSON object against `TASK_SCHEMA` to make sure that
+all the required fields (like status, summary, msg etc) are present and
+have the expected type.
+
+The output is consumed line by line, as the playbook runs. Every JSON object
+printed by the pn_json callback plugin between the task boundary markers is
+parsed and validated as soon as its closing marker is seen, so failures are
+reported in real time and only one JSON object is held in memory at a time.
 
 Example Usage:
 python pn_validate_json.py playbook.yml
@@ -12,77 +18,347 @@ python pn_validate_json.py playbook.yml
 To validate pn_initial_ztp.yml playbook, run this script as:
 python pn_validate_json.py pn_initial_ztp.yml
 
-This script takes playbook name as input and returns a string describing if
-output of the playbook is a valid/invalid JSON object and if all required
-fields (like status, summary, msg etc) are present in the JSON object or not.
+To validate the saved output of a playbook, or to tail a file which is still
+being written, run this script as:
+python pn_validate_json.py --file output.log [--follow]
+
+To validate the output piped from ansible-playbook, run this script as:
+ansible-playbook -i hosts pn_initial_ztp.yml | python pn_validate_json.py -
+
+This script returns a string describing if the output of the playbook is a
+valid/invalid JSON object and exits with a non zero status if any of the
+JSON objects is invalid.
 """
 
+import argparse
 import json
 import shlex
 import subprocess
 import sys
+import time
+
+BOUNDARY_STARTS = '__________ANSIBLE_TASK_BOUNDARY_STARTS__________'
+BOUNDARY_ENDS = '__________ANSIBLE_TASK_BOUNDARY_ENDS__________'
+
+# Fields returned by every Pluribus module, as normalised by pn_json.
+HOST_RESULT_SCHEMA = {
+    'type': dict,
+    'required': ['task', 'summary', 'msg', 'failed', 'exception',
+                 'unreachable']
+}
+
+# Each entry of `summary` of a successful task.
+SUMMARY_ENTRY_SCHEMA = {
+    'type': dict,
+    'required': ['switch', 'output'],
+    'properties': {
+        'switch': {'type': (str, type(u''))},
+        'output': {'type': (str, type(u''))}
+    }
+}
+
+TASK_SCHEMA = {
+    'type': dict,
+    'required': ['task', 'hosts', 'status'],
+    'properties': {
+        'task': {
+            'type': dict,
+            'required': ['name', 'id']
+        },
+        'hosts': {
+            'type': dict,
+            'values': HOST_RESULT_SCHEMA
+        },
+        'status': {
+            'type': (str, type(u'')),
+            'enum': ['0', '1', '-1']
+        }
+    }
+}
+
+DOCUMENT_SCHEMA = {
+    'type': dict,
+    'required': ['plays'],
+    'properties': {
+        'plays': {
+            'type': list,
+            'items': {
+                'type': dict,
+                'required': ['play', 'tasks'],
+                'properties': {
+                    'play': {
+                        'type': dict,
+                        'required': ['name', 'id']
+                    },
+                    'tasks': {
+                        'type': list,
+                        'items': TASK_SCHEMA
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+def check_schema(schema, value, path='$'):
+    """
+    Method to validate a JSON value against a schema.
+    :param schema: Dictionary describing the expected type, required keys,
+    properties, list items, dictionary values and allowed values.
+    :param value: The JSON value to validate.
+    :param path: Path of the value inside the JSON object.
+    :return: List of error messages, empty if the value is valid.
+    """
+    errors = []
+    if 'type' in schema and not isinstance(value, schema['type']):
+        return ['{}: unexpected type {}'.format(path, type(value).__name__)]
+
+    if 'enum' in schema and value not in schema['enum']:
+        errors.append('{}: invalid value {}'.format(path, value))
+
+    if isinstance(value, dict):
+        for field in schema.get('required', []):
+            if field not in value:
+                errors.append('{}: {} field is missing'.format(path, field))
+        for field, field_schema in schema.get('properties', {}).items():
+            if field in value:
+                errors += check_schema(field_schema, value[field],
+                                       '{}.{}'.format(path, field))
+        if 'values' in schema:
+            for key, item in value.items():
+                errors += check_schema(schema['values'], item,
+                                       '{}.{}'.format(path, key))
+
+    if isinstance(value, list) and 'items' in schema:
+        for index, item in enumerate(value):
+            errors += check_schema(schema['items'], item,
+                                   '{}[{}]'.format(path, index))
+
+    return errors
+
+
+def check_summary(task, path):
+    """
+    Method to validate the summary of every host against the task status.
+    If value of status is 0, every summary entry must describe the switch
+    and its output. If value of status is 1, those fields should not be
+    present in the JSON output.
+    :param task: Task entry of the JSON object.
+    :param path: Path of the task inside the JSON object.
+    :return: List of error messages, empty if the summary is valid.
+    """
+    errors = []
+    for host, result in task['hosts'].items():
+        summary = result.get('summary')
+        if not isinstance(summary, list):
+            continue
+
+        host_path = '{}.hosts.{}.summary'.format(path, host)
+        for index, entry in enumerate(summary):
+            entry_path = '{}[{}]'.format(host_path, index)
+            if task['status'] == '0':
+                errors += check_schema(SUMMARY_ENTRY_SCHEMA, entry,
+                                       entry_path)
+            elif task['status'] == '1' and isinstance(entry, dict):
+                for field in ('switch', 'output'):
+                    if field in entry:
+                        errors.append(
+                            '{}: since value of status is 1, {} field '
+                            'should not be present'.format(entry_path, field)
+                        )
+
+    return errors
 
-if len(sys.argv) != 2:
-    msg = 'Execution Error: Please provide Ansible playbook name!\n'
-    msg += 'Example usage: python validate_json.py playbook.yml'
-    exit(msg)
 
-playbook = sys.argv[1]
-command = ' ansible-playbook -i hosts ' + playbook
-command += ' --vault-password-file ~/.vault_pass.txt '
+def validate_document(text):
+    """
+    Method to parse and validate one JSON object printed by pn_json.
+    :param text: The JSON object as a string.
+    :return: Tuple of task names and list of error messages.
+    """
+    try:
+        document = json.loads(text)
+    except ValueError as error:
+        return [], ['INVALID JSON object: {}'.format(error)]
+
+    errors = check_schema(DOCUMENT_SCHEMA, document)
+    if errors:
+        return find_task_names(document), errors
+
+    for play_index, play in enumerate(document['plays']):
+        for task_index, task in enumerate(play['tasks']):
+            errors += check_summary(
+                task, '$.plays[{}].tasks[{}]'.format(play_index, task_index)
+            )
+
+    return find_task_names(document), errors
+
+
+def find_task_names(document):
+    """
+    Method to find names of the tasks reported in a JSON object, skipping
+    the parts which don't have the expected structure.
+    :param document: The parsed JSON object.
+    :return: List of task names.
+    """
+    task_names = []
+    plays = document.get('plays') if isinstance(document, dict) else None
+    for play in plays if isinstance(plays, list) else []:
+        tasks = play.get('tasks') if isinstance(play, dict) else None
+        for task in tasks if isinstance(tasks, list) else []:
+            if isinstance(task, dict) and isinstance(task.get('task'), dict):
+                task_names.append(task['task'].get('name', ''))
+
+    return task_names
+
+
+def iter_documents(lines):
+    """
+    Method to extract the JSON objects from the output of a playbook.
+    Only the lines of the JSON object currently being read are kept.
+    :param lines: Iterable of output lines.
+    :return: Generator of (line number, JSON object string) tuples, yielded
+    as soon as the closing boundary marker of an object is read.
+    """
+    buffer = None
+    start_line = 0
+    for line_number, line in enumerate(lines, 1):
+        marker = line.strip()
+        if marker == BOUNDARY_STARTS:
+            buffer = []
+            start_line = line_number
+        elif marker == BOUNDARY_ENDS:
+            if buffer is not None:
+                yield start_line, ''.join(buffer)
+            buffer = None
+        elif buffer is not None:
+            buffer.append(line)
 
-print('')
-print('Started executing playbook {}'.format(playbook))
-print('')
-print('A message will appear when playbook execution is finished')
-print('')
-print('Kindly wait until then as it may take some time')
-print('')
 
-std_out = subprocess.check_output(shlex.split(command))
+def follow_file(path, poll_interval=0.5):
+    """
+    Method to read the lines of a file which is still being written.
+    :param path: Path of the file to tail.
+    :param poll_interval: Seconds to wait for new data at end of file.
+    :return: Generator of lines. It never ends; stop it with ctrl+C.
+    """
+    with open(path) as output_file:
+        partial = ''
+        while True:
+            line = output_file.readline()
+            if not line:
+                time.sleep(poll_interval)
+                continue
+            partial += line
+            if partial.endswith('\n'):
+                yield partial
+                partial = ''
 
-print('Finished executing playbook {}'.format(playbook))
-print('')
-print('Validating JSON output')
-print('')
 
-delimiter = "Pausing for 2 seconds\n"
-delimiter += "(ctrl+C then 'C' = continue early, ctrl+C then 'A' = abort)"
+def read_file(path):
+    """
+    Method to read the lines of a saved playbook output, closing the file
+    once every line is read.
+    :param path: Path of the file.
+    :return: Generator of lines.
+    """
+    with open(path) as output_file:
+        for line in output_file:
+            yield line
 
-json_object_list = std_out.split(delimiter)
-json_object_list = json_object_list[:-1]
 
-msg = ''
-print('Validation Complete')
-print('')
+def iter_process_lines(command):
+    """
+    Method to run a command and read its standard output line by line.
+    :param command: The command to run.
+    :return: Generator of decoded output lines. It raises
+    CalledProcessError once the output is read if the command failed.
+    """
+    process = subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE)
+    for line in iter(process.stdout.readline, b''):
+        yield line.decode('utf-8', 'replace')
+    process.stdout.close()
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
 
-for json_object in json_object_list:
+
+def validate_stream(lines, source):
+    """
+    Method to validate every JSON object of a playbook output as it arrives.
+    Stopping it with ctrl+C reports the objects validated so far.
+    :param lines: Iterable of output lines.
+    :param source: Name of the playbook or file, used in messages.
+    :return: Number of invalid JSON objects, plus one if the playbook
+    exited with a non zero status.
+    """
+    documents, failures, exit_status = 0, 0, 0
     try:
-        json.loads(json_object)
-    except ValueError:
-        exit('Result: Output of {} is an INVALID JSON object'.format(playbook))
-
-    fields_to_check = [r'"task":', r'"summary":', r'"msg":', r'"status":']
-    extra_fields = [r'"output":', r'"switch":']
-
-    if r'"status": "0"' in json_object:
-        fields_to_check += extra_fields
-    elif r'"status": "1"' in json_object:
-        for field in extra_fields:
-            if field in json_object:
-                msg += 'Since value of status is 1, '
-                msg += '{} field should not be present '.format(field)
-                msg += 'in the JSON output\n'
-
-    for field in fields_to_check:
-        if field not in json_object:
-            msg += '{} field is missing from the JSON output\n'.format(field)
-
-print('Result: Output of {} is a VALID JSON object'.format(playbook))
-
-if msg == '':
-    print('And, all the required fields are present in this JSON object')
+        for line_number, text in iter_documents(lines):
+            documents += 1
+            task_names, errors = validate_document(text)
+            label = ', '.join(task_names) or 'JSON object'
+            if errors:
+                failures += 1
+                print('FAILED: {} (line {})'.format(label, line_number))
+                for error in errors:
+                    print('    {}'.format(error))
+            else:
+                print('OK: {}'.format(label))
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        print('')
+        print('Interrupted')
+    except subprocess.CalledProcessError as error:
+        exit_status = error.returncode
+        print('FAILED: {} exited with status {}'.format(source, exit_status))
+
     print('')
-else:
-    print('But,')
-    exit(msg)
+    if documents == 0:
+        print('Result: No JSON object found in output of {}'.format(source))
+        return 1
+
+    print('Result: {} of {} JSON objects in output of {} are valid'.format(
+        documents - failures, documents, source))
+    return failures + (1 if exit_status else 0)
+
+
+def main():
+    """ This section is for arguments parsing """
+    parser = argparse.ArgumentParser(
+        description='Validate JSON output of a Pluribus Ansible playbook.')
+    parser.add_argument('playbook', nargs='?',
+                        help="Playbook to run, or '-' to read from stdin.")
+    parser.add_argument('--file', help='Saved output of a playbook.')
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep reading the file as it grows.')
+    args = parser.parse_args()
+
+    if args.file:
+        source = args.file
+        if args.follow:
+            lines = follow_file(args.file)
+        else:
+            lines = read_file(args.file)
+    elif args.playbook == '-':
+        source = 'stdin'
+        lines = sys.stdin
+    elif args.playbook:
+        source = args.playbook
+        command = ' ansible-playbook -i hosts ' + args.playbook
+        command += ' --vault-password-file ~/.vault_pass.txt '
+        print('Started executing playbook {}'.format(args.playbook))
+        print('')
+        lines = iter_process_lines(command)
+    else:
+        msg = 'Execution Error: Please provide Ansible playbook name!\n'
+        msg += 'Example usage: python pn_validate_json.py playbook.yml'
+        exit(msg)
+
+    failures = validate_stream(lines, source)
+    if failures:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
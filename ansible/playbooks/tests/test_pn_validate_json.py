@@ -0,0 +1,84 @@
+""" Tests of pn_validate_json running a playbook command """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Run from the top of the repository:
+
+    python -m pytest ansible/playbooks/tests
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from ansible.playbooks import pn_validate_json
+
+DOCUMENT = {
+    'plays': [{
+        'play': {'name': 'play', 'id': '1'},
+        'tasks': [{
+            'task': {'name': 'task', 'id': '2'},
+            'status': '0',
+            'hosts': {'spine1': {
+                'task': 'task', 'msg': '', 'failed': False,
+                'exception': '', 'unreachable': False,
+                'summary': [{'switch': 'spine1', 'output': 'ok'}],
+            }},
+        }],
+    }],
+}
+
+
+class ValidateProcessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def validate(self, exit_status):
+        """
+        Method to validate the output of a command printing one valid JSON
+        object between the task boundary markers, then exiting with the
+        given status.
+        """
+        path = os.path.join(self.directory, 'playbook.py')
+        with open(path, 'w') as script:
+            script.write('print(%r)\nprint(%r)\nprint(%r)\n'
+                         'raise SystemExit(%d)\n' % (
+                             pn_validate_json.BOUNDARY_STARTS,
+                             json.dumps(DOCUMENT),
+                             pn_validate_json.BOUNDARY_ENDS, exit_status))
+        return pn_validate_json.validate_stream(
+            pn_validate_json.iter_process_lines(
+                '%s %s' % (sys.executable, path)), 'playbook.yml')
+
+    def test_valid_output(self):
+        self.assertEqual(self.validate(0), 0)
+
+    def test_failed_playbook(self):
+        self.assertEqual(self.validate(1), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,9 +19,56 @@
 from __future__ import (absolute_import, division, print_function)
 from ansible.plugins.callback import CallbackBase
 import json
+import math
+import os
+import sys
+import time
 
 __metaclass__ = type
 
+# Directory in which the profile report is written at the end of a playbook.
+# Defaults to the current working directory.
+PROFILE_DIR_ENV = 'PN_PROFILE_DIR'
+
+# SQLite store every run is appended to, see pn_run_history.py. Runs are
+# only recorded when it is set.
+HISTORY_DB_ENV = 'PN_HISTORY_DB'
+
+# Name of the fabric a run is recorded under when no task reports it.
+FABRIC_ENV = 'PN_FABRIC'
+
+
+def load_run_history():
+    """
+    Method to load pn_run_history.py from the directory of this callback,
+    which Ansible loads by path, without changing sys.path.
+    :return: The pn_run_history module.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'pn_run_history.py')
+    if sys.version_info[0] < 3:
+        import imp
+        return imp.load_source('pn_run_history', path)
+
+    import importlib.util
+    spec = importlib.util.spec_from_file_location('pn_run_history', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, pct):
+    """
+    Method to find the nearest-rank percentile of a list of values.
+    :param values: Sorted list of numbers.
+    :param pct: Percentile to find, between 0 and 100.
+    :return: The value at the given percentile or 0 for an empty list.
+    """
+    if not values:
+        return 0
+    rank = int(math.ceil(pct / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
 
 class CallbackModule(CallbackBase):
     CALLBACK_VERSION = 2.0
@@ -32,6 +79,16 @@ class CallbackModule(CallbackBase):
         super(CallbackModule, self).__init__(display)
         # It is initialised at the start of the playbook
         self.results = []
+        self.playbook_name = 'playbook'
+        self.playbook_start = time.time()
+        # Timing records of every task, in the order they were started, and
+        # the record of every task by task id.
+        self.timings = []
+        self.task_timings = {}
+        self.current_play = ''
+        # Fabric name and number of switches, as reported by the tasks.
+        self.fabric = None
+        self.fabric_size = 0
 
     def _new_play(self, play):
         return {
@@ -52,17 +109,104 @@ class CallbackModule(CallbackBase):
             'status': {}
         }
 
+    def _new_timing(self, task):
+        return {
+            'play': self.current_play,
+            'task': task.name,
+            'id': str(task._uuid),
+            'start': time.time(),
+            'hosts': {}
+        }
+
+    def _start_timing(self, task):
+        """
+        Method to start the timing record of a task or handler.
+        """
+        timing = self._new_timing(task)
+        self.timings.append(timing)
+        self.task_timings[timing['id']] = timing
+
+    def _record_host_end(self, result):
+        """
+        Method to record end time, duration and module reported cli metrics
+        of a task for the host of the given result. The host is timed from
+        its own start when Ansible reported it, else from the task start.
+        """
+        timing = self.task_timings.get(str(result._task._uuid))
+        if timing is None:
+            return
+        now = time.time()
+        record = timing['hosts'].setdefault(result._host.name,
+                                            {'start': timing['start']})
+        record['end'] = now
+        record['duration'] = now - record['start']
+        metrics = result._result.get('cli_metrics')
+        if isinstance(metrics, dict):
+            record['cli_metrics'] = metrics
+        self._record_fabric(result._result)
+
+    def _record_fabric(self, result):
+        """
+        Method to pick the fabric name and size from the arguments of the
+        fabric modules or the pn_fabric facts of a task result.
+        """
+        args = result.get('invocation', {}).get('module_args') or {}
+        if args.get('pn_fabric_name'):
+            self.fabric = args['pn_fabric_name']
+        switches = [name for key in ('pn_spine_list', 'pn_leaf_list')
+                    if isinstance(args.get(key), list) for name in args[key]]
+        self.fabric_size = max(self.fabric_size, len(set(switches)))
+
+        nodes = (result.get('ansible_facts', {}).get('pn_fabric') or
+                 {}).get('nodes')
+        if isinstance(nodes, dict) and nodes:
+            names = sorted(node.get('fabric') for node in nodes.values()
+                           if node.get('fabric'))
+            self.fabric = names[0] if names else self.fabric
+            self.fabric_size = max(self.fabric_size, len(nodes))
+
+    def v2_playbook_on_start(self, playbook):
+        self.playbook_name = os.path.basename(playbook._file_name)
+        self.playbook_start = time.time()
+
     def v2_playbook_on_play_start(self, play):
         # This part is only at the start of the play.
         # So, in between tasks, this part doesn't comes into picture.
         self.results = []
         self.results.append(self._new_play(play))
+        self.current_play = play.name
 
     def v2_playbook_on_task_start(self, task, is_conditional):
         self.results[-1]['tasks'] = []
         self.results[-1]['tasks'].append(self._new_task(task))
+        self._start_timing(task)
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.v2_playbook_on_task_start(task, False)
+
+    def v2_runner_on_start(self, host, task):
+        # Only called by Ansible 2.8 onwards. With older releases every host
+        # is assumed to start along with the task.
+        timing = self.task_timings.get(str(task._uuid))
+        if timing is not None:
+            timing['hosts'][host.name] = {'start': time.time()}
 
     def v2_runner_on_ok(self, result, **kwargs):
+        self._record_host_end(result)
+        self._print_result(result)
+
+    def v2_runner_on_skipped(self, result, **kwargs):
+        # A skipped host did no work, it is left out of the task timings.
+        timing = self.task_timings.get(str(result._task._uuid))
+        if timing is not None:
+            timing['hosts'].pop(result._host.name, None)
+        self._print_result(result)
+
+    def _print_result(self, result):
+        """
+        Method to add the result of a host to its task and print the plays as
+        a JSON document.
+        """
         host = result._host
         if 'task' not in result._result.keys():
             result._result['task'] = ''
@@ -110,7 +254,119 @@ class CallbackModule(CallbackBase):
         }
 
         print(json.dumps(output, indent=4, sort_keys=True))
+        profile = self._write_profile()
+        self._record_history(profile, len(hosts))
+
+    def _build_profile(self):
+        """
+        Method to aggregate per host timings of every task into a profile.
+        :return: Dictionary describing where the time of the playbook went.
+        """
+        tasks = []
+        for timing in self.timings:
+            durations = sorted(h['duration'] for h in timing['hosts'].values()
+                               if 'duration' in h)
+            if not durations:
+                continue
+
+            cli_metrics = {}
+            for record in timing['hosts'].values():
+                for key, value in record.get('cli_metrics', {}).items():
+                    if isinstance(value, (int, float)):
+                        cli_metrics[key] = cli_metrics.get(key, 0) + value
+
+            tasks.append({
+                'play': timing['play'],
+                'task': timing['task'],
+                'id': timing['id'],
+                'host_count': len(durations),
+                'p50': percentile(durations, 50),
+                'p95': percentile(durations, 95),
+                'max': durations[-1],
+                'cli_metrics': cli_metrics,
+                'hosts': timing['hosts']
+            })
+
+        return {
+            'playbook': self.playbook_name,
+            'duration': time.time() - self.playbook_start,
+            'tasks': tasks
+        }
+
+    def _format_profile(self, profile):
+        """
+        Method to render a profile as a human readable table, slowest first.
+        """
+        header = '%-30s %-40s %6s %9s %9s %9s %8s %9s' % (
+            'PLAY', 'TASK', 'HOSTS', 'P50(s)', 'P95(s)', 'MAX(s)', 'CLI',
+            'CLI(s)')
+        lines = ['PROFILE: %s (%.2fs)' % (profile['playbook'],
+                                        profile['duration']),
+                 header, '-' * len(header)]
+        for task in sorted(profile['tasks'], key=lambda t: t['max'],
+                           reverse=True):
+            metrics = task['cli_metrics']
+            lines.append('%-30s %-40s %6d %9.2f %9.2f %9.2f %8s %9s' % (
+                task['play'][:30], task['task'][:40], task['host_count'],
+                task['p50'], task['p95'], task['max'],
+                metrics.get('calls', '-'),
+                '%.2f' % metrics['duration'] if 'duration' in metrics else '-'
+            ))
+
+        return '\n'.join(lines)
+
+    def _write_profile(self):
+        """
+        Method to write the profile report as JSON and as a table.
+        :return: The profile.
+        """
+        profile = self._build_profile()
+        table = self._format_profile(profile)
+        # stdout only carries JSON documents.
+        self._display.display(table, stderr=True)
+
+        base = os.path.join(os.environ.get(PROFILE_DIR_ENV, os.getcwd()),
+                            os.path.splitext(self.playbook_name)[0])
+        try:
+            with open(base + '.profile.json', 'w') as json_file:
+                json.dump(profile, json_file, indent=4, sort_keys=True)
+            with open(base + '.profile.txt', 'w') as table_file:
+                table_file.write(table + '\n')
+        except (IOError, OSError) as error:
+            self._display.warning('Unable to write profile report: %s' % error)
+        return profile
+
+    def _record_history(self, profile, host_count):
+        """
+        Method to append the run to the run history given in PN_HISTORY_DB
+        and print the tasks whose duration regressed against the earlier runs
+        on the same fabric. Nothing is recorded when PN_HISTORY_DB is unset.
+        :param profile: The profile of the run.
+        :param host_count: Number of hosts of the run, used as fabric size
+        when no task reported it.
+        """
+        path = os.environ.get(HISTORY_DB_ENV)
+        if not path:
+            return
+        try:
+            pn_run_history = load_run_history()
+            connection = pn_run_history.open_store(path)
+            try:
+                run_id = pn_run_history.record_run(
+                    connection, profile,
+                    self.fabric or os.environ.get(FABRIC_ENV, 'unknown'),
+                    self.fabric_size or host_count, self.playbook_start)
+                run, tasks = pn_run_history.find_regressions(connection,
+                                                             run_id)
+            finally:
+                connection.close()
+        except Exception as error:
+            self._display.warning('Unable to record run history: %s' % error)
+            return
+
+        if [task for task in tasks if task['regressed']]:
+            report = pn_run_history.format_report(run, tasks, True)
+            self._display.display(report, stderr=True)
 
     v2_runner_on_failed = v2_runner_on_ok
     v2_runner_on_unreachable = v2_runner_on_ok
-    v2_runner_on_skipped = v2_runner_on_ok
@@ -0,0 +1,330 @@
+#!/usr/bin/python
+
+"""
+Run history of the playbooks, kept in a local SQLite store, and report of
+the tasks whose duration regressed.
+
+When PN_HISTORY_DB is set, the pn_json callback appends every playbook run
+to the store: the duration of every task on every host and the cli metrics
+reported by the modules.
+Runs are indexed by playbook, fabric name and fabric size (number of
+switches), so that a run is only compared with runs of the same playbook
+on a fabric of the same kind.
+
+A task regressed when its duration (slowest host) in a run is more than
+threshold above the median of the same task over the trailing window of
+earlier runs, and at least min-delta seconds slower.
+
+Example Usage:
+python pn_run_history.py runs
+python pn_run_history.py report --playbook pn_l3_vrrp_ebgp.yml
+python pn_run_history.py report --playbook pn_l2_ztp.yml --fabric lab-fabric
+    --threshold 0.3 --window 10
+
+The store is pn_run_history.db in the current directory, or the file given
+in --db or in the PN_HISTORY_DB environment variable. report exits with
+status 1 when it finds regressions.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+HISTORY_DB_ENV = 'PN_HISTORY_DB'
+DEFAULT_DB = 'pn_run_history.db'
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_WINDOW = 5
+DEFAULT_MIN_DELTA = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    playbook TEXT NOT NULL,
+    fabric TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_key ON runs (playbook, fabric, size, id);
+CREATE TABLE IF NOT EXISTS task_hosts (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    position INTEGER NOT NULL,
+    play TEXT NOT NULL,
+    task TEXT NOT NULL,
+    host TEXT NOT NULL,
+    duration REAL NOT NULL,
+    cli_calls INTEGER,
+    cli_duration REAL,
+    cli_metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS task_hosts_run ON task_hosts (run_id);
+"""
+
+
+def default_db():
+    """
+    Method to find the path of the store.
+    :return: Path given in PN_HISTORY_DB, or pn_run_history.db.
+    """
+    return os.environ.get(HISTORY_DB_ENV) or DEFAULT_DB
+
+
+def open_store(path):
+    """
+    Method to open the store, creating its tables if needed.
+    :param path: Path of the SQLite file.
+    :return: sqlite3 connection.
+    """
+    connection = sqlite3.connect(path, timeout=30)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def median(values):
+    """
+    Method to compute the median of a list of numbers.
+    :param values: List of numbers, not empty.
+    :return: The median.
+    """
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def record_run(connection, profile, fabric, size, started=None):
+    """
+    Method to append a playbook run to the store.
+    :param connection: sqlite3 connection of the store.
+    :param profile: Profile built by the pn_json callback: playbook,
+    duration and tasks with the timing of every host.
+    :param fabric: Name of the fabric the playbook ran on.
+    :param size: Number of switches of the fabric.
+    :param started: Start time of the run, defaults to now minus its
+    duration.
+    :return: Id of the run.
+    """
+    if started is None:
+        started = time.time() - profile['duration']
+    with connection:
+        cursor = connection.execute(
+            'INSERT INTO runs (playbook, fabric, size, started, duration) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (profile['playbook'], fabric or '', int(size or 0), started,
+             profile['duration']))
+        run_id = cursor.lastrowid
+        rows = []
+        for position, task in enumerate(profile['tasks']):
+            for host, record in sorted(task['hosts'].items()):
+                if 'duration' not in record:
+                    continue
+                metrics = record.get('cli_metrics') or {}
+                rows.append((run_id, position, task['play'], task['task'],
+                             host, record['duration'], metrics.get('calls'),
+                             metrics.get('duration'),
+                             json.dumps(metrics, sort_keys=True)
+                             if metrics else None))
+        connection.executemany(
+            'INSERT INTO task_hosts (run_id, position, play, task, host, '
+            'duration, cli_calls, cli_duration, cli_metrics) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    return run_id
+
+
+def list_runs(connection, playbook=None, fabric=None, size=None, limit=20):
+    """
+    Method to list the latest runs, newest first.
+    :param connection: sqlite3 connection of the store.
+    :param playbook: Optional playbook file name to select.
+    :param fabric: Optional fabric name to select.
+    :param size: Optional fabric size to select.
+    :param limit: Maximum number of runs.
+    :return: List of (id, playbook, fabric, size, started, duration).
+    """
+    query = 'SELECT id, playbook, fabric, size, started, duration FROM runs'
+    conditions = []
+    values = []
+    for column, value in (('playbook', playbook), ('fabric', fabric),
+                          ('size', size)):
+        if value is not None:
+            conditions.append('%s = ?' % column)
+            values.append(value)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY id DESC LIMIT ?'
+    return connection.execute(query, values + [limit]).fetchall()
+
+
+def task_durations(connection, run_id):
+    """
+    Method to read the duration of every task of a run: the duration of
+    its slowest host, and the cli calls of all its hosts.
+    :param connection: sqlite3 connection of the store.
+    :param run_id: Id of the run.
+    :return: List of (play, task, duration, cli calls), in task order.
+    """
+    return connection.execute(
+        'SELECT play, task, MAX(duration), SUM(cli_calls) FROM task_hosts '
+        'WHERE run_id = ? GROUP BY position, play, task ORDER BY position',
+        (run_id,)).fetchall()
+
+
+def find_regressions(connection, run_id=None, playbook=None, fabric=None,
+                     size=None, threshold=DEFAULT_THRESHOLD,
+                     window=DEFAULT_WINDOW, min_delta=DEFAULT_MIN_DELTA):
+    """
+    Method to compare the tasks of a run with the trailing median of the
+    earlier runs of the same playbook, fabric and size.
+    :param connection: sqlite3 connection of the store.
+    :param run_id: Id of the run to check, defaults to the latest run
+    matching playbook, fabric and size.
+    :param playbook: Optional playbook file name.
+    :param fabric: Optional fabric name.
+    :param size: Optional fabric size.
+    :param threshold: Relative slowdown above the median flagged, 0.5 for
+    50%.
+    :param window: Number of earlier runs the median is computed over.
+    :param min_delta: Minimum slowdown in seconds flagged.
+    :return: Tuple of the run (id, playbook, fabric, size, started,
+    duration), or None if there is no run, and the list of dictionaries
+    describing every task with its median and whether it regressed.
+    """
+    if run_id is None:
+        runs = list_runs(connection, playbook, fabric, size, 1)
+    else:
+        runs = connection.execute(
+            'SELECT id, playbook, fabric, size, started, duration FROM runs '
+            'WHERE id = ?', (run_id,)).fetchall()
+    if not runs:
+        return None, []
+
+    run = runs[0]
+    earlier = [row[0] for row in connection.execute(
+        'SELECT id FROM runs WHERE playbook = ? AND fabric = ? AND size = ? '
+        'AND id < ? ORDER BY id DESC LIMIT ?',
+        (run[1], run[2], run[3], run[0], window))]
+
+    history = {}
+    for earlier_id in earlier:
+        for play, task, duration, _ in task_durations(connection,
+                                                      earlier_id):
+            history.setdefault((play, task), []).append(duration)
+
+    tasks = []
+    for play, task, duration, cli_calls in task_durations(connection,
+                                                          run[0]):
+        durations = history.get((play, task))
+        entry = {
+            'play': play,
+            'task': task,
+            'duration': duration,
+            'cli_calls': cli_calls,
+            'median': median(durations) if durations else None,
+            'samples': len(durations or []),
+            'regressed': False,
+        }
+        if durations:
+            entry['regressed'] = (
+                duration > entry['median'] * (1 + threshold) and
+                duration - entry['median'] >= min_delta)
+        tasks.append(entry)
+    return run, tasks
+
+
+def format_report(run, tasks, only_regressed=False):
+    """
+    Method to render a regression report as a table.
+    :param run: Run tuple returned by find_regressions().
+    :param tasks: Task dictionaries returned by find_regressions().
+    :param only_regressed: Whether to list the regressed tasks only.
+    :return: The report.
+    """
+    regressed = [task for task in tasks if task['regressed']]
+    lines = ['RUN %d: %s on %s (%d switches), %s, %.2fs, %d regressions' % (
+        run[0], run[1], run[2] or '-', run[3],
+        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run[4])), run[5],
+        len(regressed))]
+    header = '%-30s %-40s %9s %9s %7s %8s %s' % (
+        'PLAY', 'TASK', 'TIME(s)', 'MEDIAN(s)', 'RUNS', 'CLI', '')
+    lines += [header, '-' * len(header)]
+    for task in tasks:
+        if only_regressed and not task['regressed']:
+            continue
+        lines.append('%-30s %-40s %9.2f %9s %7d %8s %s' % (
+            task['play'][:30], task['task'][:40], task['duration'],
+            '-' if task['median'] is None else '%.2f' % task['median'],
+            task['samples'],
+            '-' if task['cli_calls'] is None else task['cli_calls'],
+            'REGRESSED' if task['regressed'] else ''))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """ This section is for arguments parsing """
+    parser = argparse.ArgumentParser(
+        description='Run history of the playbooks and duration regressions.')
+    parser.add_argument('--db', default=default_db(),
+                        help='Path of the store (default: %(default)s).')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    runs_parser = commands.add_parser('runs', help='List the latest runs.')
+    report_parser = commands.add_parser(
+        'report', help='Compare a run with the trailing median of the '
+                       'earlier runs.')
+    for command_parser in (runs_parser, report_parser):
+        command_parser.add_argument('--playbook')
+        command_parser.add_argument('--fabric')
+        command_parser.add_argument('--size', type=int)
+    runs_parser.add_argument('--limit', type=int, default=20)
+    report_parser.add_argument('--run', type=int,
+                               help='Id of the run, default: the latest.')
+    report_parser.add_argument('--threshold', type=float,
+                               default=DEFAULT_THRESHOLD,
+                               help='Relative slowdown flagged '
+                                    '(default: %(default)s).')
+    report_parser.add_argument('--window', type=int, default=DEFAULT_WINDOW,
+                               help='Number of earlier runs of the median '
+                                    '(default: %(default)s).')
+    report_parser.add_argument('--min-delta', type=float,
+                               default=DEFAULT_MIN_DELTA,
+                               help='Minimum slowdown in seconds flagged '
+                                    '(default: %(default)s).')
+    report_parser.add_argument('--regressions-only', action='store_true')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print('No run history in %s' % args.db)
+        return 0
+    connection = open_store(args.db)
+
+    if args.command == 'runs':
+        for run in list_runs(connection, args.playbook, args.fabric,
+                             args.size, args.limit):
+            print('%6d  %-35s %-20s %4d  %s  %9.2fs' % (
+                run[0], run[1], run[2] or '-', run[3],
+                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run[4])),
+                run[5]))
+        return 0
+
+    run, tasks = find_regressions(
+        connection, getattr(args, 'run', None), args.playbook, args.fabric,
+        args.size, getattr(args, 'threshold', DEFAULT_THRESHOLD),
+        getattr(args, 'window', DEFAULT_WINDOW),
+        getattr(args, 'min_delta', DEFAULT_MIN_DELTA))
+    if run is None:
+        print('No matching run')
+        return 0
+    print(format_report(run, tasks, getattr(args, 'regressions_only',
+                                            False)))
+    return 1 if [task for task in tasks if task['regressed']] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())